@@ -1,8 +1,8 @@
 from fastapi import APIRouter
 from app.api.v1.endpoints import (
-    health, sucursales, auth
+    health, sucursales, auth, exportaciones, prestamos, pagos, clientes, geolocalizacion, agenda_cobranza
     # users, loans, clients, search, monitoring, admin  # Temporalmente comentado
-    # solicitudes, agenda_cobranza  # Temporalmente comentado para resolver errores de modelos
+    # solicitudes  # Temporalmente comentado para resolver errores de modelos
 )
 
 api_router = APIRouter()
@@ -28,6 +28,41 @@ api_router.include_router(
     tags=["auth"]
 )
 
+# Incluir rutas de exportaciones masivas
+api_router.include_router(
+    exportaciones.router,
+    prefix="/exportaciones",
+    tags=["exportaciones"]
+)
+
+# Incluir rutas de préstamos
+api_router.include_router(
+    prestamos.router,
+    prefix="/prestamos",
+    tags=["prestamos"]
+)
+
+# Incluir rutas de pagos
+api_router.include_router(
+    pagos.router,
+    prefix="/pagos",
+    tags=["pagos"]
+)
+
+# Incluir rutas de clientes
+api_router.include_router(
+    clientes.router,
+    prefix="/clientes",
+    tags=["clientes"]
+)
+
+# Incluir rutas de consultas geográficas
+api_router.include_router(
+    geolocalizacion.router,
+    prefix="/geolocalizacion",
+    tags=["geolocalizacion"]
+)
+
 # # Incluir rutas de solicitudes
 # api_router.include_router(
 #     solicitudes.router,
@@ -35,9 +70,9 @@ api_router.include_router(
 #     tags=["solicitudes"]
 # )
 
-# # Incluir rutas de agenda de cobranza
-# api_router.include_router(
-#     agenda_cobranza.router,
-#     prefix="/agenda-cobranza",
-#     tags=["agenda-cobranza"]
-# )
+# Incluir rutas de agenda de cobranza
+api_router.include_router(
+    agenda_cobranza.router,
+    prefix="/agenda-cobranza",
+    tags=["agenda-cobranza"]
+)
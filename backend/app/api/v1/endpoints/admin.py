@@ -5,8 +5,9 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import logging
-from app.core.init_db import init_database, migrate_descuento_directo
-from app.core.database import check_db_connection
+from app.core.init_db import init_database, apply_online_migrations
+from app.core.database import check_db_connection, engine
+from app.services.migration_runner import MigrationRunner
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -84,48 +85,47 @@ async def run_migrations():
         )
 
 @router.post("/migrate-descuento-directo", response_model=MigrationResponse)
-async def migrate_descuento_directo_endpoint():
+async def migrate_descuento_directo_endpoint(background_tasks: BackgroundTasks):
     """
-    Ejecutar migración específica para descuento directo en préstamos.
+    Programar la migración de descuento directo en préstamos.
     
-    Esta migración agrega:
-    - Tipos ENUM para clasificación de préstamos
-    - Campos de descuento directo
-    - Información encriptada del empleador
-    - Campos de control y autorización
-    - Índices optimizados
+    Se ejecuta en segundo plano con el ejecutor en línea (índices
+    concurrentes, backfill por lotes, lock_timeout con reintentos).
+    El avance se consulta en GET /migrations.
+    """
+    background_tasks.add_task(apply_online_migrations, ['003_add_descuento_directo_prestamos'])
+    return MigrationResponse(
+        success=True,
+        message="Migración de descuento directo programada",
+        details=["⏳ Consulte el progreso en GET /admin/migrations"]
+    )
+
+@router.get("/migrations")
+def get_migrations_status():
+    """
+    Estado de las migraciones: aplicadas, pendientes y progreso por paso.
     """
     try:
-        logger.info("Ejecutando migración 003: Descuento Directo...")
-        
-        # Ejecutar migración específica
-        success = migrate_descuento_directo()
-        
-        if success:
-            return MigrationResponse(
-                success=True,
-                message="Migración de descuento directo completada exitosamente",
-                details=[
-                    "✅ Tipos ENUM creados (tipo_prestamo, tipo_descuento_directo, modalidad_pago, estado_prestamo)",
-                    "✅ Campos de clasificación agregados",
-                    "✅ Información de empleador (encriptada) agregada",
-                    "✅ Campos de control de descuento agregados",
-                    "✅ Números únicos de préstamo generados",
-                    "✅ Índices optimizados creados",
-                    "🏦 Tipos de descuento: JUBILADOS, CSS, CONTRALORÍA, BANCOS, etc.",
-                    "⚖️ Cumple regulación panameña (máximo 30% del salario)"
-                ]
-            )
-        else:
-            raise Exception("Error durante la migración de descuento directo")
-            
+        return MigrationRunner(engine).estado()
     except Exception as e:
-        logger.error(f"Error en migración descuento directo: {e}")
+        logger.error(f"Error consultando estado de migraciones: {e}")
         raise HTTPException(
             status_code=500,
-            detail=f"Error ejecutando migración de descuento directo: {str(e)}"
+            detail=f"Error consultando migraciones: {str(e)}"
         )
 
+@router.post("/migrations/run", response_model=MigrationResponse)
+async def run_online_migrations(background_tasks: BackgroundTasks, version: str = None):
+    """
+    Programar las migraciones pendientes (o solo `version`) en segundo plano.
+    """
+    background_tasks.add_task(apply_online_migrations, [version] if version else None)
+    return MigrationResponse(
+        success=True,
+        message="Migraciones programadas",
+        details=[f"📋 Versión: {version or 'todas las pendientes'}", "⏳ Consulte el progreso en GET /admin/migrations"]
+    )
+
 @router.post("/reset-db", response_model=MigrationResponse)
 async def reset_database():
     """
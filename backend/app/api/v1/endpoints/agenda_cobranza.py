@@ -18,9 +18,12 @@ from app.models.secure_models import Cliente, Usuario
 from app.schemas.agenda_cobranza import (
     ActividadCobranzaCreate, ActividadCobranzaUpdate, ActividadCobranzaResponse,
     ActividadCobranzaListResponse, AlertaCobranzaResponse, DashboardCobranzaResponse,
-    ActividadReprogramar, ActividadCompletar
+    ActividadReprogramar, ActividadCompletar, RutaCobranzaResponse, PlanificacionRutasResponse
 )
+from app.core.config import settings
 from app.services.agenda_cobranza_service import AgendaCobranzaService
+from app.services.cliente_nombre_cache import cliente_nombre_cache
+from app.services.ruta_cobranza_service import RutaCobranzaService
 from app.core.security import require_permissions
 
 router = APIRouter()
@@ -176,6 +179,51 @@ def listar_actividades_cobranza(
         )
 
 
+# Catálogos antes de /{actividad_id}, que de otro modo captura sus rutas
+@router.get("/tipos-actividad", response_model=Dict[str, str])
+def obtener_tipos_actividad():
+    """
+    Obtener tipos de actividad disponibles
+    """
+    return {
+        tipo.value: tipo.value.replace('_', ' ').title()
+        for tipo in TipoActividad
+    }
+
+
+@router.get("/estados", response_model=Dict[str, str])
+def obtener_estados_actividad():
+    """
+    Obtener estados de actividad disponibles
+    """
+    return {
+        estado.value: estado.value.replace('_', ' ').title()
+        for estado in EstadoActividad
+    }
+
+
+@router.get("/prioridades", response_model=Dict[str, str])
+def obtener_prioridades():
+    """
+    Obtener prioridades disponibles
+    """
+    return {
+        prioridad.value: prioridad.value.replace('_', ' ').title()
+        for prioridad in PrioridadActividad
+    }
+
+
+@router.get("/resultados", response_model=Dict[str, str])
+def obtener_resultados():
+    """
+    Obtener resultados disponibles
+    """
+    return {
+        resultado.value: resultado.value.replace('_', ' ').title()
+        for resultado in ResultadoActividad
+    }
+
+
 @router.get("/{actividad_id}", response_model=ActividadCobranzaResponse)
 def obtener_actividad_cobranza(
     *,
@@ -419,6 +467,99 @@ def obtener_actividades_vencidas(
         )
 
 
+def _rutas_con_nombres(db: Session, rutas: List[Dict[str, Any]]) -> List[RutaCobranzaResponse]:
+    """Completa el nombre del cliente de cada visita (caché de nombres, una consulta)"""
+    nombres = cliente_nombre_cache.obtener_varios(
+        db, [v['cliente_id'] for ruta in rutas for v in ruta['paradas'] + ruta['sin_ubicacion']]
+    )
+    for ruta in rutas:
+        for visita in ruta['paradas'] + ruta['sin_ubicacion']:
+            visita['nombre_cliente'] = nombres.get(str(visita['cliente_id']))
+    return [RutaCobranzaResponse(**ruta) for ruta in rutas]
+
+
+@router.get("/rutas/{usuario_id}", response_model=RutaCobranzaResponse)
+def obtener_ruta_gestor(
+    usuario_id: UUID,
+    fecha: Optional[date] = Query(None, description="Fecha de las visitas (por defecto hoy)"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Ruta de visitas domiciliarias de un gestor para una fecha
+
+    Parte de la sucursal y ordena las visitas por cercanía respetando las
+    citas con hora de inicio. Las visitas sin coordenadas van al final.
+    Solo consulta: el orden se guarda con POST /rutas/planificar.
+    """
+    if usuario_id != current_user.id and not require_permissions(current_user, ["admin", "gerente", "supervisor"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para ver la ruta de otro gestor"
+        )
+
+    fecha = fecha or date.today()
+    try:
+        rutas = RutaCobranzaService(db).planificar(fecha, usuario_id=str(usuario_id), guardar=False)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error planificando ruta: {str(e)}"
+        )
+
+    if not rutas:
+        return RutaCobranzaResponse(
+            usuario_id=usuario_id,
+            sucursal_id=current_user.sucursal_id if usuario_id == current_user.id else None,
+            fecha=fecha,
+            hora_salida=time.fromisoformat(settings.RUTAS_HORA_SALIDA),
+            distancia_total_km=0.0,
+            retraso_total_minutos=0
+        )
+    return _rutas_con_nombres(db, rutas)[0]
+
+
+@router.post("/rutas/planificar", response_model=PlanificacionRutasResponse)
+def planificar_rutas(
+    fecha: Optional[date] = Query(None, description="Fecha de las visitas (por defecto hoy)"),
+    sucursal_id: Optional[UUID] = Query(None, description="Solo administradores: sucursal a planificar"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Planificar y guardar las rutas de visitas domiciliarias de todos los gestores
+
+    Escribe el orden de visita (orden_ruta) en cada actividad.
+    """
+    if not require_permissions(current_user, ["admin", "gerente", "supervisor"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para planificar rutas"
+        )
+
+    if current_user.rol != "admin":
+        sucursal_id = current_user.sucursal_id
+
+    fecha = fecha or date.today()
+    try:
+        rutas = RutaCobranzaService(db).planificar(fecha, sucursal_id=str(sucursal_id) if sucursal_id else None)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error planificando rutas: {str(e)}"
+        )
+
+    return PlanificacionRutasResponse(
+        fecha=fecha,
+        total_gestores=len(rutas),
+        total_visitas=sum(len(r['paradas']) + len(r['sin_ubicacion']) for r in rutas),
+        distancia_total_km=round(sum(r['distancia_total_km'] for r in rutas), 3),
+        rutas=_rutas_con_nombres(db, rutas)
+    )
+
+
 @router.get("/promesas/vencidas", response_model=List[ActividadCobranzaResponse])
 def obtener_promesas_pago_vencidas(
     db: Session = Depends(get_db),
@@ -584,47 +725,3 @@ def marcar_alerta_cobranza_leida(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error marcando alerta como leída: {str(e)}"
         )
-
-
-@router.get("/tipos-actividad", response_model=Dict[str, str])
-def obtener_tipos_actividad():
-    """
-    Obtener tipos de actividad disponibles
-    """
-    return {
-        tipo.value: tipo.value.replace('_', ' ').title()
-        for tipo in TipoActividad
-    }
-
-
-@router.get("/estados", response_model=Dict[str, str])
-def obtener_estados_actividad():
-    """
-    Obtener estados de actividad disponibles
-    """
-    return {
-        estado.value: estado.value.replace('_', ' ').title()
-        for estado in EstadoActividad
-    }
-
-
-@router.get("/prioridades", response_model=Dict[str, str])
-def obtener_prioridades():
-    """
-    Obtener prioridades disponibles
-    """
-    return {
-        prioridad.value: prioridad.value.replace('_', ' ').title()
-        for prioridad in PrioridadActividad
-    }
-
-
-@router.get("/resultados", response_model=Dict[str, str])
-def obtener_resultados():
-    """
-    Obtener resultados disponibles
-    """
-    return {
-        resultado.value: resultado.value.replace('_', ' ').title()
-        for resultado in ResultadoActividad
-    }
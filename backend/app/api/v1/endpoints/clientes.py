@@ -0,0 +1,284 @@
+"""
+API endpoints para consulta de clientes
+"""
+from datetime import date
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user, get_db
+from app.core.security import require_permissions
+from app.models.secure_models import Cliente, Usuario
+from app.schemas.cliente_schemas import (
+    Cliente360Response, CoincidenciaListaItem, CoincidenciaListaListado,
+    CumplimientoDocumentalItem, CumplimientoDocumentalListado, DuplicadoCandidatoItem,
+    DuplicadoCandidatoListado, RevisionCoincidenciaLista, RevisionDuplicado, RiesgoClienteResponse,
+    RiesgoHistorialItem
+)
+from app.services.cliente_360_service import Cliente360Service
+from app.services.cliente_nombre_cache import cliente_nombre_cache
+from app.services.cumplimiento_documental_service import CumplimientoDocumentalService
+from app.services.duplicados_clientes_service import DuplicadosClientesService
+from app.services.listas_control_service import ListasControlService
+from app.services.riesgo_service import ENTIDAD_CLIENTE, RiesgoService
+
+router = APIRouter()
+
+
+@router.get("/cumplimiento-documental", response_model=CumplimientoDocumentalListado)
+def listar_cumplimiento_documental(
+    estado: Optional[List[str]] = Query(None, description="POR_VENCER, INCOMPLETO, VENCIDO (por defecto todos salvo AL_DIA)"),
+    vence_hasta: Optional[date] = Query(None, description="Solo clientes con un vencimiento hasta esta fecha"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Listado de clientes con documentos vencidos, por vencer u obligatorios faltantes
+
+    Se lee del resultado del escaneo diario de cumplimiento documental,
+    ordenado por el vencimiento más cercano.
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["clientes:read"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para ver clientes"
+        )
+
+    items, total = CumplimientoDocumentalService(db).listar(estado, vence_hasta, skip, limit)
+    nombres = cliente_nombre_cache.obtener_varios(db, [i.cliente_id for i in items])
+    return CumplimientoDocumentalListado(
+        items=[
+            CumplimientoDocumentalItem(
+                **{c.name: getattr(i, c.name) for c in i.__table__.columns if c.name != 'obligatorios_faltantes'},
+                nombre_cliente=nombres.get(str(i.cliente_id)),
+                obligatorios_faltantes=i.obligatorios_faltantes.split(',') if i.obligatorios_faltantes else []
+            )
+            for i in items
+        ],
+        total=total,
+        skip=skip,
+        limit=limit
+    )
+
+
+def _coincidencia_item(coincidencia, nombre_cliente: Optional[str]) -> CoincidenciaListaItem:
+    entrada = coincidencia.entrada
+    return CoincidenciaListaItem(
+        **{c.name: getattr(coincidencia, c.name) for c in coincidencia.__table__.columns},
+        nombre_cliente=nombre_cliente,
+        lista=entrada.lista if entrada else None,
+        referencia=entrada.referencia if entrada else None,
+        nombre_lista=entrada.nombre if entrada else None
+    )
+
+
+@router.get("/coincidencias-listas", response_model=CoincidenciaListaListado)
+def listar_coincidencias_listas(
+    estado: Optional[List[str]] = Query(None, description="PENDIENTE, CONFIRMADA, DESCARTADA (por defecto PENDIENTE)"),
+    tipo_lista: Optional[str] = Query(None, description="PEP o SANCION"),
+    puntaje_minimo: Optional[int] = Query(None, ge=0, le=100),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Cola de revisión de coincidencias con listas PEP y de sanciones
+
+    Se lee del resultado del cotejo periódico, ordenado por puntaje.
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["clientes:read"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para ver clientes"
+        )
+
+    items, total = ListasControlService(db).listar(estado, tipo_lista, puntaje_minimo, skip, limit)
+    nombres = cliente_nombre_cache.obtener_varios(db, [i.cliente_id for i in items])
+    return CoincidenciaListaListado(
+        items=[_coincidencia_item(i, nombres.get(str(i.cliente_id))) for i in items],
+        total=total,
+        skip=skip,
+        limit=limit
+    )
+
+
+@router.put("/coincidencias-listas/{coincidencia_id}", response_model=CoincidenciaListaItem)
+def revisar_coincidencia_lista(
+    coincidencia_id: UUID,
+    revision: RevisionCoincidenciaLista,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Confirmar o descartar una coincidencia con listas de control"""
+    # Verificar permisos
+    if not require_permissions(current_user, ["clientes:compliance"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para revisar coincidencias"
+        )
+
+    try:
+        coincidencia = ListasControlService(db).revisar(
+            coincidencia_id, revision.estado, str(current_user.id), revision.observaciones
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if coincidencia is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Coincidencia no encontrada"
+        )
+    nombres = cliente_nombre_cache.obtener_varios(db, [coincidencia.cliente_id])
+    return _coincidencia_item(coincidencia, nombres.get(str(coincidencia.cliente_id)))
+
+
+def _duplicado_item(candidato, nombres: dict) -> DuplicadoCandidatoItem:
+    return DuplicadoCandidatoItem(
+        **{c.name: getattr(candidato, c.name) for c in candidato.__table__.columns if c.name != 'criterios'},
+        nombre_cliente=nombres.get(str(candidato.cliente_id)),
+        nombre_duplicado=nombres.get(str(candidato.duplicado_id)),
+        criterios=candidato.criterios.split(',') if candidato.criterios else []
+    )
+
+
+@router.get("/duplicados", response_model=DuplicadoCandidatoListado)
+def listar_duplicados(
+    estado: Optional[List[str]] = Query(None, description="PENDIENTE, CONFIRMADO, DESCARTADO (por defecto PENDIENTE)"),
+    puntaje_minimo: Optional[int] = Query(None, ge=0, le=100),
+    cliente_id: Optional[UUID] = Query(None, description="Solo los pares en los que participa este cliente"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Cola de revisión de clientes duplicados (candidatos a fusión)
+
+    Se lee del resultado de la detección periódica, ordenado por puntaje.
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["clientes:read"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para ver clientes"
+        )
+
+    items, total = DuplicadosClientesService(db).listar(estado, puntaje_minimo, cliente_id, skip, limit)
+    nombres = cliente_nombre_cache.obtener_varios(
+        db, [i.cliente_id for i in items] + [i.duplicado_id for i in items]
+    )
+    return DuplicadoCandidatoListado(
+        items=[_duplicado_item(i, nombres) for i in items],
+        total=total,
+        skip=skip,
+        limit=limit
+    )
+
+
+@router.put("/duplicados/{candidato_id}", response_model=DuplicadoCandidatoItem)
+def revisar_duplicado(
+    candidato_id: UUID,
+    revision: RevisionDuplicado,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Confirmar o descartar un par de clientes candidato a fusión"""
+    # Verificar permisos
+    if not require_permissions(current_user, ["clientes:update"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para revisar duplicados"
+        )
+
+    try:
+        candidato = DuplicadosClientesService(db).revisar(
+            candidato_id, revision.estado, str(current_user.id), revision.observaciones
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if candidato is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Candidato no encontrado"
+        )
+    nombres = cliente_nombre_cache.obtener_varios(db, [candidato.cliente_id, candidato.duplicado_id])
+    return _duplicado_item(candidato, nombres)
+
+
+@router.get("/{cliente_id}/360", response_model=Cliente360Response)
+def obtener_cliente_360(
+    cliente_id: UUID,
+    cache: bool = Query(True, description="Usar la copia en caché de corta vigencia si existe"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Obtener la vista integral (360) de un cliente
+
+    Incluye datos personales, contactos, trabajos, patrimonio, obligaciones,
+    historial reciente, solicitudes, préstamos, documentos, perfil financiero
+    y un resumen con las vistas derivadas (contacto principal, vigencia de
+    identificación, exposición política y completitud documental).
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["clientes:read"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para ver clientes"
+        )
+
+    vista = Cliente360Service(db).obtener(cliente_id, usar_cache=cache)
+    if vista is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cliente no encontrado"
+        )
+    return vista
+
+
+@router.get("/{cliente_id}/riesgo", response_model=RiesgoClienteResponse)
+def obtener_riesgo_cliente(
+    cliente_id: UUID,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Calificación de riesgo actual del cliente y sus cambios, del más reciente al más antiguo"""
+    # Verificar permisos
+    if not require_permissions(current_user, ["clientes:read"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para ver clientes"
+        )
+
+    cliente = db.query(Cliente.id, Cliente.risk_level, Cliente.puntaje_riesgo).filter(Cliente.id == cliente_id).first()
+    if cliente is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cliente no encontrado"
+        )
+    historial = RiesgoService.historial(db, ENTIDAD_CLIENTE, cliente_id, limit)
+    return RiesgoClienteResponse(
+        cliente_id=cliente.id,
+        risk_level=cliente.risk_level,
+        puntaje_riesgo=cliente.puntaje_riesgo,
+        historial=[
+            RiesgoHistorialItem(
+                puntaje=h.puntaje,
+                nivel=h.nivel,
+                puntaje_anterior=h.puntaje_anterior,
+                nivel_anterior=h.nivel_anterior,
+                factores=h.factores.split(',') if h.factores else [],
+                version_modelo=h.version_modelo,
+                calculado_en=h.calculado_en
+            )
+            for h in historial
+        ]
+    )
@@ -0,0 +1,256 @@
+"""
+API endpoints para exportaciones masivas (préstamos, pagos, clientes, agenda)
+"""
+from datetime import date
+from typing import List, Optional
+import os
+import tempfile
+import uuid
+
+import redis
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+
+from app.api.deps import get_current_user, get_db
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.security import require_permissions
+from app.models.secure_models import Usuario
+from app.services.export_service import (
+    ExportService, ENTIDADES_EXPORTABLES, FORMATOS_EXPORTACION, CONTENT_TYPES
+)
+from app.services.planilla_descuento_service import DISENOS_PLANILLA
+from app.tasks.export_tasks import exportar_entidad, generar_planillas_descuento
+
+router = APIRouter()
+
+# Dueño de cada exportación programada, registrado al despacharla para poder
+# verificar el acceso en cualquier estado de la tarea (incluso PENDING)
+redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+PROPIETARIO_KEY = "exportaciones:propietario:{}"
+
+
+def _validar_solicitud(entidad: str, formato: str, current_user: Usuario):
+    """Valida permisos, entidad y formato de la exportación"""
+    if not require_permissions(current_user, ["reportes:export"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para exportar datos"
+        )
+    if entidad not in ENTIDADES_EXPORTABLES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Entidad no exportable: {entidad}"
+        )
+    if formato not in FORMATOS_EXPORTACION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato no soportado. Use uno de: {', '.join(FORMATOS_EXPORTACION)}"
+        )
+
+
+def _filtros(entidad: str, current_user: Usuario, estado, fecha_desde, fecha_hasta) -> dict:
+    """Construye los filtros aplicando el control de acceso por sucursal"""
+    filtros = {'estado': estado, 'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta}
+    if current_user.rol != "admin":
+        if ENTIDADES_EXPORTABLES[entidad].get('sucursal') is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Solo administradores pueden exportar esta entidad"
+            )
+        filtros['sucursal_id'] = str(current_user.sucursal_id)
+    return filtros
+
+
+def _despachar(tarea, args: list, current_user: Usuario) -> dict:
+    """Registra el dueño de la tarea y luego la encola con ese task_id"""
+    task_id = str(uuid.uuid4())
+    redis_client.set(
+        PROPIETARIO_KEY.format(task_id), str(current_user.id), ex=settings.EXPORT_JOB_TTL_SECONDS
+    )
+    tarea.apply_async(args=args, task_id=task_id)
+    return {"task_id": task_id, "estado": "PENDIENTE"}
+
+
+def _verificar_propietario(task_id: str, current_user: Usuario):
+    """Solo el usuario que programó la exportación (o un administrador) puede consultarla"""
+    propietario = redis_client.get(PROPIETARIO_KEY.format(task_id))
+    if propietario is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exportación no encontrada"
+        )
+    if propietario != str(current_user.id) and current_user.rol != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene acceso a esta exportación"
+        )
+
+
+def _iterar_archivo(ruta: str, tamano_bloque: int = 1024 * 1024):
+    with open(ruta, 'rb') as f:
+        while True:
+            bloque = f.read(tamano_bloque)
+            if not bloque:
+                break
+            yield bloque
+
+
+@router.post("/planillas-descuento", status_code=status.HTTP_202_ACCEPTED)
+def programar_planillas_descuento(
+    desde: Optional[date] = Query(None, description="Inicio del período (por defecto la quincena o mes en curso)"),
+    hasta: Optional[date] = Query(None, description="Fin del período"),
+    entidades: Optional[List[str]] = Query(None, description="Entidades a generar (por defecto todas)"),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Programa la generación de las planillas de descuento directo por entidad
+    
+    Contienen datos personales de todas las sucursales: solo administradores.
+    El estado se consulta en /jobs/{task_id}.
+    """
+    if not require_permissions(current_user, ["reportes:export"]) or current_user.rol != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo administradores pueden generar planillas de descuento"
+        )
+    desconocidas = [e for e in entidades or [] if e not in DISENOS_PLANILLA]
+    if desconocidas:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Entidades sin diseño de planilla: {', '.join(desconocidas)}"
+        )
+    if desde and hasta and hasta < desde:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha final no puede ser anterior a la inicial"
+        )
+
+    return _despachar(generar_planillas_descuento, [
+        desde.isoformat() if desde else None,
+        hasta.isoformat() if hasta else None,
+        entidades,
+        str(current_user.id)
+    ], current_user)
+
+
+@router.get("/{entidad}")
+def exportar(
+    entidad: str,
+    formato: str = Query("csv", description="csv, xlsx o parquet"),
+    estado: Optional[str] = Query(None),
+    fecha_desde: Optional[date] = Query(None),
+    fecha_hasta: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Exportación directa en streaming.
+
+    CSV se transmite mientras se lee la base de datos; XLSX y Parquet se
+    escriben a un archivo temporal que se transmite y luego se elimina.
+    """
+    _validar_solicitud(entidad, formato, current_user)
+    filtros = _filtros(entidad, current_user, estado, fecha_desde, fecha_hasta)
+    service = ExportService(db)
+    nombre_archivo = f"{entidad}_{date.today().isoformat()}.{formato}"
+    headers = {"Content-Disposition": f'attachment; filename="{nombre_archivo}"'}
+
+    if formato == 'csv':
+        return StreamingResponse(
+            service.generar_csv(entidad, filtros),
+            media_type=CONTENT_TYPES['csv'],
+            headers=headers
+        )
+
+    fd, ruta = tempfile.mkstemp(suffix=f".{formato}")
+    os.close(fd)
+    try:
+        service.exportar_a_archivo(entidad, formato, ruta, filtros)
+    except ValueError as e:
+        os.remove(ruta)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception:
+        os.remove(ruta)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+    return StreamingResponse(
+        _iterar_archivo(ruta),
+        media_type=CONTENT_TYPES[formato],
+        headers=headers,
+        background=BackgroundTask(os.remove, ruta)
+    )
+
+
+@router.post("/{entidad}/jobs", status_code=status.HTTP_202_ACCEPTED)
+def programar_exportacion(
+    entidad: str,
+    formato: str = Query("csv", description="csv, xlsx o parquet"),
+    estado: Optional[str] = Query(None),
+    fecha_desde: Optional[date] = Query(None),
+    fecha_hasta: Optional[date] = Query(None),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Programa una exportación en segundo plano (Celery) que genera un archivo
+    """
+    _validar_solicitud(entidad, formato, current_user)
+    filtros = _filtros(entidad, current_user, estado, fecha_desde, fecha_hasta)
+    filtros = {k: (v.isoformat() if isinstance(v, date) else v) for k, v in filtros.items()}
+
+    return _despachar(exportar_entidad, [entidad, formato, filtros, str(current_user.id)], current_user)
+
+
+@router.get("/jobs/{task_id}")
+def estado_exportacion(
+    task_id: str,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Consulta el estado de una exportación programada
+    """
+    _verificar_propietario(task_id, current_user)
+    resultado = celery_app.AsyncResult(task_id)
+    respuesta = {"task_id": task_id, "estado": resultado.status}
+    if resultado.successful():
+        respuesta["resultado"] = resultado.result or {}
+    elif resultado.failed():
+        respuesta["error"] = str(resultado.result)
+    return respuesta
+
+
+@router.get("/jobs/{task_id}/archivo")
+def descargar_exportacion(
+    task_id: str,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Descarga el archivo generado por una exportación programada
+    """
+    _verificar_propietario(task_id, current_user)
+    resultado = celery_app.AsyncResult(task_id)
+    if not resultado.successful():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"La exportación no está lista (estado: {resultado.status})"
+        )
+
+    info = resultado.result or {}
+    ruta = os.path.realpath(info.get('archivo') or '')
+    directorio = os.path.realpath(settings.EXPORT_DIR)
+    if os.path.dirname(ruta) != directorio or not os.path.isfile(ruta):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="El archivo de la exportación ya no está disponible"
+        )
+
+    return FileResponse(
+        ruta,
+        media_type=CONTENT_TYPES.get(info.get('formato'), 'application/octet-stream'),
+        filename=os.path.basename(ruta)
+    )
@@ -0,0 +1,166 @@
+"""
+API endpoints para consultas geográficas sobre sucursales y clientes
+"""
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user, get_db
+from app.core.config import settings
+from app.core.security import require_permissions
+from app.models.secure_models import ClienteDireccion, Prestamo, Sucursal, Usuario
+from app.schemas.geo_schemas import (
+    ClienteCercano, ClientesEnRadioResponse, SucursalCercana, SucursalesCercanasResponse
+)
+from app.services.cliente_nombre_cache import cliente_nombre_cache
+from app.services.indice_espacial import servicio_espacial
+
+router = APIRouter()
+
+ESTADOS_PRESTAMO = [e[0] for e in Prestamo.ESTADOS_PRESTAMO]
+
+
+def _sucursales_cercanas(db: Session, latitud: float, longitud: float, k: int) -> SucursalesCercanasResponse:
+    return SucursalesCercanasResponse(
+        latitud=latitud,
+        longitud=longitud,
+        sucursales=[SucursalCercana(**s) for s in servicio_espacial.sucursales_cercanas(db, latitud, longitud, k)]
+    )
+
+
+def _clientes_en_radio(
+    db: Session,
+    latitud: float,
+    longitud: float,
+    radio_km: float,
+    estado_prestamo: Optional[str],
+    sucursal_id: Optional[str],
+    limit: int
+) -> ClientesEnRadioResponse:
+    if estado_prestamo and estado_prestamo not in ESTADOS_PRESTAMO:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Estado de préstamo inválido: {estado_prestamo}"
+        )
+    clientes = servicio_espacial.clientes_en_radio(db, latitud, longitud, radio_km, estado_prestamo, sucursal_id)
+    pagina = clientes[:limit]
+    nombres = cliente_nombre_cache.obtener_varios(db, [c['cliente_id'] for c in pagina])
+    return ClientesEnRadioResponse(
+        latitud=latitud,
+        longitud=longitud,
+        radio_km=radio_km,
+        estado_prestamo=estado_prestamo,
+        total=len(clientes),
+        clientes=[ClienteCercano(**c, nombre_cliente=nombres.get(str(c['cliente_id']))) for c in pagina]
+    )
+
+
+def _verificar_permiso_clientes(current_user: Usuario):
+    if not require_permissions(current_user, ["clientes:read"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para ver clientes"
+        )
+
+
+@router.get("/sucursales-cercanas", response_model=SucursalesCercanasResponse)
+def sucursales_cercanas(
+    latitud: float = Query(..., ge=-90, le=90),
+    longitud: float = Query(..., ge=-180, le=180),
+    k: int = Query(1, ge=1, le=20, description="Cantidad de sucursales"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Sucursales activas más cercanas a un punto"""
+    return _sucursales_cercanas(db, latitud, longitud, k)
+
+
+@router.get("/direcciones/{direccion_id}/sucursales-cercanas", response_model=SucursalesCercanasResponse)
+def sucursales_cercanas_direccion(
+    direccion_id: UUID,
+    k: int = Query(1, ge=1, le=20, description="Cantidad de sucursales"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Sucursales activas más cercanas a una dirección de cliente
+
+    Los usuarios que no son administradores solo pueden consultar direcciones
+    de clientes con préstamos en su sucursal.
+    """
+    _verificar_permiso_clientes(current_user)
+
+    direccion = db.query(ClienteDireccion.cliente_id, ClienteDireccion.latitud, ClienteDireccion.longitud).filter(
+        ClienteDireccion.id == direccion_id
+    ).first()
+    if direccion is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dirección no encontrada")
+
+    # Verificar acceso por sucursal (excepto admin)
+    if current_user.rol != "admin" and not db.query(Prestamo.id).filter(
+        Prestamo.cliente_id == direccion.cliente_id,
+        Prestamo.sucursal_id == current_user.sucursal_id
+    ).first():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene acceso a esta dirección"
+        )
+    if direccion.latitud is None or direccion.longitud is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La dirección no tiene coordenadas")
+
+    return _sucursales_cercanas(db, float(direccion.latitud), float(direccion.longitud), k)
+
+
+@router.get("/clientes-en-radio", response_model=ClientesEnRadioResponse)
+def clientes_en_radio(
+    latitud: float = Query(..., ge=-90, le=90),
+    longitud: float = Query(..., ge=-180, le=180),
+    radio_km: float = Query(5.0, gt=0, le=settings.ESPACIAL_RADIO_MAXIMO_KM),
+    estado_prestamo: Optional[str] = Query(None, description="Solo clientes con préstamos en este estado (p. ej. MORA)"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Clientes con alguna dirección dentro del radio, ordenados por distancia
+
+    Los usuarios que no son administradores solo ven clientes con préstamos
+    en su sucursal.
+    """
+    _verificar_permiso_clientes(current_user)
+
+    # Filtro de sucursal para control de acceso
+    sucursal_id = None if current_user.rol == "admin" else str(current_user.sucursal_id)
+    return _clientes_en_radio(db, latitud, longitud, radio_km, estado_prestamo, sucursal_id, limit)
+
+
+@router.get("/sucursales/{sucursal_id}/clientes-en-radio", response_model=ClientesEnRadioResponse)
+def clientes_en_radio_sucursal(
+    sucursal_id: UUID,
+    radio_km: float = Query(5.0, gt=0, le=settings.ESPACIAL_RADIO_MAXIMO_KM),
+    estado_prestamo: Optional[str] = Query(None, description="Solo clientes con préstamos en este estado (p. ej. MORA)"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Clientes alrededor de una sucursal (p. ej. clientes en mora a 5 km)
+
+    Los usuarios que no son administradores solo ven clientes con préstamos
+    en su sucursal.
+    """
+    _verificar_permiso_clientes(current_user)
+
+    sucursal = db.query(Sucursal.latitud, Sucursal.longitud).filter(Sucursal.id == sucursal_id).first()
+    if sucursal is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sucursal no encontrada")
+    if sucursal.latitud is None or sucursal.longitud is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La sucursal no tiene coordenadas")
+
+    # Filtro de sucursal para control de acceso
+    filtro_sucursal = None if current_user.rol == "admin" else str(current_user.sucursal_id)
+    return _clientes_en_radio(
+        db, float(sucursal.latitud), float(sucursal.longitud), radio_km, estado_prestamo, filtro_sucursal, limit
+    )
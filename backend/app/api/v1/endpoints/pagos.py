@@ -0,0 +1,126 @@
+"""
+API endpoints para gestión de pagos de préstamos
+"""
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user, get_db
+from app.core.security import require_permissions
+from app.models.secure_models import Usuario
+from app.schemas.pago_schemas import PagoAplicacionRequest, PagoAplicacionResumen, PagoBulkRequest
+from app.services.aplicacion_pagos_service import AplicacionPagosService, leer_remesa
+from app.services.pago_service import PagoService
+
+router = APIRouter()
+
+
+@router.post("/bulk", response_model=PagoAplicacionResumen)
+def crear_pagos_bulk(
+    solicitud: PagoBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Registrar pagos de forma masiva
+    
+    Cada pago se imputa a las cuotas igual que en /aplicar. Valida cada fila
+    por separado y reporta errores por fila. Las filas con clave_idempotencia
+    (o referencia) ya registrada se devuelven como DUPLICADO.
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["pagos:create"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para registrar pagos"
+        )
+    
+    # Filtro de sucursal para control de acceso
+    sucursal_id = None if current_user.rol == "admin" else str(current_user.sucursal_id)
+    
+    service = PagoService(db)
+    
+    try:
+        return service.crear_pagos_bulk(solicitud.items, str(current_user.id), sucursal_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+
+@router.post("/aplicar", response_model=PagoAplicacionResumen)
+def aplicar_pagos(
+    solicitud: PagoAplicacionRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Aplicar pagos a las cuotas de los préstamos
+    
+    Cada pago se imputa en cascada (cargos y seguro, interés, capital) desde
+    la cuota más antigua. Un pago con (origen, referencia) ya registrado se
+    devuelve como DUPLICADO sin volver a aplicarse.
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["pagos:create"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para registrar pagos"
+        )
+    
+    # Filtro de sucursal para control de acceso
+    sucursal_id = None if current_user.rol == "admin" else str(current_user.sucursal_id)
+    
+    service = AplicacionPagosService(db)
+    
+    try:
+        return service.aplicar_pagos(solicitud.items, str(current_user.id), sucursal_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/remesas", response_model=PagoAplicacionResumen)
+def aplicar_remesa(
+    archivo: UploadFile = File(..., description="CSV de la remesa de descuento directo"),
+    origen: str = Form(..., max_length=30, description="Entidad remitente (CONTRALORIA, CSS, MEF...)"),
+    fecha_pago: Optional[date] = Form(None, description="Fecha de pago si el archivo no la incluye"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Aplicar un archivo de remesa de descuento directo
+    
+    Sin columna de referencia, cada pago se identifica por préstamo, monto,
+    fecha y ocurrencia, de modo que volver a cargar el archivo (aunque se haya
+    corregido) no duplica pagos. En ese caso, si el archivo no trae fecha, se
+    debe indicar fecha_pago.
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["pagos:create"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para registrar pagos"
+        )
+    
+    # Filtro de sucursal para control de acceso
+    sucursal_id = None if current_user.rol == "admin" else str(current_user.sucursal_id)
+    
+    try:
+        filas = leer_remesa(archivo.file.read(), origen.strip().upper(), fecha_pago)
+        return AplicacionPagosService(db).aplicar_pagos(filas, str(current_user.id), sucursal_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
@@ -9,17 +9,24 @@ del sistema financiero panameño.
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import date
 from decimal import Decimal
 
-from backend.app.core.database import get_db
-from backend.app.core.auth import get_current_user, require_permissions
-from backend.app.models.secure_models import Usuario, Prestamo
-from backend.app.services.prestamo_service import PrestamoService
-from backend.app.schemas.prestamo_schemas import (
+from app.api.deps import get_current_user, get_db
+from app.core.security import require_permissions
+from app.models.secure_models import Usuario, Prestamo
+from app.services.prestamo_service import PrestamoService
+from app.services.cliente_nombre_cache import cliente_nombre_cache
+from app.services.cartera_snapshot_service import CarteraSnapshotService
+from app.services.simulacion_service import SimulacionService
+from app.schemas.prestamo_schemas import (
     PrestamoCreate, PrestamoUpdate, PrestamoResponse, PrestamoListResponse,
     PrestamoFiltros, AutorizarDescuentoRequest, EstadisticasDescuentoDirecto,
     ValidacionDescuentoResponse, TipoPrestamo, TipoDescuentoDirecto,
-    ModalidadPago, EstadoPrestamo
+    ModalidadPago, EstadoPrestamo, PrestamoBulkRequest, BulkResultado,
+    CronogramaResponse, TendenciaAntiguedadItem,
+    ValidacionDescuentoBatchRequest, ValidacionDescuentoBatchItemResponse,
+    SimulacionRequest, SimulacionResponse
 )
 
 router = APIRouter()
@@ -53,13 +60,79 @@ def crear_prestamo(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
-    except Exception as e:
+    except Exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor"
         )
 
 
+@router.post("/bulk", response_model=BulkResultado)
+def crear_prestamos_bulk(
+    solicitud: PrestamoBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Crear préstamos de forma masiva
+    
+    Valida cada fila por separado y reporta errores por fila. Las filas con
+    clave_idempotencia ya registrada se devuelven como DUPLICADO.
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["prestamos:create"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para crear préstamos"
+        )
+    
+    # Filtro de sucursal para control de acceso
+    sucursal_id = None if current_user.rol == "admin" else str(current_user.sucursal_id)
+    
+    service = PrestamoService(db)
+    
+    try:
+        return service.crear_prestamos_bulk(solicitud.items, str(current_user.id), sucursal_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+
+@router.post("/simular", response_model=SimulacionResponse)
+def simular_prestamo(
+    solicitud: SimulacionRequest,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Cotizar un préstamo: cuota, cronograma, costo total, tasa efectiva y
+    validación del 30% del salario
+    
+    Acepta plazos adicionales para comparar varios escenarios a la vez.
+    Los escenarios ya cotizados se sirven desde caché.
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["prestamos:read"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para simular préstamos"
+        )
+    
+    try:
+        return SimulacionService().simular(solicitud)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 @router.get("/", response_model=List[PrestamoListResponse])
 def listar_prestamos(
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
@@ -102,12 +175,14 @@ def listar_prestamos(
     service = PrestamoService(db)
     prestamos = service.listar_prestamos(filtros, skip, limit, sucursal_id)
     
-    # Convertir a respuesta simplificada
+    # Convertir a respuesta simplificada (nombres desde la caché)
+    nombres = cliente_nombre_cache.obtener_varios(db, [p.cliente_id for p in prestamos])
+    
     return [
         PrestamoListResponse(
             id=str(p.id),
             numero_prestamo=p.numero_prestamo,
-            cliente_nombre=p.cliente.nombre_completo if p.cliente else "N/A",
+            cliente_nombre=nombres.get(str(p.cliente_id), "N/A"),
             tipo_prestamo=p.tipo_prestamo,
             tipo_descuento_directo=p.tipo_descuento_directo,
             modalidad_pago=p.modalidad_pago,
@@ -160,6 +235,41 @@ def obtener_prestamo(
     return prestamo
 
 
+@router.get("/{prestamo_id}/cronograma", response_model=CronogramaResponse)
+def obtener_cronograma(
+    prestamo_id: str,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Obtener la tabla de amortización de un préstamo
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["prestamos:read"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para ver préstamos"
+        )
+    
+    service = PrestamoService(db)
+    prestamo = service.obtener_prestamo(prestamo_id)
+    
+    if not prestamo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Préstamo no encontrado"
+        )
+    
+    # Verificar acceso por sucursal (excepto admin)
+    if current_user.rol != "admin" and str(prestamo.sucursal_id) != str(current_user.sucursal_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene acceso a este préstamo"
+        )
+    
+    return service.obtener_cronograma(prestamo)
+
+
 @router.get("/numero/{numero_prestamo}", response_model=PrestamoResponse)
 def obtener_prestamo_por_numero(
     numero_prestamo: str,
@@ -232,7 +342,12 @@ def actualizar_prestamo(
     try:
         prestamo = service.actualizar_prestamo(prestamo_id, prestamo_data, str(current_user.id))
         return prestamo
-    except Exception as e:
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor"
@@ -335,6 +450,38 @@ def revocar_descuento_directo(
     return {"mensaje": mensaje, "revocado": True}
 
 
+@router.post("/validar-descuento/batch", response_model=List[ValidacionDescuentoBatchItemResponse])
+def validar_descuento_directo_batch(
+    solicitud: ValidacionDescuentoBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Validar capacidad de descuento para listas de empleados (préstamo o cédula, salario)
+    
+    Los resultados se devuelven en el mismo orden de la solicitud.
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["prestamos:read"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para validar descuentos"
+        )
+    
+    # Filtro de sucursal para control de acceso
+    sucursal_id = None if current_user.rol == "admin" else str(current_user.sucursal_id)
+    
+    service = PrestamoService(db)
+    
+    try:
+        return service.validar_descuento_directo_batch(solicitud.items, sucursal_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 @router.get("/{prestamo_id}/validar-descuento", response_model=ValidacionDescuentoResponse)
 def validar_descuento_directo(
     prestamo_id: str,
@@ -416,11 +563,13 @@ def obtener_prestamos_por_vencer(
     service = PrestamoService(db)
     prestamos = service.obtener_prestamos_por_vencer(dias, sucursal_id)
     
+    nombres = cliente_nombre_cache.obtener_varios(db, [p.cliente_id for p in prestamos])
+    
     return [
         PrestamoListResponse(
             id=str(p.id),
             numero_prestamo=p.numero_prestamo,
-            cliente_nombre=p.cliente.nombre_completo if p.cliente else "N/A",
+            cliente_nombre=nombres.get(str(p.cliente_id), "N/A"),
             tipo_prestamo=p.tipo_prestamo,
             tipo_descuento_directo=p.tipo_descuento_directo,
             modalidad_pago=p.modalidad_pago,
@@ -441,11 +590,17 @@ def obtener_prestamos_por_vencer(
 @router.get("/reportes/en-mora", response_model=List[PrestamoListResponse])
 def obtener_prestamos_en_mora(
     dias_minimos: int = Query(1, ge=1, description="Días mínimos de mora"),
+    fecha_corte: Optional[date] = Query(None, description="Fecha de la fotografía (por defecto la más reciente)"),
+    skip: int = Query(0, ge=0, description="Número de registros a omitir"),
+    limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
     """
     Obtener préstamos en mora
+    
+    Se lee de la fotografía diaria de cartera (cartera_mora_diaria), no de la
+    tabla viva de préstamos.
     """
     # Verificar permisos
     if not require_permissions(current_user, ["prestamos:read"]):
@@ -457,31 +612,73 @@ def obtener_prestamos_en_mora(
     # Filtro de sucursal para control de acceso
     sucursal_id = None if current_user.rol == "admin" else str(current_user.sucursal_id)
     
-    service = PrestamoService(db)
-    prestamos = service.obtener_prestamos_en_mora(dias_minimos, sucursal_id)
+    service = CarteraSnapshotService(db)
+    prestamos = service.prestamos_en_mora(dias_minimos, sucursal_id, fecha_corte, skip, limit)
+    
+    nombres = cliente_nombre_cache.obtener_varios(db, [p.cliente_id for p in prestamos])
     
     return [
         PrestamoListResponse(
-            id=str(p.id),
+            id=str(p.prestamo_id),
             numero_prestamo=p.numero_prestamo,
-            cliente_nombre=p.cliente.nombre_completo if p.cliente else "N/A",
+            cliente_nombre=nombres.get(str(p.cliente_id), "N/A"),
             tipo_prestamo=p.tipo_prestamo,
             tipo_descuento_directo=p.tipo_descuento_directo,
             modalidad_pago=p.modalidad_pago,
             estado=p.estado,
             monto=p.monto,
-            saldo_pendiente=Decimal(str(p.saldo_pendiente)),
+            saldo_pendiente=p.saldo_pendiente,
             cuota_mensual=p.cuota_mensual,
             fecha_vencimiento=p.fecha_vencimiento,
             dias_mora=p.dias_mora,
-            estado_mora=p.estado_mora,
+            estado_mora=p.tramo,
             descuento_autorizado=p.descuento_autorizado,
-            created_at=p.created_at
+            created_at=p.prestamo_creado_en
         )
         for p in prestamos
     ]
 
 
+@router.get("/reportes/antiguedad", response_model=List[TendenciaAntiguedadItem])
+def obtener_tendencia_antiguedad(
+    desde: date = Query(..., description="Fecha de corte inicial"),
+    hasta: date = Query(..., description="Fecha de corte final"),
+    agrupar_por: Optional[str] = Query(None, description="sucursal_id, tipo_prestamo o tipo_descuento_directo"),
+    tipo_prestamo: Optional[TipoPrestamo] = Query(None, description="Filtrar por tipo de préstamo"),
+    tipo_descuento_directo: Optional[TipoDescuentoDirecto] = Query(None, description="Filtrar por tipo de descuento"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Serie diaria de antigüedad de cartera por tramo de mora (AL_DIA a MORA_CRITICA)
+    """
+    # Verificar permisos
+    if not require_permissions(current_user, ["prestamos:stats"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos para ver estadísticas"
+        )
+    
+    if hasta < desde:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha final no puede ser anterior a la inicial"
+        )
+    
+    # Filtro de sucursal para control de acceso
+    sucursal_id = None if current_user.rol == "admin" else str(current_user.sucursal_id)
+    
+    service = CarteraSnapshotService(db)
+    try:
+        return service.tendencia(
+            desde, hasta, agrupar_por, sucursal_id,
+            tipo_prestamo.value if tipo_prestamo else None,
+            tipo_descuento_directo.value if tipo_descuento_directo else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 # Endpoints para obtener catálogos
 @router.get("/catalogos/tipos-prestamo")
 def obtener_tipos_prestamo():
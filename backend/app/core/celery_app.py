@@ -14,6 +14,11 @@ celery_app.config_from_object(get_celery_config())
 # Auto-descubrir tareas
 celery_app.autodiscover_tasks([
     'app.tasks.solicitudes_tasks',
+    'app.tasks.export_tasks',
+    'app.tasks.importacion_tasks',
+    'app.tasks.agenda_cobranza_tasks',
+    'app.tasks.cartera_tasks',
+    'app.tasks.clientes_tasks',
 ])
 
 # Configuración adicional para desarrollo/producción
@@ -29,11 +34,20 @@ else:
         worker_log_level='INFO',
     )
 
-# Configurar logging
-import logging
+# Configurar logging solo en los procesos de Celery (worker y beat): la API
+# importa esta instancia para despachar tareas y conserva su propio logging
+import logging.config
+from celery.signals import setup_logging
 from app.core.celery_config import CELERY_LOGGING_CONFIG
 
-logging.config.dictConfig(CELERY_LOGGING_CONFIG)
+
+@setup_logging.connect
+def configurar_logging(**kwargs):
+    """Aplica CELERY_LOGGING_CONFIG creando antes el directorio del archivo de log"""
+    archivo = CELERY_LOGGING_CONFIG['handlers']['file']['filename']
+    os.makedirs(os.path.dirname(archivo) or '.', exist_ok=True)
+    logging.config.dictConfig(CELERY_LOGGING_CONFIG)
+
 
 if __name__ == '__main__':
     celery_app.start()
@@ -36,7 +36,27 @@ CELERY_CONFIG = {
         'app.tasks.agenda_cobranza_tasks.generar_agenda_diaria': {'queue': 'notifications'},
         'app.tasks.agenda_cobranza_tasks.generar_reporte_efectividad_semanal': {'queue': 'reports'},
         'app.tasks.agenda_cobranza_tasks.limpiar_alertas_cobranza_antiguas': {'queue': 'cleanup'},
-        'app.tasks.agenda_cobranza_tasks.crear_actividades_automaticas_mora': {'queue': 'cobranza'},
+        'app.tasks.agenda_cobranza_tasks.crear_actividades_cobranza_automaticas': {'queue': 'cobranza'},
+        'app.tasks.agenda_cobranza_tasks.planificar_rutas_cobranza': {'queue': 'cobranza'},
+        
+        # Tareas de cartera
+        'app.tasks.cartera_tasks.transicionar_estados_prestamos': {'queue': 'maintenance'},
+        'app.tasks.cartera_tasks.generar_fotografia_cartera': {'queue': 'reports'},
+        
+        # Tareas de exportación
+        'app.tasks.export_tasks.exportar_entidad': {'queue': 'reports'},
+        'app.tasks.export_tasks.generar_planillas_descuento': {'queue': 'reports'},
+
+        # Tareas de importación desde el sistema legado
+        'app.tasks.importacion_tasks.sincronizar_clientes_legado': {'queue': 'maintenance'},
+
+        # Tareas de clientes
+        'app.tasks.clientes_tasks.recalcular_perfiles_financieros': {'queue': 'default'},
+        'app.tasks.clientes_tasks.recalcular_perfiles_pendientes': {'queue': 'maintenance'},
+        'app.tasks.clientes_tasks.escanear_cumplimiento_documental': {'queue': 'maintenance'},
+        'app.tasks.clientes_tasks.cotejar_listas_control': {'queue': 'maintenance'},
+        'app.tasks.clientes_tasks.detectar_clientes_duplicados': {'queue': 'maintenance'},
+        'app.tasks.clientes_tasks.calificar_riesgo_cartera': {'queue': 'maintenance'},
     },
     
     # Configuración de colas
@@ -176,10 +196,108 @@ CELERY_CONFIG = {
         
         # Crear actividades automáticas para préstamos en mora (diario a las 6:00 AM)
         'crear-actividades-automaticas-mora': {
-            'task': 'app.tasks.agenda_cobranza_tasks.crear_actividades_automaticas_mora',
+            'task': 'app.tasks.agenda_cobranza_tasks.crear_actividades_cobranza_automaticas',
             'schedule': crontab(hour=6, minute=0),  # 6:00 AM diario
             'options': {'queue': 'cobranza'}
         },
+        
+        # Planificar rutas de visitas domiciliarias del día (diario a las 6:30 AM)
+        'planificar-rutas-cobranza': {
+            'task': 'app.tasks.agenda_cobranza_tasks.planificar_rutas_cobranza',
+            'schedule': crontab(hour=6, minute=30),  # 6:30 AM diario
+            'options': {'queue': 'cobranza'}
+        },
+        
+        # ============================================================================
+        # TAREAS DE CARTERA
+        # ============================================================================
+        
+        # Transiciones de estado VIGENTE/MORA/CASTIGADO (diario a las 0:30 AM, antes de la cobranza)
+        'transicionar-estados-prestamos': {
+            'task': 'app.tasks.cartera_tasks.transicionar_estados_prestamos',
+            'schedule': crontab(hour=0, minute=30),  # 0:30 AM diario
+            'options': {'queue': 'maintenance'}
+        },
+        
+        # Planillas de descuento directo (1 y 16 de cada mes a las 2:00 AM)
+        'generar-planillas-descuento': {
+            'task': 'app.tasks.export_tasks.generar_planillas_descuento',
+            'schedule': crontab(hour=2, minute=0, day_of_month='1,16'),
+            'options': {'queue': 'reports'}
+        },
+        
+        # Fotografía de antigüedad de cartera (diario a las 0:45 AM)
+        'generar-fotografia-cartera': {
+            'task': 'app.tasks.cartera_tasks.generar_fotografia_cartera',
+            'schedule': crontab(hour=0, minute=45),  # 0:45 AM diario
+            'options': {'queue': 'reports'}
+        },
+        
+        # ============================================================================
+        # TAREAS DE IMPORTACIÓN DESDE SISTEMA LEGADO
+        # ============================================================================
+        
+        # Sincronización delta de clientes desde el DBF legado (diario a las 1:00 AM)
+        'sincronizar-clientes-legado': {
+            'task': 'app.tasks.importacion_tasks.sincronizar_clientes_legado',
+            'schedule': crontab(hour=1, minute=0),  # 1:00 AM diario
+            'options': {'queue': 'maintenance'}
+        },
+        
+        # ============================================================================
+        # TAREAS DE CLIENTES
+        # ============================================================================
+        
+        # Perfiles financieros pendientes o inexistentes (diario a las 1:30 AM, tras la sincronización)
+        'recalcular-perfiles-pendientes': {
+            'task': 'app.tasks.clientes_tasks.recalcular_perfiles_pendientes',
+            'schedule': crontab(hour=1, minute=30),  # 1:30 AM diario
+            'options': {'queue': 'maintenance'}
+        },
+
+        # Cumplimiento documental de la cartera (diario a las 5:00 AM, listado listo al iniciar la jornada)
+        'escanear-cumplimiento-documental': {
+            'task': 'app.tasks.clientes_tasks.escanear_cumplimiento_documental',
+            'schedule': crontab(hour=5, minute=0),  # 5:00 AM diario
+            'options': {'queue': 'maintenance'}
+        },
+
+        # Cotejo incremental con listas PEP y de sanciones (cada hora, minuto 20)
+        'cotejar-listas-control': {
+            'task': 'app.tasks.clientes_tasks.cotejar_listas_control',
+            'schedule': crontab(minute=20),  # Cada hora al minuto 20
+            'options': {'queue': 'maintenance'}
+        },
+
+        # Cotejo completo con listas PEP y de sanciones (domingos a las 4:00 AM)
+        'cotejar-listas-control-completo': {
+            'task': 'app.tasks.clientes_tasks.cotejar_listas_control',
+            'schedule': crontab(hour=4, minute=0, day_of_week=0),  # Domingos 4:00 AM
+            'kwargs': {'completo': True},
+            'options': {'queue': 'maintenance'}
+        },
+
+        # Detección incremental de clientes duplicados (diario a las 2:30 AM, tras la sincronización)
+        'detectar-clientes-duplicados': {
+            'task': 'app.tasks.clientes_tasks.detectar_clientes_duplicados',
+            'schedule': crontab(hour=2, minute=30),  # 2:30 AM diario
+            'options': {'queue': 'maintenance'}
+        },
+
+        # Detección completa de clientes duplicados (sábados a las 3:00 AM)
+        'detectar-clientes-duplicados-completo': {
+            'task': 'app.tasks.clientes_tasks.detectar_clientes_duplicados',
+            'schedule': crontab(hour=3, minute=0, day_of_week=6),  # Sábados 3:00 AM
+            'kwargs': {'completo': True},
+            'options': {'queue': 'maintenance'}
+        },
+
+        # Calificación de riesgo de clientes y préstamos (diario a las 3:30 AM, tras los perfiles financieros)
+        'calificar-riesgo-cartera': {
+            'task': 'app.tasks.clientes_tasks.calificar_riesgo_cartera',
+            'schedule': crontab(hour=3, minute=30),  # 3:30 AM diario
+            'options': {'queue': 'maintenance'}
+        },
     },
 }
 
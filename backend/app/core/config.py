@@ -36,6 +36,8 @@ class Settings(BaseSettings):
     # Configuración de auditoría
     ENABLE_AUDIT_LOG: bool = True
     AUDIT_LOG_RETENTION_DAYS: int = 365
+    AUDIT_LOG_PARTITIONS_AHEAD: int = 3  # Particiones mensuales creadas por adelantado
+    AUDIT_LOG_RETENTION_MODE: str = "drop"  # drop: eliminar partición, detach: solo desvincular
     
     # Configuración de encriptación
     ENCRYPT_PII_DATA: bool = True
@@ -100,7 +102,120 @@ class Settings(BaseSettings):
     
     # Configuración de logging
     LOG_LEVEL: str = "INFO"
-    
+
+    # Configuración de caché de nombres de clientes
+    CLIENTE_NOMBRE_CACHE_SIZE: int = 10000
+    CLIENTE_NOMBRE_CACHE_TTL_SECONDS: int = 300  # Vigencia de la copia local por proceso
+    CLIENTE_NOMBRE_CACHE_REDIS_TTL_SECONDS: int = 86400  # Vigencia de cada nombre en Redis
+    CLIENTE_NOMBRE_CACHE_REDIS_PREFIX: str = "financepro:clientes:nombre_display:"
+
+    # Configuración de vista 360 de clientes
+    CLIENTE_360_CACHE_TTL_SECONDS: int = 30  # 0 desactiva la caché
+    CLIENTE_360_CACHE_REDIS_PREFIX: str = "financepro:clientes:360:"
+    CLIENTE_360_DIAS_HISTORIAL: int = 365  # Ventana de historial y conversaciones incluida
+
+    # Configuración de perfiles financieros de clientes
+    PERFIL_FINANCIERO_LOTE: int = 500  # Clientes recalculados por transacción
+
+    # Configuración de cumplimiento documental
+    CUMPLIMIENTO_LOTE: int = 2000  # Clientes por bloque del escaneo diario
+    CUMPLIMIENTO_DIAS_AVISO: int = 30  # Anticipación para marcar documentos por vencer
+    CUMPLIMIENTO_TIPOS_OBLIGATORIOS: List[str] = ["CEDULA"]  # Requeridos a todo cliente activo
+
+    # Configuración de listas de control (PEP y sanciones)
+    LISTAS_CONTROL_DIR: str = "/app/listas_control"  # Archivos CSV; los que empiezan por "pep" son listas PEP
+    LISTAS_CONTROL_UMBRAL: int = 85  # Puntaje mínimo (0-100) para registrar una coincidencia
+    LISTAS_CONTROL_PREFILTRO: float = 0.65  # Fracción de trigramas fonéticos del nombre de la lista presentes en el cliente
+    LISTAS_CONTROL_LOTE: int = 10000  # Clientes por bloque del cotejo
+    LISTAS_CONTROL_SOLAPAMIENTO_SEGUNDOS: int = 300  # Margen del cotejo incremental
+
+    # Configuración de detección de clientes duplicados
+    DUPLICADOS_UMBRAL: int = 75  # Puntaje mínimo (0-100) para proponer una fusión
+    DUPLICADOS_BLOQUE_MAXIMO: int = 50  # Bloques con más clientes se omiten (claves poco selectivas)
+    DUPLICADOS_LOTE: int = 10000  # Clientes por bloque de lectura; pares por bloque de comparación
+    DUPLICADOS_SOLAPAMIENTO_SEGUNDOS: int = 300  # Margen de la detección incremental
+
+    # Configuración de scoring de riesgo (Cliente.risk_level y Prestamo.risk_assessment)
+    RIESGO_MODELO_ARCHIVO: str = ""  # JSON con intercepto, variables {peso, tope} y cortes; vacío = modelo base
+    RIESGO_LOTE: int = 50000  # Filas por bloque de lectura y de actualización
+    RIESGO_MESES_PAGOS: int = 12  # Ventana del historial de cuotas pagadas con atraso
+    RIESGO_DIAS_GESTIONES: int = 90  # Ventana de resultados de cobranza y promesas incumplidas
+    RIESGO_CAMBIO_HISTORIAL: int = 5  # Variación mínima del puntaje (además del cambio de nivel) para el historial
+
+    # Configuración de índice espacial (sucursales y direcciones)
+    ESPACIAL_CELDA_GRADOS: float = 0.05  # ~5.5 km por celda de la rejilla
+    ESPACIAL_REFRESCO_SEGUNDOS: int = 60  # Refresco incremental de direcciones por updated_at
+    ESPACIAL_SOLAPAMIENTO_SEGUNDOS: int = 300  # Margen para transacciones confirmadas tarde
+    ESPACIAL_RECONSTRUCCION_SEGUNDOS: int = 3600  # Reconstrucción completa (descarta eliminadas)
+    ESPACIAL_RADIO_MAXIMO_KM: float = 50.0
+
+    # Configuración de rutas de visitas de cobranza
+    RUTAS_VELOCIDAD_KMH: float = 25.0  # Velocidad media urbana del gestor
+    RUTAS_FACTOR_DESVIO: float = 1.3  # Distancia vial estimada sobre la línea recta
+    RUTAS_DURACION_VISITA_MINUTOS: int = 20  # Si la actividad no tiene duración estimada
+    RUTAS_HORA_SALIDA: str = "08:00"  # Salida desde la sucursal
+    RUTAS_REGRESO_SUCURSAL: bool = True  # La ruta cierra en la sucursal
+    RUTAS_2OPT_MAX_ITERACIONES: int = 500
+
+    # Configuración de exportaciones masivas
+    EXPORT_DIR: str = "/app/exports"
+    EXPORT_CHUNK_SIZE: int = 5000
+    EXPORT_DECRYPT_WORKERS: int = 4
+    EXPORT_JOB_TTL_SECONDS: int = 86400  # Vigencia del dueño de cada exportación programada
+
+    # Configuración de planillas de descuento directo
+    PLANILLA_DESCUENTO_DIR: str = "/app/planillas"
+    PLANILLA_DESCUENTO_WORKERS: int = 4  # Entidades generadas en paralelo
+
+    # Configuración de cargas masivas
+    BULK_MAX_ITEMS: int = 5000
+    BULK_BATCH_SIZE: int = 500
+    VALIDACION_DESCUENTO_MAX_ITEMS: int = 20000  # Pares por validación masiva de descuento
+
+    # Configuración de aplicación de pagos
+    PAGO_APLICACION_MAX_ITEMS: int = 50000  # Pagos por solicitud o archivo de remesa
+    PAGO_APLICACION_LOTE_PRESTAMOS: int = 500  # Préstamos bloqueados por transacción
+
+    # Configuración de importación DBF (sistema legado)
+    DBF_IMPORT_DIR: str = "/app/imports"  # Checkpoints y archivos de rechazados
+    DBF_IMPORT_ENCODING: str = "latin1"
+    DBF_IMPORT_BATCH_SIZE: int = 2000
+    DBF_IMPORT_WORKERS: int = 4
+    DBF_IMPORT_MAPPING_FILE: Optional[str] = None  # JSON con el mapeo de campos del DBF
+    DBF_SYNC_FILE: Optional[str] = None  # DBF legado para la sincronización nocturna
+    DBF_SYNC_MAX_DELETE_RATIO: float = 0.05  # Máxima proporción de eliminaciones sin forzar
+
+    # Configuración de migraciones en línea
+    MIGRATION_LOCK_TIMEOUT_MS: int = 3000  # Espera máxima por un lock antes de reintentar
+    MIGRATION_MAX_RETRIES: int = 10
+    MIGRATION_RETRY_BACKOFF_SECONDS: float = 2.0  # Base de la espera exponencial entre reintentos
+    MIGRATION_BACKFILL_BATCH_SIZE: int = 5000
+    MIGRATION_BACKFILL_PAUSE_SECONDS: float = 0.1  # Pausa entre lotes de backfill
+
+    # Configuración de estadísticas de préstamos
+    PRESTAMO_STATS_CACHE_TTL_SECONDS: int = 60  # Vigencia de las estadísticas por sucursal
+    PRESTAMO_STATS_CACHE_MAX_ENTRADAS: int = 256  # Sucursales memorizadas por proceso
+
+    # Configuración de transiciones de estado de cartera
+    PRESTAMO_DIAS_GRACIA_MORA: int = 0  # Días tras el vencimiento antes de pasar a MORA
+    PRESTAMO_DIAS_CASTIGO: int = 180  # Días de mora para castigar el préstamo
+    CARTERA_SNAPSHOT_DETALLE_DIAS: int = 90  # Retención de la fotografía por préstamo en mora
+
+    # Configuración de numeración de préstamos y solicitudes
+    NUMERADOR_TAMANO_BLOQUE: int = 50  # Números reservados por proceso en cada acceso a la base
+
+    # Configuración de simulación de préstamos
+    SIMULACION_CACHE_MAX_ENTRADAS: int = 1024  # Escenarios memorizados por proceso
+    SIMULACION_CACHE_TTL_SECONDS: int = 300
+    SIMULACION_MAX_ESCENARIOS: int = 60  # Plazos por cotización
+
+    # Configuración de amortización
+    AMORTIZACION_METODO: str = "FRANCES"  # FRANCES, ALEMAN o FLAT
+    AMORTIZACION_FRECUENCIA_DESCUENTO_DIRECTO: str = "QUINCENAL"  # Planilla: días 15 y fin de mes
+    AMORTIZACION_COMISION_APERTURA_PCT: float = 0.0  # % del monto descontado al desembolso
+    AMORTIZACION_TASA_SEGURO_ANUAL_PCT: float = 0.0  # % anual sobre saldo (seguro de vida deudor)
+    AMORTIZACION_CARGO_PERIODICO: float = 0.0  # Cargo fijo por cuota
+
     @validator("SECRET_KEY")
     def validate_secret_key(cls, v):
         if len(v) < 32:
@@ -3,7 +3,6 @@ Script de inicialización de base de datos con migraciones y datos de prueba
 """
 import logging
 from sqlalchemy import text
-from sqlalchemy.exc import ProgrammingError
 from app.core.database import SessionLocal, engine
 from app.models.secure_models import Base, Sucursal, SucursalTelefono, Usuario, UsuarioEmail
 from app.core.security import hash_password
@@ -28,6 +27,10 @@ def create_tables():
         logger.info("Ejecutando Base.metadata.create_all()...")
         Base.metadata.create_all(bind=engine)
         
+        # audit_logs se crea particionada: el mes en curso y los siguientes necesitan partición
+        from app.services.audit_partition_service import AuditPartitionService
+        AuditPartitionService(engine).asegurar_particiones()
+        
         # Verificar qué tablas se crearon
         with engine.connect() as conn:
             result = conn.execute(text("SELECT tablename FROM pg_tables WHERE schemaname = 'public'"))
@@ -311,204 +314,23 @@ def create_sample_users():
         logger.error(f"Traceback: {traceback.format_exc()}")
         return False
 
-def migrate_descuento_directo():
-    """Migración 003: Agregar campos de descuento directo a préstamos"""
+def apply_online_migrations(versiones=None):
+    """Aplicar migraciones pendientes con el ejecutor en línea (sin bloquear escrituras)"""
     try:
-        db = SessionLocal()
-        logger.info("Ejecutando migración 003: Descuento Directo...")
-        
-        # Verificar si ya se ejecutó la migración
-        try:
-            result = db.execute(text("SELECT column_name FROM information_schema.columns WHERE table_name = 'prestamos' AND column_name = 'tipo_descuento_directo';"))
-            if result.fetchone():
-                logger.info("Migración 003 ya fue ejecutada, omitiendo...")
-                db.close()
-                return True
-        except Exception:
-            pass
-        
-        # 1. Crear tipos ENUM
-        logger.info("Creando tipos ENUM para préstamos...")
-        
-        # Tipo de préstamo
-        try:
-            db.execute(text("""
-                CREATE TYPE tipo_prestamo AS ENUM (
-                    'PERSONAL', 'VEHICULAR', 'HIPOTECARIO', 'COMERCIAL',
-                    'CONSUMO', 'EDUCATIVO', 'EMERGENCIA'
-                );
-            """))
-        except ProgrammingError:
-            logger.info("Tipo tipo_prestamo ya existe")
-        
-        # Tipo de descuento directo
-        try:
-            db.execute(text("""
-                CREATE TYPE tipo_descuento_directo AS ENUM (
-                    'JUBILADOS', 'PAGOS_VOLUNTARIOS', 'CONTRALORIA', 'CSS',
-                    'MEF', 'MEDUCA', 'MINSA', 'EMPRESA_PRIVADA',
-                    'BANCO_NACIONAL', 'CAJA_AHORROS', 'OTROS_BANCOS', 'COOPERATIVAS',
-                    'GARANTIA_HIPOTECARIA', 'GARANTIA_VEHICULAR', 'GARANTIA_FIDUCIARIA',
-                    'GARANTIA_PRENDARIA', 'AVAL_SOLIDARIO', 'SIN_DESCUENTO'
-                );
-            """))
-        except ProgrammingError:
-            logger.info("Tipo tipo_descuento_directo ya existe")
-        
-        # Modalidad de pago
-        try:
-            db.execute(text("""
-                CREATE TYPE modalidad_pago AS ENUM (
-                    'DESCUENTO_DIRECTO', 'DEBITO_AUTOMATICO', 'VENTANILLA',
-                    'TRANSFERENCIA', 'CHEQUE', 'EFECTIVO'
-                );
-            """))
-        except ProgrammingError:
-            logger.info("Tipo modalidad_pago ya existe")
-        
-        # Estado de préstamo
-        try:
-            db.execute(text("""
-                CREATE TYPE estado_prestamo AS ENUM (
-                    'SOLICITUD', 'EVALUACION', 'APROBADO', 'RECHAZADO',
-                    'DESEMBOLSADO', 'VIGENTE', 'MORA', 'CANCELADO',
-                    'REFINANCIADO', 'CASTIGADO'
-                );
-            """))
-        except ProgrammingError:
-            logger.info("Tipo estado_prestamo ya existe")
-        
-        # 2. Verificar si la tabla prestamos existe
-        result = db.execute(text("SELECT to_regclass('prestamos');"))
-        table_exists = result.fetchone()[0] is not None
-        
-        if table_exists:
-            logger.info("Agregando columnas a tabla prestamos existente...")
-            
-            # Agregar columnas de clasificación
-            try:
-                db.execute(text("""
-                    ALTER TABLE prestamos 
-                    ADD COLUMN IF NOT EXISTS tipo_prestamo tipo_prestamo DEFAULT 'PERSONAL',
-                    ADD COLUMN IF NOT EXISTS tipo_descuento_directo tipo_descuento_directo,
-                    ADD COLUMN IF NOT EXISTS modalidad_pago modalidad_pago DEFAULT 'VENTANILLA';
-                """))
-            except Exception as e:
-                logger.warning(f"Error agregando columnas de clasificación: {e}")
-            
-            # Agregar número único de préstamo
-            try:
-                db.execute(text("""
-                    ALTER TABLE prestamos 
-                    ADD COLUMN IF NOT EXISTS numero_prestamo VARCHAR(50) UNIQUE;
-                """))
-            except Exception as e:
-                logger.warning(f"Error agregando numero_prestamo: {e}")
-            
-            # Agregar información del empleador (encriptada)
-            try:
-                db.execute(text("""
-                    ALTER TABLE prestamos 
-                    ADD COLUMN IF NOT EXISTS entidad_empleadora TEXT,
-                    ADD COLUMN IF NOT EXISTS numero_empleado TEXT,
-                    ADD COLUMN IF NOT EXISTS cedula_empleado TEXT,
-                    ADD COLUMN IF NOT EXISTS cargo_empleado TEXT,
-                    ADD COLUMN IF NOT EXISTS salario_base TEXT,
-                    ADD COLUMN IF NOT EXISTS contacto_rrhh TEXT,
-                    ADD COLUMN IF NOT EXISTS telefono_rrhh TEXT,
-                    ADD COLUMN IF NOT EXISTS email_rrhh TEXT;
-                """))
-            except Exception as e:
-                logger.warning(f"Error agregando campos de empleador: {e}")
-            
-            # Agregar campos de control de descuento
-            try:
-                db.execute(text("""
-                    ALTER TABLE prestamos 
-                    ADD COLUMN IF NOT EXISTS descuento_autorizado BOOLEAN DEFAULT FALSE,
-                    ADD COLUMN IF NOT EXISTS fecha_autorizacion_descuento TIMESTAMP,
-                    ADD COLUMN IF NOT EXISTS usuario_autorizacion_id UUID,
-                    ADD COLUMN IF NOT EXISTS motivo_revocacion TEXT,
-                    ADD COLUMN IF NOT EXISTS porcentaje_descuento_maximo DECIMAL(5,2) DEFAULT 30.00;
-                """))
-            except Exception as e:
-                logger.warning(f"Error agregando campos de control: {e}")
-            
-            # Convertir estado existente si existe
-            try:
-                db.execute(text("""
-                    ALTER TABLE prestamos 
-                    ADD COLUMN IF NOT EXISTS estado_nuevo estado_prestamo DEFAULT 'VIGENTE';
-                """))
-                
-                # Migrar estados existentes si hay una columna estado
-                try:
-                    db.execute(text("""
-                        UPDATE prestamos 
-                        SET estado_nuevo = CASE 
-                            WHEN estado = 'active' THEN 'VIGENTE'::estado_prestamo
-                            WHEN estado = 'pending' THEN 'SOLICITUD'::estado_prestamo
-                            WHEN estado = 'approved' THEN 'APROBADO'::estado_prestamo
-                            WHEN estado = 'rejected' THEN 'RECHAZADO'::estado_prestamo
-                            WHEN estado = 'cancelled' THEN 'CANCELADO'::estado_prestamo
-                            ELSE 'VIGENTE'::estado_prestamo
-                        END
-                        WHERE estado_nuevo IS NULL;
-                    """))
-                except Exception:
-                    # Si no existe columna estado, usar valor por defecto
-                    pass
-            except Exception as e:
-                logger.warning(f"Error agregando estado_nuevo: {e}")
-            
-            # Crear índices para optimizar consultas
-            try:
-                db.execute(text("CREATE INDEX IF NOT EXISTS idx_prestamos_tipo_prestamo ON prestamos(tipo_prestamo);"))
-                db.execute(text("CREATE INDEX IF NOT EXISTS idx_prestamos_tipo_descuento ON prestamos(tipo_descuento_directo);"))
-                db.execute(text("CREATE INDEX IF NOT EXISTS idx_prestamos_modalidad_pago ON prestamos(modalidad_pago);"))
-                db.execute(text("CREATE INDEX IF NOT EXISTS idx_prestamos_numero ON prestamos(numero_prestamo);"))
-                db.execute(text("CREATE INDEX IF NOT EXISTS idx_prestamos_descuento_autorizado ON prestamos(descuento_autorizado);"))
-                db.execute(text("CREATE INDEX IF NOT EXISTS idx_prestamos_fecha_autorizacion ON prestamos(fecha_autorizacion_descuento);"))
-                db.execute(text("CREATE INDEX IF NOT EXISTS idx_prestamos_estado_nuevo ON prestamos(estado_nuevo);"))
-            except Exception as e:
-                logger.warning(f"Error creando índices: {e}")
-            
-            # Generar números de préstamo para registros existentes
-            try:
-                result = db.execute(text("SELECT COUNT(*) FROM prestamos WHERE numero_prestamo IS NULL;"))
-                count = result.fetchone()[0]
-                
-                if count > 0:
-                    logger.info(f"Generando números de préstamo para {count} registros existentes...")
-                    db.execute(text("""
-                        UPDATE prestamos 
-                        SET numero_prestamo = 'PER-' || COALESCE(
-                            (SELECT codigo FROM sucursales WHERE id = prestamos.sucursal_id), 'S00'
-                        ) || '-' || EXTRACT(YEAR FROM COALESCE(created_at, NOW())) || '-' || 
-                        LPAD(ROW_NUMBER() OVER (ORDER BY created_at, id)::TEXT, 6, '0')
-                        WHERE numero_prestamo IS NULL;
-                    """))
-            except Exception as e:
-                logger.warning(f"Error generando números de préstamo: {e}")
-        
-        else:
-            logger.info("Tabla prestamos no existe, se creará con las nuevas columnas cuando se ejecute create_tables()")
-        
-        db.commit()
-        db.close()
+        from app.services.migration_runner import MigrationRunner
         
-        logger.info("✅ Migración 003 completada exitosamente")
+        # Las migraciones manuales (p. ej. particionar audit_logs) solo con scripts/migrar.py
+        aplicadas = MigrationRunner(engine).aplicar(versiones, incluir_manuales=False)
+        logger.info(f"✅ Migraciones en línea aplicadas: {aplicadas or 'ninguna pendiente'}")
         return True
-        
     except Exception as e:
-        logger.error(f"❌ Error en migración 003: {e}")
-        try:
-            db.rollback()
-            db.close()
-        except:
-            pass
+        logger.error(f"❌ Error aplicando migraciones en línea: {e}")
         return False
 
+def migrate_descuento_directo():
+    """Migración 003: Agregar campos de descuento directo a préstamos"""
+    return apply_online_migrations(['003_add_descuento_directo_prestamos'])
+
 def init_database():
     """Ejecutar todas las migraciones e inicialización"""
     logger.info("🚀 Iniciando migración de base de datos...")
@@ -523,8 +345,8 @@ def init_database():
     if not create_tables():
         success = False
     
-    # 3. Migración 003: Descuento Directo
-    if not migrate_descuento_directo():
+    # 3. Migraciones versionadas (descuento directo, PEP, idempotencia, auditoría...)
+    if not apply_online_migrations():
         success = False
     
     # 4. Crear datos de prueba solo en desarrollo
@@ -3,6 +3,7 @@ Módulo de seguridad para encriptación de datos sensibles
 """
 import base64
 import hashlib
+import hmac
 import secrets
 from typing import Optional, Union
 from datetime import datetime, timedelta
@@ -77,6 +78,37 @@ class DataEncryption:
         except Exception as e:
             raise ValueError(f"Error al desencriptar datos: {str(e)}")
     
+    def blind_index(self, data: str) -> Optional[str]:
+        """
+        Índice ciego para buscar por igualdad sobre columnas encriptadas
+        
+        Fernet no es determinístico, por lo que un valor encriptado no se
+        puede buscar. El índice es un HMAC-SHA256 del valor normalizado (sin
+        espacios, en mayúsculas y con un solo guion entre segmentos) con una
+        clave derivada de la clave maestra. Los guiones se conservan porque
+        separan segmentos de largo variable: 8-12-34567 y 8-123-4567 son
+        cédulas distintas.
+        
+        Args:
+            data: Valor a indexar (p. ej. una cédula)
+            
+        Returns:
+            HMAC en hexadecimal (64 caracteres) o None si no hay valor
+        """
+        if not data:
+            return None
+        
+        segmentos = ''.join(str(data).split()).upper().split('-')
+        normalizado = '-'.join(s for s in segmentos if s)
+        if not normalizado:
+            return None
+        return hmac.new(self._blind_index_key, normalizado.encode(), hashlib.sha256).hexdigest()
+    
+    @property
+    def _blind_index_key(self) -> bytes:
+        """Clave del índice ciego, independiente de la clave Fernet"""
+        return hashlib.sha256(b'financepro_blind_index:' + self.master_key.encode()).digest()
+    
     def encrypt_pii(self, pii_data: dict) -> dict:
         """
         Encriptar datos de información personal identificable (PII)
@@ -78,6 +78,9 @@ async def startup_event():
     logger = structlog.get_logger(__name__)
     
     try:
+        # Registrar las suscripciones que invalidan perfiles financieros y vistas 360 al confirmar
+        from app.services import cliente_360_service, perfil_financiero_service  # noqa: F401
+
         # Inicializar base de datos y datos de prueba
         logger.info("Inicializando base de datos...")
         try:
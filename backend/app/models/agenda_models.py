@@ -11,8 +11,8 @@ from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
 
-from app.models.base import Base, AuditMixin
-from app.models.secure_models import EncryptedColumn
+from app.models.base import AuditMixin
+from app.models.secure_models import Base, EncryptedColumn
 
 
 class TipoActividad(enum.Enum):
@@ -119,6 +119,7 @@ class AgendaCobranza(Base, AuditMixin):
     hora_fin = Column(Time, nullable=True)
     duracion_estimada_minutos = Column(Integer, nullable=True)
     duracion_real_minutos = Column(Integer, nullable=True)
+    orden_ruta = Column(Integer, nullable=True)  # Posición en la ruta de visitas del día
     
     # Fechas de control
     fecha_inicio_real = Column(DateTime, nullable=True)
@@ -400,8 +401,9 @@ class AgendaCobranza(Base, AuditMixin):
             self.proximos_pasos = descripcion
     
     # Relaciones
-    cliente = relationship("Cliente", back_populates="actividades_cobranza")
-    prestamo = relationship("Prestamo", back_populates="actividades_cobranza")
+    # backref: Cliente y Prestamo se mapean sin importar este módulo
+    cliente = relationship("Cliente", backref="actividades_cobranza")
+    prestamo = relationship("Prestamo", backref="actividades_cobranza")
     usuario_asignado = relationship("Usuario", foreign_keys=[usuario_asignado_id])
     sucursal = relationship("Sucursal")
     alertas = relationship("AlertaCobranza", back_populates="actividad", cascade="all, delete-orphan")
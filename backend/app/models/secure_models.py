@@ -4,6 +4,7 @@ Modelos de base de datos con encriptación de datos sensibles
 from datetime import datetime
 from typing import Optional
 from sqlalchemy import Column, String, DateTime, Boolean, Text, Integer, BigInteger, Numeric, ForeignKey, Index, Time, Date, Enum
+from sqlalchemy import and_, case, func, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base, declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -366,6 +367,7 @@ class Cliente(Base, AuditMixin):
     # Campos de seguridad
     is_active = Column(Boolean, default=True, nullable=False)
     risk_level = Column(String(20), default='medium', nullable=False)  # low, medium, high
+    puntaje_riesgo = Column(Integer, nullable=True, comment="Probabilidad de incumplimiento estimada (0-100), mantenida por riesgo_service")
     bloqueado = Column(Boolean, default=False, nullable=False)
     motivo_bloqueo = Column(Text, nullable=True)
     
@@ -422,6 +424,8 @@ class Cliente(Base, AuditMixin):
     propiedades = relationship("ClientePropiedad", back_populates="cliente", cascade="all, delete-orphan")
     cuentas_bancarias = relationship("ClienteCuentaBancaria", back_populates="cliente", cascade="all, delete-orphan")
     obligaciones = relationship("ClienteObligacion", back_populates="cliente", cascade="all, delete-orphan")
+    perfil_financiero = relationship("ClientePerfilFinanciero", uselist=False, viewonly=True)
+    coincidencias_listas = relationship("ClienteCoincidenciaLista", viewonly=True)
     historial = relationship("ClienteHistorial", back_populates="cliente", cascade="all, delete-orphan")
     conversaciones = relationship("ClienteConversacion", back_populates="cliente", cascade="all, delete-orphan")
     solicitudes = relationship("ClienteSolicitud", back_populates="cliente", cascade="all, delete-orphan")
@@ -612,12 +616,9 @@ class Cliente(Base, AuditMixin):
         total += self.ingresos_alquiler_mensual
         return total if total > 0 else None
     
-    def calcular_capacidad_pago(self, porcentaje_ingresos=0.30):
-        """Calcula la capacidad de pago basada en ingresos y obligaciones existentes"""
-        ingresos = self.ingresos_totales
-        if not ingresos:
-            return None
-        
+    @property
+    def gastos_fijos_mensuales(self):
+        """Gastos de vivienda más cuotas de obligaciones, vehículos e hipotecas"""
         gastos_fijos = 0
         
         # Gastos de vivienda
@@ -656,7 +657,15 @@ class Cliente(Base, AuditMixin):
                 except (ValueError, TypeError):
                     pass
         
-        ingresos_disponibles = ingresos - gastos_fijos
+        return gastos_fijos
+    
+    def calcular_capacidad_pago(self, porcentaje_ingresos=0.30):
+        """Calcula la capacidad de pago basada en ingresos y obligaciones existentes"""
+        ingresos = self.ingresos_totales
+        if not ingresos:
+            return None
+        
+        ingresos_disponibles = ingresos - self.gastos_fijos_mensuales
         return ingresos_disponibles * porcentaje_ingresos if ingresos_disponibles > 0 else 0
     
     @property
@@ -1082,8 +1091,11 @@ class Cliente(Base, AuditMixin):
     
     @property
     def es_pep(self):
-        """Determina si el cliente es Persona Políticamente Expuesta"""
-        return any(trabajo.es_pep for trabajo in self.trabajos)
+        """Determina si el cliente es Persona Políticamente Expuesta (declarado o confirmado en lista PEP)"""
+        return (
+            any(trabajo.es_pep for trabajo in self.trabajos)
+            or any(c.tipo_lista == 'PEP' and c.estado == 'CONFIRMADA' for c in self.coincidencias_listas)
+        )
     
     @property
     def es_gobierno(self):
@@ -1127,7 +1139,15 @@ class Cliente(Base, AuditMixin):
     @property
     def requiere_due_diligence_reforzada(self):
         """Determina si el cliente requiere debida diligencia reforzada"""
-        return any(trabajo.requiere_due_diligence_reforzada for trabajo in self.trabajos)
+        return (
+            any(trabajo.requiere_due_diligence_reforzada for trabajo in self.trabajos)
+            or any(c.estado != 'DESCARTADA' for c in self.coincidencias_listas)
+        )
+    
+    @property
+    def en_lista_sanciones(self):
+        """Coincidencia confirmada con una lista de sanciones"""
+        return any(c.tipo_lista == 'SANCION' and c.estado == 'CONFIRMADA' for c in self.coincidencias_listas)
     
     @property
     def trabajos_gobierno(self):
@@ -1221,6 +1241,7 @@ class ClienteDireccion(Base, AuditMixin):
         Index('idx_direccion_cliente', 'cliente_id'),
         Index('idx_direccion_principal', 'cliente_id', 'es_principal'),
         Index('idx_direccion_coordenadas', 'latitud', 'longitud'),
+        Index('idx_direccion_actualizacion', 'updated_at'),
     )
     
     @property
@@ -2023,6 +2044,291 @@ class ClienteObligacion(Base, AuditMixin):
         return f"<Obligación {self.tipo} - {self.entidad_acreedora} de {self.cliente_id}>"
 
 
+class ClientePerfilFinanciero(Base):
+    """
+    Perfil financiero materializado del cliente
+
+    Totales de ingresos, gastos, patrimonio y obligaciones calculados a partir
+    del cliente y de sus obligaciones, vehículos, propiedades y cuentas. Se
+    marca como pendiente en la misma transacción que modifica esos datos y se
+    recalcula en segundo plano (perfil_financiero_service).
+    """
+    __tablename__ = "cliente_perfil_financiero"
+
+    cliente_id = Column(UUID(as_uuid=True), ForeignKey('clientes.id', ondelete='CASCADE'), primary_key=True)
+    ingresos_totales = Column(Numeric(14, 2), nullable=True, comment="Ingresos mensuales (incluye alquileres)")
+    ingresos_alquiler = Column(Numeric(14, 2), nullable=False, default=0)
+    gastos_fijos = Column(Numeric(14, 2), nullable=False, default=0, comment="Vivienda, obligaciones, vehículos e hipotecas")
+    capacidad_pago = Column(Numeric(14, 2), nullable=True, comment="30% de los ingresos disponibles")
+    patrimonio_total = Column(Numeric(16, 2), nullable=False, default=0)
+    valor_vehiculos = Column(Numeric(16, 2), nullable=False, default=0)
+    valor_neto_propiedades = Column(Numeric(16, 2), nullable=False, default=0)
+    saldo_promedio_cuentas = Column(Numeric(16, 2), nullable=False, default=0)
+    total_obligaciones_vigentes = Column(Numeric(16, 2), nullable=False, default=0)
+    cuotas_mensuales_obligaciones = Column(Numeric(14, 2), nullable=False, default=0)
+    obligaciones_vigentes = Column(Integer, nullable=False, default=0)
+    pendiente = Column(Boolean, nullable=False, default=False, comment="Datos de origen modificados desde el último cálculo")
+    calculado_en = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_perfil_financiero_pendiente', 'cliente_id', postgresql_where=text('pendiente')),
+    )
+
+    def __repr__(self):
+        return f"<ClientePerfilFinanciero {self.cliente_id} capacidad={self.capacidad_pago}>"
+
+
+class ClienteCumplimientoDocumental(Base):
+    """
+    Estado de cumplimiento documental del cliente
+
+    Vigencia de cédula y pasaporte, documentos vencidos o por vencer y
+    obligatorios faltantes. Lo escribe el escaneo diario de la cartera
+    (cumplimiento_documental_service); cumplimiento consulta el listado de
+    clientes que requieren atención sin recorrer documentos ni desencriptar.
+    """
+    __tablename__ = "cliente_cumplimiento_documental"
+
+    ESTADOS_CUMPLIMIENTO = [
+        ('AL_DIA', 'Al día'),
+        ('POR_VENCER', 'Documentos por vencer'),
+        ('INCOMPLETO', 'Obligatorios faltantes'),
+        ('VENCIDO', 'Documentos vencidos'),
+    ]
+
+    cliente_id = Column(UUID(as_uuid=True), ForeignKey('clientes.id', ondelete='CASCADE'), primary_key=True)
+    estado = Column(String(20), nullable=False, comment="AL_DIA, POR_VENCER, INCOMPLETO, VENCIDO")
+    fecha_vencimiento_cedula = Column(Date, nullable=True, comment="NULL si no está registrada o no se pudo interpretar")
+    dias_para_vencimiento_cedula = Column(Integer, nullable=True)
+    cedula_vigente = Column(Boolean, nullable=True)
+    fecha_vencimiento_pasaporte = Column(Date, nullable=True)
+    pasaporte_vigente = Column(Boolean, nullable=True)
+    documentos_total = Column(Integer, nullable=False, default=0, comment="Versiones actuales")
+    documentos_verificados = Column(Integer, nullable=False, default=0)
+    documentos_vencidos = Column(Integer, nullable=False, default=0)
+    documentos_por_vencer = Column(Integer, nullable=False, default=0)
+    porcentaje_completo = Column(Integer, nullable=False, default=0)
+    obligatorios_faltantes = Column(String(500), nullable=True, comment="Tipos de documento separados por coma")
+    proximo_vencimiento = Column(Date, nullable=True, comment="Vencimiento más cercano (cédula, pasaporte o documento)")
+    revisado_en = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_cumplimiento_estado_vencimiento', 'estado', 'proximo_vencimiento'),
+        Index('idx_cumplimiento_proximo_vencimiento', 'proximo_vencimiento', postgresql_where=text("estado <> 'AL_DIA'")),
+    )
+
+    @property
+    def requiere_atencion(self):
+        return self.estado != 'AL_DIA'
+
+    def __repr__(self):
+        return f"<ClienteCumplimientoDocumental {self.cliente_id} {self.estado}>"
+
+
+class ListaControlEntrada(Base):
+    """
+    Entrada de una lista de control (PEP o sanciones)
+
+    Se carga desde los archivos locales de listas (LISTAS_CONTROL_DIR). La
+    huella del contenido permite detectar entradas nuevas o modificadas y
+    volver a cotejar solo contra ellas; las entradas que desaparecen del
+    archivo quedan inactivas.
+    """
+    __tablename__ = "lista_control_entradas"
+
+    TIPOS_LISTA = [
+        ('PEP', 'Personas políticamente expuestas'),
+        ('SANCION', 'Sanciones'),
+    ]
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    lista = Column(String(50), nullable=False, comment="Nombre del archivo de origen")
+    tipo = Column(String(20), nullable=False, comment="PEP o SANCION")
+    referencia = Column(String(100), nullable=False, comment="Identificador de la entrada en la lista")
+    nombre = Column(String(500), nullable=False)
+    alias = Column(Text, nullable=True, comment="Nombres alternativos separados por |")
+    identificacion = Column(String(100), nullable=True, comment="Cédula o pasaporte normalizado")
+    fecha_nacimiento = Column(Date, nullable=True)
+    pais = Column(String(100), nullable=True)
+    huella = Column(String(64), nullable=False, comment="SHA-256 del contenido de la fila")
+    activo = Column(Boolean, nullable=False, default=True)
+    actualizado_en = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_lista_control_referencia', 'lista', 'referencia', unique=True),
+        Index('idx_lista_control_actualizacion', 'actualizado_en'),
+    )
+
+    @property
+    def nombres(self):
+        """Nombre y alias de la entrada"""
+        return [self.nombre] + [a.strip() for a in (self.alias or '').split('|') if a.strip()]
+
+    def __repr__(self):
+        return f"<ListaControlEntrada {self.lista}:{self.referencia} {self.tipo}>"
+
+
+class ClienteCoincidenciaLista(Base):
+    """
+    Coincidencia de un cliente con una entrada de lista de control
+
+    La escribe el cotejo de listas (listas_control_service) con el puntaje
+    de similitud (0-100); cumplimiento la revisa y la confirma o descarta.
+    Los nuevos cotejos actualizan el puntaje sin alterar la revisión.
+    """
+    __tablename__ = "cliente_coincidencias_listas"
+
+    ESTADOS_REVISION = [
+        ('PENDIENTE', 'Pendiente de revisión'),
+        ('CONFIRMADA', 'Confirmada'),
+        ('DESCARTADA', 'Descartada (falso positivo)'),
+    ]
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    cliente_id = Column(UUID(as_uuid=True), ForeignKey('clientes.id', ondelete='CASCADE'), nullable=False)
+    entrada_id = Column(UUID(as_uuid=True), ForeignKey('lista_control_entradas.id', ondelete='CASCADE'), nullable=False)
+    tipo_lista = Column(String(20), nullable=False, comment="PEP o SANCION (copiado de la entrada)")
+    puntaje = Column(Integer, nullable=False, comment="Similitud 0-100")
+    tipo_coincidencia = Column(String(20), nullable=False, comment="NOMBRE o IDENTIFICACION")
+    nombre_coincidente = Column(String(500), nullable=True, comment="Nombre o alias de la lista que coincidió")
+    estado = Column(String(20), nullable=False, default='PENDIENTE')
+    observaciones = Column(Text, nullable=True)
+    revisado_por = Column(String(100), nullable=True)
+    revisado_en = Column(DateTime, nullable=True)
+    detectada_en = Column(DateTime, nullable=False, default=datetime.utcnow)
+    actualizada_en = Column(DateTime, nullable=False, default=datetime.utcnow, comment="Último cotejo que la encontró")
+
+    entrada = relationship("ListaControlEntrada")
+
+    __table_args__ = (
+        Index('idx_coincidencia_cliente_entrada', 'cliente_id', 'entrada_id', unique=True),
+        Index('idx_coincidencia_estado_puntaje', 'estado', 'puntaje'),
+        Index('idx_coincidencia_entrada', 'entrada_id'),
+    )
+
+    def __repr__(self):
+        return f"<ClienteCoincidenciaLista {self.cliente_id} {self.tipo_lista} {self.puntaje} {self.estado}>"
+
+
+class ListaControlEjecucion(Base):
+    """Corrida del cotejo de listas; la última finalizada marca el inicio del cotejo incremental"""
+    __tablename__ = "lista_control_ejecuciones"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    modo = Column(String(20), nullable=False, comment="COMPLETA o INCREMENTAL")
+    iniciada_en = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finalizada_en = Column(DateTime, nullable=True)
+    entradas_activas = Column(Integer, nullable=False, default=0)
+    entradas_modificadas = Column(Integer, nullable=False, default=0)
+    clientes_cotejados = Column(Integer, nullable=False, default=0)
+    coincidencias_nuevas = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_lista_ejecucion_finalizada', 'finalizada_en'),
+    )
+
+
+class ClienteClaveDuplicado(Base):
+    """
+    Clave de bloqueo de un cliente para la detección de duplicados
+
+    Las claves (identificación y sus variantes con un dígito menos, nombre
+    fonético con fecha de nacimiento, teléfono, ...) se guardan como índice
+    ciego truncado: los clientes que comparten una clave forman un bloque y
+    solo se comparan entre sí.
+    """
+    __tablename__ = "cliente_claves_duplicados"
+
+    cliente_id = Column(UUID(as_uuid=True), ForeignKey('clientes.id', ondelete='CASCADE'), primary_key=True)
+    clave = Column(String(32), primary_key=True, comment="HMAC truncado de la clave de bloqueo")
+
+    __table_args__ = (
+        Index('idx_clave_duplicado_clave', 'clave'),
+    )
+
+
+class ClienteDuplicadoCandidato(Base):
+    """
+    Par de clientes candidato a fusión
+
+    cliente_id es el registro más antiguo (sugerido como el que se conserva)
+    y duplicado_id el más reciente. Las nuevas detecciones actualizan el
+    puntaje sin alterar la revisión.
+    """
+    __tablename__ = "cliente_duplicados_candidatos"
+
+    ESTADOS_REVISION = [
+        ('PENDIENTE', 'Pendiente de revisión'),
+        ('CONFIRMADO', 'Duplicado confirmado (fusionar)'),
+        ('DESCARTADO', 'Descartado (clientes distintos)'),
+    ]
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    cliente_id = Column(UUID(as_uuid=True), ForeignKey('clientes.id', ondelete='CASCADE'), nullable=False)
+    duplicado_id = Column(UUID(as_uuid=True), ForeignKey('clientes.id', ondelete='CASCADE'), nullable=False)
+    puntaje = Column(Integer, nullable=False, comment="Similitud 0-100")
+    criterios = Column(String(100), nullable=True, comment="Campos coincidentes: NOMBRE, IDENTIFICACION, FECHA_NACIMIENTO, TELEFONO")
+    estado = Column(String(20), nullable=False, default='PENDIENTE')
+    observaciones = Column(Text, nullable=True)
+    revisado_por = Column(String(100), nullable=True)
+    revisado_en = Column(DateTime, nullable=True)
+    detectado_en = Column(DateTime, nullable=False, default=datetime.utcnow)
+    actualizado_en = Column(DateTime, nullable=False, default=datetime.utcnow, comment="Última detección que lo encontró")
+
+    __table_args__ = (
+        Index('idx_duplicado_par', 'cliente_id', 'duplicado_id', unique=True),
+        Index('idx_duplicado_estado_puntaje', 'estado', 'puntaje'),
+        Index('idx_duplicado_duplicado', 'duplicado_id'),
+    )
+
+    def __repr__(self):
+        return f"<ClienteDuplicadoCandidato {self.cliente_id} {self.duplicado_id} {self.puntaje} {self.estado}>"
+
+
+class DuplicadoEjecucion(Base):
+    """Corrida de la detección de duplicados; la última finalizada marca el inicio de la incremental"""
+    __tablename__ = "cliente_duplicados_ejecuciones"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    modo = Column(String(20), nullable=False, comment="COMPLETA o INCREMENTAL")
+    iniciada_en = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finalizada_en = Column(DateTime, nullable=True)
+    clientes_procesados = Column(Integer, nullable=False, default=0)
+    bloques = Column(Integer, nullable=False, default=0)
+    bloques_omitidos = Column(Integer, nullable=False, default=0)
+    pares_comparados = Column(Integer, nullable=False, default=0)
+    candidatos_nuevos = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_duplicado_ejecucion_finalizada', 'finalizada_en'),
+    )
+
+
+class RiesgoPuntajeHistorial(Base):
+    """
+    Historial de calificaciones de riesgo de clientes y préstamos
+
+    El scoring por lotes (riesgo_service) agrega una fila cuando cambia el
+    nivel o el puntaje varía al menos RIESGO_CAMBIO_HISTORIAL puntos.
+    """
+    __tablename__ = "riesgo_puntajes_historial"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    entidad = Column(String(20), nullable=False, comment="CLIENTE o PRESTAMO")
+    entidad_id = Column(UUID(as_uuid=True), nullable=False)
+    puntaje = Column(Integer, nullable=False, comment="Probabilidad de incumplimiento estimada (0-100)")
+    nivel = Column(String(20), nullable=False, comment="low, medium, high")
+    puntaje_anterior = Column(Integer, nullable=True)
+    nivel_anterior = Column(String(20), nullable=True)
+    factores = Column(String(200), nullable=True, comment="Variables que más aportan al riesgo")
+    version_modelo = Column(String(50), nullable=False)
+    calculado_en = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_riesgo_historial_entidad', 'entidad', 'entidad_id', 'calculado_en'),
+    )
+
+
 class ClienteHistorial(Base, AuditMixin):
     """Historial completo de interacciones y eventos del cliente"""
     __tablename__ = "cliente_historial"
@@ -2838,6 +3144,18 @@ class Prestamo(Base, AuditMixin):
         ('SIN_DESCUENTO', 'Sin Descuento Directo')
     ]
     
+    # Categorías de descuento directo (compartidas con las estadísticas en SQL)
+    TIPOS_CON_GARANTIA = frozenset({
+        'GARANTIA_HIPOTECARIA', 'GARANTIA_VEHICULAR',
+        'GARANTIA_FIDUCIARIA', 'GARANTIA_PRENDARIA', 'AVAL_SOLIDARIO'
+    })
+    TIPOS_EMPLEADO_PUBLICO = frozenset({
+        'JUBILADOS', 'CONTRALORIA', 'CSS', 'MEF', 'MEDUCA', 'MINSA'
+    })
+    TIPOS_EMPLEADO_BANCARIO = frozenset({
+        'BANCO_NACIONAL', 'CAJA_AHORROS', 'OTROS_BANCOS', 'COOPERATIVAS'
+    })
+    
     # Estados del préstamo
     ESTADOS_PRESTAMO = [
         ('SOLICITUD', 'En Solicitud'),
@@ -2852,6 +3170,18 @@ class Prestamo(Base, AuditMixin):
         ('CASTIGADO', 'Castigado')
     ]
     
+    # Tramos de antigüedad de mora: (nombre, días desde, días hasta)
+    TRAMOS_MORA = (
+        ('AL_DIA', None, 0),
+        ('MORA_TEMPRANA', 1, 30),
+        ('MORA_MEDIA', 31, 60),
+        ('MORA_TARDIA', 61, 90),
+        ('MORA_CRITICA', 91, None),
+    )
+    
+    # Límite legal de descuento sobre el salario (% , ley panameña)
+    LIMITE_LEGAL_DESCUENTO = 30.0
+    
     # Modalidades de pago
     MODALIDADES_PAGO = [
         ('DESCUENTO_DIRECTO', 'Descuento Directo'),
@@ -2890,6 +3220,7 @@ class Prestamo(Base, AuditMixin):
     _entidad_empleadora = Column("entidad_empleadora", String(500), nullable=True, comment="Entidad donde trabaja para descuento")
     _numero_empleado = Column("numero_empleado", String(500), nullable=True, comment="Número de empleado")
     _cedula_empleado = Column("cedula_empleado", String(500), nullable=True, comment="Cédula del empleado")
+    cedula_empleado_hash = Column(String(64), nullable=True, index=True, comment="Índice ciego de la cédula del empleado")
     _cargo_empleado = Column("cargo_empleado", String(500), nullable=True, comment="Cargo del empleado")
     _salario_base = Column("salario_base", String(500), nullable=True, comment="Salario base para descuento")
     _contacto_rrhh = Column("contacto_rrhh", String(500), nullable=True, comment="Contacto de RRHH")
@@ -2919,6 +3250,13 @@ class Prestamo(Base, AuditMixin):
     # Campos de seguridad
     is_active = Column(Boolean, default=True, nullable=False)
     risk_assessment = Column(String(20), default='medium', nullable=False)
+    puntaje_riesgo = Column(Integer, nullable=True, comment="Probabilidad de incumplimiento estimada (0-100), mantenida por riesgo_service")
+    
+    # Idempotencia para carga masiva
+    clave_idempotencia = Column(String(100), unique=True, nullable=True, comment="Clave de idempotencia de carga masiva")
+    
+    # Mora real por cuotas (mantenida por CuotaService)
+    fecha_primera_cuota_impaga = Column(Date, nullable=True, comment="Vencimiento de la cuota impaga más antigua")
     
     # Métodos y propiedades calculadas
     @property
@@ -2929,27 +3267,17 @@ class Prestamo(Base, AuditMixin):
     @property
     def tiene_garantia(self):
         """Verifica si el préstamo tiene algún tipo de garantía"""
-        tipos_con_garantia = [
-            'GARANTIA_HIPOTECARIA', 'GARANTIA_VEHICULAR', 
-            'GARANTIA_FIDUCIARIA', 'GARANTIA_PRENDARIA', 'AVAL_SOLIDARIO'
-        ]
-        return self.tipo_descuento_directo in tipos_con_garantia
+        return self.tipo_descuento_directo in self.TIPOS_CON_GARANTIA
     
     @property
     def es_empleado_publico(self):
         """Verifica si es empleado público"""
-        entidades_publicas = [
-            'JUBILADOS', 'CONTRALORIA', 'CSS', 'MEF', 'MEDUCA', 'MINSA'
-        ]
-        return self.tipo_descuento_directo in entidades_publicas
+        return self.tipo_descuento_directo in self.TIPOS_EMPLEADO_PUBLICO
     
     @property
     def es_empleado_bancario(self):
         """Verifica si es empleado bancario"""
-        entidades_bancarias = [
-            'BANCO_NACIONAL', 'CAJA_AHORROS', 'OTROS_BANCOS', 'COOPERATIVAS'
-        ]
-        return self.tipo_descuento_directo in entidades_bancarias
+        return self.tipo_descuento_directo in self.TIPOS_EMPLEADO_BANCARIO
     
     @property
     def saldo_pendiente(self):
@@ -2963,34 +3291,40 @@ class Prestamo(Base, AuditMixin):
             return 0
         return float((self.monto_pagado / self.monto_total) * 100)
     
-    @property
+    @hybrid_property
     def dias_mora(self):
-        """Calcula los días de mora del préstamo"""
+        """Días transcurridos desde el vencimiento de la cuota impaga más antigua"""
         from datetime import date
-        if self.estado not in ['VIGENTE', 'MORA'] or not self.fecha_vencimiento:
+        if self.estado not in ['VIGENTE', 'MORA'] or not self.fecha_primera_cuota_impaga:
             return 0
         
         hoy = date.today()
-        fecha_venc = self.fecha_vencimiento.date() if hasattr(self.fecha_vencimiento, 'date') else self.fecha_vencimiento
-        
-        if hoy > fecha_venc:
-            return (hoy - fecha_venc).days
+        if hoy > self.fecha_primera_cuota_impaga:
+            return (hoy - self.fecha_primera_cuota_impaga).days
         return 0
     
+    @dias_mora.expression
+    def dias_mora(cls):
+        """Expresión SQL equivalente (usa idx_prestamo_estado_primera_impaga)"""
+        return case(
+            (
+                and_(
+                    cls.estado.in_(['VIGENTE', 'MORA']),
+                    cls.fecha_primera_cuota_impaga < func.current_date()
+                ),
+                func.current_date() - cls.fecha_primera_cuota_impaga
+            ),
+            else_=0
+        )
+    
     @property
     def estado_mora(self):
         """Determina el estado de mora del préstamo"""
         dias = self.dias_mora
-        if dias == 0:
-            return 'AL_DIA'
-        elif dias <= 30:
-            return 'MORA_TEMPRANA'
-        elif dias <= 60:
-            return 'MORA_MEDIA'
-        elif dias <= 90:
-            return 'MORA_TARDIA'
-        else:
-            return 'MORA_CRITICA'
+        for nombre, _, hasta in self.TRAMOS_MORA:
+            if hasta is not None and dias <= hasta:
+                return nombre
+        return self.TRAMOS_MORA[-1][0]
     
     def autorizar_descuento(self, usuario_id=None):
         """Autoriza el descuento directo del préstamo"""
@@ -3018,24 +3352,21 @@ class Prestamo(Base, AuditMixin):
             return False, f"El descuento ({porcentaje_actual:.2f}%) excede el máximo permitido ({self.porcentaje_descuento_maximo}%)"
         
         # Validación según ley panameña (máximo 30% del salario)
-        if porcentaje_actual > 30.0:
+        if porcentaje_actual > self.LIMITE_LEGAL_DESCUENTO:
             return False, f"El descuento ({porcentaje_actual:.2f}%) excede el límite legal del 30%"
         
         return True, f"Descuento válido: {porcentaje_actual:.2f}% del salario"
     
-    def generar_numero_prestamo(self):
+    def generar_numero_prestamo(self, sucursal_codigo=None):
         """Genera un número único de préstamo"""
-        from datetime import datetime
-        import random
+        from app.services.numerador_service import numerador
         
         if not self.numero_prestamo:
-            # Formato: TIPO-SUCURSAL-AÑO-SECUENCIAL
-            tipo_codigo = self.tipo_prestamo[:3].upper()
-            sucursal_codigo = self.sucursal.codigo if self.sucursal else "001"
-            año = datetime.now().year
-            secuencial = random.randint(1000, 9999)
-            
-            self.numero_prestamo = f"{tipo_codigo}-{sucursal_codigo}-{año}-{secuencial}"
+            # Formato: TIPO-SUCURSAL-AÑO-SECUENCIAL (correlativo por tipo, sucursal y año)
+            if sucursal_codigo is None:
+                sucursal_codigo = self.sucursal.codigo if self.sucursal else "001"
+            tipo = self.tipo_prestamo.value if hasattr(self.tipo_prestamo, 'value') else str(self.tipo_prestamo)
+            self.numero_prestamo = numerador.numero_prestamo(tipo, sucursal_codigo)
     
     def obtener_descripcion_tipo_descuento(self):
         """Obtiene la descripción del tipo de descuento directo"""
@@ -3059,6 +3390,7 @@ class Prestamo(Base, AuditMixin):
     sucursal = relationship("Sucursal", back_populates="prestamos")
     usuario = relationship("Usuario", back_populates="prestamos_creados", foreign_keys=[usuario_id])
     pagos = relationship("Pago", back_populates="prestamo")
+    cuotas = relationship("Cuota", back_populates="prestamo", order_by="Cuota.numero")
     documentos = relationship("Documento", back_populates="prestamo")
     # actividades_cobranza = relationship("app.models.agenda_models.AgendaCobranza", back_populates="prestamo")
     
@@ -3074,6 +3406,7 @@ class Prestamo(Base, AuditMixin):
         Index('idx_prestamo_descuento_autorizado', 'descuento_autorizado'),
         Index('idx_prestamo_sucursal_estado', 'sucursal_id', 'estado'),
         Index('idx_prestamo_tipo_estado', 'tipo_prestamo', 'estado'),
+        Index('idx_prestamo_estado_primera_impaga', 'estado', 'fecha_primera_cuota_impaga'),
     )
 
 
@@ -3093,9 +3426,95 @@ class Pago(Base, AuditMixin):
     referencia = Column(String(255), nullable=True)
     notas = Column(Text, nullable=True)
     
+    # Idempotencia para carga masiva
+    clave_idempotencia = Column(String(100), unique=True, nullable=True, comment="Clave de idempotencia de carga masiva")
+    
+    # Aplicación a cuotas (AplicacionPagosService): origen + referencia es único
+    origen = Column(String(30), nullable=True, comment="Origen del pago: CAJA, CONTRALORIA, CSS, MEF...")
+    monto_cargos = Column(Numeric(12, 2), default=0, nullable=False, comment="Aplicado a cargos y seguro")
+    monto_interes = Column(Numeric(12, 2), default=0, nullable=False, comment="Aplicado a intereses")
+    monto_capital = Column(Numeric(12, 2), default=0, nullable=False, comment="Aplicado a capital")
+    monto_excedente = Column(Numeric(12, 2), default=0, nullable=False, comment="Sobrante sin cuotas por cubrir")
+    
     # Relaciones
     prestamo = relationship("Prestamo", back_populates="pagos")
     usuario = relationship("Usuario", foreign_keys=[usuario_id])
+    imputaciones = relationship("PagoCuota", back_populates="pago", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index(
+            'idx_pago_origen_referencia', 'origen', 'referencia', unique=True,
+            postgresql_where=text("origen IS NOT NULL")
+        ),
+    )
+
+
+class PagoCuota(Base):
+    """Imputación de un pago a una cuota (cascada cargos -> interés -> capital)"""
+    __tablename__ = "pago_cuotas"
+    
+    pago_id = Column(UUID(as_uuid=True), ForeignKey('pagos.id', ondelete='CASCADE'), primary_key=True)
+    cuota_id = Column(UUID(as_uuid=True), ForeignKey('cuotas.id', ondelete='CASCADE'), primary_key=True)
+    monto_cargos = Column(Numeric(12, 2), nullable=False)
+    monto_interes = Column(Numeric(12, 2), nullable=False)
+    monto_capital = Column(Numeric(12, 2), nullable=False)
+    
+    pago = relationship("Pago", back_populates="imputaciones")
+    
+    __table_args__ = (
+        Index('idx_pago_cuota_cuota', 'cuota_id'),
+    )
+    
+    def __repr__(self):
+        return f"<PagoCuota {self.pago_id} -> {self.cuota_id}>"
+
+
+class Cuota(Base, BasicAuditMixin):
+    """Cuota del cronograma de un préstamo con su estado de pago"""
+    __tablename__ = "cuotas"
+    
+    ESTADOS_CUOTA = [
+        ('PENDIENTE', 'Pendiente'),
+        ('PARCIAL', 'Pago Parcial'),
+        ('PAGADA', 'Pagada')
+    ]
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    prestamo_id = Column(UUID(as_uuid=True), ForeignKey('prestamos.id', ondelete='CASCADE'), nullable=False)
+    numero = Column(Integer, nullable=False)
+    fecha_vencimiento = Column(Date, nullable=False)
+    
+    # Composición de la cuota
+    monto_capital = Column(Numeric(12, 2), nullable=False)
+    monto_interes = Column(Numeric(12, 2), nullable=False)
+    monto_seguro = Column(Numeric(12, 2), default=0, nullable=False)
+    monto_cargos = Column(Numeric(12, 2), default=0, nullable=False)
+    monto_cuota = Column(Numeric(12, 2), nullable=False, comment="Monto exigible de la cuota")
+    saldo_capital = Column(Numeric(12, 2), nullable=False, comment="Saldo de capital después de la cuota")
+    
+    # Seguimiento de pago
+    monto_pagado = Column(Numeric(12, 2), default=0, nullable=False)
+    estado = Column(String(20), default='PENDIENTE', nullable=False)
+    fecha_pago = Column(DateTime, nullable=True, comment="Fecha en que la cuota quedó pagada")
+    
+    prestamo = relationship("Prestamo", back_populates="cuotas")
+    
+    __table_args__ = (
+        Index('idx_cuota_prestamo_numero', 'prestamo_id', 'numero', unique=True),
+        Index('idx_cuota_estado_vencimiento', 'estado', 'fecha_vencimiento'),
+        Index(
+            'idx_cuota_impaga_prestamo', 'prestamo_id', 'fecha_vencimiento',
+            postgresql_where=text("estado <> 'PAGADA'")
+        ),
+    )
+    
+    @property
+    def saldo_cuota(self):
+        """Monto pendiente de la cuota"""
+        return self.monto_cuota - self.monto_pagado
+    
+    def __repr__(self):
+        return f"<Cuota {self.numero} de {self.prestamo_id} - {self.estado}>"
 
 
 class Documento(Base, SecureBaseModel, AuditMixin):
@@ -3329,12 +3748,117 @@ class Documento(Base, SecureBaseModel, AuditMixin):
         return f"<Documento {self.tipo_documento} - {self.nombre_archivo} de {self.cliente_id}>"
 
 
+class ClienteLegadoHuella(Base):
+    """Huella de cada registro del DBF legado para la sincronización delta"""
+    __tablename__ = "cliente_legado_huellas"
+
+    codigo_legado = Column(String(50), primary_key=True, comment="Código del cliente en el sistema legado")
+    cliente_id = Column(UUID(as_uuid=True), ForeignKey('clientes.id'), nullable=False)
+    huella = Column(String(64), nullable=False, comment="SHA-256 de los campos normalizados")
+    eliminado_en = Column(DateTime, nullable=True, comment="Fecha en que el registro dejó de aparecer en el DBF")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('idx_cliente_legado_huellas_cliente', 'cliente_id'),
+    )
+
+    def __repr__(self):
+        return f"<ClienteLegadoHuella {self.codigo_legado} -> {self.cliente_id}>"
+
+
+class PrestamoTransicionEjecucion(Base):
+    """Resumen de cada ejecución de las transiciones nocturnas de estado"""
+    __tablename__ = "prestamo_transiciones_ejecuciones"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    fecha_corte = Column(Date, nullable=False)
+    iniciado_en = Column(DateTime, nullable=False)
+    finalizado_en = Column(DateTime, nullable=False)
+    duracion_segundos = Column(Numeric(10, 3), nullable=False)
+    curados = Column(Integer, default=0, nullable=False, comment="MORA -> VIGENTE")
+    activados = Column(Integer, default=0, nullable=False, comment="DESEMBOLSADO -> VIGENTE")
+    a_mora = Column(Integer, default=0, nullable=False, comment="VIGENTE -> MORA")
+    castigados = Column(Integer, default=0, nullable=False, comment="MORA -> CASTIGADO")
+    eventos_publicados = Column(Boolean, default=False, nullable=False)
+
+    __table_args__ = (
+        Index('idx_transiciones_ejecuciones_fecha', 'fecha_corte'),
+    )
+
+    def __repr__(self):
+        return f"<PrestamoTransicionEjecucion {self.fecha_corte} +{self.a_mora} mora>"
+
+
+class CarteraAntiguedadDiaria(Base):
+    """Acumulado diario de la cartera por sucursal, producto, descuento y tramo de mora"""
+    __tablename__ = "cartera_antiguedad_diaria"
+
+    fecha_corte = Column(Date, primary_key=True)
+    sucursal_id = Column(UUID(as_uuid=True), ForeignKey('sucursales.id'), primary_key=True)
+    tipo_prestamo = Column(String(30), primary_key=True)
+    tipo_descuento_directo = Column(String(30), primary_key=True, comment="SIN_DESCUENTO cuando no aplica")
+    tramo = Column(String(20), primary_key=True, comment="AL_DIA ... MORA_CRITICA")
+    prestamos = Column(Integer, nullable=False)
+    monto = Column(Numeric(16, 2), nullable=False)
+    saldo_pendiente = Column(Numeric(16, 2), nullable=False)
+    saldo_vencido = Column(Numeric(16, 2), nullable=False)
+
+    def __repr__(self):
+        return f"<CarteraAntiguedadDiaria {self.fecha_corte} {self.tramo} {self.prestamos}>"
+
+
+class CarteraMoraDiaria(Base):
+    """Fotografía diaria de cada préstamo en mora (fuente del listado de mora)"""
+    __tablename__ = "cartera_mora_diaria"
+
+    fecha_corte = Column(Date, primary_key=True)
+    prestamo_id = Column(UUID(as_uuid=True), primary_key=True)
+    numero_prestamo = Column(String(50), nullable=True)
+    cliente_id = Column(UUID(as_uuid=True), nullable=False)
+    sucursal_id = Column(UUID(as_uuid=True), nullable=False)
+    tipo_prestamo = Column(String(30), nullable=False)
+    tipo_descuento_directo = Column(String(30), nullable=True)
+    modalidad_pago = Column(String(30), nullable=False)
+    estado = Column(String(20), nullable=False)
+    monto = Column(Numeric(12, 2), nullable=False)
+    saldo_pendiente = Column(Numeric(12, 2), nullable=False)
+    saldo_vencido = Column(Numeric(12, 2), nullable=False)
+    cuotas_vencidas = Column(Integer, nullable=False)
+    cuota_mensual = Column(Numeric(12, 2), nullable=False)
+    fecha_vencimiento = Column(DateTime, nullable=False)
+    dias_mora = Column(Integer, nullable=False)
+    tramo = Column(String(20), nullable=False)
+    descuento_autorizado = Column(Boolean, nullable=False)
+    prestamo_creado_en = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('idx_cartera_mora_fecha_dias', 'fecha_corte', 'dias_mora'),
+        Index('idx_cartera_mora_fecha_sucursal_dias', 'fecha_corte', 'sucursal_id', 'dias_mora'),
+    )
+
+    def __repr__(self):
+        return f"<CarteraMoraDiaria {self.fecha_corte} {self.numero_prestamo} {self.dias_mora}d>"
+
+
+class Numerador(Base):
+    """Último correlativo reservado por prefijo (préstamos por tipo/sucursal/año, solicitudes por día)"""
+    __tablename__ = "numeradores"
+
+    clave = Column(String(50), primary_key=True, comment="Prefijo del número, p. ej. PER-001-2026")
+    ultimo = Column(BigInteger, nullable=False, default=0, comment="Último correlativo reservado")
+
+    def __repr__(self):
+        return f"<Numerador {self.clave} {self.ultimo}>"
+
+
 class AuditLog(Base):
-    """Modelo para logs de auditoría"""
+    """Modelo para logs de auditoría (particionado por mes sobre timestamp)"""
     __tablename__ = "audit_logs"
     
+    # La clave de partición debe formar parte de la clave primaria
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, nullable=False)
     usuario_id = Column(UUID(as_uuid=True), ForeignKey('usuarios.id'), nullable=True)
     
     # Información del evento
@@ -3356,10 +3880,11 @@ class AuditLog(Base):
     # Relaciones
     usuario = relationship("Usuario", back_populates="audit_logs")
     
-    # Índices para consultas eficientes
+    # Índices para consultas eficientes (BRIN: timestamp es creciente por inserción)
     __table_args__ = (
-        Index('idx_audit_timestamp', 'timestamp'),
+        Index('idx_audit_timestamp_brin', 'timestamp', postgresql_using='brin'),
         Index('idx_audit_usuario', 'usuario_id'),
         Index('idx_audit_event_type', 'event_type'),
         Index('idx_audit_resource', 'resource_type', 'resource_id'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
     )
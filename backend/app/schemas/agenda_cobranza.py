@@ -246,6 +246,7 @@ class ActividadCobranzaResponse(BaseModel):
     fecha_inicio_real: Optional[datetime]
     fecha_fin_real: Optional[datetime]
     duracion_real_minutos: Optional[int]
+    orden_ruta: Optional[int] = None
     resultado: Optional[str]
     resultado_detalle: Optional[str]
     objetivo: Optional[str]
@@ -451,6 +452,54 @@ class DashboardCobranzaResponse(BaseModel):
     fecha_generacion: datetime = Field(default_factory=datetime.utcnow)
 
 
+# ============================================================================
+# ESQUEMAS DE RUTAS DE VISITAS
+# ============================================================================
+
+class ParadaRuta(BaseModel):
+    """Visita domiciliaria ubicada dentro de la ruta"""
+    actividad_id: UUID
+    cliente_id: UUID
+    nombre_cliente: Optional[str] = None
+    orden: int
+    latitud: float
+    longitud: float
+    hora_inicio: Optional[time] = Field(None, description="Hora de la cita, si la tiene")
+    llegada_estimada: time
+    retraso_minutos: int = Field(0, description="Minutos de llegada después de la hora de la cita")
+    distancia_tramo_km: float = Field(..., description="Distancia desde la parada anterior")
+
+
+class VisitaSinUbicacion(BaseModel):
+    """Visita sin coordenadas: se agrega al final de la ruta"""
+    actividad_id: UUID
+    cliente_id: UUID
+    nombre_cliente: Optional[str] = None
+    orden: int
+    hora_inicio: Optional[time] = None
+
+
+class RutaCobranzaResponse(BaseModel):
+    """Ruta de visitas domiciliarias de un gestor para una fecha"""
+    usuario_id: UUID
+    sucursal_id: Optional[UUID]
+    fecha: date
+    hora_salida: time
+    distancia_total_km: float
+    retraso_total_minutos: int
+    paradas: List[ParadaRuta] = []
+    sin_ubicacion: List[VisitaSinUbicacion] = []
+
+
+class PlanificacionRutasResponse(BaseModel):
+    """Resultado de planificar las rutas de una fecha"""
+    fecha: date
+    total_gestores: int
+    total_visitas: int
+    distancia_total_km: float
+    rutas: List[RutaCobranzaResponse] = []
+
+
 # ============================================================================
 # ESQUEMAS DE FILTROS
 # ============================================================================
@@ -0,0 +1,193 @@
+"""
+Esquemas Pydantic para la vista integral (360), el cumplimiento documental,
+las coincidencias con listas de control, los duplicados y el historial de
+riesgo de clientes
+"""
+
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+
+class VigenciaIdentificacion(BaseModel):
+    """Vigencia de los documentos de identificación (None = no determinable)"""
+    cedula_vigente: Optional[bool] = None
+    pasaporte_vigente: Optional[bool] = None
+    dias_para_vencimiento_cedula: Optional[int] = None
+
+
+class ExposicionPolitica(BaseModel):
+    """Exposición política calculada sobre los trabajos del cliente"""
+    es_pep: bool = False
+    es_familiar_pep: bool = False
+    es_asociado_pep: bool = False
+    es_gobierno: bool = False
+    nivel: str = 'NINGUNO'
+    requiere_due_diligence_reforzada: bool = False
+    en_lista_sanciones: bool = False
+    descripcion: str = 'Sin exposición política'
+
+
+class CompletitudDocumental(BaseModel):
+    """Estado de la documentación del cliente (versiones actuales)"""
+    total: int = 0
+    verificados: int = 0
+    pendientes: int = 0
+    vencidos: int = 0
+    obligatorios_faltantes: List[str] = []
+    porcentaje_completo: int = 0
+
+
+class Cliente360Resumen(BaseModel):
+    """Vistas derivadas calculadas una sola vez sobre los datos cargados"""
+    nombre_completo: str
+    email_principal: Optional[str] = None
+    telefono_principal: Optional[str] = None
+    direccion_principal: Optional[Dict[str, Any]] = None
+    trabajo_actual: Optional[Dict[str, Any]] = None
+    vigencia: VigenciaIdentificacion
+    exposicion_politica: ExposicionPolitica
+    documentacion: CompletitudDocumental
+    prestamos_activos: int = 0
+    saldo_prestamos: Decimal = Decimal('0')
+    solicitudes_activas: int = 0
+    ultima_interaccion: Optional[datetime] = None
+
+
+class Cliente360Response(BaseModel):
+    """Expediente completo del cliente con sus relaciones desencriptadas"""
+    cliente: Dict[str, Any]
+    resumen: Cliente360Resumen
+    perfil_financiero: Optional[Dict[str, Any]] = None
+    direcciones: List[Dict[str, Any]] = []
+    emails: List[Dict[str, Any]] = []
+    telefonos: List[Dict[str, Any]] = []
+    trabajos: List[Dict[str, Any]] = []
+    referencias: List[Dict[str, Any]] = []
+    vehiculos: List[Dict[str, Any]] = []
+    propiedades: List[Dict[str, Any]] = []
+    cuentas_bancarias: List[Dict[str, Any]] = []
+    obligaciones: List[Dict[str, Any]] = []
+    historial: List[Dict[str, Any]] = []
+    conversaciones: List[Dict[str, Any]] = []
+    solicitudes: List[Dict[str, Any]] = []
+    prestamos: List[Dict[str, Any]] = []
+    documentos: List[Dict[str, Any]] = []
+    coincidencias_listas: List[Dict[str, Any]] = []
+    generado_en: datetime
+    desde_cache: bool = False
+
+
+class CumplimientoDocumentalItem(BaseModel):
+    """Cliente del listado de cumplimiento documental"""
+    cliente_id: UUID
+    nombre_cliente: Optional[str] = None
+    estado: str
+    fecha_vencimiento_cedula: Optional[date] = None
+    dias_para_vencimiento_cedula: Optional[int] = None
+    cedula_vigente: Optional[bool] = None
+    fecha_vencimiento_pasaporte: Optional[date] = None
+    pasaporte_vigente: Optional[bool] = None
+    documentos_total: int
+    documentos_verificados: int
+    documentos_vencidos: int
+    documentos_por_vencer: int
+    porcentaje_completo: int
+    obligatorios_faltantes: List[str] = []
+    proximo_vencimiento: Optional[date] = None
+    revisado_en: datetime
+
+
+class CumplimientoDocumentalListado(BaseModel):
+    """Listado paginado de clientes que requieren atención documental"""
+    items: List[CumplimientoDocumentalItem]
+    total: int
+    skip: int
+    limit: int
+
+
+class CoincidenciaListaItem(BaseModel):
+    """Coincidencia de un cliente con una lista de control"""
+    id: UUID
+    cliente_id: UUID
+    nombre_cliente: Optional[str] = None
+    entrada_id: UUID
+    lista: Optional[str] = None
+    referencia: Optional[str] = None
+    nombre_lista: Optional[str] = None
+    tipo_lista: str
+    puntaje: int
+    tipo_coincidencia: str
+    nombre_coincidente: Optional[str] = None
+    estado: str
+    observaciones: Optional[str] = None
+    revisado_por: Optional[str] = None
+    revisado_en: Optional[datetime] = None
+    detectada_en: datetime
+    actualizada_en: datetime
+
+
+class CoincidenciaListaListado(BaseModel):
+    """Listado paginado de coincidencias con listas de control"""
+    items: List[CoincidenciaListaItem]
+    total: int
+    skip: int
+    limit: int
+
+
+class RevisionCoincidenciaLista(BaseModel):
+    """Resultado de la revisión de cumplimiento"""
+    estado: str = Field(..., pattern='^(CONFIRMADA|DESCARTADA)$')
+    observaciones: Optional[str] = Field(None, max_length=2000)
+
+
+class DuplicadoCandidatoItem(BaseModel):
+    """Par de clientes candidato a fusión"""
+    id: UUID
+    cliente_id: UUID
+    nombre_cliente: Optional[str] = None
+    duplicado_id: UUID
+    nombre_duplicado: Optional[str] = None
+    puntaje: int
+    criterios: List[str] = []
+    estado: str
+    observaciones: Optional[str] = None
+    revisado_por: Optional[str] = None
+    revisado_en: Optional[datetime] = None
+    detectado_en: datetime
+    actualizado_en: datetime
+
+
+class DuplicadoCandidatoListado(BaseModel):
+    """Listado paginado de candidatos a fusión"""
+    items: List[DuplicadoCandidatoItem]
+    total: int
+    skip: int
+    limit: int
+
+
+class RevisionDuplicado(BaseModel):
+    """Resultado de la revisión de un candidato a fusión"""
+    estado: str = Field(..., pattern='^(CONFIRMADO|DESCARTADO)$')
+    observaciones: Optional[str] = Field(None, max_length=2000)
+
+
+class RiesgoHistorialItem(BaseModel):
+    """Cambio de calificación de riesgo"""
+    puntaje: int
+    nivel: str
+    puntaje_anterior: Optional[int] = None
+    nivel_anterior: Optional[str] = None
+    factores: List[str] = []
+    version_modelo: str
+    calculado_en: datetime
+
+
+class RiesgoClienteResponse(BaseModel):
+    """Calificación de riesgo actual del cliente e historial de cambios"""
+    cliente_id: UUID
+    risk_level: str
+    puntaje_riesgo: Optional[int] = None
+    historial: List[RiesgoHistorialItem] = []
@@ -0,0 +1,40 @@
+"""
+Esquemas Pydantic para consultas geográficas (sucursales y clientes cercanos)
+"""
+
+from pydantic import BaseModel
+from typing import List, Optional
+from uuid import UUID
+
+
+class SucursalCercana(BaseModel):
+    """Sucursal con su distancia al punto consultado"""
+    sucursal_id: UUID
+    codigo: str
+    nombre: str
+    distancia_km: float
+
+
+class SucursalesCercanasResponse(BaseModel):
+    latitud: float
+    longitud: float
+    sucursales: List[SucursalCercana]
+
+
+class ClienteCercano(BaseModel):
+    """Cliente con su dirección más cercana al punto consultado"""
+    cliente_id: UUID
+    nombre_cliente: Optional[str] = None
+    direccion_id: UUID
+    distancia_km: float
+    prestamos: int = 0
+    saldo_pendiente: float = 0.0
+
+
+class ClientesEnRadioResponse(BaseModel):
+    latitud: float
+    longitud: float
+    radio_km: float
+    estado_prestamo: Optional[str] = None
+    total: int
+    clientes: List[ClienteCercano]
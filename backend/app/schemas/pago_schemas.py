@@ -0,0 +1,67 @@
+"""
+Esquemas Pydantic para pagos de préstamos
+"""
+
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List
+from datetime import datetime
+from decimal import Decimal
+
+
+class PagoBulkRequest(BaseModel):
+    """
+    Solicitud de carga masiva de pagos
+
+    Cada fila lleva prestamo_id (o numero_prestamo), monto, fecha_pago y
+    clave_idempotencia o referencia; se aplica como un PagoAplicacionItem.
+    """
+    items: List[dict] = Field(..., min_length=1, description="Pagos a registrar")
+
+
+class PagoAplicacionItem(BaseModel):
+    """Pago a aplicar a las cuotas de un préstamo (ventanilla o remesa de planilla)"""
+    origen: str = Field(..., min_length=1, max_length=30, description="Origen del pago (CAJA, CONTRALORIA, CSS, MEF...)")
+    referencia: str = Field(..., min_length=1, max_length=255, description="Referencia única dentro del origen")
+    prestamo_id: Optional[str] = Field(None, description="ID del préstamo")
+    numero_prestamo: Optional[str] = Field(None, max_length=50, description="Número del préstamo (alternativa al ID)")
+    monto: Decimal = Field(..., gt=0, decimal_places=2, description="Monto del pago")
+    fecha_pago: datetime = Field(..., description="Fecha del pago")
+    metodo_pago: str = Field('DESCUENTO_DIRECTO', max_length=50, description="Método de pago")
+    notas: Optional[str] = Field(None, description="Notas adicionales")
+
+    @model_validator(mode='after')
+    def validar_prestamo(self):
+        if not self.prestamo_id and not self.numero_prestamo:
+            raise ValueError("Debe indicar prestamo_id o numero_prestamo")
+        self.origen = self.origen.strip().upper()
+        return self
+
+
+class PagoAplicacionRequest(BaseModel):
+    """Solicitud de aplicación masiva de pagos"""
+    items: List[dict] = Field(..., min_length=1, description="Pagos a aplicar")
+
+
+class PagoAplicacionResultado(BaseModel):
+    """Resultado por fila de la aplicación de pagos"""
+    indice: int
+    estado: str  # APLICADO, DUPLICADO, ERROR
+    id: Optional[str] = None
+    origen: Optional[str] = None
+    referencia: Optional[str] = None
+    monto_cargos: Decimal = Decimal('0')
+    monto_interes: Decimal = Decimal('0')
+    monto_capital: Decimal = Decimal('0')
+    monto_excedente: Decimal = Decimal('0')
+    errores: List[str] = []
+
+
+class PagoAplicacionResumen(BaseModel):
+    """Resumen de una aplicación masiva de pagos"""
+    total: int
+    aplicados: int
+    duplicados: int
+    errores: int
+    monto_aplicado: Decimal
+    duracion_segundos: float
+    resultados: List[PagoAplicacionResultado]
@@ -6,7 +6,7 @@ incluyendo los nuevos campos para descuento directo específicos del
 sistema financiero panameño.
 """
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, model_validator, validator
 from typing import Optional, List
 from datetime import datetime, date
 from decimal import Decimal
@@ -134,8 +134,8 @@ class PrestamoUpdate(BaseModel):
     tipo_descuento_directo: Optional[TipoDescuentoDirecto] = None
     modalidad_pago: Optional[ModalidadPago] = None
     
+    # La cuota mensual y el monto total se recalculan al cambiar tasa o modalidad
     tasa_interes: Optional[Decimal] = Field(None, gt=0, le=100)
-    cuota_mensual: Optional[Decimal] = Field(None, gt=0)
     
     garantia: Optional[str] = None
     proposito: Optional[str] = None
@@ -198,6 +198,7 @@ class PrestamoResponse(PrestamoBase):
     # Metadatos
     is_active: bool
     risk_assessment: str
+    puntaje_riesgo: Optional[int] = None
     created_at: datetime
     updated_at: datetime
     
@@ -275,3 +276,158 @@ class ValidacionDescuentoResponse(BaseModel):
     salario_bruto: Decimal
     cuota_mensual: Decimal
     margen_disponible: Decimal
+
+
+class ValidacionDescuentoBatchItem(BaseModel):
+    """Par (préstamo o cédula, salario) a validar"""
+    prestamo_id: Optional[str] = Field(None, description="ID del préstamo")
+    cedula: Optional[str] = Field(None, max_length=30, description="Cédula del empleado (todos sus préstamos activos)")
+    salario_bruto: Decimal = Field(..., description="Salario bruto del empleado")
+
+    @model_validator(mode='after')
+    def validar_identificacion(self):
+        if not self.prestamo_id and not self.cedula:
+            raise ValueError("Debe indicar prestamo_id o cedula")
+        return self
+
+
+class ValidacionDescuentoBatchRequest(BaseModel):
+    """Solicitud de validación masiva de descuento directo"""
+    items: List[ValidacionDescuentoBatchItem] = Field(..., min_length=1, description="Pares a validar")
+
+
+class ValidacionDescuentoBatchItemResponse(ValidacionDescuentoResponse):
+    """Resultado de validación por fila, en el orden de la solicitud"""
+    indice: int
+    prestamo_id: Optional[str] = None
+    cedula: Optional[str] = None
+    prestamos_considerados: int = 0
+
+
+# ============================================================================
+# CARGA MASIVA
+# ============================================================================
+
+class CuotaCronograma(BaseModel):
+    """Fila de la tabla de amortización"""
+    numero: int
+    fecha_vencimiento: Optional[date] = None
+    capital: Decimal
+    interes: Decimal
+    seguro: Decimal
+    cargos: Decimal
+    pago: Decimal
+    saldo: Decimal
+
+
+class CronogramaResponse(BaseModel):
+    """Tabla de amortización con totales y tasa efectiva"""
+    prestamo_id: str
+    metodo: str
+    periodos_por_anio: int
+    cuota_mensual: Decimal
+    total_capital: Decimal
+    total_interes: Decimal
+    total_seguro: Decimal
+    total_cargos: Decimal
+    total_pagado: Decimal
+    comision_apertura: Decimal
+    tasa_efectiva_anual: float
+    cuotas: List[CuotaCronograma]
+
+
+class SimulacionRequest(BaseModel):
+    """Parámetros de una cotización (uno o varios plazos)"""
+    monto: Decimal = Field(..., gt=0, description="Monto solicitado")
+    tasa_interes: Decimal = Field(..., gt=0, le=100, description="Tasa de interés anual")
+    plazo: int = Field(..., gt=0, le=360, description="Plazo principal en meses")
+    plazos: Optional[List[int]] = Field(None, description="Plazos adicionales a comparar (meses)")
+    modalidad_pago: ModalidadPago = Field(ModalidadPago.VENTANILLA, description="Modalidad de pago")
+    tipo_descuento_directo: Optional[TipoDescuentoDirecto] = Field(None, description="Entidad de descuento")
+    salario_bruto: Optional[Decimal] = Field(None, gt=0, description="Salario bruto para validar el descuento")
+    porcentaje_descuento_maximo: Decimal = Field(Decimal('30.00'), gt=0, le=30, description="% máximo de descuento del salario")
+    fecha_inicio: Optional[date] = Field(None, description="Fecha de inicio (por defecto hoy)")
+    incluir_cronograma: bool = Field(True, description="Incluir la tabla de amortización del plazo principal")
+
+    @validator('plazos')
+    def validar_plazos(cls, v):
+        if v and any(p <= 0 or p > 360 for p in v):
+            raise ValueError('Los plazos deben estar entre 1 y 360 meses')
+        return v
+
+
+class SimulacionEscenario(BaseModel):
+    """Resultado de la cotización para un plazo"""
+    plazo: int
+    periodos: int
+    cuota: Decimal
+    cuota_mensual: Decimal
+    total_interes: Decimal
+    total_seguro: Decimal
+    total_cargos: Decimal
+    total_pagado: Decimal
+    comision_apertura: Decimal
+    costo_total: Decimal = Field(..., description="Intereses, seguro, cargos y comisión")
+    tasa_efectiva_anual: float
+    porcentaje_salario: Optional[float] = None
+    cumple_limite_descuento: Optional[bool] = None
+    margen_disponible: Optional[Decimal] = None
+    desde_cache: bool = False
+
+
+class SimulacionResponse(BaseModel):
+    """Cotización con los escenarios por plazo y el cronograma del plazo principal"""
+    monto: Decimal
+    tasa_interes: Decimal
+    modalidad_pago: str
+    tipo_descuento_directo: Optional[str] = None
+    metodo: str
+    periodos_por_anio: int
+    salario_bruto: Optional[Decimal] = None
+    limite_descuento: float
+    escenarios: List[SimulacionEscenario]
+    cuotas: List[CuotaCronograma] = []
+
+
+class TendenciaAntiguedadItem(BaseModel):
+    """Punto de la serie diaria de antigüedad de cartera"""
+    fecha_corte: date
+    tramo: str
+    grupo: Optional[str] = None
+    prestamos: int
+    saldo_pendiente: Decimal
+    saldo_vencido: Decimal
+
+
+class PrestamoBulkItem(PrestamoBase):
+    """Elemento de carga masiva de préstamos (admite fechas históricas)"""
+    cliente_id: str = Field(..., description="ID del cliente")
+    sucursal_id: str = Field(..., description="ID de la sucursal")
+    fecha_inicio: date = Field(..., description="Fecha de inicio del préstamo")
+    estado: EstadoPrestamo = Field(EstadoPrestamo.SOLICITUD, description="Estado inicial")
+    monto_pagado: Decimal = Field(Decimal('0'), ge=0, description="Monto ya pagado (migraciones)")
+    descuento_directo_info: Optional[DescuentoDirectoInfo] = None
+    clave_idempotencia: Optional[str] = Field(None, max_length=100, description="Clave para reintentos seguros")
+
+
+class PrestamoBulkRequest(BaseModel):
+    """Solicitud de carga masiva de préstamos"""
+    items: List[dict] = Field(..., min_length=1, description="Préstamos a crear")
+
+
+class BulkItemResultado(BaseModel):
+    """Resultado por fila de una carga masiva"""
+    indice: int
+    estado: str  # CREADO, DUPLICADO, ERROR
+    id: Optional[str] = None
+    clave_idempotencia: Optional[str] = None
+    errores: List[str] = []
+
+
+class BulkResultado(BaseModel):
+    """Resumen de una carga masiva"""
+    total: int
+    creados: int
+    duplicados: int
+    errores: int
+    resultados: List[BulkItemResultado]
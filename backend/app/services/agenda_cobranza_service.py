@@ -16,6 +16,7 @@ from app.models.agenda_models import (
 from app.models.secure_models import Cliente, Usuario, Prestamo, SolicitudAlerta
 from app.services.notification_service import NotificationService
 from app.services.rabbitmq_service import RabbitMQService
+from app.services.cliente_nombre_cache import cliente_nombre_cache
 
 logger = logging.getLogger(__name__)
 
@@ -457,6 +458,13 @@ class AgendaCobranzaService:
                     a.fecha_promesa_pago and a.fecha_promesa_pago <= hoy)
             ])
             
+            # Próximas actividades con nombres resueltos en una sola consulta
+            proximas = sorted(
+                [a for a in actividades if a.fecha_programada >= hoy and a.estado == EstadoActividad.PROGRAMADA],
+                key=lambda x: x.fecha_programada
+            )[:10]
+            nombres = cliente_nombre_cache.obtener_varios(self.db, [a.cliente_id for a in proximas])
+            
             return {
                 'resumen': {
                     'total_actividades': total_actividades,
@@ -472,14 +480,13 @@ class AgendaCobranzaService:
                 'actividades_proximas': [
                     {
                         'id': str(a.id),
-                        'cliente_nombre': f"{a.cliente.nombres} {a.cliente.apellidos}",
+                        'cliente_nombre': nombres.get(str(a.cliente_id), "N/A"),
                         'tipo_actividad': a.nombre_tipo_legible,
                         'fecha_programada': a.fecha_programada.isoformat(),
                         'hora_inicio': a.hora_inicio.isoformat() if a.hora_inicio else None,
                         'prioridad': a.prioridad.value
                     }
-                    for a in sorted([a for a in actividades if a.fecha_programada >= hoy and a.estado == EstadoActividad.PROGRAMADA], 
-                                  key=lambda x: x.fecha_programada)[:10]
+                    for a in proximas
                 ]
             }
             
@@ -509,7 +516,7 @@ class AgendaCobranzaService:
                     nivel_urgencia='MEDIA',
                     titulo=f'Actividad Programada - {actividad.titulo}',
                     mensaje=f'Tiene una actividad de cobranza programada: {actividad.nombre_tipo_legible} '
-                           f'con el cliente {actividad.cliente.nombres} {actividad.cliente.apellidos}.',
+                           f'con el cliente {cliente_nombre_cache.obtener(self.db, actividad.cliente_id)}.',
                     fecha_programada=fecha_alerta
                 )
                 
@@ -527,14 +534,15 @@ class AgendaCobranzaService:
                 return
             
             fecha_alerta = datetime.combine(actividad.fecha_promesa_pago, time(9, 0))
+            nombre_cliente = cliente_nombre_cache.obtener(self.db, actividad.cliente_id)
             
             alerta = AlertaCobranza(
                 actividad_id=actividad.id,
                 usuario_destinatario_id=actividad.usuario_asignado_id,
                 tipo_alerta='PROMESA_PAGO_VENCIMIENTO',
                 nivel_urgencia='ALTA',
-                titulo=f'Promesa de Pago - {actividad.cliente.nombres}',
-                mensaje=f'El cliente {actividad.cliente.nombres} {actividad.cliente.apellidos} '
+                titulo=f'Promesa de Pago - {nombre_cliente}',
+                mensaje=f'El cliente {nombre_cliente} '
                        f'prometió pagar ${actividad.monto_prometido} hoy.',
                 fecha_programada=fecha_alerta
             )
@@ -0,0 +1,326 @@
+"""
+Motor de amortización vectorizado
+
+Genera tablas de amortización para uno o muchos préstamos en una sola
+llamada, operando sobre matrices NumPy de forma (préstamos × períodos).
+
+Métodos soportados:
+- FRANCES: cuota constante (capital creciente, interés decreciente)
+- ALEMAN: amortización de capital constante (cuota decreciente)
+- FLAT: interés calculado sobre el monto original en cada período
+
+Frecuencias: mensual (12 períodos al año) y quincenal (24 períodos al año,
+usada por el descuento directo de planilla los días 15 y fin de mes).
+
+Cargos adicionales:
+- comisión de apertura (% del monto, descontada al desembolso)
+- seguro sobre saldo (% anual aplicado al saldo de cada período)
+- cargo fijo por período
+
+El módulo no depende de la base de datos ni de la configuración, para poder
+usarse desde servicios, tareas y benchmarks por igual.
+"""
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+import calendar
+
+import numpy as np
+
+METODO_FRANCES = 'FRANCES'
+METODO_ALEMAN = 'ALEMAN'
+METODO_FLAT = 'FLAT'
+METODOS_AMORTIZACION = (METODO_FRANCES, METODO_ALEMAN, METODO_FLAT)
+
+FRECUENCIA_MENSUAL = 'MENSUAL'
+FRECUENCIA_QUINCENAL = 'QUINCENAL'
+PERIODOS_POR_ANIO = {
+    FRECUENCIA_MENSUAL: 12,
+    FRECUENCIA_QUINCENAL: 24,
+}
+
+Numerico = Union[float, int, Decimal, Sequence, np.ndarray]
+
+
+def _vector(valor: Numerico, tamano: int, dtype=np.float64) -> np.ndarray:
+    """Convierte un escalar o secuencia en un vector de tamaño fijo"""
+    arreglo = np.asarray(valor, dtype=dtype)
+    if arreglo.ndim == 0:
+        return np.full(tamano, arreglo, dtype=dtype)
+    if arreglo.shape != (tamano,):
+        raise ValueError(f"Se esperaban {tamano} valores, se recibieron {arreglo.size}")
+    return arreglo
+
+
+def periodos_por_modalidad(
+    modalidades: Union[str, Sequence[str]],
+    frecuencia_descuento_directo: str = FRECUENCIA_QUINCENAL
+) -> np.ndarray:
+    """Períodos por año implícitos en la modalidad de pago de cada préstamo"""
+    modalidades = np.atleast_1d(np.asarray(modalidades, dtype=object))
+    return np.where(
+        modalidades == 'DESCUENTO_DIRECTO',
+        PERIODOS_POR_ANIO[frecuencia_descuento_directo],
+        PERIODOS_POR_ANIO[FRECUENCIA_MENSUAL]
+    ).astype(np.int64)
+
+
+@dataclass
+class Cronogramas:
+    """
+    Tablas de amortización de un conjunto de préstamos
+
+    Las matrices tienen forma (préstamos × períodos); los períodos posteriores
+    al plazo de cada préstamo valen cero.
+    """
+    montos: np.ndarray
+    periodos: np.ndarray            # número de períodos de cada préstamo
+    periodos_por_anio: np.ndarray
+    comision: np.ndarray            # comisión de apertura cobrada al desembolso
+    capital: np.ndarray
+    interes: np.ndarray
+    seguro: np.ndarray
+    cargos: np.ndarray
+    pago: np.ndarray
+    saldo: np.ndarray               # saldo después de cada pago
+
+    def __len__(self) -> int:
+        return self.montos.size
+
+    def totales(self) -> Dict[str, np.ndarray]:
+        """Totales por préstamo (vectores de tamaño igual al número de préstamos)"""
+        return {
+            'total_capital': self.capital.sum(axis=1),
+            'total_interes': self.interes.sum(axis=1),
+            'total_seguro': self.seguro.sum(axis=1),
+            'total_cargos': self.cargos.sum(axis=1),
+            'total_pagado': self.pago.sum(axis=1),
+            'comision': self.comision,
+            'cuota': self.pago[:, 0],
+            'cuota_mensual': np.round(self.pago[:, 0] * self.periodos_por_anio / 12, 2),
+        }
+
+    def tasa_efectiva_anual(self, max_iteraciones: int = 50, tolerancia: float = 1e-10) -> np.ndarray:
+        """
+        Tasa efectiva anual (%) por préstamo, incluyendo comisión, seguro y cargos
+
+        Resuelve la TIR de los flujos (desembolso neto de comisión contra los
+        pagos del cronograma) con Newton-Raphson vectorizado sobre todos los
+        préstamos a la vez.
+        """
+        neto = self.montos - self.comision
+        k = np.arange(1, self.pago.shape[1] + 1, dtype=np.float64)
+        # Punto de partida: tasa nominal aproximada a partir del total pagado
+        tasa = np.maximum((self.pago.sum(axis=1) / neto - 1) / np.maximum(self.periodos, 1), 1e-6)
+
+        for _ in range(max_iteraciones):
+            descuento = (1 + tasa)[:, None] ** -k
+            valor = (self.pago * descuento).sum(axis=1) - neto
+            derivada = -(self.pago * k * descuento).sum(axis=1) / (1 + tasa)
+            paso = np.divide(valor, derivada, out=np.zeros_like(valor), where=derivada != 0)
+            tasa = np.maximum(tasa - paso, -0.99)
+            if np.all(np.abs(paso) < tolerancia):
+                break
+
+        return np.round(((1 + tasa) ** self.periodos_por_anio - 1) * 100, 4)
+
+    def cronograma(self, indice: int, fecha_inicio: date = None) -> List[Dict]:
+        """Tabla de amortización de un préstamo como lista de filas"""
+        n = int(self.periodos[indice])
+        fechas = (
+            fechas_vencimiento(fecha_inicio, n, int(self.periodos_por_anio[indice]))
+            if fecha_inicio else [None] * n
+        )
+        filas = []
+        for p in range(n):
+            filas.append({
+                'numero': p + 1,
+                'fecha_vencimiento': fechas[p],
+                'capital': _decimal(self.capital[indice, p]),
+                'interes': _decimal(self.interes[indice, p]),
+                'seguro': _decimal(self.seguro[indice, p]),
+                'cargos': _decimal(self.cargos[indice, p]),
+                'pago': _decimal(self.pago[indice, p]),
+                'saldo': _decimal(self.saldo[indice, p]),
+            })
+        return filas
+
+
+def _decimal(valor: float) -> Decimal:
+    return Decimal(f"{valor:.2f}")
+
+
+def _componentes(
+    metodo: str,
+    montos: np.ndarray,
+    tasas_periodo: np.ndarray,
+    periodos: np.ndarray,
+    k: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Capital e interés sin redondear para un grupo de préstamos"""
+    p = montos[:, None]
+    r = tasas_periodo[:, None]
+    n = periodos[:, None]
+    transcurridos = k[None, :] - 1
+
+    if metodo == METODO_FRANCES:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cuota = np.where(
+                tasas_periodo > 0,
+                montos * tasas_periodo / (1 - (1 + tasas_periodo) ** -periodos),
+                montos / periodos
+            )[:, None]
+            factor = (1 + r) ** transcurridos
+            saldo = np.where(r > 0, p * factor - cuota * (factor - 1) / r, p - cuota * transcurridos)
+        interes = saldo * r
+        return cuota - interes, interes
+
+    capital = np.broadcast_to(p / n, (montos.size, k.size))
+    saldo = p - capital * transcurridos
+    if metodo == METODO_ALEMAN:
+        interes = saldo * r
+    else:
+        interes = np.broadcast_to(p * r, saldo.shape)
+    return capital, interes
+
+
+def generar_cronogramas(
+    montos: Numerico,
+    tasas_anuales: Numerico,
+    plazos_meses: Numerico,
+    metodo: Union[str, Sequence[str]] = METODO_FRANCES,
+    periodos_por_anio: Numerico = 12,
+    comision_apertura: Numerico = 0.0,
+    tasa_seguro_anual: Numerico = 0.0,
+    cargo_periodico: Numerico = 0.0
+) -> Cronogramas:
+    """
+    Genera los cronogramas de uno o muchos préstamos en una sola llamada
+
+    Todos los parámetros aceptan un escalar (común a todos los préstamos) o un
+    vector con un valor por préstamo. Tasas y comisiones se expresan en %.
+
+    Los importes se redondean a centavos; la última cuota absorbe la
+    diferencia de redondeo para que el capital amortizado sea exactamente
+    el monto prestado.
+    """
+    montos = np.atleast_1d(np.asarray(montos, dtype=np.float64))
+    tamano = montos.size
+    tasas = _vector(tasas_anuales, tamano)
+    plazos = _vector(plazos_meses, tamano, np.int64)
+    por_anio = _vector(periodos_por_anio, tamano, np.int64)
+    comision_pct = _vector(comision_apertura, tamano)
+    seguro_pct = _vector(tasa_seguro_anual, tamano)
+    cargo = _vector(cargo_periodico, tamano)
+    metodos = np.atleast_1d(np.asarray(metodo, dtype=object))
+    if metodos.size == 1:
+        metodos = np.full(tamano, metodos[0], dtype=object)
+
+    desconocidos = set(metodos) - set(METODOS_AMORTIZACION)
+    if desconocidos:
+        raise ValueError(f"Método de amortización no soportado: {', '.join(sorted(desconocidos))}")
+    if np.any(montos <= 0) or np.any(plazos <= 0) or np.any(tasas < 0):
+        raise ValueError("Monto y plazo deben ser positivos y la tasa no negativa")
+
+    periodos = np.ceil(plazos * por_anio / 12).astype(np.int64)
+    k = np.arange(1, int(periodos.max()) + 1, dtype=np.float64)
+    activo = k[None, :] <= periodos[:, None]
+    tasas_periodo = tasas / 100 / por_anio
+
+    capital = np.zeros((tamano, k.size))
+    interes = np.zeros_like(capital)
+    for nombre in np.unique(metodos):
+        grupo = metodos == nombre
+        capital[grupo], interes[grupo] = _componentes(
+            nombre, montos[grupo], tasas_periodo[grupo], periodos[grupo], k
+        )
+
+    capital = np.where(activo, np.round(capital, 2), 0.0)
+    interes = np.where(activo, np.round(interes, 2), 0.0)
+
+    # Ajuste de redondeo en la última cuota de cada préstamo
+    filas = np.arange(tamano)
+    capital[filas, periodos - 1] += np.round(montos - capital.sum(axis=1), 2)
+
+    # El + 0.0 normaliza los -0.0 que deja el redondeo del saldo final
+    saldo = np.where(activo, np.round(montos[:, None] - np.cumsum(capital, axis=1), 2) + 0.0, 0.0)
+    saldo_inicial = np.where(activo, saldo + capital, 0.0)
+
+    seguro = np.where(activo, np.round(saldo_inicial * (seguro_pct / 100 / por_anio)[:, None], 2), 0.0)
+    cargos = np.where(activo, cargo[:, None], 0.0)
+    pago = capital + interes + seguro + cargos
+
+    return Cronogramas(
+        montos=montos,
+        periodos=periodos,
+        periodos_por_anio=por_anio,
+        comision=np.round(montos * comision_pct / 100, 2),
+        capital=capital,
+        interes=interes,
+        seguro=seguro,
+        cargos=cargos,
+        pago=pago,
+        saldo=saldo,
+    )
+
+
+def generar_en_bloques(tamano_bloque: int, montos: Numerico, **parametros) -> Iterator[Tuple[slice, Cronogramas]]:
+    """
+    Genera cronogramas de un portafolio por bloques para acotar la memoria
+
+    Los parámetros vectoriales se recortan al bloque correspondiente; los
+    escalares se aplican a todos los préstamos.
+    """
+    montos = np.atleast_1d(np.asarray(montos, dtype=np.float64))
+    for inicio in range(0, montos.size, tamano_bloque):
+        bloque = slice(inicio, min(inicio + tamano_bloque, montos.size))
+        recortados = {
+            nombre: (valor[bloque] if np.ndim(valor) == 1 else valor)
+            for nombre, valor in parametros.items()
+        }
+        yield bloque, generar_cronogramas(montos[bloque], **recortados)
+
+
+# ----------------------------------------------------------------------
+# Fechas de vencimiento
+# ----------------------------------------------------------------------
+
+def _sumar_meses(fecha: date, meses: int) -> date:
+    anio, mes = divmod(fecha.month - 1 + meses, 12)
+    anio += fecha.year
+    dia = min(fecha.day, calendar.monthrange(anio, mes + 1)[1])
+    return date(anio, mes + 1, dia)
+
+
+def _fecha_quincena(indice: int) -> date:
+    """Fecha de planilla a partir de un índice absoluto de quincenas"""
+    anio, mes = divmod(indice // 2, 12)
+    if indice % 2 == 0:
+        return date(anio, mes + 1, 15)
+    return date(anio, mes + 1, calendar.monthrange(anio, mes + 1)[1])
+
+
+def _primera_quincena(fecha_inicio: date) -> int:
+    """Índice de la primera fecha de planilla posterior al inicio"""
+    base = (fecha_inicio.year * 12 + fecha_inicio.month - 1) * 2
+    if fecha_inicio.day < 15:
+        return base
+    if fecha_inicio.day < calendar.monthrange(fecha_inicio.year, fecha_inicio.month)[1]:
+        return base + 1
+    return base + 2
+
+
+def fechas_vencimiento(fecha_inicio: date, periodos: int, periodos_por_anio: int = 12) -> List[date]:
+    """Fechas de vencimiento de cada cuota (quincenal: días 15 y fin de mes)"""
+    if periodos_por_anio == PERIODOS_POR_ANIO[FRECUENCIA_QUINCENAL]:
+        primera = _primera_quincena(fecha_inicio)
+        return [_fecha_quincena(primera + p) for p in range(periodos)]
+    return [_sumar_meses(fecha_inicio, p + 1) for p in range(periodos)]
+
+
+def fecha_ultimo_vencimiento(fecha_inicio: date, periodos: int, periodos_por_anio: int = 12) -> date:
+    """Fecha de la última cuota sin generar el calendario completo"""
+    if periodos_por_anio == PERIODOS_POR_ANIO[FRECUENCIA_QUINCENAL]:
+        return _fecha_quincena(_primera_quincena(fecha_inicio) + periodos - 1)
+    return _sumar_meses(fecha_inicio, periodos)
@@ -0,0 +1,468 @@
+"""
+Motor de aplicación de pagos a cuotas
+
+Aplica pagos de ventanilla y remesas de descuento directo (Contraloría, CSS,
+MEF, ...) a las cuotas pendientes de cada préstamo:
+
+1. Validar filas y resolver préstamos (por id o número) con una sola consulta
+2. Por lotes de préstamos, cada lote en su propia transacción:
+   - bloquear solo las filas de los préstamos afectados (SELECT ... FOR
+     UPDATE en orden de id, sin interbloqueos entre cargas concurrentes)
+   - descartar pagos ya registrados con el mismo (origen, referencia)
+   - imputar cada pago en cascada, de la cuota más antigua a la más reciente;
+     dentro de cada cuota: cargos y seguro -> interés -> capital
+   - escribir pagos, imputaciones, cuotas y préstamos con sentencias masivas
+3. Lo que sobra sin cuotas por cubrir queda como excedente del pago
+
+Reintentar la misma remesa es seguro: las filas ya aplicadas se reportan como
+DUPLICADO y no se vuelven a imputar.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time as hora
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+import csv
+import io
+import logging
+import time
+import unicodedata
+import uuid
+
+from sqlalchemy import insert, or_, select, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.secure_models import Cuota, Pago, PagoCuota, Prestamo
+from app.schemas.pago_schemas import PagoAplicacionItem
+from app.services.carga_masiva import ESTADO_DUPLICADO, ESTADO_ERROR, resultado_error, validar_items
+from app.services.cuota_service import CuotaService
+
+logger = logging.getLogger(__name__)
+
+ESTADO_APLICADO = 'APLICADO'
+
+# Estados de préstamo que admiten pagos (CASTIGADO: recuperaciones)
+ESTADOS_APLICABLES = ('DESEMBOLSADO', 'VIGENTE', 'MORA', 'CASTIGADO')
+
+CERO = Decimal('0')
+
+# Encabezados aceptados en los archivos de remesa (normalizados)
+COLUMNAS_REMESA = {
+    'prestamo_id': ('prestamo_id', 'id_prestamo'),
+    'numero_prestamo': ('numero_prestamo', 'no_prestamo', 'prestamo', 'numero'),
+    'monto': ('monto', 'importe', 'descuento', 'valor'),
+    'fecha_pago': ('fecha_pago', 'fecha'),
+    'referencia': ('referencia', 'ref', 'comprobante'),
+    'notas': ('notas', 'observacion', 'observaciones'),
+}
+
+
+def _componentes_pagados(cuota: Dict[str, Any], pagado: Decimal) -> Tuple[Decimal, Decimal, Decimal]:
+    """Reparte lo pagado de una cuota en (cargos, interés, capital) según la cascada"""
+    cargos = min(pagado, cuota['monto_cargos'] + cuota['monto_seguro'])
+    interes = min(pagado - cargos, cuota['monto_interes'])
+    # El capital absorbe la diferencia de redondeo de la cuota
+    return cargos, interes, pagado - cargos - interes
+
+
+def imputar_en_cascada(
+    monto: Decimal,
+    cuotas: List[Dict[str, Any]]
+) -> Tuple[List[Tuple[Dict[str, Any], Decimal, Decimal, Decimal]], Decimal]:
+    """
+    Imputa un monto a cuotas ordenadas por vencimiento
+
+    Actualiza monto_pagado de cada cuota cubierta y retorna las imputaciones
+    (cuota, cargos, interés, capital) junto con el excedente.
+    """
+    imputaciones = []
+    restante = monto
+    for cuota in cuotas:
+        if restante <= CERO:
+            break
+        saldo = cuota['monto_cuota'] - cuota['monto_pagado']
+        if saldo <= CERO:
+            continue
+        aplicado = min(restante, saldo)
+        antes = _componentes_pagados(cuota, cuota['monto_pagado'])
+        cuota['monto_pagado'] += aplicado
+        despues = _componentes_pagados(cuota, cuota['monto_pagado'])
+        imputaciones.append((cuota, *(d - a for a, d in zip(antes, despues))))
+        restante -= aplicado
+    return imputaciones, restante
+
+
+def _normalizar_encabezado(valor: str) -> str:
+    valor = unicodedata.normalize('NFKD', valor or '').encode('ascii', 'ignore').decode()
+    return valor.strip().lower().replace(' ', '_').replace('.', '')
+
+
+def _normalizar_monto(valor: Optional[str]) -> Optional[str]:
+    if not valor:
+        return valor
+    valor = valor.replace(' ', '').replace('B/.', '').replace('$', '')
+    if ',' in valor and '.' in valor:
+        valor = valor.replace(',', '')
+    elif ',' in valor:
+        valor = valor.replace(',', '.')
+    return valor
+
+
+def _referencia_derivada(fila: Dict[str, Any], ocurrencias: Dict[tuple, int]) -> str:
+    """
+    Referencia estable para remesas sin columna de referencia
+
+    Se deriva de (préstamo, monto, fecha, ocurrencia) y no de la posición en
+    el archivo: volver a cargar la remesa corregida, con filas agregadas o
+    reordenadas, no duplica los pagos ya aplicados.
+    """
+    prestamo = (fila.get('numero_prestamo') or fila.get('prestamo_id') or '').strip().upper()
+    try:
+        monto = str(Decimal(fila.get('monto') or '').quantize(Decimal('0.01')))
+    except ArithmeticError:
+        monto = fila.get('monto') or ''
+    fecha = (fila.get('fecha_pago') or '')[:10]
+    clave = (prestamo, monto, fecha)
+    ocurrencias[clave] = ocurrencias.get(clave, 0) + 1
+    return f"{prestamo}:{monto}:{fecha}#{ocurrencias[clave]}"
+
+
+def _normalizar_fecha(valor: Optional[str]) -> Optional[str]:
+    if not valor:
+        return valor
+    for formato in ('%d/%m/%Y', '%d-%m-%Y', '%Y%m%d'):
+        try:
+            return datetime.strptime(valor, formato).isoformat()
+        except ValueError:
+            continue
+    return valor  # ISO u otro formato: lo valida el esquema
+
+
+def leer_remesa(
+    contenido: bytes,
+    origen: str,
+    fecha_pago: Optional[date] = None
+) -> List[dict]:
+    """
+    Convierte un archivo CSV de remesa en filas para aplicar_pagos
+
+    Detecta el separador (, ; | o tabulador) y acepta encabezados comunes
+    (numero_prestamo/prestamo, monto/importe/descuento, fecha, referencia).
+    Sin columna de referencia se deriva de préstamo, monto, fecha y número de
+    ocurrencia dentro del archivo, de modo que volver a cargarlo (aunque se
+    hayan insertado o quitado líneas) no duplica pagos; dos remesas del mismo
+    origen y fecha con pagos idénticos deben traer columna de referencia.
+    Sin columna de fecha se usa fecha_pago, obligatoria si tampoco hay
+    referencia (la fecha forma parte de la referencia derivada); con
+    referencia, por defecto hoy.
+    """
+    try:
+        texto = contenido.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = contenido.decode('latin1')
+
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=',;|\t')
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.DictReader(io.StringIO(texto), dialect=dialecto)
+
+    columnas = {}
+    for campo, alias in COLUMNAS_REMESA.items():
+        for encabezado in lector.fieldnames or []:
+            if _normalizar_encabezado(encabezado) in alias and encabezado not in columnas.values():
+                columnas[campo] = encabezado
+                break
+    if 'monto' not in columnas or not {'prestamo_id', 'numero_prestamo'} & columnas.keys():
+        raise ValueError("El archivo debe tener una columna de monto y otra de préstamo (numero_prestamo o prestamo_id)")
+    if not {'referencia', 'fecha_pago'} & columnas.keys() and fecha_pago is None:
+        raise ValueError("Sin columnas de referencia ni de fecha, indique la fecha de pago de la remesa")
+
+    fecha_defecto = datetime.combine(fecha_pago or date.today(), hora()).isoformat()
+    filas = []
+    ocurrencias: Dict[tuple, int] = {}
+    for registro in lector:
+        if not any((valor or '').strip() for valor in registro.values() if isinstance(valor, str)):
+            continue
+        fila = {'origen': origen, 'metodo_pago': 'DESCUENTO_DIRECTO'}
+        for campo, encabezado in columnas.items():
+            valor = (registro.get(encabezado) or '').strip()
+            if valor:
+                fila[campo] = valor
+        fila['monto'] = _normalizar_monto(fila.get('monto'))
+        fila['fecha_pago'] = _normalizar_fecha(fila.get('fecha_pago')) or fecha_defecto
+        if 'referencia' not in fila:
+            fila['referencia'] = _referencia_derivada(fila, ocurrencias)
+        filas.append(fila)
+    return filas
+
+
+class AplicacionPagosService:
+    """Aplicación masiva de pagos a cuotas con idempotencia por (origen, referencia)"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def aplicar_pagos(
+        self,
+        items: List[dict],
+        usuario_id: str,
+        sucursal_permitida: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Aplica los pagos y retorna el resultado por fila en el orden de la solicitud"""
+        if len(items) > settings.PAGO_APLICACION_MAX_ITEMS:
+            raise ValueError(f"Máximo {settings.PAGO_APLICACION_MAX_ITEMS} pagos por solicitud")
+
+        inicio = time.monotonic()
+        validos, resultados = validar_items(items, PagoAplicacionItem)
+        validos = self._descartar_repetidos(validos, resultados)
+        por_prestamo = self._resolver_prestamos(validos, resultados, sucursal_permitida)
+
+        prestamo_ids = sorted(por_prestamo)
+        tamano_lote = settings.PAGO_APLICACION_LOTE_PRESTAMOS
+        for desde in range(0, len(prestamo_ids), tamano_lote):
+            lote = {pid: por_prestamo[pid] for pid in prestamo_ids[desde:desde + tamano_lote]}
+            self._aplicar_lote(lote, usuario_id, resultados)
+
+        resumen = self._resumir(len(items), resultados, time.monotonic() - inicio)
+        logger.info(
+            f"Aplicación de pagos: {resumen['aplicados']} aplicados, {resumen['duplicados']} duplicados, "
+            f"{resumen['errores']} con error en {resumen['duracion_segundos']} s"
+        )
+        return resumen
+
+    def _descartar_repetidos(self, validos, resultados) -> List[Tuple[int, PagoAplicacionItem]]:
+        """Marca como error las referencias repetidas dentro de la misma solicitud"""
+        vistas = set()
+        pendientes = []
+        for indice, item in validos:
+            clave = (item.origen, item.referencia)
+            if clave in vistas:
+                resultados[indice] = self._resultado_error(indice, item, "Referencia repetida en la solicitud")
+                continue
+            vistas.add(clave)
+            pendientes.append((indice, item))
+        return pendientes
+
+    def _resolver_prestamos(self, validos, resultados, sucursal_permitida) -> Dict[str, List]:
+        """Resuelve préstamos por id o número con una consulta; agrupa los pagos por préstamo"""
+        ids, numeros = set(), set()
+        for indice, item in list(validos):
+            if item.prestamo_id:
+                try:
+                    # Forma canónica: el cliente puede enviar mayúsculas o llaves
+                    item.prestamo_id = str(uuid.UUID(item.prestamo_id))
+                    ids.add(uuid.UUID(item.prestamo_id))
+                except ValueError:
+                    resultados[indice] = self._resultado_error(indice, item, "prestamo_id no es un UUID válido")
+            else:
+                numeros.add(item.numero_prestamo)
+
+        por_id, por_numero = {}, {}
+        if ids or numeros:
+            for fila in self.db.execute(
+                select(Prestamo.id, Prestamo.numero_prestamo, Prestamo.sucursal_id).where(
+                    or_(Prestamo.id.in_(ids), Prestamo.numero_prestamo.in_(numeros))
+                )
+            ):
+                por_id[str(fila.id)] = fila
+                por_numero[fila.numero_prestamo] = fila
+
+        por_prestamo = defaultdict(list)
+        for indice, item in validos:
+            if indice in resultados:
+                continue
+            prestamo = por_id.get(item.prestamo_id) if item.prestamo_id else por_numero.get(item.numero_prestamo)
+            if not prestamo:
+                resultados[indice] = self._resultado_error(
+                    indice, item, f"Préstamo {item.prestamo_id or item.numero_prestamo} no encontrado"
+                )
+            elif sucursal_permitida and str(prestamo.sucursal_id) != sucursal_permitida:
+                resultados[indice] = self._resultado_error(indice, item, "No tiene acceso al préstamo indicado")
+            else:
+                por_prestamo[str(prestamo.id)].append((indice, item))
+        return por_prestamo
+
+    def _aplicar_lote(self, lote: Dict[str, List], usuario_id: str, resultados: Dict[int, Dict[str, Any]]):
+        """Aplica los pagos de un lote de préstamos en una transacción"""
+        try:
+            resultados_lote = self._imputar_lote(lote, usuario_id)
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error aplicando lote de {len(lote)} préstamos: {str(e)}")
+            for pagos in lote.values():
+                for indice, item in pagos:
+                    resultados[indice] = self._resultado_error(indice, item, "Error de base de datos")
+            return
+        resultados.update(resultados_lote)
+
+    def _imputar_lote(self, lote: Dict[str, List], usuario_id: str) -> Dict[int, Dict[str, Any]]:
+        prestamo_ids = list(lote)
+        ahora = datetime.utcnow()
+
+        # Bloqueo de filas solo de los préstamos afectados, en orden de id
+        prestamos = {
+            str(fila.id): fila
+            for fila in self.db.execute(
+                select(Prestamo.id, Prestamo.estado, Prestamo.monto_total, Prestamo.monto_pagado)
+                .where(Prestamo.id.in_(prestamo_ids))
+                .order_by(Prestamo.id)
+                .with_for_update()
+            )
+        }
+
+        # Idempotencia verificada bajo el bloqueo: una remesa concurrente con
+        # las mismas referencias espera aquí y luego las ve como duplicadas
+        pares = [(item.origen, item.referencia) for pagos in lote.values() for _, item in pagos]
+        existentes = {
+            (fila.origen, fila.referencia): str(fila.id)
+            for fila in self.db.execute(
+                select(Pago.id, Pago.origen, Pago.referencia).where(tuple_(Pago.origen, Pago.referencia).in_(pares))
+            )
+        }
+
+        # Cuotas pendientes de todo el lote (idx_cuota_impaga_prestamo)
+        cuotas = defaultdict(list)
+        for fila in self.db.execute(
+            select(
+                Cuota.id, Cuota.prestamo_id, Cuota.fecha_vencimiento, Cuota.monto_cargos, Cuota.monto_seguro,
+                Cuota.monto_interes, Cuota.monto_cuota, Cuota.monto_pagado
+            ).where(
+                Cuota.prestamo_id.in_(prestamo_ids), Cuota.estado != 'PAGADA'
+            ).order_by(Cuota.prestamo_id, Cuota.fecha_vencimiento, Cuota.numero)
+        ):
+            cuota = dict(fila._mapping)
+            cuota['fecha_pago'] = None
+            cuotas[str(fila.prestamo_id)].append(cuota)
+
+        resultados = {}
+        filas_pagos, filas_imputaciones, filas_prestamos = [], [], []
+        cuotas_tocadas = {}
+        for prestamo_id, pagos in lote.items():
+            prestamo = prestamos.get(prestamo_id)
+            pendientes = cuotas[prestamo_id]
+            monto_pagado = prestamo.monto_pagado if prestamo else CERO
+            aplicados = 0
+
+            # Dentro de un préstamo los pagos se aplican en orden de fecha
+            for indice, item in sorted(pagos, key=lambda p: (p[1].fecha_pago, p[0])):
+                existente = existentes.get((item.origen, item.referencia))
+                if existente:
+                    resultados[indice] = {
+                        'indice': indice, 'estado': ESTADO_DUPLICADO, 'id': existente,
+                        'origen': item.origen, 'referencia': item.referencia, 'errores': []
+                    }
+                    continue
+                if not prestamo:
+                    resultados[indice] = self._resultado_error(indice, item, "Préstamo no encontrado")
+                    continue
+                if prestamo.estado not in ESTADOS_APLICABLES:
+                    resultados[indice] = self._resultado_error(
+                        indice, item, f"El préstamo está en estado {prestamo.estado}"
+                    )
+                    continue
+
+                imputaciones, excedente = imputar_en_cascada(item.monto, pendientes)
+                pago_id = uuid.uuid4()
+                totales = [CERO, CERO, CERO]
+                for cuota, cargos, interes, capital in imputaciones:
+                    filas_imputaciones.append({
+                        'pago_id': pago_id,
+                        'cuota_id': cuota['id'],
+                        'monto_cargos': cargos,
+                        'monto_interes': interes,
+                        'monto_capital': capital,
+                    })
+                    totales = [totales[0] + cargos, totales[1] + interes, totales[2] + capital]
+                    if cuota['monto_pagado'] >= cuota['monto_cuota']:
+                        cuota['fecha_pago'] = item.fecha_pago
+                    cuotas_tocadas[cuota['id']] = cuota
+
+                vencimiento = (
+                    datetime.combine(imputaciones[0][0]['fecha_vencimiento'], hora())
+                    if imputaciones else item.fecha_pago
+                )
+                filas_pagos.append({
+                    'id': pago_id,
+                    'prestamo_id': prestamo.id,
+                    'usuario_id': usuario_id,
+                    'monto': item.monto,
+                    'fecha_pago': item.fecha_pago,
+                    'fecha_vencimiento': vencimiento,
+                    'estado': 'aplicado',
+                    'metodo_pago': item.metodo_pago,
+                    'referencia': item.referencia,
+                    'notas': item.notas,
+                    'origen': item.origen,
+                    'monto_cargos': totales[0],
+                    'monto_interes': totales[1],
+                    'monto_capital': totales[2],
+                    'monto_excedente': excedente,
+                    'created_by': usuario_id,
+                })
+                monto_pagado += item.monto - excedente
+                aplicados += 1
+                resultados[indice] = {
+                    'indice': indice, 'estado': ESTADO_APLICADO, 'id': str(pago_id),
+                    'origen': item.origen, 'referencia': item.referencia,
+                    'monto_cargos': totales[0], 'monto_interes': totales[1],
+                    'monto_capital': totales[2], 'monto_excedente': excedente, 'errores': []
+                }
+
+            if aplicados:
+                cancelado = (
+                    monto_pagado >= prestamo.monto_total
+                    and all(c['monto_pagado'] >= c['monto_cuota'] for c in pendientes)
+                )
+                filas_prestamos.append({
+                    'id': prestamo.id,
+                    'monto_pagado': monto_pagado,
+                    'estado': 'CANCELADO' if cancelado else prestamo.estado,
+                    'updated_at': ahora,
+                })
+
+        if not filas_pagos:
+            return resultados
+
+        # Escrituras masivas: una sentencia por tabla
+        self.db.execute(insert(Pago), filas_pagos)
+        if filas_imputaciones:
+            self.db.execute(insert(PagoCuota), filas_imputaciones)
+        if cuotas_tocadas:
+            self.db.execute(update(Cuota), [
+                {
+                    'id': cuota['id'],
+                    'monto_pagado': cuota['monto_pagado'],
+                    'estado': 'PAGADA' if cuota['monto_pagado'] >= cuota['monto_cuota'] else 'PARCIAL',
+                    'fecha_pago': cuota['fecha_pago'],
+                    'updated_at': ahora,
+                }
+                for cuota in cuotas_tocadas.values()
+            ])
+        self.db.execute(update(Prestamo), filas_prestamos)
+        CuotaService(self.db).actualizar_primera_impaga(fila['id'] for fila in filas_prestamos)
+        return resultados
+
+    @staticmethod
+    def _resultado_error(indice: int, item: PagoAplicacionItem, error: str) -> Dict[str, Any]:
+        resultado = resultado_error(indice, [error])
+        resultado.update(origen=item.origen, referencia=item.referencia)
+        return resultado
+
+    @staticmethod
+    def _resumir(total: int, resultados: Dict[int, Dict[str, Any]], duracion: float) -> Dict[str, Any]:
+        filas = [resultados[i] for i in sorted(resultados)]
+        aplicadas = [r for r in filas if r['estado'] == ESTADO_APLICADO]
+        return {
+            'total': total,
+            'aplicados': len(aplicadas),
+            'duplicados': sum(1 for r in filas if r['estado'] == ESTADO_DUPLICADO),
+            'errores': sum(1 for r in filas if r['estado'] == ESTADO_ERROR),
+            'monto_aplicado': sum(
+                (r['monto_cargos'] + r['monto_interes'] + r['monto_capital'] for r in aplicadas), CERO
+            ),
+            'duracion_segundos': round(duracion, 3),
+            'resultados': filas,
+        }
@@ -0,0 +1,243 @@
+"""
+Mantenimiento de particiones mensuales de audit_logs
+
+audit_logs está particionada por rango mensual sobre `timestamp`:
+- Cada mes vive en su propia partición (audit_logs_pYYYYMM)
+- Las particiones futuras se crean por adelantado
+- La retención desvincula (DETACH) y elimina particiones completas en lugar
+  de ejecutar DELETE masivos
+- La tabla heap original se conserva como partición histórica
+  (audit_logs_legacy) adjuntada con rango MINVALUE..inicio de la migración
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.services.migration_runner import CrearIndice, ejecutar_con_reintentos
+
+logger = logging.getLogger(__name__)
+
+TABLA_AUDITORIA = 'audit_logs'
+TABLA_LEGADO = 'audit_logs_legacy'
+RESTRICCION_RANGO_LEGADO = 'audit_logs_legacy_rango'
+INDICE_CLAVE_LEGADO = 'audit_logs_legacy_id_timestamp_key'
+
+# (sufijo, columnas, método) de los índices de AuditLog; idx_audit_<sufijo> en la tabla
+# particionada, idx_audit_legacy_<sufijo> en la partición histórica
+INDICES_AUDITORIA = (
+    ('timestamp_brin', '"timestamp"', 'brin'),
+    ('usuario', 'usuario_id', None),
+    ('event_type', 'event_type', None),
+    ('resource', 'resource_type, resource_id', None),
+)
+
+_PATRON_LIMITE_SUPERIOR = re.compile(r"TO \('([^']+)'\)")
+
+
+def _inicio_mes(fecha: date) -> date:
+    return date(fecha.year, fecha.month, 1)
+
+
+def _sumar_meses(fecha: date, meses: int) -> date:
+    total = fecha.year * 12 + (fecha.month - 1) + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nombre_particion(mes: date) -> str:
+    """Nombre de la partición para un mes dado"""
+    return f"{TABLA_AUDITORIA}_p{mes.year:04d}{mes.month:02d}"
+
+
+class AuditPartitionService:
+    """Servicio de particionamiento y retención de logs de auditoría"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    # ------------------------------------------------------------------
+    # Consultas de estado
+    # ------------------------------------------------------------------
+
+    def es_particionada(self) -> bool:
+        """Indica si audit_logs ya es una tabla particionada"""
+        with self.engine.connect() as conn:
+            return bool(conn.execute(text("""
+                SELECT 1 FROM pg_partitioned_table pt
+                JOIN pg_class c ON c.oid = pt.partrelid
+                WHERE c.relname = :tabla AND c.relnamespace = 'public'::regnamespace
+            """), {'tabla': TABLA_AUDITORIA}).scalar())
+
+    def existe_tabla(self) -> bool:
+        """Indica si audit_logs existe"""
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text("SELECT to_regclass(:tabla) IS NOT NULL"),
+                {'tabla': f'public.{TABLA_AUDITORIA}'}
+            ).scalar()
+
+    def listar_particiones(self) -> List[Dict[str, Any]]:
+        """Lista las particiones con su límite superior (None = sin límite)"""
+        with self.engine.connect() as conn:
+            filas = conn.execute(text("""
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = :tabla
+                ORDER BY c.relname
+            """), {'tabla': TABLA_AUDITORIA}).fetchall()
+
+        particiones = []
+        for nombre, limites in filas:
+            coincidencia = _PATRON_LIMITE_SUPERIOR.search(limites or '')
+            hasta = datetime.fromisoformat(coincidencia.group(1)) if coincidencia else None
+            particiones.append({'nombre': nombre, 'limites': limites, 'hasta': hasta})
+        return particiones
+
+    # ------------------------------------------------------------------
+    # Creación de particiones
+    # ------------------------------------------------------------------
+
+    def asegurar_particiones(self, meses_adelante: Optional[int] = None) -> List[str]:
+        """Crea las particiones del mes actual y los siguientes N meses"""
+        if not self.es_particionada():
+            logger.warning("audit_logs aún no está particionada (migración 005 pendiente: scripts/migrar.py aplicar)")
+            return []
+        meses_adelante = settings.AUDIT_LOG_PARTITIONS_AHEAD if meses_adelante is None else meses_adelante
+        mes_actual = _inicio_mes(datetime.utcnow().date())
+        particiones = self.listar_particiones()
+        existentes = {p['nombre'] for p in particiones}
+        # Los meses cubiertos por la partición histórica no llevan partición propia
+        legado_hasta = next((p['hasta'] for p in particiones if p['nombre'] == TABLA_LEGADO), None)
+
+        creadas = []
+        with self.engine.begin() as conn:
+            for i in range(meses_adelante + 1):
+                desde = _sumar_meses(mes_actual, i)
+                nombre = nombre_particion(desde)
+                if nombre in existentes or (legado_hasta and datetime.combine(desde, datetime.min.time()) < legado_hasta):
+                    continue
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {nombre} PARTITION OF {TABLA_AUDITORIA} "
+                    f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{_sumar_meses(desde, 1).isoformat()}')"
+                ))
+                creadas.append(nombre)
+
+        if creadas:
+            logger.info(f"Particiones de auditoría creadas: {creadas}")
+        return creadas
+
+    # ------------------------------------------------------------------
+    # Retención
+    # ------------------------------------------------------------------
+
+    def aplicar_retencion(
+        self,
+        dias_retencion: Optional[int] = None,
+        modo: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Elimina (modo 'drop') o solo desvincula (modo 'detach') las particiones
+        cuyo rango completo es anterior a la fecha de corte.
+        """
+        dias_retencion = dias_retencion or settings.AUDIT_LOG_RETENTION_DAYS
+        modo = modo or settings.AUDIT_LOG_RETENTION_MODE
+        if modo not in ('drop', 'detach'):
+            raise ValueError(f"Modo de retención no válido: {modo}")
+
+        corte = datetime.utcnow() - timedelta(days=dias_retencion)
+        vencidas = [
+            p['nombre'] for p in self.listar_particiones()
+            if p['hasta'] is not None and p['hasta'] <= corte
+        ]
+
+        # DETACH ... CONCURRENTLY no puede ejecutarse dentro de una transacción
+        autocommit = self.engine.execution_options(isolation_level="AUTOCOMMIT")
+        procesadas = []
+        for nombre in vencidas:
+            with autocommit.connect() as conn:
+                conn.execute(text(f"ALTER TABLE {TABLA_AUDITORIA} DETACH PARTITION {nombre} CONCURRENTLY"))
+                if modo == 'drop':
+                    conn.execute(text(f"DROP TABLE {nombre}"))
+            procesadas.append(nombre)
+            logger.info(f"Partición de auditoría {nombre} {'eliminada' if modo == 'drop' else 'desvinculada'}")
+
+        return {
+            'success': True,
+            'modo': modo,
+            'fecha_corte': corte.isoformat(),
+            'count': len(procesadas),
+            'particiones': procesadas
+        }
+
+    # ------------------------------------------------------------------
+    # Migración desde tabla heap
+    # ------------------------------------------------------------------
+
+    def migrar_tabla_heap(self) -> bool:
+        """
+        Convierte la tabla heap existente en tabla particionada sin copiar datos.
+
+        La tabla original se renombra a audit_logs_legacy y se adjunta como
+        partición histórica que cubre hasta el inicio del mes subsiguiente
+        (incluye el mes en curso y el siguiente, para que las escrituras no
+        violen el CHECK si el mes cambia durante la migración).
+
+        Todo lo que recorre la tabla ocurre antes del lock ACCESS EXCLUSIVE:
+        el CHECK de rango se agrega NOT VALID y se valida con VALIDATE
+        CONSTRAINT (SHARE UPDATE EXCLUSIVE, no bloquea escrituras), y el
+        índice único (id, "timestamp") que sustituye a la PK y los índices
+        que ATTACH exige en la partición se crean de forma concurrente. Bajo
+        el lock solo quedan cambios de catálogo.
+        """
+        if not self.existe_tabla() or self.es_particionada():
+            return False
+
+        corte = _sumar_meses(_inicio_mes(datetime.utcnow().date()), 2).isoformat()
+
+        # 1. CHECK de rango sin recorrer la tabla; VALIDATE lo recorre sin bloquear escrituras
+        ejecutar_con_reintentos(self.engine, [
+            f"ALTER TABLE {TABLA_AUDITORIA} DROP CONSTRAINT IF EXISTS {RESTRICCION_RANGO_LEGADO}",
+            f"""ALTER TABLE {TABLA_AUDITORIA} ADD CONSTRAINT {RESTRICCION_RANGO_LEGADO} CHECK ("timestamp" IS NOT NULL AND "timestamp" < '{corte}') NOT VALID""",
+        ])
+        ejecutar_con_reintentos(self.engine, [
+            f"ALTER TABLE {TABLA_AUDITORIA} VALIDATE CONSTRAINT {RESTRICCION_RANGO_LEGADO}",
+        ])
+
+        # 2. Índices que ATTACH reutiliza en lugar de construirlos; el único pasa a ser la PK
+        CrearIndice(INDICE_CLAVE_LEGADO, TABLA_AUDITORIA, 'id, "timestamp"', unico=True).ejecutar(self.engine, None)
+        for sufijo, columnas, metodo in INDICES_AUDITORIA:
+            CrearIndice(f"idx_audit_{sufijo}", TABLA_AUDITORIA, columnas, metodo=metodo).ejecutar(self.engine, None)
+
+        # 3. Intercambio bajo ACCESS EXCLUSIVE: solo catálogo (el CHECK validado evita el recorrido de ATTACH)
+        ejecutar_con_reintentos(self.engine, [
+            f"LOCK TABLE {TABLA_AUDITORIA} IN ACCESS EXCLUSIVE MODE",
+            f"ALTER TABLE {TABLA_AUDITORIA} RENAME TO {TABLA_LEGADO}",
+            # La PK (id) no es compatible con la de la tabla particionada: se sustituye por el índice ya creado
+            f"ALTER TABLE {TABLA_LEGADO} DROP CONSTRAINT audit_logs_pkey",
+            f"ALTER TABLE {TABLA_LEGADO} ADD CONSTRAINT audit_logs_legacy_pkey PRIMARY KEY USING INDEX {INDICE_CLAVE_LEGADO}",
+            "ALTER INDEX IF EXISTS idx_audit_timestamp RENAME TO idx_audit_legacy_timestamp",
+            *[
+                f"ALTER INDEX idx_audit_{sufijo} RENAME TO idx_audit_legacy_{sufijo}"
+                for sufijo, _, _ in INDICES_AUDITORIA
+            ],
+            f"""CREATE TABLE {TABLA_AUDITORIA} (
+                LIKE {TABLA_LEGADO} INCLUDING DEFAULTS INCLUDING COMMENTS,
+                PRIMARY KEY (id, "timestamp"),
+                FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+            ) PARTITION BY RANGE ("timestamp")""",
+            *[
+                f"CREATE INDEX idx_audit_{sufijo} ON {TABLA_AUDITORIA} {f'USING {metodo} ' if metodo else ''}({columnas})"
+                for sufijo, columnas, metodo in INDICES_AUDITORIA
+            ],
+            f"ALTER TABLE {TABLA_AUDITORIA} ATTACH PARTITION {TABLA_LEGADO} FOR VALUES FROM (MINVALUE) TO ('{corte}')",
+        ])
+
+        logger.info(f"audit_logs migrada a tabla particionada (histórico hasta {corte})")
+        self.asegurar_particiones()
+        return True
@@ -0,0 +1,168 @@
+"""
+Piezas comunes de las cachés
+
+- CacheLRU: LRU acotado en memoria por proceso, con vigencia por entrada
+- suscribir_cambios_clientes: invalidación tras confirmar escrituras de
+  clientes. Un único trío de listeners de Session (after_flush,
+  after_commit, after_rollback) recorre cada flush una sola vez, acumula en
+  session.info los clientes afectados por suscripción y, al confirmar,
+  entrega a cada suscripción sus ids. En un rollback se descartan.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+import logging
+import threading
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models.secure_models import Cliente
+
+logger = logging.getLogger(__name__)
+
+
+class CacheLRU:
+    """LRU acotado con vigencia por entrada, seguro entre hilos"""
+
+    def __init__(self, max_entradas: int, ttl_seconds: int):
+        self.max_entradas = max_entradas
+        self.ttl_seconds = ttl_seconds
+        self._entradas: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[1] < time.monotonic():
+                if entrada is not None:
+                    del self._entradas[clave]
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave: Hashable, valor: Any):
+        with self._lock:
+            self._entradas[clave] = (valor, time.monotonic() + self.ttl_seconds)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def eliminar(self, claves: Iterable[Hashable]):
+        with self._lock:
+            for clave in claves:
+                self._entradas.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entradas': len(self._entradas), 'aciertos': self.aciertos, 'fallos': self.fallos}
+
+
+# ----------------------------------------------------------------------
+# Invalidación al confirmar escrituras de clientes
+# ----------------------------------------------------------------------
+
+_PENDIENTES_KEY = 'clientes_modificados'
+
+
+class SuscripcionClientes:
+    """
+    Qué cambios de clientes interesan a una caché y qué hacer con ellos
+
+    Un cliente es afectado si se elimina, si se crea (con incluir_nuevos) o
+    si cambia alguno de `campos` (None: cualquier columna); también si se
+    escribe una fila de `modelos_hijos` (todos con cliente_id), incluido el
+    cliente anterior cuando la fila cambia de cliente.
+
+    `al_flush` corre dentro de la transacción con los ids de ese flush;
+    `al_confirmar` recibe los acumulados tras el commit.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        al_confirmar: Callable[[Set[str]], None],
+        campos: Optional[Tuple[str, ...]] = None,
+        modelos_hijos: Tuple[type, ...] = (),
+        incluir_nuevos: bool = True,
+        al_flush: Optional[Callable[[Session, Set[str]], None]] = None
+    ):
+        self.nombre = nombre
+        self.al_confirmar = al_confirmar
+        self.campos = campos
+        self.modelos_hijos = modelos_hijos
+        self.incluir_nuevos = incluir_nuevos
+        self.al_flush = al_flush
+
+    def afecta_cliente(self, session: Session, cliente: Cliente) -> bool:
+        if cliente in session.deleted:
+            return True
+        if cliente in session.new:
+            return self.incluir_nuevos
+        if self.campos is None:
+            return True
+        estado = inspect(cliente)
+        return any(estado.attrs[campo].history.has_changes() for campo in self.campos)
+
+
+_suscripciones: List[SuscripcionClientes] = []
+
+
+def suscribir_cambios_clientes(suscripcion: SuscripcionClientes) -> SuscripcionClientes:
+    """Registra una suscripción; las suscripciones se registran al importar cada servicio"""
+    _suscripciones.append(suscripcion)
+    return suscripcion
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_clientes_modificados(session, flush_context):
+    """Acumula, por suscripción, los clientes afectados por este flush"""
+    suscripciones = list(_suscripciones)
+    afectados: Dict[str, Set] = {s.nombre: set() for s in suscripciones}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        for suscripcion in suscripciones:
+            if isinstance(obj, Cliente):
+                if suscripcion.afecta_cliente(session, obj):
+                    afectados[suscripcion.nombre].add(obj.id)
+            elif isinstance(obj, suscripcion.modelos_hijos):
+                afectados[suscripcion.nombre].add(obj.cliente_id)
+                # Si la fila cambió de cliente, el anterior también queda afectado
+                afectados[suscripcion.nombre].update(inspect(obj).attrs.cliente_id.history.deleted or ())
+
+    for suscripcion in suscripciones:
+        ids = {str(i) for i in afectados[suscripcion.nombre] if i is not None}
+        if not ids:
+            continue
+        if suscripcion.al_flush is not None:
+            suscripcion.al_flush(session, ids)
+        session.info.setdefault(_PENDIENTES_KEY, {}).setdefault(suscripcion.nombre, set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _notificar_clientes_confirmados(session):
+    """Entrega a cada suscripción los clientes modificados en la transacción confirmada"""
+    pendientes = session.info.pop(_PENDIENTES_KEY, None)
+    if not pendientes:
+        return
+    for suscripcion in list(_suscripciones):
+        ids = pendientes.get(suscripcion.nombre)
+        if not ids:
+            continue
+        try:
+            suscripcion.al_confirmar(ids)
+        except Exception as e:
+            logger.warning(f"Error invalidando {suscripcion.nombre} de {len(ids)} clientes: {str(e)}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_clientes_modificados(session):
+    """Descarta los clientes acumulados de una transacción revertida"""
+    session.info.pop(_PENDIENTES_KEY, None)
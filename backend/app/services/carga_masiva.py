@@ -0,0 +1,185 @@
+"""
+Utilidades compartidas para cargas masivas (préstamos, pagos)
+
+Flujo común:
+1. Validar cada fila con su esquema y acumular errores por fila
+2. Resolver claves de idempotencia (repetidas en la solicitud o ya existentes)
+3. Insertar por lotes con ON CONFLICT DO NOTHING sobre la clave de idempotencia;
+   los registros dependientes (p. ej. cuotas) se generan en la misma transacción
+   del lote y, si el lote falla, se reintenta fila por fila
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+import logging
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+ESTADO_CREADO = 'CREADO'
+ESTADO_DUPLICADO = 'DUPLICADO'
+ESTADO_ERROR = 'ERROR'
+
+
+def resultado_error(indice: int, errores: List[str], clave: str = None) -> Dict[str, Any]:
+    """Resultado de una fila con errores"""
+    return {'indice': indice, 'estado': ESTADO_ERROR, 'id': None, 'clave_idempotencia': clave, 'errores': errores}
+
+
+def validar_items(
+    items: List[dict],
+    esquema: Type[BaseModel]
+) -> Tuple[List[Tuple[int, BaseModel]], Dict[int, Dict[str, Any]]]:
+    """Valida cada fila con el esquema; retorna filas válidas y resultados de error"""
+    validos = []
+    resultados = {}
+    for indice, item in enumerate(items):
+        try:
+            validos.append((indice, esquema(**item)))
+        except ValidationError as e:
+            errores = [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+            resultados[indice] = resultado_error(indice, errores, item.get('clave_idempotencia'))
+        except TypeError:
+            resultados[indice] = resultado_error(indice, ["La fila debe ser un objeto JSON"])
+    return validos, resultados
+
+
+def resolver_idempotencia(
+    db: Session,
+    modelo,
+    validos: List[Tuple[int, BaseModel]],
+    resultados: Dict[int, Dict[str, Any]]
+) -> List[Tuple[int, BaseModel]]:
+    """Descarta filas cuya clave ya existe (en BD o repetida en la solicitud)"""
+    claves = {item.clave_idempotencia for _, item in validos if item.clave_idempotencia}
+    existentes = {}
+    if claves:
+        existentes = {
+            clave: str(id_)
+            for id_, clave in db.query(modelo.id, modelo.clave_idempotencia).filter(
+                modelo.clave_idempotencia.in_(claves)
+            )
+        }
+
+    pendientes = []
+    vistas = set()
+    for indice, item in validos:
+        clave = item.clave_idempotencia
+        if clave and clave in existentes:
+            resultados[indice] = {
+                'indice': indice, 'estado': ESTADO_DUPLICADO, 'id': existentes[clave],
+                'clave_idempotencia': clave, 'errores': []
+            }
+        elif clave and clave in vistas:
+            resultados[indice] = resultado_error(indice, ["Clave de idempotencia repetida en la solicitud"], clave)
+        else:
+            if clave:
+                vistas.add(clave)
+            pendientes.append((indice, item))
+    return pendientes
+
+
+def insertar_en_lotes(
+    db: Session,
+    modelo,
+    filas: List[Tuple[int, Dict[str, Any]]],
+    resultados: Dict[int, Dict[str, Any]],
+    tamano_lote: int,
+    al_insertar: Optional[Callable[[List[Dict[str, Any]]], Any]] = None
+):
+    """
+    Inserta filas (mapeos con 'id' pregenerado) en lotes, confirmando cada lote
+
+    al_insertar recibe los mapeos efectivamente insertados y corre antes del
+    commit: si falla, ni el lote ni sus registros dependientes se confirman.
+    """
+    stmt = pg_insert(modelo).on_conflict_do_nothing(
+        index_elements=['clave_idempotencia']
+    ).returning(modelo.id)
+
+    for inicio in range(0, len(filas), tamano_lote):
+        lote = filas[inicio:inicio + tamano_lote]
+        try:
+            insertados = {str(r[0]) for r in db.execute(stmt, [m for _, m in lote])}
+            if al_insertar and insertados:
+                al_insertar([m for _, m in lote if str(m['id']) in insertados])
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            logger.warning(f"Lote de {modelo.__tablename__} rechazado, reintentando fila por fila: {str(e.orig)}")
+            insertados = _insertar_fila_por_fila(db, stmt, lote, resultados, al_insertar)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Error insertando lote de {modelo.__tablename__}: {str(e)}")
+            for indice, mapeo in lote:
+                resultados[indice] = resultado_error(indice, ["Error de base de datos"], mapeo.get('clave_idempotencia'))
+            continue
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Lote de {modelo.__tablename__} incompleto, reintentando fila por fila: {str(e)}")
+            insertados = _insertar_fila_por_fila(db, stmt, lote, resultados, al_insertar)
+
+        _registrar_resultados(db, modelo, lote, insertados, resultados)
+
+
+def _insertar_fila_por_fila(db: Session, stmt, lote, resultados, al_insertar=None) -> set:
+    insertados = set()
+    for indice, mapeo in lote:
+        try:
+            with db.begin_nested():
+                ids = {str(r[0]) for r in db.execute(stmt, [mapeo])}
+                if al_insertar and ids:
+                    al_insertar([mapeo])
+            insertados |= ids
+        except IntegrityError as e:
+            resultados[indice] = resultado_error(
+                indice, [f"Violación de integridad: {str(e.orig).splitlines()[0]}"], mapeo.get('clave_idempotencia')
+            )
+        except Exception as e:
+            logger.error(f"Error completando fila {indice} de la carga: {str(e)}")
+            resultados[indice] = resultado_error(
+                indice, ["Error generando los registros asociados"], mapeo.get('clave_idempotencia')
+            )
+    db.commit()
+    return insertados
+
+
+def _registrar_resultados(db: Session, modelo, lote, insertados: set, resultados):
+    """Marca creados; las filas omitidas por conflicto concurrente quedan como duplicadas"""
+    omitidas = {}
+    for indice, mapeo in lote:
+        if indice in resultados:
+            continue
+        id_ = str(mapeo['id'])
+        clave = mapeo.get('clave_idempotencia')
+        if id_ in insertados:
+            resultados[indice] = {
+                'indice': indice, 'estado': ESTADO_CREADO, 'id': id_,
+                'clave_idempotencia': clave, 'errores': []
+            }
+        else:
+            omitidas[clave] = indice
+
+    if omitidas:
+        for id_, clave in db.query(modelo.id, modelo.clave_idempotencia).filter(
+            modelo.clave_idempotencia.in_(list(omitidas))
+        ):
+            indice = omitidas[clave]
+            resultados[indice] = {
+                'indice': indice, 'estado': ESTADO_DUPLICADO, 'id': str(id_),
+                'clave_idempotencia': clave, 'errores': []
+            }
+
+
+def resumir(total: int, resultados: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    """Construye el resumen de la carga en el orden de la solicitud"""
+    filas = [resultados[i] for i in sorted(resultados)]
+    return {
+        'total': total,
+        'creados': sum(1 for r in filas if r['estado'] == ESTADO_CREADO),
+        'duplicados': sum(1 for r in filas if r['estado'] == ESTADO_DUPLICADO),
+        'errores': sum(1 for r in filas if r['estado'] == ESTADO_ERROR),
+        'resultados': filas
+    }
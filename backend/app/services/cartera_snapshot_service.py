@@ -0,0 +1,207 @@
+"""
+Fotografías diarias de antigüedad de la cartera
+
+Un proceso nocturno escribe dos tablas a partir de prestamos y cuotas:
+
+- cartera_antiguedad_diaria: acumulado por fecha, sucursal, tipo de
+  préstamo, tipo de descuento y tramo de mora (AL_DIA ... MORA_CRITICA).
+  Alimenta los gráficos de tendencia y se conserva indefinidamente.
+- cartera_mora_diaria: una fila por préstamo en mora y día, con los campos
+  del listado de mora. Se conserva CARTERA_SNAPSHOT_DETALLE_DIAS días.
+
+Los reportes leen solo estas tablas; nunca recorren la tabla viva de
+préstamos. Regenerar una fecha reemplaza sus filas (idempotente).
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+import time
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.secure_models import CarteraAntiguedadDiaria, CarteraMoraDiaria
+from app.services.cuota_service import TRAMOS_MORA
+
+logger = logging.getLogger(__name__)
+
+# Dimensiones por las que se pueden agrupar las tendencias
+DIMENSIONES_TENDENCIA = ('sucursal_id', 'tipo_prestamo', 'tipo_descuento_directo')
+
+
+def _sql_tramo(columna_dias: str) -> str:
+    """CASE SQL con los mismos umbrales que Prestamo.estado_mora"""
+    ramas = []
+    for nombre, _, hasta in TRAMOS_MORA:
+        if hasta is not None:
+            ramas.append(f"WHEN {columna_dias} <= {hasta} THEN '{nombre}'")
+    return f"CASE {' '.join(ramas)} ELSE '{TRAMOS_MORA[-1][0]}' END"
+
+
+# Mora por préstamo a la fecha de corte: días desde la cuota impaga más
+# antigua y saldo de las cuotas vencidas (idx_cuota_estado_vencimiento)
+SQL_BASE = """
+    WITH vencidas AS (
+        SELECT c.prestamo_id,
+               SUM(c.monto_cuota - c.monto_pagado) AS saldo_vencido,
+               COUNT(*) AS cuotas_vencidas
+        FROM cuotas c
+        WHERE c.estado <> 'PAGADA' AND c.fecha_vencimiento < :fecha_corte
+        GROUP BY c.prestamo_id
+    ),
+    base AS (
+        SELECT p.id, p.numero_prestamo, p.cliente_id, p.sucursal_id,
+               p.tipo_prestamo::text AS tipo_prestamo,
+               COALESCE(p.tipo_descuento_directo::text, 'SIN_DESCUENTO') AS tipo_descuento_directo,
+               p.modalidad_pago::text AS modalidad_pago,
+               p.estado::text AS estado,
+               p.monto, p.monto_total - p.monto_pagado AS saldo_pendiente, p.cuota_mensual,
+               p.fecha_vencimiento, p.descuento_autorizado, p.created_at,
+               GREATEST(COALESCE(:fecha_corte - p.fecha_primera_cuota_impaga, 0), 0) AS dias_mora,
+               COALESCE(v.saldo_vencido, 0) AS saldo_vencido,
+               COALESCE(v.cuotas_vencidas, 0) AS cuotas_vencidas
+        FROM prestamos p
+        LEFT JOIN vencidas v ON v.prestamo_id = p.id
+        WHERE p.estado IN ('DESEMBOLSADO', 'VIGENTE', 'MORA')
+    )
+"""
+
+SQL_ACUMULADO = SQL_BASE + f"""
+    INSERT INTO cartera_antiguedad_diaria
+        (fecha_corte, sucursal_id, tipo_prestamo, tipo_descuento_directo, tramo,
+         prestamos, monto, saldo_pendiente, saldo_vencido)
+    SELECT :fecha_corte, sucursal_id, tipo_prestamo, tipo_descuento_directo,
+           {_sql_tramo('dias_mora')},
+           COUNT(*), SUM(monto), SUM(saldo_pendiente), SUM(saldo_vencido)
+    FROM base
+    GROUP BY sucursal_id, tipo_prestamo, tipo_descuento_directo, {_sql_tramo('dias_mora')}
+"""
+
+SQL_DETALLE_MORA = SQL_BASE + f"""
+    INSERT INTO cartera_mora_diaria
+        (fecha_corte, prestamo_id, numero_prestamo, cliente_id, sucursal_id,
+         tipo_prestamo, tipo_descuento_directo, modalidad_pago, estado,
+         monto, saldo_pendiente, saldo_vencido, cuotas_vencidas, cuota_mensual,
+         fecha_vencimiento, dias_mora, tramo, descuento_autorizado, prestamo_creado_en)
+    SELECT :fecha_corte, id, numero_prestamo, cliente_id, sucursal_id,
+           tipo_prestamo, NULLIF(tipo_descuento_directo, 'SIN_DESCUENTO'), modalidad_pago, estado,
+           monto, saldo_pendiente, saldo_vencido, cuotas_vencidas, cuota_mensual,
+           fecha_vencimiento, dias_mora, {_sql_tramo('dias_mora')}, descuento_autorizado, created_at
+    FROM base
+    WHERE dias_mora > 0
+"""
+
+
+class CarteraSnapshotService:
+    """Generación y consulta de las fotografías diarias de cartera"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def generar(self, fecha_corte: Optional[date] = None) -> Dict[str, Any]:
+        """Genera (o regenera) las fotografías de una fecha de corte en una transacción"""
+        fecha_corte = fecha_corte or date.today()
+        inicio = time.monotonic()
+        parametros = {'fecha_corte': fecha_corte}
+        try:
+            self.db.execute(text("DELETE FROM cartera_antiguedad_diaria WHERE fecha_corte = :fecha_corte"), parametros)
+            self.db.execute(text("DELETE FROM cartera_mora_diaria WHERE fecha_corte = :fecha_corte"), parametros)
+            acumulados = self.db.execute(text(SQL_ACUMULADO), parametros).rowcount
+            en_mora = self.db.execute(text(SQL_DETALLE_MORA), parametros).rowcount
+
+            # Retención del detalle por préstamo
+            limite = fecha_corte - timedelta(days=settings.CARTERA_SNAPSHOT_DETALLE_DIAS)
+            depurados = self.db.execute(
+                text("DELETE FROM cartera_mora_diaria WHERE fecha_corte < :limite"), {'limite': limite}
+            ).rowcount
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        resumen = {
+            'fecha_corte': fecha_corte.isoformat(),
+            'filas_acumuladas': acumulados,
+            'prestamos_en_mora': en_mora,
+            'detalle_depurado': depurados,
+            'duracion_segundos': round(time.monotonic() - inicio, 3),
+        }
+        logger.info(f"Fotografía de cartera generada: {resumen}")
+        return resumen
+
+    def ultima_fecha_corte(self) -> Optional[date]:
+        """
+        Fecha de la fotografía más reciente
+
+        Se toma del acumulado, que tiene filas cada día aunque ningún préstamo
+        esté en mora (el detalle quedaría vacío y apuntaría a un día anterior).
+        """
+        return self.db.query(func.max(CarteraAntiguedadDiaria.fecha_corte)).scalar()
+
+    def prestamos_en_mora(
+        self,
+        dias_minimos: int = 1,
+        sucursal_id: Optional[str] = None,
+        fecha_corte: Optional[date] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[CarteraMoraDiaria]:
+        """Listado de mora de la fotografía indicada (por defecto la más reciente)"""
+        fecha_corte = fecha_corte or self.ultima_fecha_corte()
+        if not fecha_corte:
+            return []
+        query = self.db.query(CarteraMoraDiaria).filter(
+            CarteraMoraDiaria.fecha_corte == fecha_corte,
+            CarteraMoraDiaria.dias_mora >= dias_minimos
+        )
+        if sucursal_id:
+            query = query.filter(CarteraMoraDiaria.sucursal_id == sucursal_id)
+        return query.order_by(CarteraMoraDiaria.dias_mora.desc()).offset(skip).limit(limit).all()
+
+    def tendencia(
+        self,
+        desde: date,
+        hasta: date,
+        agrupar_por: Optional[str] = None,
+        sucursal_id: Optional[str] = None,
+        tipo_prestamo: Optional[str] = None,
+        tipo_descuento_directo: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Serie diaria por tramo de mora, opcionalmente desglosada por una dimensión
+        """
+        if agrupar_por and agrupar_por not in DIMENSIONES_TENDENCIA:
+            raise ValueError(f"Dimensión no soportada: {agrupar_por}")
+
+        columnas = [CarteraAntiguedadDiaria.fecha_corte, CarteraAntiguedadDiaria.tramo]
+        if agrupar_por:
+            columnas.append(getattr(CarteraAntiguedadDiaria, agrupar_por))
+
+        query = self.db.query(
+            *columnas,
+            func.sum(CarteraAntiguedadDiaria.prestamos).label('prestamos'),
+            func.sum(CarteraAntiguedadDiaria.saldo_pendiente).label('saldo_pendiente'),
+            func.sum(CarteraAntiguedadDiaria.saldo_vencido).label('saldo_vencido'),
+        ).filter(
+            CarteraAntiguedadDiaria.fecha_corte.between(desde, hasta)
+        )
+        if sucursal_id:
+            query = query.filter(CarteraAntiguedadDiaria.sucursal_id == sucursal_id)
+        if tipo_prestamo:
+            query = query.filter(CarteraAntiguedadDiaria.tipo_prestamo == tipo_prestamo)
+        if tipo_descuento_directo:
+            query = query.filter(CarteraAntiguedadDiaria.tipo_descuento_directo == tipo_descuento_directo)
+
+        filas = query.group_by(*columnas).order_by(*columnas).all()
+        return [
+            {
+                'fecha_corte': fila.fecha_corte,
+                'tramo': fila.tramo,
+                'grupo': str(getattr(fila, agrupar_por)) if agrupar_por else None,
+                'prestamos': int(fila.prestamos),
+                'saldo_pendiente': fila.saldo_pendiente,
+                'saldo_vencido': fila.saldo_vencido,
+            }
+            for fila in filas
+        ]
@@ -51,6 +51,7 @@ celery_app.conf.update(
         "app.services.celery_tasks.index_for_search": {"queue": "search_indexing"},
         "app.services.celery_tasks.backup_data": {"queue": "backup_tasks"},
         "app.services.celery_tasks.cleanup_old_data": {"queue": "maintenance"},
+        "app.services.celery_tasks.maintain_audit_partitions": {"queue": "maintenance"},
         "app.services.celery_tasks.generate_reports": {"queue": "reports"},
     },
     
@@ -76,6 +77,12 @@ celery_app.conf.update(
             "schedule": crontab(hour=2, minute=0),  # 2:00 AM diario
         },
         
+        # Particiones futuras de audit_logs
+        "maintain-audit-partitions": {
+            "task": "app.services.celery_tasks.maintain_audit_partitions",
+            "schedule": crontab(hour=1, minute=30),  # 1:30 AM diario
+        },
+        
         # Respaldo semanal
         "weekly-backup": {
             "task": "app.services.celery_tasks.backup_data",
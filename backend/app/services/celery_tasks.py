@@ -5,7 +5,7 @@ Incluye procesamiento de documentos, notificaciones, respaldos y mantenimiento
 
 import os
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, Any, List
 import structlog
 from celery import current_task
@@ -245,10 +245,8 @@ def cleanup_old_data(self):
     try:
         logger.info("Iniciando limpieza de datos antiguos")
         
-        cleanup_date = datetime.utcnow() - timedelta(days=settings.DATA_RETENTION_DAYS)
-        
-        # Limpiar logs de auditoría antiguos
-        audit_cleanup_result = _cleanup_old_audit_logs(cleanup_date)
+        # Limpiar logs de auditoría antiguos (eliminando particiones completas)
+        audit_cleanup_result = _cleanup_old_audit_logs(settings.AUDIT_LOG_RETENTION_DAYS)
         
         # Limpiar sesiones expiradas
         session_cleanup_result = _cleanup_expired_sessions()
@@ -265,11 +263,11 @@ def cleanup_old_data(self):
         
         # Log de auditoría
         log_audit_event(
-            action="data_cleanup",
-            resource_type="system",
-            resource_id="maintenance",
+            event_type="data_cleanup",
+            user_id="system",
             details={
                 **result,
+                "audit_partitions_removed": audit_cleanup_result.get("particiones", []),
                 "task_id": self.request.id
             }
         )
@@ -282,6 +280,23 @@ def cleanup_old_data(self):
         logger.error("Error en limpieza de datos", error=str(e))
         return {"success": False, "error": str(e)}
 
+@celery_app.task(bind=True, max_retries=3)
+def maintain_audit_partitions(self):
+    """Crear por adelantado las particiones mensuales de audit_logs"""
+    try:
+        from app.core.database import engine
+        from app.services.audit_partition_service import AuditPartitionService
+        
+        creadas = AuditPartitionService(engine).asegurar_particiones()
+        logger.info("Particiones de auditoría verificadas", created=creadas)
+        return {"success": True, "created": creadas}
+        
+    except Exception as e:
+        logger.error("Error creando particiones de auditoría", error=str(e))
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=300, exc=e)
+        return {"success": False, "error": str(e)}
+
 @celery_app.task(bind=True)
 def generate_daily_metrics(self):
     """Generar métricas diarias del sistema"""
@@ -487,9 +502,12 @@ def _backup_uploaded_files(timestamp: str) -> Dict[str, Any]:
     """Simular respaldo de archivos"""
     return {"success": True, "files_backed_up": 245}
 
-def _cleanup_old_audit_logs(cleanup_date: datetime) -> Dict[str, Any]:
-    """Simular limpieza de logs de auditoría"""
-    return {"success": True, "count": 1250}
+def _cleanup_old_audit_logs(retention_days: int) -> Dict[str, Any]:
+    """Eliminar particiones mensuales de auditoría fuera del período de retención"""
+    from app.core.database import engine
+    from app.services.audit_partition_service import AuditPartitionService
+    
+    return AuditPartitionService(engine).aplicar_retencion(retention_days)
 
 def _cleanup_expired_sessions() -> Dict[str, Any]:
     """Simular limpieza de sesiones"""
@@ -0,0 +1,307 @@
+"""
+Vista integral (360) de clientes
+
+El expediente del cliente reúne catorce relaciones con decenas de columnas
+encriptadas. Cargarlo relación por relación y desencriptar atributo por
+atributo multiplica las consultas y las llamadas a Fernet, y cada vista
+derivada (email principal, vigencia, exposición política, documentación)
+volvía a recorrer las colecciones.
+
+- Una consulta por relación con selectinload (número de consultas acotado)
+- Todas las columnas encriptadas del expediente se desencriptan en un solo
+  bloque en el pool de procesos de exportación
+- Las vistas derivadas se calculan una vez sobre los datos ya desencriptados
+- Caché opcional en Redis (encriptada) con vigencia corta, invalidada al
+  confirmar cualquier escritura del cliente o de sus tablas hijas
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+import redis
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.core.security import data_encryption
+from app.models.secure_models import (
+    Cliente, ClienteCoincidenciaLista, ClienteConversacion, ClienteCuentaBancaria, ClienteDireccion,
+    ClienteEmail, ClienteHistorial, ClienteObligacion, ClientePropiedad, ClienteReferencia,
+    ClienteSolicitud, ClienteTelefono, ClienteTrabajo, ClienteVehiculo, Documento, Prestamo
+)
+from app.schemas.cliente_schemas import (
+    Cliente360Response, Cliente360Resumen, CompletitudDocumental, ExposicionPolitica,
+    VigenciaIdentificacion
+)
+from app.services.cache_comun import SuscripcionClientes, suscribir_cambios_clientes
+from app.services.export_service import desencriptar_bloque
+from app.services.perfil_financiero_service import PerfilFinancieroService
+
+logger = logging.getLogger(__name__)
+
+# Relaciones del expediente, en el orden de la respuesta
+RELACIONES_360 = (
+    'direcciones', 'emails', 'telefonos', 'trabajos', 'referencias', 'vehiculos', 'propiedades',
+    'cuentas_bancarias', 'obligaciones', 'historial', 'conversaciones', 'solicitudes', 'prestamos',
+    'documentos', 'coincidencias_listas',
+)
+
+# Modelos cuyo cambio invalida la vista del cliente (todos tienen cliente_id)
+MODELOS_HIJOS = (
+    ClienteDireccion, ClienteEmail, ClienteTelefono, ClienteTrabajo, ClienteReferencia,
+    ClienteVehiculo, ClientePropiedad, ClienteCuentaBancaria, ClienteObligacion, ClienteHistorial,
+    ClienteConversacion, ClienteSolicitud, Prestamo, Documento, ClienteCoincidenciaLista,
+)
+
+# Columnas que no se exponen en la vista (rutas internas, hashes, metadatos)
+COLUMNAS_EXCLUIDAS = {
+    Documento: {'_ruta_fisica', '_metadata_json', 'file_hash', 'checksum_md5'},
+    Prestamo: {'cedula_empleado_hash'},
+}
+
+ESTADOS_PRESTAMO_ACTIVO = ('DESEMBOLSADO', 'VIGENTE', 'MORA')
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+
+def _parsear_fecha(valor: Optional[str]) -> Optional[date]:
+    """Fecha desencriptada en cualquiera de los formatos aceptados por el modelo"""
+    if not valor:
+        return None
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def _principal(filas: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    return next((f for f in filas if f.get('es_principal')), None)
+
+
+class _Serializador:
+    """Convierte instancias en diccionarios y desencripta todo el expediente en un bloque"""
+
+    def __init__(self):
+        self._pendientes: List[Tuple[Dict[str, Any], str, str]] = []
+
+    def agregar(self, obj) -> Dict[str, Any]:
+        excluidas = COLUMNAS_EXCLUIDAS.get(type(obj), ())
+        fila: Dict[str, Any] = {}
+        for columna in inspect(obj).mapper.column_attrs:
+            clave = columna.key
+            if clave in excluidas:
+                continue
+            valor = getattr(obj, clave)
+            if clave.startswith('_'):
+                # Columna encriptada: se expone con su nombre público
+                nombre = clave[1:]
+                fila[nombre] = valor
+                if valor:
+                    self._pendientes.append((fila, nombre, valor))
+            else:
+                fila[clave] = valor
+        return fila
+
+    def desencriptar(self):
+        """Una sola pasada de desencriptación para todas las filas agregadas"""
+        if not self._pendientes:
+            return
+        valores = desencriptar_bloque([(p[2],) for p in self._pendientes], (0,))
+        for (fila, nombre, _), (valor,) in zip(self._pendientes, valores):
+            fila[nombre] = valor
+        self._pendientes = []
+
+
+class Cliente360Service:
+    """Expediente integral del cliente con carga por lotes y caché corta"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def obtener(self, cliente_id, usar_cache: bool = True) -> Optional[Cliente360Response]:
+        """Vista 360 del cliente (None si no existe)"""
+        usar_cache = usar_cache and settings.CLIENTE_360_CACHE_TTL_SECONDS > 0
+        if usar_cache:
+            vista = cliente_360_cache.obtener(cliente_id)
+            if vista is not None:
+                return vista
+
+        cliente = self._cargar(cliente_id)
+        if cliente is None:
+            return None
+        vista = self._construir(cliente)
+        if usar_cache:
+            cliente_360_cache.guardar(cliente_id, vista)
+        return vista
+
+    def _cargar(self, cliente_id) -> Optional[Cliente]:
+        """Cliente y todas sus relaciones: una consulta por relación"""
+        limite = datetime.utcnow() - timedelta(days=settings.CLIENTE_360_DIAS_HISTORIAL)
+        query = self.db.query(Cliente).options(
+            *[selectinload(getattr(Cliente, r)) for r in RELACIONES_360 if r not in ('historial', 'conversaciones')],
+            selectinload(Cliente.historial.and_(ClienteHistorial.fecha_evento >= limite)),
+            selectinload(Cliente.conversaciones.and_(ClienteConversacion.fecha_inicio >= limite)),
+        ).filter(Cliente.id == cliente_id)
+        return query.populate_existing().first()
+
+    def _construir(self, cliente: Cliente) -> Cliente360Response:
+        serializador = _Serializador()
+        datos_cliente = serializador.agregar(cliente)
+        relaciones = {
+            relacion: [serializador.agregar(obj) for obj in getattr(cliente, relacion)]
+            for relacion in RELACIONES_360
+        }
+        serializador.desencriptar()
+
+        perfil = PerfilFinancieroService(self.db).obtener(cliente.id)
+        return Cliente360Response(
+            cliente=datos_cliente,
+            resumen=self._resumen(cliente, datos_cliente, relaciones),
+            perfil_financiero=(
+                {c.key: getattr(perfil, c.key) for c in inspect(perfil).mapper.column_attrs}
+                if perfil is not None else None
+            ),
+            generado_en=datetime.utcnow(),
+            **relaciones
+        )
+
+    @staticmethod
+    def _resumen(cliente: Cliente, datos: Dict[str, Any], relaciones: Dict[str, List[Dict[str, Any]]]) -> Cliente360Resumen:
+        """Vistas derivadas calculadas una sola vez sobre los datos desencriptados"""
+        hoy = date.today()
+        email = _principal(relaciones['emails'])
+        telefono = _principal(relaciones['telefonos'])
+        trabajo_actual = next((t for t in relaciones['trabajos'] if t.get('es_actual')), None)
+
+        vencimiento_cedula = _parsear_fecha(datos.get('fecha_vencimiento_cedula'))
+        vencimiento_pasaporte = _parsear_fecha(datos.get('fecha_vencimiento_pasaporte'))
+
+        # Las propiedades PEP del modelo solo leen columnas no encriptadas de los trabajos
+        exposicion = ExposicionPolitica(
+            es_pep=cliente.es_pep,
+            es_familiar_pep=cliente.es_familiar_pep,
+            es_asociado_pep=cliente.es_asociado_pep,
+            es_gobierno=cliente.es_gobierno,
+            nivel=cliente.nivel_exposicion_politica_cliente,
+            requiere_due_diligence_reforzada=cliente.requiere_due_diligence_reforzada,
+            en_lista_sanciones=cliente.en_lista_sanciones,
+            descripcion=cliente.descripcion_exposicion_politica,
+        )
+
+        documentos = [d for d in cliente.documentos if d.es_version_actual]
+        verificados = sum(1 for d in documentos if d.esta_verificado)
+        tipos_verificados = {d.tipo_documento for d in documentos if d.esta_verificado}
+        documentacion = CompletitudDocumental(
+            total=len(documentos),
+            verificados=verificados,
+            pendientes=sum(1 for d in documentos if d.estado == 'PENDIENTE'),
+            vencidos=sum(1 for d in documentos if d.esta_vencido),
+            obligatorios_faltantes=sorted({
+                d.tipo_documento for d in documentos
+                if d.es_obligatorio and d.tipo_documento not in tipos_verificados
+            }),
+            porcentaje_completo=int(verificados * 100 / len(documentos)) if documentos else 0,
+        )
+
+        prestamos_activos = [p for p in cliente.prestamos if p.estado in ESTADOS_PRESTAMO_ACTIVO]
+        historial = relaciones['historial']
+        return Cliente360Resumen(
+            nombre_completo=" ".join(
+                datos.get(c) for c in ('nombre', 'segundo_nombre', 'apellido_paterno', 'apellido_materno')
+                if datos.get(c)
+            ),
+            email_principal=email['email'] if email else None,
+            telefono_principal=telefono['numero'] if telefono else None,
+            direccion_principal=_principal(relaciones['direcciones']),
+            trabajo_actual=trabajo_actual,
+            vigencia=VigenciaIdentificacion(
+                cedula_vigente=hoy <= vencimiento_cedula if vencimiento_cedula else None,
+                pasaporte_vigente=hoy <= vencimiento_pasaporte if vencimiento_pasaporte else None,
+                dias_para_vencimiento_cedula=(vencimiento_cedula - hoy).days if vencimiento_cedula else None,
+            ),
+            exposicion_politica=exposicion,
+            documentacion=documentacion,
+            prestamos_activos=len(prestamos_activos),
+            saldo_prestamos=sum(
+                (p.monto_total - p.monto_pagado for p in prestamos_activos), Decimal('0')
+            ),
+            solicitudes_activas=sum(1 for s in cliente.solicitudes if not s.esta_completada),
+            ultima_interaccion=max((h['fecha_evento'] for h in historial), default=None),
+        )
+
+
+class Cliente360Cache:
+    """Caché en Redis de vistas 360, encriptada en reposo y con vigencia corta"""
+
+    def __init__(self, prefijo: str = settings.CLIENTE_360_CACHE_REDIS_PREFIX):
+        self.prefijo = prefijo
+        self._redis = None
+
+    @property
+    def redis_client(self) -> Optional[redis.Redis]:
+        """Cliente Redis perezoso; None si no está disponible"""
+        if self._redis is None:
+            try:
+                self._redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            except Exception as e:
+                logger.warning(f"Redis no disponible para caché de vistas 360: {str(e)}")
+                return None
+        return self._redis
+
+    def _clave(self, cliente_id) -> str:
+        return f"{self.prefijo}{cliente_id}"
+
+    def obtener(self, cliente_id) -> Optional[Cliente360Response]:
+        client = self.redis_client
+        if client is None:
+            return None
+        try:
+            cifrado = client.get(self._clave(cliente_id))
+            if cifrado is None:
+                return None
+            vista = Cliente360Response.model_validate_json(data_encryption.decrypt(cifrado))
+        except Exception as e:
+            logger.warning(f"Error leyendo vista 360 desde Redis: {str(e)}")
+            return None
+        vista.desde_cache = True
+        return vista
+
+    def guardar(self, cliente_id, vista: Cliente360Response):
+        client = self.redis_client
+        if client is None:
+            return
+        try:
+            client.setex(
+                self._clave(cliente_id),
+                settings.CLIENTE_360_CACHE_TTL_SECONDS,
+                data_encryption.encrypt(vista.model_dump_json())
+            )
+        except Exception as e:
+            logger.warning(f"Error guardando vista 360 en Redis: {str(e)}")
+
+    def invalidar(self, cliente_ids: Iterable):
+        claves = [self._clave(c) for c in cliente_ids if c is not None]
+        client = self.redis_client
+        if not claves or client is None:
+            return
+        try:
+            client.delete(*claves)
+        except Exception as e:
+            logger.warning(f"Error invalidando vistas 360 en Redis: {str(e)}")
+
+
+# Instancia global de la caché
+cliente_360_cache = Cliente360Cache()
+
+
+# ----------------------------------------------------------------------
+# Invalidación al confirmar escrituras del cliente o de sus tablas hijas
+# ----------------------------------------------------------------------
+
+suscribir_cambios_clientes(SuscripcionClientes(
+    'vistas 360',
+    al_confirmar=cliente_360_cache.invalidar,
+    modelos_hijos=MODELOS_HIJOS,
+))
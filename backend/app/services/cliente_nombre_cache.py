@@ -0,0 +1,231 @@
+"""
+Caché de nombres para mostrar de clientes
+
+Mantiene una proyección desnormalizada del nombre completo de cada cliente
+para evitar desencriptar nombre, segundo nombre y apellidos en cada pantalla
+(listados de préstamos, agenda, alertas SLA, dashboard de cobranza).
+
+Dos niveles:
+- LRU acotado en memoria por proceso (con vigencia corta)
+- Una clave de Redis por cliente, con el valor encriptado en reposo y
+  vencimiento: Redis solo conserva los nombres consultados recientemente y
+  una invalidación perdida se corrige sola al vencer la clave
+
+La invalidación se realiza al confirmar (commit) una sesión que modificó
+alguno de los campos del nombre de un cliente. Además de borrar las claves,
+incrementa una versión en Redis: cada proceso (API y workers) la compara
+antes de confiar en su LRU y lo vacía si cambió, de modo que ningún proceso
+sirve un nombre viejo hasta que venza la vigencia local.
+"""
+from typing import Dict, Iterable, List, Optional
+import logging
+
+import redis
+from sqlalchemy.orm import Session, load_only
+
+from app.core.config import settings
+from app.core.security import data_encryption
+from app.models.secure_models import Cliente
+from app.services.cache_comun import CacheLRU, SuscripcionClientes, suscribir_cambios_clientes
+
+logger = logging.getLogger(__name__)
+
+# Columnas encriptadas que componen el nombre para mostrar
+CAMPOS_NOMBRE_CLIENTE = ('_nombre', '_segundo_nombre', '_apellido_paterno', '_apellido_materno')
+
+
+def _desencriptar(valor: Optional[str]) -> Optional[str]:
+    """Desencripta un valor, retornando el original si no está encriptado"""
+    if not valor:
+        return valor
+    try:
+        return data_encryption.decrypt(valor)
+    except Exception:
+        return valor
+
+
+def componer_nombre_cliente(cliente: Cliente) -> str:
+    """Construye el nombre completo a partir de las columnas encriptadas"""
+    partes = [_desencriptar(getattr(cliente, campo)) for campo in CAMPOS_NOMBRE_CLIENTE]
+    return " ".join(p for p in partes if p)
+
+
+class ClienteNombreCache:
+    """Caché LRU de dos niveles para nombres de clientes"""
+
+    def __init__(
+        self,
+        max_size: int = settings.CLIENTE_NOMBRE_CACHE_SIZE,
+        ttl_seconds: int = settings.CLIENTE_NOMBRE_CACHE_TTL_SECONDS,
+        redis_ttl_seconds: int = settings.CLIENTE_NOMBRE_CACHE_REDIS_TTL_SECONDS,
+        prefijo: str = settings.CLIENTE_NOMBRE_CACHE_REDIS_PREFIX
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self.prefijo = prefijo
+        self.version_key = f"{prefijo}version"
+        self._local = CacheLRU(max_size, ttl_seconds)
+        self._redis = None
+        self._version: Optional[int] = None
+
+    @property
+    def redis_client(self) -> Optional[redis.Redis]:
+        """Cliente Redis perezoso; None si no está disponible"""
+        if self._redis is None:
+            try:
+                self._redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            except Exception as e:
+                logger.warning(f"Redis no disponible para caché de nombres: {str(e)}")
+                return None
+        return self._redis
+
+    def _clave(self, cliente_id: str) -> str:
+        return f"{self.prefijo}{cliente_id}"
+
+    # ------------------------------------------------------------------
+    # Nivel local (LRU)
+    # ------------------------------------------------------------------
+
+    def _sincronizar_version(self):
+        """Vacía el LRU si otro proceso invalidó nombres desde la última lectura"""
+        client = self.redis_client
+        if client is None:
+            return
+        try:
+            version = int(client.get(self.version_key) or 0)
+        except Exception as e:
+            logger.warning(f"Error leyendo versión de nombres desde Redis: {str(e)}")
+            return
+        if self._version is not None and version != self._version:
+            self._local.limpiar()
+        self._version = version
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def obtener(self, db: Session, cliente_id) -> Optional[str]:
+        """Obtiene el nombre para mostrar de un cliente"""
+        if cliente_id is None:
+            return None
+        return self.obtener_varios(db, [cliente_id]).get(str(cliente_id))
+
+    def obtener_varios(self, db: Session, cliente_ids: Iterable) -> Dict[str, str]:
+        """Obtiene los nombres de varios clientes con una consulta por nivel"""
+        ids = list(dict.fromkeys(str(c) for c in cliente_ids if c is not None))
+        resultado: Dict[str, str] = {}
+        faltantes: List[str] = []
+        if not ids:
+            return resultado
+
+        self._sincronizar_version()
+
+        for cliente_id in ids:
+            nombre = self._local.obtener(cliente_id)
+            if nombre is None:
+                faltantes.append(cliente_id)
+            else:
+                resultado[cliente_id] = nombre
+
+        if faltantes:
+            faltantes = self._cargar_desde_redis(faltantes, resultado)
+
+        if faltantes:
+            self._cargar_desde_db(db, faltantes, resultado)
+
+        return resultado
+
+    def nombre_de(self, db: Session, cliente: Optional[Cliente], default: str = "N/A") -> str:
+        """Nombre para mostrar de una instancia de cliente ya cargada"""
+        if cliente is None:
+            return default
+        return self.obtener(db, cliente.id) or default
+
+    def invalidar(self, cliente_ids: Iterable):
+        """Invalida las entradas de los clientes indicados en todos los procesos"""
+        ids = [str(c) for c in cliente_ids if c is not None]
+        if not ids:
+            return
+        self._local.eliminar(ids)
+        client = self.redis_client
+        if client is not None:
+            try:
+                with client.pipeline() as pipe:
+                    pipe.delete(*[self._clave(c) for c in ids])
+                    pipe.incr(self.version_key)
+                    pipe.execute()
+            except Exception as e:
+                logger.warning(f"Error invalidando nombres en Redis: {str(e)}")
+
+    def limpiar(self):
+        """Vacía la caché local (la compartida en Redis se conserva)"""
+        self._local.limpiar()
+
+    # ------------------------------------------------------------------
+    # Carga desde niveles inferiores
+    # ------------------------------------------------------------------
+
+    def _cargar_desde_redis(self, ids: List[str], resultado: Dict[str, str]) -> List[str]:
+        client = self.redis_client
+        if client is None:
+            return ids
+        try:
+            valores = client.mget([self._clave(c) for c in ids])
+        except Exception as e:
+            logger.warning(f"Error leyendo nombres desde Redis: {str(e)}")
+            return ids
+
+        faltantes = []
+        for cliente_id, cifrado in zip(ids, valores):
+            if cifrado is None:
+                faltantes.append(cliente_id)
+                continue
+            try:
+                nombre = data_encryption.decrypt(cifrado)
+            except Exception:
+                faltantes.append(cliente_id)
+                continue
+            resultado[cliente_id] = nombre
+            self._local.guardar(cliente_id, nombre)
+        return faltantes
+
+    def _cargar_desde_db(self, db: Session, ids: List[str], resultado: Dict[str, str]):
+        clientes = db.query(Cliente).options(
+            load_only(Cliente.id, *[getattr(Cliente, campo) for campo in CAMPOS_NOMBRE_CLIENTE])
+        ).filter(Cliente.id.in_(ids)).all()
+
+        nuevos = {}
+        for cliente in clientes:
+            cliente_id = str(cliente.id)
+            nombre = componer_nombre_cliente(cliente)
+            resultado[cliente_id] = nombre
+            nuevos[cliente_id] = data_encryption.encrypt(nombre)
+            self._local.guardar(cliente_id, nombre)
+
+        client = self.redis_client
+        if nuevos and client is not None:
+            try:
+                with client.pipeline(transaction=False) as pipe:
+                    for cliente_id, cifrado in nuevos.items():
+                        pipe.set(self._clave(cliente_id), cifrado, ex=self.redis_ttl_seconds)
+                    pipe.execute()
+            except Exception as e:
+                logger.warning(f"Error guardando nombres en Redis: {str(e)}")
+
+
+# Instancia global del servicio
+cliente_nombre_cache = ClienteNombreCache()
+
+
+# ----------------------------------------------------------------------
+# Invalidación automática al modificar nombres
+# ----------------------------------------------------------------------
+
+suscribir_cambios_clientes(SuscripcionClientes(
+    'nombres',
+    al_confirmar=cliente_nombre_cache.invalidar,
+    campos=CAMPOS_NOMBRE_CLIENTE,
+    # Un cliente nuevo aún no está en caché
+    incluir_nuevos=False,
+))
@@ -0,0 +1,289 @@
+"""
+Escaneo diario de cumplimiento documental de la cartera de clientes
+
+Las propiedades del modelo (cedula_vigente, documentos_vencidos,
+porcentaje_documentos_completos, ...) trabajan cliente por cliente y la
+fecha de vencimiento de la cédula está encriptada, por lo que no se puede
+filtrar en SQL. Este servicio recorre la cartera una vez al día:
+
+- Clientes activos por bloques de CUMPLIMIENTO_LOTE (paginación por clave)
+  y sus documentos vigentes con una consulta por bloque
+- Desencriptación y evaluación de cada bloque en el pool de procesos de
+  exportación
+- Resultado por cliente en cliente_cumplimiento_documental (UPSERT por bloque)
+- Un evento de notificación por bloque con los clientes que pasaron a
+  requerir atención (no se repite mientras su estado no cambie)
+
+Cumplimiento consulta el listado sobre esa tabla indexada.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import data_encryption
+from app.models.secure_models import Cliente, ClienteCumplimientoDocumental, Documento
+from app.services.export_service import repartir_en_pool
+from app.services.rabbitmq_service import RabbitMQService
+
+logger = logging.getLogger(__name__)
+
+AL_DIA = 'AL_DIA'
+POR_VENCER = 'POR_VENCER'
+INCOMPLETO = 'INCOMPLETO'
+VENCIDO = 'VENCIDO'
+
+# Estados de documento que no cuentan como entregados
+ESTADOS_NO_ENTREGADO = ('PENDIENTE', 'RECHAZADO', 'VENCIDO')
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+SQL_ESTADOS_PREVIOS = text("""
+    SELECT cliente_id, estado FROM cliente_cumplimiento_documental
+    WHERE cliente_id = ANY(CAST(:ids AS uuid[]))
+""")
+
+# Clientes no revisados en la corrida (inactivos o eliminados de la cartera)
+SQL_DESCARTAR_NO_REVISADOS = text("""
+    DELETE FROM cliente_cumplimiento_documental WHERE revisado_en < :inicio
+""")
+
+
+def _fecha_encriptada(valor: Optional[str]) -> Optional[date]:
+    """Desencripta e interpreta una fecha en los formatos aceptados por el modelo"""
+    if not valor:
+        return None
+    try:
+        valor = data_encryption.decrypt(valor)
+    except Exception:
+        pass
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def evaluar_cliente(
+    cliente_id,
+    cedula_encriptada: Optional[str],
+    pasaporte_encriptado: Optional[str],
+    documentos: Sequence[tuple],
+    fecha_corte: date,
+    dias_aviso: int,
+    tipos_obligatorios: Sequence[str]
+) -> Dict[str, Any]:
+    """
+    Cumplimiento de un cliente a la fecha de corte
+
+    `documentos` son las versiones actuales como tuplas
+    (tipo_documento, estado, es_obligatorio, fecha_vencimiento, verificado).
+    El pasaporte solo se exige vigente cuando el cliente no tiene cédula.
+    """
+    limite_aviso = fecha_corte + timedelta(days=dias_aviso)
+    vence_cedula = _fecha_encriptada(cedula_encriptada)
+    vence_pasaporte = _fecha_encriptada(pasaporte_encriptado)
+    cedula_vigente = fecha_corte <= vence_cedula if vence_cedula else None
+    pasaporte_vigente = fecha_corte <= vence_pasaporte if vence_pasaporte else None
+    identificacion = vence_cedula or (None if cedula_encriptada else vence_pasaporte)
+
+    vencimientos = [d[3] for d in documentos if d[3]]
+    vencidos = sum(1 for f in vencimientos if f < fecha_corte)
+    por_vencer = sum(1 for f in vencimientos if fecha_corte <= f <= limite_aviso)
+    verificados = sum(1 for d in documentos if d[1] == 'VERIFICADO' and d[4])
+
+    entregados = {
+        d[0] for d in documentos
+        if d[1] not in ESTADOS_NO_ENTREGADO and not (d[3] and d[3] < fecha_corte)
+    }
+    faltantes = {d[0] for d in documentos if d[2] and d[1] == 'PENDIENTE'}
+    faltantes.update(t for t in tipos_obligatorios if t not in entregados)
+
+    if vencidos or (identificacion and identificacion < fecha_corte):
+        estado = VENCIDO
+    elif faltantes:
+        estado = INCOMPLETO
+    elif por_vencer or (identificacion and identificacion <= limite_aviso):
+        estado = POR_VENCER
+    else:
+        estado = AL_DIA
+
+    fechas = [f for f in (vence_cedula, vence_pasaporte, *vencimientos) if f]
+    return {
+        'cliente_id': cliente_id,
+        'estado': estado,
+        'fecha_vencimiento_cedula': vence_cedula,
+        'dias_para_vencimiento_cedula': (vence_cedula - fecha_corte).days if vence_cedula else None,
+        'cedula_vigente': cedula_vigente,
+        'fecha_vencimiento_pasaporte': vence_pasaporte,
+        'pasaporte_vigente': pasaporte_vigente,
+        'documentos_total': len(documentos),
+        'documentos_verificados': verificados,
+        'documentos_vencidos': vencidos,
+        'documentos_por_vencer': por_vencer,
+        'porcentaje_completo': int(verificados * 100 / len(documentos)) if documentos else 0,
+        'obligatorios_faltantes': ','.join(sorted(faltantes)) or None,
+        'proximo_vencimiento': min(fechas) if fechas else None,
+    }
+
+
+def _evaluar_bloque(args: Tuple[List[tuple], tuple]) -> List[Dict[str, Any]]:
+    """Evalúa un bloque de clientes (se ejecuta en el pool)"""
+    filas, (fecha_corte, dias_aviso, tipos_obligatorios) = args
+    return [
+        evaluar_cliente(cliente_id, cedula, pasaporte, documentos, fecha_corte, dias_aviso, tipos_obligatorios)
+        for cliente_id, cedula, pasaporte, documentos in filas
+    ]
+
+
+class CumplimientoDocumentalService:
+    """Escaneo de cumplimiento documental y listado para cumplimiento"""
+
+    def __init__(
+        self,
+        db: Session,
+        chunk_size: Optional[int] = None,
+        publicador: Optional[RabbitMQService] = None
+    ):
+        self.db = db
+        self.chunk_size = chunk_size or settings.CUMPLIMIENTO_LOTE
+        self.publicador = publicador
+
+    def escanear(self, fecha_corte: Optional[date] = None) -> Dict[str, Any]:
+        """Evalúa toda la cartera activa, guarda el resultado y notifica los cambios"""
+        fecha_corte = fecha_corte or date.today()
+        contexto = (fecha_corte, settings.CUMPLIMIENTO_DIAS_AVISO, tuple(settings.CUMPLIMIENTO_TIPOS_OBLIGATORIOS))
+        inicio = datetime.utcnow()
+        reloj = time.monotonic()
+        por_estado: Counter = Counter()
+        notificados = 0
+
+        for clientes in self._iterar_bloques():
+            documentos = self._documentos([c[0] for c in clientes])
+            filas = [(c[0], c[1], c[2], documentos.get(c[0], [])) for c in clientes]
+            resultados = repartir_en_pool(_evaluar_bloque, filas, contexto)
+
+            previos = self._estados_previos([r['cliente_id'] for r in resultados])
+            self._guardar(resultados)
+            self.db.commit()
+
+            por_estado.update(r['estado'] for r in resultados)
+            nuevos = [
+                r for r in resultados
+                if r['estado'] != AL_DIA and previos.get(str(r['cliente_id'])) != r['estado']
+            ]
+            if nuevos and self._notificar(fecha_corte, nuevos, previos):
+                notificados += len(nuevos)
+
+        descartados = self.db.execute(SQL_DESCARTAR_NO_REVISADOS, {'inicio': inicio}).rowcount
+        self.db.commit()
+
+        resumen = {
+            'fecha_corte': fecha_corte.isoformat(),
+            'clientes': sum(por_estado.values()),
+            'por_estado': dict(por_estado),
+            'notificados': notificados,
+            'descartados': descartados,
+            'duracion_segundos': round(time.monotonic() - reloj, 2),
+        }
+        logger.info(f"Escaneo de cumplimiento documental: {resumen}")
+        return resumen
+
+    def _iterar_bloques(self):
+        """Clientes activos por bloques, paginando por id (sin cursor abierto entre commits)"""
+        ultimo = None
+        while True:
+            query = self.db.query(
+                Cliente.id, Cliente._fecha_vencimiento_cedula, Cliente._fecha_vencimiento_pasaporte
+            ).filter(Cliente.is_active.is_(True))
+            if ultimo is not None:
+                query = query.filter(Cliente.id > ultimo)
+            bloque = [tuple(f) for f in query.order_by(Cliente.id).limit(self.chunk_size)]
+            if not bloque:
+                return
+            yield bloque
+            ultimo = bloque[-1][0]
+
+    def _documentos(self, cliente_ids: List) -> Dict[Any, List[tuple]]:
+        """Versiones actuales de los documentos del bloque, agrupadas por cliente"""
+        documentos: Dict[Any, List[tuple]] = {}
+        filas = self.db.query(
+            Documento.cliente_id, Documento.tipo_documento, Documento.estado, Documento.es_obligatorio,
+            Documento.fecha_vencimiento, Documento.verificado_por.isnot(None)
+        ).filter(
+            Documento.cliente_id.in_(cliente_ids),
+            Documento.es_version_actual.is_(True)
+        )
+        for cliente_id, *documento in filas:
+            documentos.setdefault(cliente_id, []).append(tuple(documento))
+        return documentos
+
+    def _estados_previos(self, cliente_ids: List) -> Dict[str, str]:
+        filas = self.db.execute(SQL_ESTADOS_PREVIOS, {'ids': [str(i) for i in cliente_ids]})
+        return {str(cliente_id): estado for cliente_id, estado in filas}
+
+    def _guardar(self, resultados: List[Dict[str, Any]]):
+        revisado_en = datetime.utcnow()
+        stmt = insert(ClienteCumplimientoDocumental).values([
+            {**r, 'revisado_en': revisado_en} for r in resultados
+        ])
+        self.db.execute(stmt.on_conflict_do_update(
+            index_elements=['cliente_id'],
+            set_={
+                columna.name: stmt.excluded[columna.name]
+                for columna in ClienteCumplimientoDocumental.__table__.columns if columna.name != 'cliente_id'
+            }
+        ))
+
+    def _notificar(self, fecha_corte: date, nuevos: List[Dict[str, Any]], previos: Dict[str, str]) -> bool:
+        """Publica un solo evento con todos los clientes del bloque que requieren atención"""
+        if self.publicador is None:
+            self.publicador = RabbitMQService()
+        evento = {
+            'fecha_corte': fecha_corte.isoformat(),
+            'total': len(nuevos),
+            'por_estado': dict(Counter(r['estado'] for r in nuevos)),
+            'clientes': [
+                {
+                    'cliente_id': str(r['cliente_id']),
+                    'estado': r['estado'],
+                    'estado_anterior': previos.get(str(r['cliente_id'])),
+                    'proximo_vencimiento': r['proximo_vencimiento'].isoformat() if r['proximo_vencimiento'] else None,
+                    'obligatorios_faltantes': r['obligatorios_faltantes'],
+                }
+                for r in nuevos
+            ],
+        }
+        if not self.publicador.publish_notificacion_event('cumplimiento_documental', evento):
+            logger.error(f"No se pudo publicar la notificación de cumplimiento documental ({len(nuevos)} clientes)")
+            return False
+        return True
+
+    def listar(
+        self,
+        estados: Optional[List[str]] = None,
+        vence_hasta: Optional[date] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[ClienteCumplimientoDocumental], int]:
+        """Clientes que requieren atención, por vencimiento más cercano"""
+        query = self.db.query(ClienteCumplimientoDocumental)
+        if estados:
+            query = query.filter(ClienteCumplimientoDocumental.estado.in_(estados))
+        else:
+            query = query.filter(ClienteCumplimientoDocumental.estado != AL_DIA)
+        if vence_hasta:
+            query = query.filter(ClienteCumplimientoDocumental.proximo_vencimiento <= vence_hasta)
+        total = query.count()
+        items = query.order_by(
+            ClienteCumplimientoDocumental.proximo_vencimiento.asc().nullslast(),
+            ClienteCumplimientoDocumental.cliente_id
+        ).offset(skip).limit(limit).all()
+        return items, total
@@ -0,0 +1,262 @@
+"""
+Servicio de cuotas (cronograma persistido de cada préstamo)
+
+Las cuotas se generan con el motor de amortización vectorizado y permiten
+calcular la mora real: los días de mora se cuentan desde la cuota impaga más
+antigua (Prestamo.fecha_primera_cuota_impaga), no desde el vencimiento final.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+import uuid
+
+import numpy as np
+from sqlalchemy import and_, func, insert, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.secure_models import Cuota, Prestamo
+from app.services.amortizacion import (
+    fechas_vencimiento, generar_cronogramas, periodos_por_modalidad
+)
+
+logger = logging.getLogger(__name__)
+
+# Estados de préstamo que deben tener cronograma
+ESTADOS_CON_CRONOGRAMA = ('DESEMBOLSADO', 'VIGENTE', 'MORA')
+
+# Tramos de antigüedad de mora (días desde la cuota impaga más antigua)
+TRAMOS_MORA = Prestamo.TRAMOS_MORA
+
+# Mantiene fecha_primera_cuota_impaga con una búsqueda por índice parcial
+SQL_ACTUALIZAR_PRIMERA_IMPAGA = text("""
+    UPDATE prestamos p
+    SET fecha_primera_cuota_impaga = (
+        SELECT MIN(c.fecha_vencimiento)
+        FROM cuotas c
+        WHERE c.prestamo_id = p.id AND c.estado <> 'PAGADA'
+    )
+    WHERE p.id = ANY(CAST(:ids AS uuid[]))
+""")
+
+
+def _fecha(valor) -> date:
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def parametros_amortizacion(modalidades) -> Dict[str, Any]:
+    """Parámetros del motor de amortización según la configuración vigente"""
+    return {
+        'metodo': settings.AMORTIZACION_METODO,
+        'periodos_por_anio': periodos_por_modalidad(
+            modalidades, settings.AMORTIZACION_FRECUENCIA_DESCUENTO_DIRECTO
+        ),
+        'comision_apertura': settings.AMORTIZACION_COMISION_APERTURA_PCT,
+        'tasa_seguro_anual': settings.AMORTIZACION_TASA_SEGURO_ANUAL_PCT,
+        'cargo_periodico': settings.AMORTIZACION_CARGO_PERIODICO,
+    }
+
+
+class CuotaService:
+    """Generación de cuotas y consultas de mora por cuota"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def construir_cuotas(self, prestamos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Construye las filas de cuotas de varios préstamos con una sola
+        llamada al motor de amortización
+
+        Cada préstamo es un mapeo con id, monto, tasa_interes, plazo,
+        modalidad_pago, fecha_inicio y (opcional) monto_pagado. El monto ya
+        pagado se imputa a las cuotas en orden de vencimiento.
+        """
+        if not prestamos:
+            return []
+
+        cronogramas = generar_cronogramas(
+            [p['monto'] for p in prestamos],
+            [p['tasa_interes'] for p in prestamos],
+            [p['plazo'] for p in prestamos],
+            **parametros_amortizacion([p['modalidad_pago'] for p in prestamos])
+        )
+
+        # Imputación vectorizada del monto pagado: cada cuota recibe lo que
+        # queda después de cubrir las anteriores, hasta su propio monto
+        pagado_total = np.array([float(p.get('monto_pagado') or 0) for p in prestamos])
+        acumulado_previo = np.cumsum(cronogramas.pago, axis=1) - cronogramas.pago
+        pagado = np.round(np.clip(pagado_total[:, None] - acumulado_previo, 0, cronogramas.pago), 2)
+
+        ahora = datetime.utcnow()
+        filas = []
+        for i, prestamo in enumerate(prestamos):
+            n = int(cronogramas.periodos[i])
+            fechas = fechas_vencimiento(
+                _fecha(prestamo['fecha_inicio']), n, int(cronogramas.periodos_por_anio[i])
+            )
+            for k in range(n):
+                monto_cuota = cronogramas.pago[i, k]
+                monto_pagado = pagado[i, k]
+                if monto_pagado >= monto_cuota:
+                    estado = 'PAGADA'
+                elif monto_pagado > 0:
+                    estado = 'PARCIAL'
+                else:
+                    estado = 'PENDIENTE'
+                filas.append({
+                    'id': uuid.uuid4(),
+                    'prestamo_id': prestamo['id'],
+                    'numero': k + 1,
+                    'fecha_vencimiento': fechas[k],
+                    'monto_capital': Decimal(f"{cronogramas.capital[i, k]:.2f}"),
+                    'monto_interes': Decimal(f"{cronogramas.interes[i, k]:.2f}"),
+                    'monto_seguro': Decimal(f"{cronogramas.seguro[i, k]:.2f}"),
+                    'monto_cargos': Decimal(f"{cronogramas.cargos[i, k]:.2f}"),
+                    'monto_cuota': Decimal(f"{monto_cuota:.2f}"),
+                    'saldo_capital': Decimal(f"{cronogramas.saldo[i, k]:.2f}"),
+                    'monto_pagado': Decimal(f"{monto_pagado:.2f}"),
+                    'estado': estado,
+                    'fecha_pago': ahora if estado == 'PAGADA' else None,
+                    'created_at': ahora,
+                    'updated_at': ahora,
+                })
+        return filas
+
+    def generar_cuotas(self, prestamos: List[Dict[str, Any]], tamano_lote: Optional[int] = None) -> int:
+        """
+        Inserta las cuotas de los préstamos indicados y actualiza su cuota
+        impaga más antigua. No confirma la transacción.
+        """
+        filas = self.construir_cuotas(prestamos)
+        tamano_lote = tamano_lote or settings.BULK_BATCH_SIZE * 10
+        for inicio in range(0, len(filas), tamano_lote):
+            self.db.execute(insert(Cuota), filas[inicio:inicio + tamano_lote])
+        self.actualizar_primera_impaga([p['id'] for p in prestamos])
+        return len(filas)
+
+    def generar_para_prestamo(self, prestamo: Prestamo) -> int:
+        """Genera las cuotas de un préstamo recién creado (el préstamo debe tener id)"""
+        return self.generar_cuotas([{
+            'id': prestamo.id,
+            'monto': prestamo.monto,
+            'tasa_interes': prestamo.tasa_interes,
+            'plazo': prestamo.plazo,
+            'modalidad_pago': prestamo.modalidad_pago,
+            'fecha_inicio': prestamo.fecha_inicio,
+            'monto_pagado': prestamo.monto_pagado,
+        }])
+
+    def regenerar_para_prestamo(self, prestamo: Prestamo) -> bool:
+        """
+        Regenera el cronograma tras un cambio de condiciones. Solo procede si
+        ninguna cuota tiene pagos imputados; retorna si se regeneró.
+        """
+        con_pagos = self.db.query(Cuota.id).filter(
+            Cuota.prestamo_id == prestamo.id, Cuota.monto_pagado > 0
+        ).first()
+        if con_pagos:
+            logger.warning(f"Cronograma de {prestamo.numero_prestamo} no regenerado: tiene cuotas con pagos")
+            return False
+        self.db.query(Cuota).filter(Cuota.prestamo_id == prestamo.id).delete(synchronize_session=False)
+        self.generar_para_prestamo(prestamo)
+        return True
+
+    def actualizar_primera_impaga(self, prestamo_ids: Iterable) -> None:
+        """Recalcula Prestamo.fecha_primera_cuota_impaga para los préstamos indicados"""
+        ids = list({str(i) for i in prestamo_ids if i is not None})
+        if ids:
+            self.db.execute(SQL_ACTUALIZAR_PRIMERA_IMPAGA, {'ids': ids})
+
+    def generar_faltantes(self, tamano_lote: int = 500) -> int:
+        """
+        Genera cuotas para los préstamos activos que aún no tienen cronograma
+        (préstamos anteriores a la tabla de cuotas). Recorre por lotes de id y
+        confirma cada lote.
+        """
+        total = 0
+        ultimo_id = None
+        while True:
+            query = self.db.query(
+                Prestamo.id, Prestamo.monto, Prestamo.tasa_interes, Prestamo.plazo,
+                Prestamo.modalidad_pago, Prestamo.fecha_inicio, Prestamo.monto_pagado
+            ).filter(
+                Prestamo.estado.in_(ESTADOS_CON_CRONOGRAMA),
+                ~self.db.query(Cuota.id).filter(Cuota.prestamo_id == Prestamo.id).exists()
+            )
+            if ultimo_id is not None:
+                query = query.filter(Prestamo.id > ultimo_id)
+            lote = query.order_by(Prestamo.id).limit(tamano_lote).all()
+            if not lote:
+                break
+
+            self.generar_cuotas([dict(fila._mapping) for fila in lote])
+            self.db.commit()
+            total += len(lote)
+            ultimo_id = lote[-1].id
+            logger.info(f"Cuotas generadas para {total} préstamos existentes")
+        return total
+
+    # ------------------------------------------------------------------
+    # Consultas de mora
+    # ------------------------------------------------------------------
+
+    def cuotas_vencidas(self, prestamo_id: str, fecha_corte: Optional[date] = None) -> List[Cuota]:
+        """Cuotas impagas vencidas de un préstamo, en orden de vencimiento"""
+        fecha_corte = fecha_corte or date.today()
+        return self.db.query(Cuota).filter(
+            Cuota.prestamo_id == prestamo_id,
+            Cuota.estado != 'PAGADA',
+            Cuota.fecha_vencimiento < fecha_corte
+        ).order_by(Cuota.numero).all()
+
+    def antiguedad_mora(
+        self,
+        sucursal_id: Optional[str] = None,
+        fecha_corte: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Préstamos y saldo vencido por tramo de antigüedad de mora
+
+        Agrupa en la base de datos las cuotas impagas vencidas (índice
+        idx_cuota_estado_vencimiento) según la cuota más antigua de cada
+        préstamo.
+        """
+        fecha_corte = fecha_corte or date.today()
+        vencidas = self.db.query(
+            Cuota.prestamo_id,
+            func.min(Cuota.fecha_vencimiento).label('primera'),
+            func.sum(Cuota.monto_cuota - Cuota.monto_pagado).label('saldo_vencido'),
+            func.count().label('cuotas_vencidas'),
+        ).filter(
+            Cuota.estado != 'PAGADA',
+            Cuota.fecha_vencimiento < fecha_corte
+        ).group_by(Cuota.prestamo_id).subquery()
+
+        dias = (fecha_corte - vencidas.c.primera)
+        tramo = func.width_bucket(dias, [desde for _, desde, _ in TRAMOS_MORA[2:]])
+        query = self.db.query(
+            tramo.label('tramo'),
+            func.count().label('prestamos'),
+            func.sum(vencidas.c.saldo_vencido).label('saldo_vencido'),
+            func.sum(vencidas.c.cuotas_vencidas).label('cuotas_vencidas'),
+        ).select_from(vencidas).join(
+            Prestamo, and_(Prestamo.id == vencidas.c.prestamo_id, Prestamo.estado.in_(('VIGENTE', 'MORA')))
+        )
+        if sucursal_id:
+            query = query.filter(Prestamo.sucursal_id == sucursal_id)
+
+        por_tramo = {fila.tramo: fila for fila in query.group_by(tramo)}
+        resultado = []
+        for indice, (nombre, desde, hasta) in enumerate(TRAMOS_MORA[1:]):
+            fila = por_tramo.get(indice)
+            resultado.append({
+                'tramo': nombre,
+                'dias_desde': desde,
+                'dias_hasta': hasta,
+                'prestamos': fila.prestamos if fila else 0,
+                'cuotas_vencidas': int(fila.cuotas_vencidas) if fila else 0,
+                'saldo_vencido': fila.saldo_vencido if fila else Decimal('0'),
+            })
+        return resultado
@@ -0,0 +1,918 @@
+"""
+Importación de clientes desde archivos DBF del sistema legado (FoxPro)
+
+Flujo por lotes con memoria acotada:
+1. Lectura en streaming del DBF (dbfread con load=False)
+2. Mapeo de cada registro a filas de clientes, cliente_telefonos y
+   cliente_direcciones según un mapeo de campos configurable
+3. Encriptación de PII en un pool de procesos
+4. Carga con COPY de PostgreSQL, una transacción por lote
+5. Checkpoint en JSON tras cada lote confirmado para reanudar la carga
+6. Registros rechazados a un archivo dead-letter (JSONL) con su error
+
+Modo delta (sincronización nocturna durante la transición):
+- Cada registro legado tiene una huella (SHA-256 de sus campos normalizados)
+  guardada en cliente_legado_huellas por código legado
+- Solo se mapean, encriptan y escriben los registros nuevos o con huella
+  distinta; los cambios se aplican con UPDATE desde tablas temporales
+- Los códigos que ya no aparecen en el DBF se marcan como eliminados y el
+  cliente queda INACTIVO (nunca se borra: puede tener préstamos)
+
+Solo se aceptan archivos locales.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+import uuid
+
+from psycopg2.extras import execute_values
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.security import data_encryption
+from app.services.cliente_360_service import cliente_360_cache
+from app.services.cliente_nombre_cache import cliente_nombre_cache
+
+logger = logging.getLogger(__name__)
+
+# Mapeo por defecto: campo destino -> campo del DBF legado (prsctes.dbf).
+# Se puede sobrescribir con un archivo JSON con la misma estructura.
+MAPEO_CAMPOS_CLIENTE: Dict[str, str] = {
+    'codigo_cliente': 'CODIGO',
+    'nombre_completo': 'NOMBRE',
+    'nombre': '',
+    'segundo_nombre': '',
+    'apellido_paterno': '',
+    'apellido_materno': '',
+    'cedula': 'CEDULA',
+    'fecha_nacimiento': 'FECNAC',
+    'genero': 'SEXO',
+    'estado_civil': 'ESTCIVIL',
+    'empresa_actual': 'EMPRESA',
+    'puesto_actual': 'CARGO',
+    'ingreso_mensual': 'SALARIO',
+    'telefono_casa': 'TELEFONO',
+    'telefono_celular': 'CELULAR',
+    'telefono_trabajo': 'TELTRAB',
+    'direccion': 'DIRECCION',
+    'barriada': 'BARRIADA',
+    'ciudad': 'CIUDAD',
+    'provincia': 'PROVINCIA',
+}
+
+# Columnas de clientes encriptadas (las columnas cortas como genero o
+# estado_civil no admiten el texto encriptado y se guardan en claro)
+CAMPOS_ENCRIPTADOS_CLIENTE = (
+    'nombre', 'segundo_nombre', 'apellido_paterno', 'apellido_materno',
+    'fecha_nacimiento', 'numero_identificacion', 'cedula',
+    'empresa_actual', 'puesto_actual', 'ingreso_mensual',
+)
+
+COLUMNAS_CLIENTES = (
+    'id', 'codigo_cliente', 'nombre', 'segundo_nombre', 'apellido_paterno',
+    'apellido_materno', 'fecha_nacimiento', 'genero', 'estado_civil', 'nacionalidad',
+    'tipo_identificacion', 'numero_identificacion', 'cedula',
+    'empresa_actual', 'puesto_actual', 'ingreso_mensual',
+    'estado_cliente', 'is_active', 'risk_level', 'bloqueado',
+    'created_at', 'updated_at', 'access_count',
+)
+
+COLUMNAS_TELEFONOS = (
+    'id', 'cliente_id', 'tipo', 'numero', 'es_principal', 'tiene_whatsapp',
+    'created_at', 'updated_at', 'access_count',
+)
+
+COLUMNAS_DIRECCIONES = (
+    'id', 'cliente_id', 'tipo', 'calle', 'barriada', 'ciudad', 'estado', 'pais',
+    'es_principal', 'es_facturacion', 'created_at', 'updated_at', 'access_count',
+)
+
+# (campo del mapeo, tipo de teléfono)
+CAMPOS_TELEFONO = (
+    ('telefono_celular', 'CELULAR'),
+    ('telefono_casa', 'CASA'),
+    ('telefono_trabajo', 'TRABAJO'),
+)
+
+# Columnas de clientes que la sincronización delta actualiza
+COLUMNAS_CLIENTES_SINCRONIZADAS = (
+    'nombre', 'segundo_nombre', 'apellido_paterno', 'apellido_materno',
+    'fecha_nacimiento', 'genero', 'estado_civil', 'tipo_identificacion',
+    'numero_identificacion', 'cedula', 'empresa_actual', 'puesto_actual',
+    'ingreso_mensual',
+)
+
+VALOR_NO_DISPONIBLE = 'N/D'
+NULO_COPY = '\\N'
+
+
+class RegistroInvalidoError(ValueError):
+    """Registro del DBF que no puede mapearse a un cliente"""
+
+
+def validar_ruta_local(ruta: str) -> str:
+    """Retorna la ruta absoluta del archivo o ValueError si no es un archivo local"""
+    if '://' in ruta or ruta.startswith('\\\\') or ruta.startswith('//'):
+        raise ValueError("Solo se permiten archivos locales")
+    ruta_real = os.path.realpath(ruta)
+    if not os.path.isfile(ruta_real):
+        raise ValueError(f"Archivo no encontrado: {ruta}")
+    return ruta_real
+
+
+def cargar_mapeo(ruta_mapeo: Optional[str] = None) -> Dict[str, str]:
+    """Mapeo por defecto, sobrescrito con el JSON indicado"""
+    mapeo = dict(MAPEO_CAMPOS_CLIENTE)
+    if ruta_mapeo:
+        with open(validar_ruta_local(ruta_mapeo), encoding='utf-8') as f:
+            mapeo.update({k: (v or '').upper() for k, v in json.load(f).items()})
+    return mapeo
+
+
+# ----------------------------------------------------------------------
+# Mapeo de registros
+# ----------------------------------------------------------------------
+
+def _texto(valor: Any) -> Optional[str]:
+    """Convierte un valor del DBF a texto limpio (None si vacío)"""
+    if valor is None:
+        return None
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, bytes):
+        valor = valor.decode('latin1', errors='replace')
+    if isinstance(valor, (float, Decimal)):
+        valor = format(Decimal(str(valor)).normalize(), 'f')
+    texto = ' '.join(str(valor).split())
+    return texto or None
+
+
+def _campo(registro: Dict[str, Any], mapeo: Dict[str, str], destino: str) -> Optional[str]:
+    origen = mapeo.get(destino)
+    return _texto(registro.get(origen)) if origen else None
+
+
+def huella_registro(registro: Dict[str, Any], mapeo: Dict[str, str]) -> str:
+    """Huella SHA-256 de los campos mapeados, normalizados y en orden estable"""
+    valores = [
+        f"{destino}={_texto(registro.get(origen)) or ''}"
+        for destino, origen in sorted(mapeo.items()) if origen
+    ]
+    return hashlib.sha256('\x1f'.join(valores).encode('utf-8')).hexdigest()
+
+
+def asignar_cliente_id(mapeado: Dict[str, Any], cliente_id: str):
+    """Reasigna el id del cliente (y de sus filas hijas) a un cliente existente"""
+    mapeado['cliente']['id'] = cliente_id
+    for fila in mapeado['telefonos'] + mapeado['direcciones']:
+        fila['cliente_id'] = cliente_id
+
+
+def dividir_nombre_completo(nombre_completo: str) -> Dict[str, Optional[str]]:
+    """
+    Divide un nombre completo del sistema legado.
+
+    Formatos admitidos: "APELLIDOS, NOMBRES" o "NOMBRE [SEGUNDO] PATERNO [MATERNO]".
+    """
+    if ',' in nombre_completo:
+        apellidos, nombres = [p.split() for p in nombre_completo.split(',', 1)]
+    else:
+        partes = nombre_completo.split()
+        if len(partes) <= 3:
+            nombres, apellidos = partes[:1], partes[1:]
+        else:
+            nombres, apellidos = partes[:-2], partes[-2:]
+
+    if not nombres or not apellidos:
+        raise RegistroInvalidoError(f"Nombre incompleto: '{nombre_completo}'")
+
+    return {
+        'nombre': nombres[0],
+        'segundo_nombre': ' '.join(nombres[1:]) or None,
+        'apellido_paterno': apellidos[0],
+        'apellido_materno': ' '.join(apellidos[1:]) or None,
+    }
+
+
+def mapear_registro(
+    registro: Dict[str, Any],
+    mapeo: Dict[str, str],
+    marca_tiempo: datetime
+) -> Dict[str, Any]:
+    """Mapea un registro del DBF a filas de cliente, teléfonos y direcciones"""
+    codigo = _campo(registro, mapeo, 'codigo_cliente')
+    if not codigo:
+        raise RegistroInvalidoError("Registro sin código de cliente")
+    if len(codigo) > 50:
+        raise RegistroInvalidoError(f"Código de cliente demasiado largo: '{codigo}'")
+
+    nombres = {c: _campo(registro, mapeo, c) for c in ('nombre', 'segundo_nombre', 'apellido_paterno', 'apellido_materno')}
+    if not (nombres['nombre'] and nombres['apellido_paterno']):
+        nombre_completo = _campo(registro, mapeo, 'nombre_completo')
+        if not nombre_completo:
+            raise RegistroInvalidoError("Registro sin nombre")
+        nombres = dividir_nombre_completo(nombre_completo)
+
+    cedula = _campo(registro, mapeo, 'cedula')
+    genero = _campo(registro, mapeo, 'genero')
+    estado_civil = _campo(registro, mapeo, 'estado_civil')
+    cliente_id = str(uuid.uuid4())
+
+    cliente = {
+        'id': cliente_id,
+        'codigo_cliente': codigo,
+        **nombres,
+        'fecha_nacimiento': _campo(registro, mapeo, 'fecha_nacimiento'),
+        'genero': genero[:20] if genero else None,
+        'estado_civil': estado_civil[:50] if estado_civil else None,
+        'nacionalidad': 'Panameño/a',
+        'tipo_identificacion': 'CEDULA' if cedula else None,
+        'numero_identificacion': cedula,
+        'cedula': cedula,
+        'empresa_actual': _campo(registro, mapeo, 'empresa_actual'),
+        'puesto_actual': _campo(registro, mapeo, 'puesto_actual'),
+        'ingreso_mensual': _campo(registro, mapeo, 'ingreso_mensual'),
+        'estado_cliente': 'ACTIVO',
+        'is_active': True,
+        'risk_level': 'medium',
+        'bloqueado': False,
+        'created_at': marca_tiempo,
+        'updated_at': marca_tiempo,
+        'access_count': 0,
+    }
+
+    telefonos = []
+    for campo, tipo in CAMPOS_TELEFONO:
+        numero = _campo(registro, mapeo, campo)
+        if numero:
+            telefonos.append({
+                'id': str(uuid.uuid4()),
+                'cliente_id': cliente_id,
+                'tipo': tipo,
+                'numero': numero[:20],
+                'es_principal': not telefonos,
+                'tiene_whatsapp': False,
+                'created_at': marca_tiempo,
+                'updated_at': marca_tiempo,
+                'access_count': 0,
+            })
+
+    direcciones = []
+    calle = _campo(registro, mapeo, 'direccion')
+    if calle:
+        direcciones.append({
+            'id': str(uuid.uuid4()),
+            'cliente_id': cliente_id,
+            'tipo': 'RESIDENCIAL',
+            'calle': calle[:255],
+            'barriada': (_campo(registro, mapeo, 'barriada') or VALOR_NO_DISPONIBLE)[:100],
+            'ciudad': (_campo(registro, mapeo, 'ciudad') or VALOR_NO_DISPONIBLE)[:100],
+            'estado': (_campo(registro, mapeo, 'provincia') or VALOR_NO_DISPONIBLE)[:100],
+            'pais': 'Panamá',
+            'es_principal': True,
+            'es_facturacion': False,
+            'created_at': marca_tiempo,
+            'updated_at': marca_tiempo,
+            'access_count': 0,
+        })
+
+    return {
+        'cliente': cliente,
+        'telefonos': telefonos,
+        'direcciones': direcciones,
+        'huella': huella_registro(registro, mapeo),
+    }
+
+
+# ----------------------------------------------------------------------
+# Encriptación (se ejecuta en el pool)
+# ----------------------------------------------------------------------
+
+def _encriptar_clientes(clientes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Encripta las columnas PII de un bloque de clientes"""
+    for cliente in clientes:
+        for campo in CAMPOS_ENCRIPTADOS_CLIENTE:
+            if cliente.get(campo):
+                cliente[campo] = data_encryption.encrypt(cliente[campo])
+    return clientes
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _obtener_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool de procesos compartido para encriptación (None = en línea)"""
+    global _pool
+    if settings.DBF_IMPORT_WORKERS <= 1:
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.DBF_IMPORT_WORKERS)
+    return _pool
+
+
+def encriptar_en_paralelo(clientes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reparte el bloque entre los procesos del pool y conserva el orden"""
+    pool = _obtener_pool()
+    if pool is None or len(clientes) < 2:
+        return _encriptar_clientes(clientes)
+    tamano = max(1, -(-len(clientes) // settings.DBF_IMPORT_WORKERS))
+    partes = [clientes[i:i + tamano] for i in range(0, len(clientes), tamano)]
+    return [c for parte in pool.map(_encriptar_clientes, partes) for c in parte]
+
+
+# ----------------------------------------------------------------------
+# COPY
+# ----------------------------------------------------------------------
+
+def _valor_copy(valor: Any) -> Any:
+    if valor is None:
+        return NULO_COPY
+    if isinstance(valor, bool):
+        return 't' if valor else 'f'
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=' ')
+    return valor
+
+
+def _buffer_copy(filas: List[Dict[str, Any]], columnas: Tuple[str, ...]) -> io.StringIO:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for fila in filas:
+        escritor.writerow([_valor_copy(fila.get(c)) for c in columnas])
+    buffer.seek(0)
+    return buffer
+
+
+def copiar_filas(cursor, tabla: str, columnas: Tuple[str, ...], filas: List[Dict[str, Any]]):
+    """Carga filas con COPY ... FROM STDIN en formato CSV"""
+    if not filas:
+        return
+    cursor.copy_expert(
+        f"COPY {tabla} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv, NULL '{NULO_COPY}')",
+        _buffer_copy(filas, columnas)
+    )
+
+
+class DBFImportService:
+    """Servicio de importación de clientes desde DBF legado"""
+
+    def __init__(
+        self,
+        engine: Engine,
+        mapeo: Optional[Dict[str, str]] = None,
+        tamano_lote: Optional[int] = None
+    ):
+        self.engine = engine
+        self.mapeo = mapeo or dict(MAPEO_CAMPOS_CLIENTE)
+        self.tamano_lote = tamano_lote or settings.DBF_IMPORT_BATCH_SIZE
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def iterar_registros(self, ruta: str, desde: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Itera (índice, registro) del DBF sin cargarlo en memoria"""
+        from dbfread import DBF
+
+        tabla = DBF(
+            ruta,
+            encoding=settings.DBF_IMPORT_ENCODING,
+            load=False,
+            char_decode_errors='replace',
+            ignore_missing_memofile=True
+        )
+        for indice, registro in enumerate(tabla):
+            if indice >= desde:
+                yield indice, registro
+
+    # ------------------------------------------------------------------
+    # Checkpoint y dead-letter
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _firma_archivo(ruta: str) -> Dict[str, Any]:
+        estado = os.stat(ruta)
+        return {'archivo': ruta, 'tamano': estado.st_size, 'modificado': estado.st_mtime}
+
+    def leer_checkpoint(self, ruta_checkpoint: str, ruta: str) -> Dict[str, Any]:
+        """Lee el checkpoint; ValueError si corresponde a otro archivo"""
+        if not os.path.exists(ruta_checkpoint):
+            return {}
+        with open(ruta_checkpoint, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        firma = self._firma_archivo(ruta)
+        if any(checkpoint.get(k) != v for k, v in firma.items()):
+            raise ValueError("El checkpoint corresponde a otro archivo o el DBF cambió; use --reiniciar")
+        return checkpoint
+
+    def guardar_checkpoint(self, ruta_checkpoint: str, ruta: str, estado: Dict[str, Any]):
+        """Escribe el checkpoint de forma atómica"""
+        temporal = f"{ruta_checkpoint}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({**self._firma_archivo(ruta), **estado, 'actualizado': datetime.utcnow().isoformat()}, f)
+        os.replace(temporal, ruta_checkpoint)
+
+    @staticmethod
+    def _registrar_rechazo(dead_letter, indice: int, registro: Dict[str, Any], error: str):
+        dead_letter.write(json.dumps({
+            'registro': indice,
+            'error': error,
+            'datos': {k: _texto(v) for k, v in registro.items()},
+        }, ensure_ascii=False) + '\n')
+
+    # ------------------------------------------------------------------
+    # Importación
+    # ------------------------------------------------------------------
+
+    def importar(
+        self,
+        ruta: str,
+        ruta_checkpoint: Optional[str] = None,
+        ruta_dead_letter: Optional[str] = None,
+        reiniciar: bool = False,
+        limite: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Importa el DBF completo (o hasta `limite` registros) reanudando desde el
+        checkpoint. Retorna el reporte de la carga.
+        """
+        ruta = validar_ruta_local(ruta)
+        base = os.path.join(settings.DBF_IMPORT_DIR, os.path.splitext(os.path.basename(ruta))[0])
+        ruta_checkpoint = ruta_checkpoint or f"{base}.checkpoint.json"
+        ruta_dead_letter = ruta_dead_letter or f"{base}.rechazados.jsonl"
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_checkpoint)), exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_dead_letter)), exist_ok=True)
+
+        if reiniciar and os.path.exists(ruta_checkpoint):
+            os.remove(ruta_checkpoint)
+        checkpoint = self.leer_checkpoint(ruta_checkpoint, ruta)
+        estado = {
+            'siguiente_registro': checkpoint.get('siguiente_registro', 0),
+            'importados': checkpoint.get('importados', 0),
+            'omitidos': checkpoint.get('omitidos', 0),
+            'rechazados': checkpoint.get('rechazados', 0),
+        }
+        if estado['siguiente_registro']:
+            logger.info(f"Reanudando importación de {ruta} desde el registro {estado['siguiente_registro']}")
+
+        inicio = time.monotonic()
+        procesados = 0
+        # El dead-letter contiene PII en claro: solo lectura para el propietario
+        fd = os.open(ruta_dead_letter, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        with os.fdopen(fd, 'a', encoding='utf-8') as dead_letter:
+            lote: List[Tuple[int, Dict[str, Any], Dict[str, Any]]] = []
+            ultimo_indice: Optional[int] = None
+            for indice, registro in self.iterar_registros(ruta, estado['siguiente_registro']):
+                if limite is not None and procesados >= limite:
+                    break
+                procesados += 1
+                ultimo_indice = indice
+                try:
+                    lote.append((indice, registro, mapear_registro(registro, self.mapeo, datetime.utcnow())))
+                except RegistroInvalidoError as e:
+                    self._registrar_rechazo(dead_letter, indice, registro, str(e))
+                    estado['rechazados'] += 1
+
+                if len(lote) >= self.tamano_lote:
+                    self._procesar_lote(lote, estado, dead_letter)
+                    estado['siguiente_registro'] = indice + 1
+                    self.guardar_checkpoint(ruta_checkpoint, ruta, estado)
+                    self._reportar_progreso(estado, procesados, inicio)
+                    lote = []
+
+            if lote:
+                self._procesar_lote(lote, estado, dead_letter)
+            if ultimo_indice is not None:
+                estado['siguiente_registro'] = ultimo_indice + 1
+
+        self.guardar_checkpoint(ruta_checkpoint, ruta, estado)
+        duracion = time.monotonic() - inicio
+        reporte = {
+            **estado,
+            'archivo': ruta,
+            'procesados': procesados,
+            'duracion_segundos': round(duracion, 2),
+            'registros_por_segundo': round(procesados / duracion, 1) if duracion > 0 else None,
+            'checkpoint': ruta_checkpoint,
+            'dead_letter': ruta_dead_letter,
+        }
+        logger.info(f"Importación DBF finalizada: {reporte}")
+        return reporte
+
+    def _reportar_progreso(self, estado: Dict[str, Any], procesados: int, inicio: float):
+        duracion = time.monotonic() - inicio
+        velocidad = procesados / duracion if duracion > 0 else 0
+        logger.info(
+            f"Importación DBF: registro {estado['siguiente_registro']}, "
+            f"{estado['importados']} importados, {estado['omitidos']} omitidos, "
+            f"{estado['rechazados']} rechazados ({velocidad:.0f} registros/s)"
+        )
+
+    def _procesar_lote(self, lote, estado: Dict[str, Any], dead_letter):
+        """Descarta códigos ya existentes, encripta y carga el lote con COPY"""
+        codigos = [m['cliente']['codigo_cliente'] for _, _, m in lote]
+        existentes = self._codigos_existentes(codigos)
+
+        pendientes = []
+        vistos = set()
+        for indice, registro, mapeado in lote:
+            codigo = mapeado['cliente']['codigo_cliente']
+            if codigo in existentes:
+                # Ya importado (p. ej. lote confirmado antes de guardar el checkpoint)
+                estado['omitidos'] += 1
+            elif codigo in vistos:
+                self._registrar_rechazo(dead_letter, indice, registro, f"Código de cliente duplicado en el DBF: {codigo}")
+                estado['rechazados'] += 1
+            else:
+                vistos.add(codigo)
+                pendientes.append((indice, registro, mapeado))
+
+        if not pendientes:
+            return
+
+        clientes = encriptar_en_paralelo([m['cliente'] for _, _, m in pendientes])
+        for (_, _, mapeado), cliente in zip(pendientes, clientes):
+            mapeado['cliente'] = cliente
+
+        conexion = self.engine.raw_connection()
+        try:
+            cursor = conexion.cursor()
+            rechazados = self._copiar_con_division(cursor, pendientes)
+            indices_rechazados = {r[0] for r in rechazados}
+            self._guardar_huellas(cursor, [m for i, _, m in pendientes if i not in indices_rechazados])
+            conexion.commit()
+        except Exception:
+            conexion.rollback()
+            raise
+        finally:
+            conexion.close()
+
+        for indice, registro, error in rechazados:
+            self._registrar_rechazo(dead_letter, indice, registro, error)
+        estado['importados'] += len(pendientes) - len(rechazados)
+        estado['rechazados'] += len(rechazados)
+
+    def _codigos_existentes(self, codigos: List[str]) -> set:
+        conexion = self.engine.raw_connection()
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("SELECT codigo_cliente FROM clientes WHERE codigo_cliente = ANY(%s)", (codigos,))
+            return {fila[0] for fila in cursor.fetchall()}
+        finally:
+            conexion.close()
+
+    def _copiar_con_division(self, cursor, pendientes) -> List[Tuple[int, Dict[str, Any], str]]:
+        """
+        Ejecuta COPY del lote dentro de un savepoint; si falla, divide el lote
+        a la mitad hasta aislar los registros rechazados.
+        """
+        cursor.execute("SAVEPOINT lote_dbf")
+        try:
+            copiar_filas(cursor, 'clientes', COLUMNAS_CLIENTES, [m['cliente'] for _, _, m in pendientes])
+            copiar_filas(cursor, 'cliente_telefonos', COLUMNAS_TELEFONOS, [t for _, _, m in pendientes for t in m['telefonos']])
+            copiar_filas(cursor, 'cliente_direcciones', COLUMNAS_DIRECCIONES, [d for _, _, m in pendientes for d in m['direcciones']])
+            cursor.execute("RELEASE SAVEPOINT lote_dbf")
+            return []
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT lote_dbf")
+            cursor.execute("RELEASE SAVEPOINT lote_dbf")
+            if len(pendientes) == 1:
+                indice, registro, _ = pendientes[0]
+                return [(indice, registro, f"Error de carga: {str(e).splitlines()[0]}")]
+            mitad = len(pendientes) // 2
+            return (
+                self._copiar_con_division(cursor, pendientes[:mitad]) +
+                self._copiar_con_division(cursor, pendientes[mitad:])
+            )
+
+    # ------------------------------------------------------------------
+    # Huellas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _guardar_huellas(cursor, mapeados: List[Dict[str, Any]]):
+        """Inserta o actualiza la huella de cada registro cargado"""
+        if not mapeados:
+            return
+        ahora = datetime.utcnow()
+        execute_values(cursor, """
+            INSERT INTO cliente_legado_huellas
+                (codigo_legado, cliente_id, huella, eliminado_en, created_at, updated_at)
+            VALUES %s
+            ON CONFLICT (codigo_legado) DO UPDATE SET
+                cliente_id = EXCLUDED.cliente_id,
+                huella = EXCLUDED.huella,
+                eliminado_en = NULL,
+                updated_at = EXCLUDED.updated_at
+        """, [
+            (m['cliente']['codigo_cliente'], m['cliente']['id'], m['huella'], None, ahora, ahora)
+            for m in mapeados
+        ], page_size=1000)
+
+    def _cargar_huellas(self) -> Dict[str, Tuple[str, str, bool]]:
+        """codigo_legado -> (huella, cliente_id, eliminado) leído con cursor del servidor"""
+        huellas = {}
+        conexion = self.engine.raw_connection()
+        try:
+            cursor = conexion.cursor(name='huellas_legado')
+            cursor.itersize = 50000
+            cursor.execute(
+                "SELECT codigo_legado, huella, cliente_id, eliminado_en IS NOT NULL FROM cliente_legado_huellas"
+            )
+            for codigo, huella, cliente_id, eliminado in cursor:
+                huellas[codigo] = (huella, str(cliente_id), eliminado)
+            cursor.close()
+            conexion.commit()
+        finally:
+            conexion.close()
+        return huellas
+
+    def _ids_por_codigo(self, codigos: List[str]) -> Dict[str, str]:
+        """Clientes existentes sin huella (p. ej. cargados antes de existir la tabla)"""
+        if not codigos:
+            return {}
+        conexion = self.engine.raw_connection()
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("SELECT codigo_cliente, id FROM clientes WHERE codigo_cliente = ANY(%s)", (codigos,))
+            return {codigo: str(id_) for codigo, id_ in cursor.fetchall()}
+        finally:
+            conexion.close()
+
+    # ------------------------------------------------------------------
+    # Sincronización delta
+    # ------------------------------------------------------------------
+
+    def sincronizar(
+        self,
+        ruta: str,
+        ruta_dead_letter: Optional[str] = None,
+        forzar_eliminaciones: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Aplica solo las diferencias entre el DBF y la última sincronización:
+        inserta registros nuevos, actualiza los modificados y marca los
+        eliminados. Es idempotente: una segunda ejecución sin cambios no escribe.
+        """
+        ruta = validar_ruta_local(ruta)
+        base = os.path.join(settings.DBF_IMPORT_DIR, os.path.splitext(os.path.basename(ruta))[0])
+        ruta_dead_letter = ruta_dead_letter or f"{base}.delta.rechazados.jsonl"
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_dead_letter)), exist_ok=True)
+
+        inicio = time.monotonic()
+        huellas = self._cargar_huellas()
+        logger.info(f"Sincronización delta de {ruta}: {len(huellas)} huellas cargadas")
+
+        estado = {
+            'nuevos': 0, 'modificados': 0, 'sin_cambios': 0, 'reactivados': 0,
+            'eliminados': 0, 'eliminaciones_pendientes': 0, 'rechazados': 0,
+        }
+        vistos = set()
+        procesados = 0
+
+        fd = os.open(ruta_dead_letter, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        with os.fdopen(fd, 'a', encoding='utf-8') as dead_letter:
+            nuevos: List[Tuple[int, Dict[str, Any], Dict[str, Any]]] = []
+            cambiados: List[Tuple[int, Dict[str, Any], Dict[str, Any], bool]] = []
+            for indice, registro in self.iterar_registros(ruta):
+                procesados += 1
+                codigo = _campo(registro, self.mapeo, 'codigo_cliente')
+                if not codigo:
+                    self._registrar_rechazo(dead_letter, indice, registro, "Registro sin código de cliente")
+                    estado['rechazados'] += 1
+                    continue
+                if codigo in vistos:
+                    self._registrar_rechazo(dead_letter, indice, registro, f"Código de cliente duplicado en el DBF: {codigo}")
+                    estado['rechazados'] += 1
+                    continue
+                vistos.add(codigo)
+
+                # Comparación barata antes de mapear o encriptar
+                previo = huellas.get(codigo)
+                if previo and not previo[2] and previo[0] == huella_registro(registro, self.mapeo):
+                    estado['sin_cambios'] += 1
+                    continue
+
+                try:
+                    mapeado = mapear_registro(registro, self.mapeo, datetime.utcnow())
+                except RegistroInvalidoError as e:
+                    self._registrar_rechazo(dead_letter, indice, registro, str(e))
+                    estado['rechazados'] += 1
+                    continue
+
+                if previo:
+                    asignar_cliente_id(mapeado, previo[1])
+                    cambiados.append((indice, registro, mapeado, previo[2]))
+                else:
+                    nuevos.append((indice, registro, mapeado))
+
+                if len(nuevos) + len(cambiados) >= self.tamano_lote:
+                    self._sincronizar_lote(nuevos, cambiados, estado, dead_letter)
+                    self._reportar_delta(estado, procesados, inicio)
+                    nuevos, cambiados = [], []
+
+            if nuevos or cambiados:
+                self._sincronizar_lote(nuevos, cambiados, estado, dead_letter)
+
+        # Detección de eliminaciones: códigos activos que ya no están en el DBF
+        activos = [c for c, (_, _, eliminado) in huellas.items() if not eliminado]
+        eliminados = [c for c in activos if c not in vistos]
+        proporcion = len(eliminados) / len(activos) if activos else 0
+        if eliminados and not forzar_eliminaciones and proporcion > settings.DBF_SYNC_MAX_DELETE_RATIO:
+            # Un DBF truncado o incompleto no debe inactivar media cartera
+            logger.warning(
+                f"Sincronización delta: {len(eliminados)} eliminaciones ({proporcion:.1%}) superan el "
+                f"máximo permitido ({settings.DBF_SYNC_MAX_DELETE_RATIO:.1%}); no se aplican"
+            )
+            estado['eliminaciones_pendientes'] = len(eliminados)
+        elif eliminados:
+            estado['eliminados'] = self._marcar_eliminados(eliminados)
+
+        duracion = time.monotonic() - inicio
+        reporte = {
+            **estado,
+            'archivo': ruta,
+            'procesados': procesados,
+            'duracion_segundos': round(duracion, 2),
+            'registros_por_segundo': round(procesados / duracion, 1) if duracion > 0 else None,
+            'dead_letter': ruta_dead_letter,
+        }
+        logger.info(f"Sincronización delta finalizada: {reporte}")
+        return reporte
+
+    def _reportar_delta(self, estado: Dict[str, Any], procesados: int, inicio: float):
+        duracion = time.monotonic() - inicio
+        velocidad = procesados / duracion if duracion > 0 else 0
+        logger.info(
+            f"Sincronización delta: {procesados} registros leídos, {estado['nuevos']} nuevos, "
+            f"{estado['modificados']} modificados, {estado['sin_cambios']} sin cambios "
+            f"({velocidad:.0f} registros/s)"
+        )
+
+    def _sincronizar_lote(self, nuevos, cambiados, estado: Dict[str, Any], dead_letter):
+        """Inserta los nuevos con COPY y aplica los cambios en una sola transacción"""
+        # Clientes ya cargados pero sin huella se tratan como modificados
+        existentes = self._ids_por_codigo([m['cliente']['codigo_cliente'] for _, _, m in nuevos])
+        if existentes:
+            pendientes = []
+            for indice, registro, mapeado in nuevos:
+                cliente_id = existentes.get(mapeado['cliente']['codigo_cliente'])
+                if cliente_id:
+                    asignar_cliente_id(mapeado, cliente_id)
+                    cambiados.append((indice, registro, mapeado, False))
+                else:
+                    pendientes.append((indice, registro, mapeado))
+            nuevos = pendientes
+
+        todos = [m for _, _, m in nuevos] + [m for _, _, m, _ in cambiados]
+        for mapeado, cliente in zip(todos, encriptar_en_paralelo([m['cliente'] for m in todos])):
+            mapeado['cliente'] = cliente
+
+        conexion = self.engine.raw_connection()
+        try:
+            cursor = conexion.cursor()
+            rechazados = self._copiar_con_division(cursor, nuevos) if nuevos else []
+            indices_rechazados = {r[0] for r in rechazados}
+            insertados = [m for i, _, m in nuevos if i not in indices_rechazados]
+            modificados = [m for _, _, m, _ in cambiados]
+            reactivados = [m['cliente']['id'] for _, _, m, eliminado in cambiados if eliminado]
+
+            self._aplicar_cambios(cursor, modificados, reactivados)
+            self._guardar_huellas(cursor, insertados + modificados)
+            conexion.commit()
+        except Exception:
+            conexion.rollback()
+            raise
+        finally:
+            conexion.close()
+        self._invalidar_caches([m['cliente']['id'] for m in modificados])
+
+        for indice, registro, error in rechazados:
+            self._registrar_rechazo(dead_letter, indice, registro, error)
+        estado['nuevos'] += len(insertados)
+        estado['modificados'] += len(modificados)
+        estado['reactivados'] += len(reactivados)
+        estado['rechazados'] += len(rechazados)
+
+    def _aplicar_cambios(self, cursor, modificados: List[Dict[str, Any]], reactivados: List[str]):
+        """
+        Aplica los registros modificados desde tablas temporales:
+        - clientes: UPDATE de las columnas sincronizadas (un valor vacío en el
+          legado no borra lo capturado en FinancePro)
+        - teléfonos: se agregan los números que el cliente aún no tiene
+        - dirección residencial principal: UPDATE o INSERT si no existe
+        """
+        if not modificados:
+            return
+
+        cursor.execute("CREATE TEMP TABLE tmp_delta_clientes (LIKE clientes INCLUDING DEFAULTS) ON COMMIT DROP")
+        cursor.execute("CREATE TEMP TABLE tmp_delta_telefonos (LIKE cliente_telefonos INCLUDING DEFAULTS) ON COMMIT DROP")
+        cursor.execute("CREATE TEMP TABLE tmp_delta_direcciones (LIKE cliente_direcciones INCLUDING DEFAULTS) ON COMMIT DROP")
+        copiar_filas(cursor, 'tmp_delta_clientes', COLUMNAS_CLIENTES, [m['cliente'] for m in modificados])
+        copiar_filas(cursor, 'tmp_delta_telefonos', COLUMNAS_TELEFONOS, [t for m in modificados for t in m['telefonos']])
+        copiar_filas(cursor, 'tmp_delta_direcciones', COLUMNAS_DIRECCIONES, [d for m in modificados for d in m['direcciones']])
+
+        asignaciones = ', '.join(f"{c} = COALESCE(t.{c}, c.{c})" for c in COLUMNAS_CLIENTES_SINCRONIZADAS)
+        cursor.execute(f"""
+            UPDATE clientes c SET {asignaciones}, updated_at = t.updated_at
+            FROM tmp_delta_clientes t
+            WHERE c.id = t.id
+        """)
+        # El ingreso sincronizado invalida el perfil financiero (se recalcula en la tarea nocturna)
+        cursor.execute("""
+            UPDATE cliente_perfil_financiero p SET pendiente = TRUE
+            FROM tmp_delta_clientes t
+            WHERE p.cliente_id = t.id
+        """)
+
+        cursor.execute("""
+            INSERT INTO cliente_telefonos
+                (id, cliente_id, tipo, numero, es_principal, tiene_whatsapp, created_at, updated_at, access_count)
+            SELECT t.id, t.cliente_id, t.tipo, t.numero,
+                   t.es_principal AND NOT EXISTS (
+                       SELECT 1 FROM cliente_telefonos p WHERE p.cliente_id = t.cliente_id AND p.es_principal
+                   ),
+                   t.tiene_whatsapp, t.created_at, t.updated_at, 0
+            FROM tmp_delta_telefonos t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM cliente_telefonos ct WHERE ct.cliente_id = t.cliente_id AND ct.numero = t.numero
+            )
+        """)
+
+        cursor.execute("""
+            UPDATE cliente_direcciones d SET
+                calle = t.calle, barriada = t.barriada, ciudad = t.ciudad,
+                estado = t.estado, updated_at = t.updated_at
+            FROM tmp_delta_direcciones t
+            WHERE d.cliente_id = t.cliente_id AND d.tipo = 'RESIDENCIAL' AND d.es_principal
+        """)
+        cursor.execute("""
+            INSERT INTO cliente_direcciones
+                (id, cliente_id, tipo, calle, barriada, ciudad, estado, pais,
+                 es_principal, es_facturacion, created_at, updated_at, access_count)
+            SELECT t.id, t.cliente_id, t.tipo, t.calle, t.barriada, t.ciudad, t.estado, t.pais,
+                   NOT EXISTS (SELECT 1 FROM cliente_direcciones p WHERE p.cliente_id = t.cliente_id AND p.es_principal),
+                   t.es_facturacion, t.created_at, t.updated_at, 0
+            FROM tmp_delta_direcciones t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM cliente_direcciones d
+                WHERE d.cliente_id = t.cliente_id AND d.tipo = 'RESIDENCIAL' AND d.es_principal
+            )
+        """)
+
+        if reactivados:
+            cursor.execute("""
+                UPDATE clientes SET estado_cliente = 'ACTIVO', is_active = TRUE, updated_at = %s
+                WHERE id = ANY(%s::uuid[]) AND estado_cliente = 'INACTIVO'
+            """, (datetime.utcnow(), reactivados))
+
+    @staticmethod
+    def _invalidar_caches(cliente_ids: List[str]):
+        """
+        Invalida los nombres y vistas 360 de los clientes escritos con SQL
+
+        Los UPDATE directos no pasan por los eventos de sesión del ORM que
+        invalidan estas cachés al confirmar.
+        """
+        if cliente_ids:
+            cliente_nombre_cache.invalidar(cliente_ids)
+            cliente_360_cache.invalidar(cliente_ids)
+
+    def _marcar_eliminados(self, codigos: List[str]) -> int:
+        """Marca las huellas como eliminadas e inactiva los clientes, por bloques"""
+        total = 0
+        conexion = self.engine.raw_connection()
+        try:
+            cursor = conexion.cursor()
+            for inicio in range(0, len(codigos), self.tamano_lote):
+                ahora = datetime.utcnow()
+                cursor.execute("""
+                    WITH eliminadas AS (
+                        UPDATE cliente_legado_huellas SET eliminado_en = %s, updated_at = %s
+                        WHERE codigo_legado = ANY(%s) AND eliminado_en IS NULL
+                        RETURNING cliente_id
+                    )
+                    UPDATE clientes c SET estado_cliente = 'INACTIVO', is_active = FALSE, updated_at = %s
+                    FROM eliminadas e
+                    WHERE c.id = e.cliente_id
+                    RETURNING c.id
+                """, (ahora, ahora, codigos[inicio:inicio + self.tamano_lote], ahora))
+                inactivados = [fila[0] for fila in cursor.fetchall()]
+                total += len(inactivados)
+                conexion.commit()
+                self._invalidar_caches(inactivados)
+        except Exception:
+            conexion.rollback()
+            raise
+        finally:
+            conexion.close()
+        logger.info(f"Sincronización delta: {total} clientes legados marcados como eliminados")
+        return total
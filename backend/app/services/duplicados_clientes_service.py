@@ -0,0 +1,536 @@
+"""
+Detección de clientes duplicados
+
+Las sucursales crean clientes repetidos (cédula con un dígito errado,
+variantes del nombre, sin codigo_cliente). Como los campos están
+encriptados, la búsqueda no se puede hacer en SQL:
+
+- Bloqueo: por cliente se calculan claves (cada identificación y sus
+  variantes con un carácter menos, que cubren un dígito cambiado, de más,
+  de menos o transpuesto; nombre y apellidos fonéticos; nombre o apellido
+  fonético con la fecha de nacimiento; teléfono) y se guardan como índice
+  ciego truncado en cliente_claves_duplicados, sin texto en claro
+- Solo se comparan los clientes que comparten alguna clave; los bloques de
+  más de DUPLICADOS_BLOQUE_MAXIMO clientes se omiten (claves poco
+  selectivas: un duplicado real comparte además otras claves)
+- Comparación por pares de nombre (palabras fonéticas y Jaro-Winkler, como
+  el cotejo de listas de control), identificación, fecha de nacimiento y
+  teléfonos; un campo ausente en alguno de los dos cuenta como neutro
+- Desencriptación, cálculo de claves y comparación por bloques en el pool
+  de procesos de exportación
+- Incremental: solo los clientes creados o modificados desde la última
+  corrida, contra los clientes que comparten sus claves. La corrida
+  completa recalcula las claves de toda la cartera y compara todos los
+  bloques
+- Candidatos en cliente_duplicados_candidatos (UPSERT); los pendientes que
+  dejan de aparecer se eliminan y los revisados se conservan
+"""
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+import re
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.core.security import data_encryption
+from app.models.secure_models import (
+    Cliente, ClienteClaveDuplicado, ClienteDuplicadoCandidato, ClienteTelefono, DuplicadoEjecucion
+)
+from app.services.export_service import repartir_en_pool
+from app.services.listas_control_service import (
+    codigo_fonetico, normalizar_identificacion, normalizar_nombre, puntuar_nombres
+)
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = 'PENDIENTE'
+ESTADOS_REVISION = ('CONFIRMADO', 'DESCARTADO')
+
+# Peso de cada campo en el puntaje; un campo ausente en alguno de los dos vale NEUTRO
+PESOS = (('NOMBRE', 0.4), ('IDENTIFICACION', 0.3), ('FECHA_NACIMIENTO', 0.2), ('TELEFONO', 0.1))
+NEUTRO = 0.5
+SIMILITUD_CRITERIO = 0.8  # Similitud mínima para informar el campo como criterio
+SIMILITUD_UNA_EDICION = 0.8  # Identificaciones a un carácter de distancia
+SIMILITUD_FECHA_PARCIAL = 0.5  # Fechas con un solo componente distinto o día y mes invertidos
+
+LARGO_MINIMO_IDENTIFICACION = 6
+DIGITOS_TELEFONO = 7  # Sin código de país ni prefijos
+LARGO_CLAVE = 32
+IDS_POR_CONSULTA = 5000
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+# Columnas que lee el pool: id, alta, activo y los campos encriptados
+COLUMNAS_CLIENTE = (
+    Cliente.id, Cliente.created_at, Cliente.is_active, Cliente._nombre, Cliente._segundo_nombre,
+    Cliente._apellido_paterno, Cliente._apellido_materno, Cliente._fecha_nacimiento, Cliente._cedula,
+    Cliente._pasaporte, Cliente._numero_identificacion,
+)
+
+SQL_BORRAR_CLAVES = text("""
+    DELETE FROM cliente_claves_duplicados
+    WHERE (cliente_id, clave) IN (
+        SELECT * FROM unnest(CAST(:ids AS uuid[]), CAST(:claves AS varchar[]))
+    )
+""")
+
+# Pendientes que esta corrida ya no encontró (todos o los de los clientes procesados)
+SQL_DESCARTAR_OBSOLETOS = text("""
+    DELETE FROM cliente_duplicados_candidatos
+    WHERE estado = 'PENDIENTE' AND actualizado_en < :inicio
+""")
+SQL_DESCARTAR_OBSOLETOS_CLIENTES = text("""
+    DELETE FROM cliente_duplicados_candidatos
+    WHERE estado = 'PENDIENTE' AND actualizado_en < :inicio
+      AND (cliente_id = ANY(CAST(:ids AS uuid[])) OR duplicado_id = ANY(CAST(:ids AS uuid[])))
+""")
+
+# (fecha de alta, palabras del nombre, códigos fonéticos, fecha de nacimiento,
+#  identificaciones, teléfonos)
+Rasgos = Tuple[datetime, Tuple[str, ...], Tuple[str, ...], Optional[date], frozenset, frozenset]
+
+
+# ----------------------------------------------------------------------
+# Claves de bloqueo y comparación
+# ----------------------------------------------------------------------
+
+def _desencriptar(valor: Optional[str]) -> Optional[str]:
+    """Desencripta un valor, retornando el original si no está encriptado"""
+    if not valor:
+        return None
+    try:
+        return data_encryption.decrypt(valor)
+    except Exception:
+        return valor
+
+
+def _parsear_fecha(valor: Optional[str]) -> Optional[date]:
+    """Fecha desencriptada en cualquiera de los formatos aceptados por el modelo"""
+    if not valor:
+        return None
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def normalizar_telefono(numero: Optional[str]) -> Optional[str]:
+    """Últimos DIGITOS_TELEFONO dígitos (sin código de país, prefijos ni separadores)"""
+    digitos = re.sub(r'\D', '', numero or '')
+    return digitos[-DIGITOS_TELEFONO:] if len(digitos) >= DIGITOS_TELEFONO else None
+
+
+def claves_bloqueo(
+    nombre: List[str],
+    apellido_paterno: List[str],
+    apellido_materno: List[str],
+    fecha_nacimiento: Optional[date],
+    identificaciones: Iterable[str],
+    telefonos: Iterable[str],
+) -> set:
+    """Claves de bloqueo del cliente como índice ciego truncado"""
+    claves = set()
+    for identificacion in identificaciones:
+        if len(identificacion) < LARGO_MINIMO_IDENTIFICACION:
+            continue
+        claves.add(f'I:{identificacion}')
+        claves.update(f'I:{identificacion[:i]}{identificacion[i + 1:]}' for i in range(len(identificacion)))
+
+    n, p, m = (codigo_fonetico(palabras[0]) if palabras else None for palabras in (nombre, apellido_paterno, apellido_materno))
+    if n and p:
+        claves.add(f'NP:{n}:{p}')
+        if m:
+            claves.add(f'NPM:{n}:{p}:{m}')
+    if fecha_nacimiento:
+        fecha = fecha_nacimiento.strftime('%Y%m%d')
+        if n:
+            claves.add(f'NF:{n}:{fecha}')
+        if p:
+            claves.add(f'PF:{p}:{fecha}')
+    claves.update(f'T:{t}' for t in telefonos)
+    return {data_encryption.blind_index(c)[:LARGO_CLAVE] for c in claves}
+
+
+def _a_una_edicion(a: str, b: str) -> bool:
+    """Distancia de Damerau-Levenshtein (restringida) de a lo sumo 1"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diferencias = [i for i, (x, y) in enumerate(zip(a, b)) if x != y]
+        if len(diferencias) <= 1:
+            return True
+        i, j = diferencias[0], diferencias[-1]
+        return len(diferencias) == 2 and j == i + 1 and a[i] == b[j] and a[j] == b[i]
+    corto, largo = sorted((a, b), key=len)
+    return any(largo[:i] + largo[i + 1:] == corto for i in range(len(largo)))
+
+
+def _similitud_identificacion(a: frozenset, b: frozenset) -> Optional[float]:
+    if not a or not b:
+        return None
+    if a & b:
+        return 1.0
+    return SIMILITUD_UNA_EDICION if any(_a_una_edicion(x, y) for x in a for y in b) else 0.0
+
+
+def _similitud_fecha(a: Optional[date], b: Optional[date]) -> Optional[float]:
+    if not a or not b:
+        return None
+    if a == b:
+        return 1.0
+    distintos = (a.year != b.year) + (a.month != b.month) + (a.day != b.day)
+    invertida = a.year == b.year and a.month == b.day and a.day == b.month
+    return SIMILITUD_FECHA_PARCIAL if distintos == 1 or invertida else 0.0
+
+
+def comparar(a: Rasgos, b: Rasgos) -> Tuple[int, List[str]]:
+    """Puntaje 0-100 de que dos clientes sean la misma persona y campos coincidentes"""
+    _, palabras_a, codigos_a, fecha_a, ids_a, telefonos_a = a
+    _, palabras_b, codigos_b, fecha_b, ids_b, telefonos_b = b
+    similitudes = {
+        'NOMBRE': (
+            puntuar_nombres(palabras_a, codigos_a, palabras_b, codigos_b)
+            + puntuar_nombres(palabras_b, codigos_b, palabras_a, codigos_a)
+        ) / 200 if palabras_a and palabras_b else None,
+        'IDENTIFICACION': _similitud_identificacion(ids_a, ids_b),
+        'FECHA_NACIMIENTO': _similitud_fecha(fecha_a, fecha_b),
+        'TELEFONO': (1.0 if telefonos_a & telefonos_b else 0.0) if telefonos_a and telefonos_b else None,
+    }
+    puntaje = 100 * sum(peso * (NEUTRO if similitudes[campo] is None else similitudes[campo]) for campo, peso in PESOS)
+    criterios = [campo for campo, _ in PESOS if (similitudes[campo] or 0) >= SIMILITUD_CRITERIO]
+    return int(round(puntaje)), criterios
+
+
+# ----------------------------------------------------------------------
+# Trabajo en el pool de procesos
+# ----------------------------------------------------------------------
+
+def _firmas_bloque(args: Tuple[List[tuple], Any]) -> List[Tuple[Any, set, Optional[Rasgos]]]:
+    """
+    Desencripta un bloque de clientes y calcula sus claves y rasgos
+
+    Cada fila es COLUMNAS_CLIENTE más la lista de teléfonos; los clientes
+    inactivos no tienen claves ni rasgos.
+    """
+    filas, _ = args
+    firmas = []
+    for cliente_id, creado, activo, *encriptados, numeros in filas:
+        if not activo:
+            firmas.append((cliente_id, set(), None))
+            continue
+        nombre, segundo, paterno, materno, nacimiento, *documentos = (_desencriptar(v) for v in encriptados)
+        partes = [normalizar_nombre(v) for v in (nombre, segundo, paterno, materno)]
+        palabras = tuple(p for parte in partes for p in parte)
+        fecha = _parsear_fecha(nacimiento)
+        identificaciones = frozenset(i for i in (normalizar_identificacion(d) for d in documentos) if i)
+        telefonos = frozenset(t for t in (normalizar_telefono(n) for n in numeros) if t)
+        rasgos = (creado, palabras, tuple(codigo_fonetico(p) for p in palabras), fecha, identificaciones, telefonos)
+        claves = claves_bloqueo(partes[0], partes[2], partes[3], fecha, identificaciones, telefonos)
+        firmas.append((cliente_id, claves, rasgos))
+    return firmas
+
+
+def _comparar_bloque(args: Tuple[List[tuple], int]) -> List[Dict[str, Any]]:
+    """
+    Compara un bloque de pares (cliente_id, rasgos, duplicado_id, rasgos)
+
+    Una identificación idéntica en dos clientes siempre se informa.
+    """
+    pares, umbral = args
+    resultados = []
+    for cliente_id, rasgos_cliente, duplicado_id, rasgos_duplicado in pares:
+        puntaje, criterios = comparar(rasgos_cliente, rasgos_duplicado)
+        if rasgos_cliente[4] & rasgos_duplicado[4]:
+            puntaje = max(puntaje, umbral)
+        if puntaje >= umbral:
+            resultados.append({
+                'cliente_id': cliente_id,
+                'duplicado_id': duplicado_id,
+                'puntaje': puntaje,
+                'criterios': ','.join(criterios) or None,
+            })
+    return resultados
+
+
+# ----------------------------------------------------------------------
+# Servicio
+# ----------------------------------------------------------------------
+
+class DuplicadosClientesService:
+    """Detección de clientes duplicados y revisión de candidatos a fusión"""
+
+    def __init__(self, db: Session, chunk_size: Optional[int] = None):
+        self.db = db
+        self.chunk_size = chunk_size or settings.DUPLICADOS_LOTE
+
+    def detectar(self, completo: bool = False) -> Dict[str, Any]:
+        """
+        Detecta pares de clientes duplicados y guarda los candidatos
+
+        Sin corrida previa finalizada la detección es completa.
+        """
+        reloj = time.monotonic()
+        marca = None if completo else self._marca_incremental()
+        ejecucion = DuplicadoEjecucion(modo='INCREMENTAL' if marca else 'COMPLETA', iniciada_en=datetime.utcnow())
+        self.db.add(ejecucion)
+        self.db.commit()
+        inicio = ejecucion.iniciada_en
+        totales: Counter = Counter()
+
+        # 1. Claves de los clientes (toda la cartera o los modificados)
+        rasgos: Dict[Any, Rasgos] = {}
+        procesados: List[Any] = []
+        for clientes in self._iterar_clientes(desde=marca):
+            firmas = repartir_en_pool(_firmas_bloque, self._con_telefonos(clientes))
+            self._actualizar_claves(firmas)
+            self.db.commit()
+            procesados.extend(f[0] for f in firmas)
+            rasgos.update((f[0], f[2]) for f in firmas if f[2] is not None)
+
+        # 2. Pares de los bloques con algún cliente procesado
+        ids, pares = self._pares(None if marca is None else list(rasgos), totales)
+
+        # 3. Rasgos de los clientes de esos bloques que no se procesaron
+        faltantes = [ids[n] for n in {n for par in pares for n in (par >> 32, par & 0xFFFFFFFF)} if ids[n] not in rasgos]
+        for inicio_lote in range(0, len(faltantes), self.chunk_size):
+            parte = faltantes[inicio_lote:inicio_lote + self.chunk_size]
+            clientes = [tuple(f) for f in self.db.query(*COLUMNAS_CLIENTE).filter(Cliente.id.in_(parte))]
+            for cliente_id, _, datos in repartir_en_pool(_firmas_bloque, self._con_telefonos(clientes)):
+                if datos is not None:
+                    rasgos[cliente_id] = datos
+
+        # 4. Comparación y UPSERT de los candidatos
+        umbral = settings.DUPLICADOS_UMBRAL
+        bloque = []
+        for par in pares:
+            a, b = ids[par >> 32], ids[par & 0xFFFFFFFF]
+            if a not in rasgos or b not in rasgos:
+                continue
+            # El registro más antiguo es el que se sugiere conservar
+            if (rasgos[b][0], str(b)) < (rasgos[a][0], str(a)):
+                a, b = b, a
+            bloque.append((a, rasgos[a], b, rasgos[b]))
+            if len(bloque) >= self.chunk_size:
+                self._comparar(bloque, umbral, totales)
+                bloque = []
+        if bloque:
+            self._comparar(bloque, umbral, totales)
+
+        # 5. Pendientes que ya no aparecen
+        if marca is None:
+            self.db.execute(SQL_DESCARTAR_OBSOLETOS, {'inicio': inicio})
+        else:
+            for inicio_lote in range(0, len(procesados), IDS_POR_CONSULTA):
+                parte = [str(i) for i in procesados[inicio_lote:inicio_lote + IDS_POR_CONSULTA]]
+                self.db.execute(SQL_DESCARTAR_OBSOLETOS_CLIENTES, {'inicio': inicio, 'ids': parte})
+
+        nuevos = self.db.query(func.count(ClienteDuplicadoCandidato.id)).filter(
+            ClienteDuplicadoCandidato.detectado_en >= inicio
+        ).scalar()
+        ejecucion.finalizada_en = datetime.utcnow()
+        ejecucion.clientes_procesados = len(procesados)
+        ejecucion.bloques = totales['bloques']
+        ejecucion.bloques_omitidos = totales['bloques_omitidos']
+        ejecucion.pares_comparados = totales['pares']
+        ejecucion.candidatos_nuevos = nuevos
+        self.db.commit()
+
+        resumen = {
+            'modo': ejecucion.modo,
+            'clientes_procesados': len(procesados),
+            'bloques': totales['bloques'],
+            'bloques_omitidos': totales['bloques_omitidos'],
+            'pares_comparados': totales['pares'],
+            'candidatos': totales['candidatos'],
+            'candidatos_nuevos': nuevos,
+            'duracion_segundos': round(time.monotonic() - reloj, 2),
+        }
+        logger.info(f"Detección de clientes duplicados: {resumen}")
+        return resumen
+
+    def _marca_incremental(self) -> Optional[datetime]:
+        """Inicio de la última corrida finalizada, con solapamiento para transacciones tardías"""
+        ultima = self.db.query(DuplicadoEjecucion.iniciada_en).filter(
+            DuplicadoEjecucion.finalizada_en.isnot(None)
+        ).order_by(DuplicadoEjecucion.iniciada_en.desc()).limit(1).scalar()
+        if ultima is None:
+            return None
+        return ultima - timedelta(seconds=settings.DUPLICADOS_SOLAPAMIENTO_SEGUNDOS)
+
+    def _iterar_clientes(self, desde: Optional[datetime] = None) -> Iterator[List[tuple]]:
+        """
+        Clientes por bloques, paginando por id (sin cursor abierto entre commits)
+
+        Incluye los inactivos para retirar sus claves.
+        """
+        ultimo = None
+        while True:
+            query = self.db.query(*COLUMNAS_CLIENTE)
+            if desde is not None:
+                query = query.filter(Cliente.updated_at >= desde)
+            if ultimo is not None:
+                query = query.filter(Cliente.id > ultimo)
+            bloque = [tuple(f) for f in query.order_by(Cliente.id).limit(self.chunk_size)]
+            if not bloque:
+                return
+            yield bloque
+            ultimo = bloque[-1][0]
+
+    def _con_telefonos(self, clientes: List[tuple]) -> List[tuple]:
+        """Agrega a cada fila la lista de teléfonos del cliente"""
+        telefonos = defaultdict(list)
+        for cliente_id, numero in self.db.query(ClienteTelefono.cliente_id, ClienteTelefono.numero).filter(
+            ClienteTelefono.cliente_id.in_([c[0] for c in clientes])
+        ):
+            telefonos[cliente_id].append(numero)
+        return [(*c, telefonos.get(c[0], [])) for c in clientes]
+
+    def _actualizar_claves(self, firmas: List[Tuple[Any, set, Optional[Rasgos]]]):
+        """Escribe solo las claves que cambiaron"""
+        existentes = defaultdict(set)
+        for cliente_id, clave in self.db.query(ClienteClaveDuplicado.cliente_id, ClienteClaveDuplicado.clave).filter(
+            ClienteClaveDuplicado.cliente_id.in_([f[0] for f in firmas])
+        ):
+            existentes[cliente_id].add(clave)
+
+        borrar, agregar = [], []
+        for cliente_id, claves, _ in firmas:
+            previas = existentes.get(cliente_id, set())
+            borrar.extend((cliente_id, clave) for clave in previas - claves)
+            agregar.extend({'cliente_id': cliente_id, 'clave': clave} for clave in claves - previas)
+
+        if borrar:
+            self.db.execute(SQL_BORRAR_CLAVES, {
+                'ids': [str(c[0]) for c in borrar], 'claves': [c[1] for c in borrar]
+            })
+        if agregar:
+            self.db.execute(insert(ClienteClaveDuplicado).on_conflict_do_nothing(), agregar)
+
+    def _bloques(self, clientes: Optional[List[Any]]) -> Iterator[Tuple[str, int, List[Any]]]:
+        """(clave, clientes del bloque, ids) de los bloques con dos o más clientes"""
+        query = self.db.query(
+            ClienteClaveDuplicado.clave, func.count(), func.array_agg(ClienteClaveDuplicado.cliente_id)
+        ).group_by(ClienteClaveDuplicado.clave).having(func.count() > 1)
+        if clientes is None:
+            yield from query.yield_per(self.chunk_size)
+            return
+
+        procesadas = aliased(ClienteClaveDuplicado)
+        vistas = set()
+        for inicio in range(0, len(clientes), IDS_POR_CONSULTA):
+            claves = select(procesadas.clave).where(
+                procesadas.cliente_id.in_(clientes[inicio:inicio + IDS_POR_CONSULTA])
+            )
+            for clave, total, miembros in query.filter(ClienteClaveDuplicado.clave.in_(claves)):
+                if clave not in vistas:
+                    vistas.add(clave)
+                    yield clave, total, miembros
+
+    def _pares(self, clientes: Optional[List[Any]], totales: Counter) -> Tuple[List[Any], set]:
+        """
+        Pares distintos de los bloques, codificados como un entero
+
+        Un mismo par suele compartir varias claves; con `clientes` solo los
+        pares con al menos uno de ellos.
+        """
+        filtro = set(clientes) if clientes is not None else None
+        numeros: Dict[Any, int] = {}
+        ids: List[Any] = []
+        pares = set()
+        for _, total, miembros in self._bloques(clientes):
+            if total > settings.DUPLICADOS_BLOQUE_MAXIMO:
+                totales['bloques_omitidos'] += 1
+                continue
+            totales['bloques'] += 1
+            posiciones = []
+            for cliente_id in miembros:
+                if cliente_id not in numeros:
+                    numeros[cliente_id] = len(ids)
+                    ids.append(cliente_id)
+                posiciones.append(numeros[cliente_id])
+            posiciones.sort()
+            for i, a in enumerate(posiciones):
+                for b in posiciones[i + 1:]:
+                    if filtro is None or ids[a] in filtro or ids[b] in filtro:
+                        pares.add(a << 32 | b)
+        return ids, pares
+
+    def _comparar(self, bloque: List[tuple], umbral: int, totales: Counter):
+        resultados = repartir_en_pool(_comparar_bloque, bloque, umbral)
+        if resultados:
+            self._guardar(resultados)
+        self.db.commit()
+        totales['pares'] += len(bloque)
+        totales['candidatos'] += len(resultados)
+
+    def _guardar(self, resultados: List[Dict[str, Any]]):
+        """UPSERT de candidatos: actualiza el puntaje sin tocar la revisión"""
+        ahora = datetime.utcnow()
+        for inicio in range(0, len(resultados), 1000):
+            stmt = insert(ClienteDuplicadoCandidato).values([
+                {**r, 'estado': PENDIENTE, 'detectado_en': ahora, 'actualizado_en': ahora}
+                for r in resultados[inicio:inicio + 1000]
+            ])
+            self.db.execute(stmt.on_conflict_do_update(
+                index_elements=['cliente_id', 'duplicado_id'],
+                set_={columna: stmt.excluded[columna] for columna in ('puntaje', 'criterios', 'actualizado_en')}
+            ))
+
+    # ------------------------------------------------------------------
+    # Consulta y revisión
+    # ------------------------------------------------------------------
+
+    def listar(
+        self,
+        estados: Optional[List[str]] = None,
+        puntaje_minimo: Optional[int] = None,
+        cliente_id=None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[ClienteDuplicadoCandidato], int]:
+        """Candidatos por puntaje descendente (por defecto, los pendientes)"""
+        query = self.db.query(ClienteDuplicadoCandidato).filter(
+            ClienteDuplicadoCandidato.estado.in_(estados or [PENDIENTE])
+        )
+        if puntaje_minimo is not None:
+            query = query.filter(ClienteDuplicadoCandidato.puntaje >= puntaje_minimo)
+        if cliente_id is not None:
+            query = query.filter(
+                (ClienteDuplicadoCandidato.cliente_id == cliente_id)
+                | (ClienteDuplicadoCandidato.duplicado_id == cliente_id)
+            )
+        total = query.count()
+        items = query.order_by(
+            ClienteDuplicadoCandidato.puntaje.desc(),
+            ClienteDuplicadoCandidato.detectado_en
+        ).offset(skip).limit(limit).all()
+        return items, total
+
+    def revisar(
+        self,
+        candidato_id,
+        estado: str,
+        usuario: str,
+        observaciones: Optional[str] = None
+    ) -> Optional[ClienteDuplicadoCandidato]:
+        """Confirma o descarta un candidato a fusión"""
+        if estado not in ESTADOS_REVISION:
+            raise ValueError(f"Estado de revisión inválido: {estado}")
+        candidato = self.db.query(ClienteDuplicadoCandidato).filter(
+            ClienteDuplicadoCandidato.id == candidato_id
+        ).first()
+        if candidato is None:
+            return None
+        candidato.estado = estado
+        candidato.revisado_por = usuario
+        candidato.revisado_en = datetime.utcnow()
+        if observaciones:
+            candidato.observaciones = observaciones
+        self.db.commit()
+        return candidato
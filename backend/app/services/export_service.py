@@ -0,0 +1,395 @@
+"""
+Servicio de exportación masiva de cartera
+
+Exporta Prestamo, Pago, Cliente y AgendaCobranza a CSV, XLSX o Parquet
+con memoria acotada sin importar la cantidad de filas:
+- Lectura con cursor del lado del servidor (yield_per)
+- Desencriptación por bloques en un pool de procesos
+- Escritura incremental (CSV en streaming, XLSX en modo write-only,
+  Parquet por row groups)
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import csv
+import enum
+import io
+import logging
+import os
+import uuid
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, Numeric, Time
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import data_encryption
+from app.models.agenda_models import AgendaCobranza
+from app.models.secure_models import Cliente, Pago, Prestamo
+
+logger = logging.getLogger(__name__)
+
+FORMATOS_EXPORTACION = ['csv', 'xlsx', 'parquet']
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Límite de filas por hoja de Excel
+MAX_FILAS_XLSX = 1048575
+
+# Definición de entidades exportables: (etiqueta, columna, encriptada)
+ENTIDADES_EXPORTABLES: Dict[str, Dict[str, Any]] = {
+    'prestamos': {
+        'modelo': Prestamo,
+        'columnas': [
+            ('id', Prestamo.id, False),
+            ('numero_prestamo', Prestamo.numero_prestamo, False),
+            ('cliente_id', Prestamo.cliente_id, False),
+            ('sucursal_id', Prestamo.sucursal_id, False),
+            ('tipo_prestamo', Prestamo.tipo_prestamo, False),
+            ('tipo_descuento_directo', Prestamo.tipo_descuento_directo, False),
+            ('modalidad_pago', Prestamo.modalidad_pago, False),
+            ('estado', Prestamo.estado, False),
+            ('monto', Prestamo.monto, False),
+            ('plazo', Prestamo.plazo, False),
+            ('tasa_interes', Prestamo.tasa_interes, False),
+            ('monto_total', Prestamo.monto_total, False),
+            ('monto_pagado', Prestamo.monto_pagado, False),
+            ('cuota_mensual', Prestamo.cuota_mensual, False),
+            ('fecha_inicio', Prestamo.fecha_inicio, False),
+            ('fecha_vencimiento', Prestamo.fecha_vencimiento, False),
+            ('entidad_empleadora', Prestamo._entidad_empleadora, True),
+            ('numero_empleado', Prestamo._numero_empleado, True),
+            ('salario_base', Prestamo._salario_base, True),
+            ('descuento_autorizado', Prestamo.descuento_autorizado, False),
+            ('porcentaje_descuento_maximo', Prestamo.porcentaje_descuento_maximo, False),
+            ('created_at', Prestamo.created_at, False),
+        ],
+        'orden': Prestamo.id,
+        'fecha': Prestamo.created_at,
+        'sucursal': Prestamo.sucursal_id,
+        'estado': Prestamo.estado,
+    },
+    'pagos': {
+        'modelo': Pago,
+        'columnas': [
+            ('id', Pago.id, False),
+            ('prestamo_id', Pago.prestamo_id, False),
+            ('usuario_id', Pago.usuario_id, False),
+            ('monto', Pago.monto, False),
+            ('fecha_pago', Pago.fecha_pago, False),
+            ('fecha_vencimiento', Pago.fecha_vencimiento, False),
+            ('estado', Pago.estado, False),
+            ('metodo_pago', Pago.metodo_pago, False),
+            ('referencia', Pago.referencia, False),
+            ('created_at', Pago.created_at, False),
+        ],
+        'orden': Pago.id,
+        'fecha': Pago.fecha_pago,
+        'sucursal': Prestamo.sucursal_id,
+        'join': Prestamo,
+        'estado': Pago.estado,
+    },
+    'clientes': {
+        'modelo': Cliente,
+        'columnas': [
+            ('id', Cliente.id, False),
+            ('codigo_cliente', Cliente.codigo_cliente, False),
+            ('nombre', Cliente._nombre, True),
+            ('segundo_nombre', Cliente._segundo_nombre, True),
+            ('apellido_paterno', Cliente._apellido_paterno, True),
+            ('apellido_materno', Cliente._apellido_materno, True),
+            ('cedula', Cliente._cedula, True),
+            ('fecha_nacimiento', Cliente._fecha_nacimiento, True),
+            ('empresa_actual', Cliente._empresa_actual, True),
+            ('ingreso_mensual', Cliente._ingreso_mensual, True),
+            ('tipo_cliente', Cliente.tipo_cliente, False),
+            ('estado_cliente', Cliente.estado_cliente, False),
+            ('risk_level', Cliente.risk_level, False),
+            ('is_active', Cliente.is_active, False),
+            ('created_at', Cliente.created_at, False),
+        ],
+        'orden': Cliente.id,
+        'fecha': Cliente.created_at,
+        'estado': Cliente.estado_cliente,
+    },
+    'agenda_cobranza': {
+        'modelo': AgendaCobranza,
+        'columnas': [
+            ('id', AgendaCobranza.id, False),
+            ('cliente_id', AgendaCobranza.cliente_id, False),
+            ('prestamo_id', AgendaCobranza.prestamo_id, False),
+            ('usuario_asignado_id', AgendaCobranza.usuario_asignado_id, False),
+            ('sucursal_id', AgendaCobranza.sucursal_id, False),
+            ('tipo_actividad', AgendaCobranza.tipo_actividad, False),
+            ('estado', AgendaCobranza.estado, False),
+            ('prioridad', AgendaCobranza.prioridad, False),
+            ('resultado', AgendaCobranza.resultado, False),
+            ('fecha_programada', AgendaCobranza.fecha_programada, False),
+            ('hora_inicio', AgendaCobranza.hora_inicio, False),
+            ('titulo', AgendaCobranza._titulo, True),
+            ('monto_gestionado', AgendaCobranza._monto_gestionado, False),
+            ('monto_prometido', AgendaCobranza._monto_prometido, False),
+            ('fecha_promesa_pago', AgendaCobranza._fecha_promesa_pago, False),
+            ('created_at', AgendaCobranza.created_at, False),
+        ],
+        'orden': AgendaCobranza.id,
+        'fecha': AgendaCobranza.fecha_programada,
+        'sucursal': AgendaCobranza.sucursal_id,
+        'estado': AgendaCobranza.estado,
+    },
+}
+
+
+def _normalizar(valor: Any) -> Any:
+    """Convierte valores no serializables (UUID, Enum) a tipos simples"""
+    if isinstance(valor, uuid.UUID):
+        return str(valor)
+    if isinstance(valor, enum.Enum):
+        return valor.value
+    return valor
+
+
+def _desencriptar_valor(valor: Any) -> Any:
+    """Desencripta un valor, retornando el original si no está encriptado"""
+    if not valor or not isinstance(valor, str):
+        return valor
+    try:
+        return data_encryption.decrypt(valor)
+    except Exception:
+        return valor
+
+
+def _procesar_bloque(args: Tuple[List[tuple], Tuple[int, ...]]) -> List[list]:
+    """Normaliza y desencripta un bloque de filas (se ejecuta en el pool)"""
+    filas, indices_encriptados = args
+    resultado = []
+    for fila in filas:
+        valores = [_normalizar(v) for v in fila]
+        for i in indices_encriptados:
+            valores[i] = _desencriptar_valor(valores[i])
+        resultado.append(valores)
+    return resultado
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _obtener_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool de procesos compartido para desencriptación (None = en línea)"""
+    global _pool
+    if settings.EXPORT_DECRYPT_WORKERS <= 1:
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.EXPORT_DECRYPT_WORKERS)
+    return _pool
+
+
+def repartir_en_pool(funcion: Callable[[tuple], list], bloque: List, contexto: Any = None) -> list:
+    """
+    Reparte un bloque en el pool de procesos y concatena los resultados en orden
+
+    `funcion` debe ser de nivel de módulo (serializable) y recibir la tupla
+    (parte del bloque, contexto).
+    """
+    pool = _obtener_pool()
+    if pool is None:
+        return funcion((bloque, contexto))
+    workers = settings.EXPORT_DECRYPT_WORKERS
+    tamano = max(1, -(-len(bloque) // workers))
+    partes = [(bloque[i:i + tamano], contexto) for i in range(0, len(bloque), tamano)]
+    resultado: list = []
+    for parte in pool.map(funcion, partes):
+        resultado.extend(parte)
+    return resultado
+
+
+def desencriptar_bloque(bloque: List[tuple], indices_encriptados: Tuple[int, ...]) -> List[list]:
+    """Normaliza y desencripta un bloque repartiéndolo en el pool de procesos"""
+    if not indices_encriptados:
+        return _procesar_bloque((bloque, indices_encriptados))
+    return repartir_en_pool(_procesar_bloque, bloque, indices_encriptados)
+
+
+class ExportService:
+    """Servicio para exportaciones masivas en streaming"""
+
+    def __init__(self, db: Session, chunk_size: Optional[int] = None):
+        self.db = db
+        self.chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def columnas(self, entidad: str) -> List[str]:
+        """Nombres de columnas de la exportación"""
+        return [c[0] for c in self._definicion(entidad)['columnas']]
+
+    def iterar_bloques(
+        self,
+        entidad: str,
+        filtros: Optional[Dict[str, Any]] = None
+    ) -> Iterator[List[list]]:
+        """Itera la entidad en bloques ya normalizados y desencriptados"""
+        definicion = self._definicion(entidad)
+        columnas = definicion['columnas']
+        indices_encriptados = tuple(i for i, c in enumerate(columnas) if c[2])
+
+        query = self.db.query(*[c[1] for c in columnas])
+        if definicion.get('join') is not None:
+            query = query.join(definicion['join'])
+        query = self._aplicar_filtros(query, definicion, filtros or {})
+        query = query.order_by(definicion['orden']).yield_per(self.chunk_size)
+
+        bloque: List[tuple] = []
+        for fila in query:
+            bloque.append(tuple(fila))
+            if len(bloque) >= self.chunk_size:
+                yield desencriptar_bloque(bloque, indices_encriptados)
+                bloque = []
+        if bloque:
+            yield desencriptar_bloque(bloque, indices_encriptados)
+
+    def _definicion(self, entidad: str) -> Dict[str, Any]:
+        definicion = ENTIDADES_EXPORTABLES.get(entidad)
+        if not definicion:
+            raise ValueError(f"Entidad de exportación no válida: {entidad}")
+        return definicion
+
+    def _aplicar_filtros(self, query, definicion: Dict[str, Any], filtros: Dict[str, Any]):
+        if filtros.get('sucursal_id'):
+            if definicion.get('sucursal') is None:
+                raise ValueError("La entidad no admite filtro por sucursal")
+            query = query.filter(definicion['sucursal'] == filtros['sucursal_id'])
+        if filtros.get('estado') and definicion.get('estado') is not None:
+            query = query.filter(definicion['estado'] == filtros['estado'])
+        if filtros.get('fecha_desde'):
+            query = query.filter(definicion['fecha'] >= filtros['fecha_desde'])
+        if filtros.get('fecha_hasta'):
+            query = query.filter(definicion['fecha'] <= filtros['fecha_hasta'])
+        return query
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def generar_csv(self, entidad: str, filtros: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+        """Genera el CSV por bloques, apto para StreamingResponse"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.columnas(entidad))
+        yield buffer.getvalue().encode('utf-8-sig')
+
+        for bloque in self.iterar_bloques(entidad, filtros):
+            buffer.seek(0)
+            buffer.truncate(0)
+            writer.writerows(bloque)
+            yield buffer.getvalue().encode('utf-8')
+
+    def exportar_a_archivo(
+        self,
+        entidad: str,
+        formato: str,
+        ruta_destino: str,
+        filtros: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Escribe la exportación completa en un archivo"""
+        if formato not in FORMATOS_EXPORTACION:
+            raise ValueError(f"Formato de exportación no válido: {formato}")
+
+        inicio = datetime.utcnow()
+        if formato == 'csv':
+            total = self._escribir_csv(entidad, ruta_destino, filtros)
+        elif formato == 'xlsx':
+            total = self._escribir_xlsx(entidad, ruta_destino, filtros)
+        else:
+            total = self._escribir_parquet(entidad, ruta_destino, filtros)
+
+        duracion = (datetime.utcnow() - inicio).total_seconds()
+        logger.info(f"Exportación {entidad}.{formato}: {total} filas en {duracion:.1f}s")
+
+        return {
+            'entidad': entidad,
+            'formato': formato,
+            'archivo': ruta_destino,
+            'filas': total,
+            'bytes': os.path.getsize(ruta_destino),
+            'duracion_segundos': round(duracion, 2)
+        }
+
+    def _escribir_csv(self, entidad: str, ruta: str, filtros) -> int:
+        total = 0
+        with open(ruta, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columnas(entidad))
+            for bloque in self.iterar_bloques(entidad, filtros):
+                writer.writerows(bloque)
+                total += len(bloque)
+        return total
+
+    def _escribir_xlsx(self, entidad: str, ruta: str, filtros) -> int:
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        encabezados = self.columnas(entidad)
+        hoja = workbook.create_sheet(title=entidad[:31])
+        hoja.append(encabezados)
+        filas_hoja = 0
+        total = 0
+
+        for bloque in self.iterar_bloques(entidad, filtros):
+            for fila in bloque:
+                if filas_hoja >= MAX_FILAS_XLSX:
+                    hoja = workbook.create_sheet(title=f"{entidad[:27]}_{total // MAX_FILAS_XLSX + 1}")
+                    hoja.append(encabezados)
+                    filas_hoja = 0
+                hoja.append(fila)
+                filas_hoja += 1
+            total += len(bloque)
+
+        workbook.save(ruta)
+        return total
+
+    def _escribir_parquet(self, entidad: str, ruta: str, filtros) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        definicion = self._definicion(entidad)
+        schema = pa.schema([
+            (etiqueta, self._tipo_arrow(pa, columna, encriptada))
+            for etiqueta, columna, encriptada in definicion['columnas']
+        ])
+
+        total = 0
+        with pq.ParquetWriter(ruta, schema, compression='snappy') as writer:
+            for bloque in self.iterar_bloques(entidad, filtros):
+                arrays = [
+                    pa.array([fila[i] for fila in bloque], type=campo.type)
+                    for i, campo in enumerate(schema)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                total += len(bloque)
+        return total
+
+    @staticmethod
+    def _tipo_arrow(pa, columna, encriptada: bool):
+        """Tipo Arrow equivalente al tipo SQLAlchemy de la columna"""
+        if encriptada:
+            return pa.string()
+        tipo = columna.type
+        if isinstance(tipo, Boolean):
+            return pa.bool_()
+        if isinstance(tipo, Integer):
+            return pa.int64()
+        if isinstance(tipo, Numeric):
+            return pa.decimal128(tipo.precision or 18, tipo.scale or 2)
+        if isinstance(tipo, DateTime):
+            return pa.timestamp('us')
+        if isinstance(tipo, Date):
+            return pa.date32()
+        if isinstance(tipo, Time):
+            return pa.time64('us')
+        return pa.string()
@@ -0,0 +1,316 @@
+"""
+Índice espacial de sucursales y direcciones de clientes
+
+- Haversine vectorizado (NumPy) para distancias punto a punto y matrices
+  de distancias completas
+- IndiceEspacial: rejilla de celdas en grados; una consulta por radio solo
+  evalúa los puntos de las celdas que cubren el círculo, y k vecinos amplía
+  el radio hasta reunir k candidatos
+- ServicioEspacial: mantiene un índice de sucursales y otro de direcciones
+  por proceso. Las direcciones se actualizan de forma incremental por
+  updated_at (con solapamiento) y se reconstruyen completas periódicamente,
+  lo que descarta las filas eliminadas; las sucursales se recargan completas
+  en cada refresco (son pocas)
+
+La rejilla no contempla el cruce del antimeridiano (irrelevante en Panamá).
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.secure_models import ClienteDireccion, Prestamo, Sucursal
+
+logger = logging.getLogger(__name__)
+
+RADIO_TIERRA_KM = 6371.0
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180
+# Mitad de la circunferencia: ningún punto está más lejos
+DISTANCIA_MAXIMA_KM = math.pi * RADIO_TIERRA_KM
+
+ESTADOS_PRESTAMO_ACTIVO = ('DESEMBOLSADO', 'VIGENTE', 'MORA')
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distancia de gran círculo en km; acepta escalares o arreglos con broadcasting"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def matriz_distancias(origenes: np.ndarray, destinos: Optional[np.ndarray] = None) -> np.ndarray:
+    """Matriz (n, m) de distancias en km entre arreglos (n, 2) y (m, 2) de (latitud, longitud)"""
+    origenes = np.asarray(origenes, dtype=float).reshape(-1, 2)
+    destinos = origenes if destinos is None else np.asarray(destinos, dtype=float).reshape(-1, 2)
+    return haversine_km(
+        origenes[:, 0:1], origenes[:, 1:2], destinos[:, 0][np.newaxis, :], destinos[:, 1][np.newaxis, :]
+    )
+
+
+class IndiceEspacial:
+    """Rejilla de celdas sobre puntos (id -> latitud, longitud, datos), segura entre hilos"""
+
+    def __init__(self, celda_grados: float):
+        self.celda_grados = celda_grados
+        self._puntos: Dict[Hashable, Tuple[float, float, Any]] = {}
+        self._celdas: Dict[Tuple[int, int], set] = {}
+        # Arreglos por celda, reconstruidos solo para las celdas modificadas
+        self._arreglos: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._puntos)
+
+    def _celda(self, latitud: float, longitud: float) -> Tuple[int, int]:
+        return math.floor(latitud / self.celda_grados), math.floor(longitud / self.celda_grados)
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+
+    def actualizar(self, puntos: Iterable[Tuple[Hashable, float, float, Any]]):
+        """Inserta o mueve puntos (id, latitud, longitud, datos)"""
+        with self._lock:
+            for punto_id, latitud, longitud, datos in puntos:
+                self._quitar(punto_id)
+                celda = self._celda(latitud, longitud)
+                self._puntos[punto_id] = (latitud, longitud, datos)
+                self._celdas.setdefault(celda, set()).add(punto_id)
+                self._arreglos.pop(celda, None)
+
+    def eliminar(self, ids: Iterable[Hashable]):
+        with self._lock:
+            for punto_id in ids:
+                self._quitar(punto_id)
+
+    def reemplazar(self, puntos: Iterable[Tuple[Hashable, float, float, Any]]):
+        """Reconstruye el índice completo"""
+        with self._lock:
+            self._puntos.clear()
+            self._celdas.clear()
+            self._arreglos.clear()
+            self.actualizar(puntos)
+
+    def _quitar(self, punto_id: Hashable):
+        anterior = self._puntos.pop(punto_id, None)
+        if anterior is None:
+            return
+        celda = self._celda(anterior[0], anterior[1])
+        miembros = self._celdas.get(celda)
+        if miembros is not None:
+            miembros.discard(punto_id)
+            if not miembros:
+                del self._celdas[celda]
+        self._arreglos.pop(celda, None)
+
+    def _arreglos_celda(self, celda: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        arreglos = self._arreglos.get(celda)
+        if arreglos is None:
+            ids = list(self._celdas[celda])
+            ids_arr = np.empty(len(ids), dtype=object)
+            ids_arr[:] = ids
+            coordenadas = np.array([self._puntos[i][:2] for i in ids], dtype=float).reshape(-1, 2)
+            arreglos = self._arreglos[celda] = (ids_arr, coordenadas)
+        return arreglos
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def en_radio(self, latitud: float, longitud: float, radio_km: float) -> List[Tuple[Hashable, float, Any]]:
+        """Puntos a radio_km o menos, ordenados por distancia: (id, distancia_km, datos)"""
+        with self._lock:
+            celdas = self._celdas_en_caja(latitud, longitud, radio_km)
+            if not celdas:
+                return []
+            partes = [self._arreglos_celda(c) for c in celdas]
+            ids = np.concatenate([p[0] for p in partes])
+            coordenadas = np.concatenate([p[1] for p in partes])
+            distancias = haversine_km(latitud, longitud, coordenadas[:, 0], coordenadas[:, 1])
+            dentro = np.flatnonzero(distancias <= radio_km)
+            orden = dentro[np.argsort(distancias[dentro], kind='stable')]
+            return [(ids[i], float(distancias[i]), self._puntos[ids[i]][2]) for i in orden]
+
+    def cercanos(
+        self, latitud: float, longitud: float, k: int, radio_max_km: Optional[float] = None
+    ) -> List[Tuple[Hashable, float, Any]]:
+        """Los k puntos más cercanos (opcionalmente dentro de radio_max_km)"""
+        limite = min(radio_max_km or DISTANCIA_MAXIMA_KM, DISTANCIA_MAXIMA_KM)
+        radio = min(self.celda_grados * KM_POR_GRADO, limite)
+        while True:
+            # Todo punto a menos de `radio` está en el resultado: si hay k, son los k más cercanos
+            encontrados = self.en_radio(latitud, longitud, radio)
+            if len(encontrados) >= k or radio >= limite or len(encontrados) == len(self):
+                return encontrados[:k]
+            radio = min(radio * 2, limite)
+
+    def _celdas_en_caja(self, latitud: float, longitud: float, radio_km: float) -> List[Tuple[int, int]]:
+        """Celdas no vacías que intersectan la caja que contiene el círculo"""
+        delta_lat = radio_km / KM_POR_GRADO
+        coseno = max(math.cos(math.radians(min(abs(latitud) + delta_lat, 90.0))), 1e-6)
+        delta_lon = min(radio_km / (KM_POR_GRADO * coseno), 180.0)
+        fila_min, col_min = self._celda(latitud - delta_lat, longitud - delta_lon)
+        fila_max, col_max = self._celda(latitud + delta_lat, longitud + delta_lon)
+
+        total = (fila_max - fila_min + 1) * (col_max - col_min + 1)
+        if total > len(self._celdas):
+            # Radio grande: es más barato filtrar las celdas ocupadas
+            return [
+                c for c in self._celdas
+                if fila_min <= c[0] <= fila_max and col_min <= c[1] <= col_max
+            ]
+        return [
+            (fila, col)
+            for fila in range(fila_min, fila_max + 1)
+            for col in range(col_min, col_max + 1)
+            if (fila, col) in self._celdas
+        ]
+
+
+class ServicioEspacial:
+    """Índices de sucursales y direcciones por proceso, con refresco incremental"""
+
+    def __init__(self, celda_grados: Optional[float] = None):
+        celda_grados = celda_grados or settings.ESPACIAL_CELDA_GRADOS
+        self.sucursales = IndiceEspacial(celda_grados)
+        self.direcciones = IndiceEspacial(celda_grados)
+        self._marca_direcciones: Optional[datetime] = None
+        self._ultimo_refresco = 0.0
+        self._ultima_reconstruccion = 0.0
+        self._lock = threading.Lock()
+
+    def refrescar(self, db: Session, forzar: bool = False):
+        """Aplica los cambios desde el último refresco (o reconstruye si corresponde)"""
+        ahora = time.monotonic()
+        with self._lock:
+            reconstruir = forzar or ahora - self._ultima_reconstruccion >= settings.ESPACIAL_RECONSTRUCCION_SEGUNDOS
+            if not reconstruir and ahora - self._ultimo_refresco < settings.ESPACIAL_REFRESCO_SEGUNDOS:
+                return
+            self._cargar_sucursales(db)
+            self._cargar_direcciones(db, completo=reconstruir)
+            self._ultimo_refresco = ahora
+            if reconstruir:
+                self._ultima_reconstruccion = ahora
+
+    def _cargar_sucursales(self, db: Session):
+        filas = db.query(Sucursal.id, Sucursal.latitud, Sucursal.longitud, Sucursal.codigo, Sucursal.nombre).filter(
+            Sucursal.is_active.is_(True), Sucursal.latitud.isnot(None), Sucursal.longitud.isnot(None)
+        )
+        self.sucursales.reemplazar(
+            (f.id, float(f.latitud), float(f.longitud), {'codigo': f.codigo, 'nombre': f.nombre}) for f in filas
+        )
+
+    def _cargar_direcciones(self, db: Session, completo: bool):
+        query = db.query(
+            ClienteDireccion.id, ClienteDireccion.cliente_id, ClienteDireccion.latitud,
+            ClienteDireccion.longitud, ClienteDireccion.updated_at
+        )
+        if not completo and self._marca_direcciones is not None:
+            # Solapamiento para no perder transacciones confirmadas con un updated_at anterior a la marca
+            query = query.filter(
+                ClienteDireccion.updated_at > self._marca_direcciones - timedelta(seconds=settings.ESPACIAL_SOLAPAMIENTO_SEGUNDOS)
+            )
+        else:
+            completo = True
+            query = query.filter(ClienteDireccion.latitud.isnot(None), ClienteDireccion.longitud.isnot(None))
+
+        marca = self._marca_direcciones
+        puntos, sin_coordenadas = [], []
+        for fila in query.yield_per(settings.EXPORT_CHUNK_SIZE):
+            if fila.updated_at and (marca is None or fila.updated_at > marca):
+                marca = fila.updated_at
+            if fila.latitud is None or fila.longitud is None:
+                sin_coordenadas.append(fila.id)
+            else:
+                puntos.append((fila.id, float(fila.latitud), float(fila.longitud), fila.cliente_id))
+
+        if completo:
+            self.direcciones.reemplazar(puntos)
+            logger.info(f"Índice espacial de direcciones reconstruido: {len(puntos)} puntos")
+        else:
+            self.direcciones.eliminar(sin_coordenadas)
+            self.direcciones.actualizar(puntos)
+        self._marca_direcciones = marca
+
+    # ------------------------------------------------------------------
+    # Consultas de negocio
+    # ------------------------------------------------------------------
+
+    def sucursales_cercanas(self, db: Session, latitud: float, longitud: float, k: int = 1) -> List[Dict[str, Any]]:
+        """Las k sucursales activas más cercanas a un punto"""
+        self.refrescar(db)
+        return [
+            {'sucursal_id': sucursal_id, 'distancia_km': round(distancia, 3), **datos}
+            for sucursal_id, distancia, datos in self.sucursales.cercanos(latitud, longitud, k)
+        ]
+
+    def clientes_en_radio(
+        self,
+        db: Session,
+        latitud: float,
+        longitud: float,
+        radio_km: float,
+        estado_prestamo: Optional[str] = None,
+        sucursal_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Clientes con alguna dirección a radio_km o menos, por distancia
+
+        Con estado_prestamo solo se incluyen clientes con préstamos en ese
+        estado; sin él se resumen sus préstamos activos. Con sucursal_id solo
+        se incluyen clientes con algún préstamo en esa sucursal y solo se
+        resumen esos préstamos.
+        """
+        self.refrescar(db)
+        clientes: Dict[Any, Dict[str, Any]] = {}
+        for direccion_id, distancia, cliente_id in self.direcciones.en_radio(latitud, longitud, radio_km):
+            # en_radio está ordenado: la primera dirección de cada cliente es la más cercana
+            if cliente_id not in clientes:
+                clientes[cliente_id] = {
+                    'cliente_id': cliente_id,
+                    'direccion_id': direccion_id,
+                    'distancia_km': round(distancia, 3),
+                    'prestamos': 0,
+                    'saldo_pendiente': 0.0,
+                }
+        if not clientes:
+            return []
+
+        query = db.query(
+            Prestamo.cliente_id, func.count(Prestamo.id), func.sum(Prestamo.monto_total - Prestamo.monto_pagado)
+        ).filter(Prestamo.cliente_id.in_(list(clientes)))
+        if estado_prestamo:
+            query = query.filter(Prestamo.estado == estado_prestamo)
+        else:
+            query = query.filter(Prestamo.estado.in_(ESTADOS_PRESTAMO_ACTIVO))
+        if sucursal_id:
+            query = query.filter(Prestamo.sucursal_id == sucursal_id)
+
+        con_prestamos = set()
+        for cliente_id, cantidad, saldo in query.group_by(Prestamo.cliente_id):
+            clientes[cliente_id]['prestamos'] = cantidad
+            clientes[cliente_id]['saldo_pendiente'] = float(saldo or 0)
+            con_prestamos.add(cliente_id)
+
+        if estado_prestamo:
+            return [c for c in clientes.values() if c['cliente_id'] in con_prestamos]
+        if sucursal_id:
+            en_sucursal = {
+                cliente_id for (cliente_id,) in db.query(Prestamo.cliente_id).filter(
+                    Prestamo.cliente_id.in_(list(clientes)),
+                    Prestamo.sucursal_id == sucursal_id
+                ).distinct()
+            }
+            return [c for c in clientes.values() if c['cliente_id'] in en_sucursal]
+        return list(clientes.values())
+
+
+# Instancia global del servicio (un índice por proceso)
+servicio_espacial = ServicioEspacial()
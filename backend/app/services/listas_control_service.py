@@ -0,0 +1,737 @@
+"""
+Cotejo de la cartera de clientes contra listas de control (PEP y sanciones)
+
+Cliente.es_pep solo refleja lo declarado en los trabajos del cliente. Este
+servicio coteja los nombres (y la identificación) de toda la cartera contra
+las listas locales de PEP y sanciones:
+
+- Normalización de nombres (sin acentos, partículas ni iniciales) y código
+  fonético por palabra adaptado al español (B/V, S/Z/C, LL/Y, H muda, letras
+  dobles, ...)
+- Índice invertido de trigramas de los códigos fonéticos de cada nombre y
+  alias de la lista; por cliente se cuentan los trigramas compartidos con
+  NumPy y solo se puntúan los nombres de la lista con al menos
+  LISTAS_CONTROL_PREFILTRO de sus trigramas presentes en el del cliente
+  (compartir solo los nombres de pila, muy repetidos, no alcanza)
+- Puntaje 0-100 por alineación de palabras (igual, igual fonéticamente o
+  Jaro-Winkler), ajustado por la fecha de nacimiento si ambas la tienen; la
+  identificación coincidente es un puntaje de 100
+- Desencriptación y cotejo por bloques en el pool de procesos de exportación
+- Incremental: contra el índice completo solo los clientes modificados desde
+  la última corrida, y toda la cartera solo contra las entradas de la lista
+  nuevas o modificadas. La corrida completa coteja todo contra todo
+- Coincidencias en cliente_coincidencias_listas (UPSERT por bloque); las
+  pendientes que dejan de aparecer se eliminan y las revisadas se conservan
+- Un evento de notificación por bloque con las coincidencias nuevas
+
+Formato de los archivos (CSV con encabezado, separador , ; | o tabulador):
+referencia, nombre, alias (separados por |), identificacion,
+fecha_nacimiento, pais y tipo (PEP o SANCION; opcional, por defecto según el
+nombre del archivo).
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import csv
+import hashlib
+import logging
+import pickle
+import re
+import time
+import unicodedata
+import uuid
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import data_encryption
+from app.models.secure_models import (
+    Cliente, ClienteCoincidenciaLista, ListaControlEjecucion, ListaControlEntrada
+)
+from app.services.export_service import repartir_en_pool
+from app.services.rabbitmq_service import RabbitMQService
+
+logger = logging.getLogger(__name__)
+
+PEP = 'PEP'
+SANCION = 'SANCION'
+PENDIENTE = 'PENDIENTE'
+ESTADOS_REVISION = ('CONFIRMADA', 'DESCARTADA')
+
+# Partículas y tratamientos que no distinguen a una persona
+PARTICULAS = frozenset({
+    'DE', 'DEL', 'LA', 'LAS', 'LOS', 'Y', 'E', 'DA', 'DI', 'DO', 'DOS', 'DAS', 'VAN', 'VON', 'DER', 'EL',
+    'SR', 'SRA', 'SRTA', 'DR', 'DRA', 'LIC', 'ING', 'VDA',
+})
+
+# Reglas en orden; las minúsculas son marcas temporales para que una regla
+# posterior no vuelva a transformar el resultado
+REGLAS_FONETICAS = tuple((re.compile(patron), reemplazo) for patron, reemplazo in (
+    (r'X', 'KS'),
+    (r'[CS]H', 'x'),
+    (r'PH', 'F'),
+    (r'LL', 'Y'),
+    (r'QU?', 'K'),
+    (r'GU(?=[EI])', 'g'),
+    (r'G(?=[EI])', 'J'),
+    (r'C(?=[EI])', 'S'),
+    (r'C', 'K'),
+    (r'Z', 'S'),
+    (r'V', 'B'),
+    (r'W', 'U'),
+    (r'H', ''),
+    (r'N(?=[BP])', 'M'),
+    (r'Y(?![AEIOU])', 'I'),
+))
+LETRAS_REPETIDAS = re.compile(r'(.)\1+')
+
+# Similitud mínima de Jaro-Winkler para que dos palabras distintas cuenten
+UMBRAL_PALABRA = 0.88
+# Pesos del puntaje: cobertura del nombre de la lista y del nombre del cliente
+PESO_LISTA = 0.7
+PESO_CLIENTE = 0.3
+FACTOR_FECHA_DISTINTA = 0.85
+BONO_FECHA_IGUAL = 10
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+SQL_COINCIDENCIAS_PREVIAS = text("""
+    SELECT cliente_id, entrada_id FROM cliente_coincidencias_listas
+    WHERE cliente_id = ANY(CAST(:ids AS uuid[]))
+""")
+
+# Pendientes de los clientes cotejados que esta corrida ya no encontró
+SQL_DESCARTAR_OBSOLETAS = text("""
+    DELETE FROM cliente_coincidencias_listas
+    WHERE estado = 'PENDIENTE' AND actualizada_en < :inicio
+      AND cliente_id = ANY(CAST(:ids AS uuid[]))
+""")
+SQL_DESCARTAR_OBSOLETAS_ENTRADAS = text("""
+    DELETE FROM cliente_coincidencias_listas
+    WHERE estado = 'PENDIENTE' AND actualizada_en < :inicio
+      AND cliente_id = ANY(CAST(:ids AS uuid[]))
+      AND entrada_id = ANY(CAST(:entradas AS uuid[]))
+""")
+
+SQL_DESACTIVAR_ENTRADAS = text("""
+    UPDATE lista_control_entradas SET activo = FALSE, actualizado_en = :ahora
+    WHERE (lista, referencia) IN (
+        SELECT * FROM unnest(CAST(:listas AS varchar[]), CAST(:referencias AS varchar[]))
+    )
+""")
+
+SQL_DESCARTAR_ENTRADAS_INACTIVAS = text("""
+    DELETE FROM cliente_coincidencias_listas c
+    USING lista_control_entradas e
+    WHERE c.entrada_id = e.id AND NOT e.activo AND c.estado = 'PENDIENTE'
+""")
+
+
+# ----------------------------------------------------------------------
+# Normalización y similitud
+# ----------------------------------------------------------------------
+
+def normalizar_nombre(nombre: Optional[str]) -> List[str]:
+    """Palabras del nombre en mayúsculas sin acentos, partículas ni iniciales"""
+    valor = unicodedata.normalize('NFKD', nombre or '').encode('ascii', 'ignore').decode().upper()
+    return [p for p in re.sub(r'[^A-Z]+', ' ', valor).split() if len(p) > 1 and p not in PARTICULAS]
+
+
+@lru_cache(maxsize=65536)
+def codigo_fonetico(palabra: str) -> str:
+    """Código fonético de una palabra normalizada (los nombres se repiten mucho)"""
+    for patron, reemplazo in REGLAS_FONETICAS:
+        palabra = patron.sub(reemplazo, palabra)
+    return LETRAS_REPETIDAS.sub(r'\1', palabra.upper())
+
+
+def normalizar_identificacion(valor: Optional[str]) -> Optional[str]:
+    """Cédula o pasaporte en mayúsculas y sin separadores"""
+    if not valor:
+        return None
+    valor = re.sub(r'[^0-9A-Z]', '', valor.upper())
+    return valor or None
+
+
+def jaro_winkler(a: str, b: str) -> float:
+    """Similitud de Jaro-Winkler (0-1)"""
+    if a == b:
+        return 1.0
+    largo_a, largo_b = len(a), len(b)
+    if not largo_a or not largo_b:
+        return 0.0
+    rango = max(largo_a, largo_b) // 2 - 1
+    usados = [False] * largo_b
+    coincidencias_a = []
+    for i, letra in enumerate(a):
+        for j in range(max(0, i - rango), min(largo_b, i + rango + 1)):
+            if not usados[j] and b[j] == letra:
+                usados[j] = True
+                coincidencias_a.append(letra)
+                break
+    m = len(coincidencias_a)
+    if not m:
+        return 0.0
+    coincidencias_b = [b[j] for j in range(largo_b) if usados[j]]
+    transposiciones = sum(x != y for x, y in zip(coincidencias_a, coincidencias_b)) / 2
+    jaro = (m / largo_a + m / largo_b + (m - transposiciones) / m) / 3
+    prefijo = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefijo += 1
+    return jaro + prefijo * 0.1 * (1 - jaro)
+
+
+def _trigramas(codigos: Iterable[str]) -> set:
+    trigramas = set()
+    for codigo in codigos:
+        relleno = f'#{codigo}#'
+        trigramas.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return trigramas
+
+
+@lru_cache(maxsize=262144)
+def _similitud_palabra(palabra_a: str, codigo_a: str, palabra_b: str, codigo_b: str) -> float:
+    if palabra_a == palabra_b:
+        return 1.0
+    if codigo_a == codigo_b:
+        return 0.95
+    similitud = jaro_winkler(palabra_a, palabra_b)
+    return similitud if similitud >= UMBRAL_PALABRA else 0.0
+
+
+def puntuar_nombres(
+    palabras_cliente: Sequence[str],
+    codigos_cliente: Sequence[str],
+    palabras_lista: Sequence[str],
+    codigos_lista: Sequence[str],
+) -> float:
+    """
+    Puntaje 0-100 entre dos nombres normalizados
+
+    Cada palabra de un nombre se alinea con la más parecida del otro; pesa
+    más cubrir el nombre de la lista (que suele ser más corto) que explicar
+    todas las palabras del cliente.
+    """
+    if not palabras_cliente or not palabras_lista:
+        return 0.0
+    matriz = [
+        [_similitud_palabra(pl, cl, pc, cc) for pc, cc in zip(palabras_cliente, codigos_cliente)]
+        for pl, cl in zip(palabras_lista, codigos_lista)
+    ]
+    cobertura_lista = sum(max(fila) for fila in matriz) / len(palabras_lista)
+    cobertura_cliente = sum(max(columna) for columna in zip(*matriz)) / len(palabras_cliente)
+    return 100 * (PESO_LISTA * cobertura_lista + PESO_CLIENTE * cobertura_cliente)
+
+
+# ----------------------------------------------------------------------
+# Índice de la lista
+# ----------------------------------------------------------------------
+
+class IndiceListas:
+    """
+    Índice invertido de trigramas fonéticos sobre nombres y alias de la lista
+
+    Las publicaciones se guardan en formato CSR (offsets + arreglo int32).
+    Se serializa una sola vez por pasada y cada proceso del pool lo
+    deserializa solo la primera vez que recibe su clave.
+    """
+
+    def __init__(self, entradas: Iterable[Tuple[Any, str, List[str], Optional[str], Optional[date]]]):
+        # entradas: (id, tipo, nombres, identificacion, fecha_nacimiento)
+        self.clave = uuid.uuid4().hex
+        self.entradas: List[Tuple[Any, str, Optional[date]]] = []
+        self.variantes: List[Tuple[int, str, Tuple[str, ...], Tuple[str, ...]]] = []
+        self.identificaciones: Dict[str, List[int]] = {}
+        vocabulario: Dict[str, int] = {}
+        publicaciones: List[List[int]] = []
+        tamanos: List[int] = []
+
+        for entrada_id, tipo, nombres, identificacion, fecha_nacimiento in entradas:
+            indice_entrada = len(self.entradas)
+            self.entradas.append((entrada_id, tipo, fecha_nacimiento))
+            if identificacion:
+                self.identificaciones.setdefault(identificacion, []).append(indice_entrada)
+            for nombre in nombres:
+                palabras = normalizar_nombre(nombre)
+                if not palabras:
+                    continue
+                codigos = tuple(codigo_fonetico(p) for p in palabras)
+                trigramas = _trigramas(codigos)
+                indice_variante = len(self.variantes)
+                self.variantes.append((indice_entrada, nombre, tuple(palabras), codigos))
+                tamanos.append(len(trigramas))
+                for trigrama in trigramas:
+                    posicion = vocabulario.get(trigrama)
+                    if posicion is None:
+                        posicion = vocabulario[trigrama] = len(publicaciones)
+                        publicaciones.append([])
+                    publicaciones[posicion].append(indice_variante)
+
+        self.vocabulario = vocabulario
+        self.offsets = np.zeros(len(publicaciones) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum([len(p) for p in publicaciones])
+        self.publicaciones = np.fromiter(
+            (v for p in publicaciones for v in p), dtype=np.int32, count=int(self.offsets[-1])
+        )
+        self.tamanos = np.asarray(tamanos, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.entradas)
+
+    def candidatos(self, trigramas: set, prefiltro: float) -> np.ndarray:
+        """Variantes con al menos la fracción `prefiltro` de sus trigramas presentes en el nombre"""
+        posiciones = [self.vocabulario[t] for t in trigramas if t in self.vocabulario]
+        if not posiciones:
+            return np.empty(0, dtype=np.int64)
+        compartidos = np.bincount(
+            np.concatenate([self.publicaciones[self.offsets[p]:self.offsets[p + 1]] for p in posiciones]),
+            minlength=len(self.tamanos)
+        )
+        return np.flatnonzero(compartidos >= prefiltro * self.tamanos)
+
+    def cotejar(
+        self,
+        nombre: Optional[str],
+        identificaciones: Sequence[str],
+        fecha_nacimiento: Optional[date],
+        umbral: float,
+        prefiltro: float,
+    ) -> List[Tuple[int, int, str, str]]:
+        """Coincidencias (índice de entrada, puntaje, tipo de coincidencia, nombre coincidente)"""
+        mejores: Dict[int, Tuple[int, str, str]] = {}
+        for identificacion in identificaciones:
+            for indice_entrada in self.identificaciones.get(identificacion, ()):
+                mejores[indice_entrada] = (100, 'IDENTIFICACION', identificacion)
+
+        palabras = normalizar_nombre(nombre)
+        if palabras:
+            codigos = [codigo_fonetico(p) for p in palabras]
+            for indice_variante in self.candidatos(_trigramas(codigos), prefiltro):
+                indice_entrada, nombre_lista, palabras_lista, codigos_lista = self.variantes[indice_variante]
+                if indice_entrada in mejores and mejores[indice_entrada][1] == 'IDENTIFICACION':
+                    continue
+                puntaje = puntuar_nombres(palabras, codigos, palabras_lista, codigos_lista)
+                fecha_lista = self.entradas[indice_entrada][2]
+                if fecha_nacimiento and fecha_lista:
+                    puntaje = min(100, puntaje + BONO_FECHA_IGUAL) if fecha_lista == fecha_nacimiento else puntaje * FACTOR_FECHA_DISTINTA
+                puntaje = int(round(puntaje))
+                if puntaje >= umbral and puntaje > mejores.get(indice_entrada, (0,))[0]:
+                    mejores[indice_entrada] = (puntaje, 'NOMBRE', nombre_lista)
+
+        return [(indice, *coincidencia) for indice, coincidencia in mejores.items()]
+
+
+# ----------------------------------------------------------------------
+# Cotejo en el pool de procesos
+# ----------------------------------------------------------------------
+
+# Índice deserializado en este proceso (solo el de la pasada en curso)
+_indices_proceso: Dict[str, IndiceListas] = {}
+
+
+def _indice_proceso(clave: str, datos: bytes) -> IndiceListas:
+    indice = _indices_proceso.get(clave)
+    if indice is None:
+        _indices_proceso.clear()
+        indice = _indices_proceso[clave] = pickle.loads(datos)
+    return indice
+
+
+def _desencriptar(valor: Optional[str]) -> Optional[str]:
+    if not valor:
+        return None
+    try:
+        return data_encryption.decrypt(valor)
+    except Exception:
+        return valor
+
+
+def _parsear_fecha(valor: Optional[str]) -> Optional[date]:
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def _cotejar_bloque(args: Tuple[List[tuple], tuple]) -> List[Dict[str, Any]]:
+    """
+    Desencripta y coteja un bloque de clientes (se ejecuta en el pool)
+
+    Cada fila es (cliente_id, nombre, segundo_nombre, apellido_paterno,
+    apellido_materno, fecha_nacimiento, cedula, pasaporte, numero_identificacion)
+    con los valores encriptados.
+    """
+    filas, (clave, datos, umbral, prefiltro) = args
+    indice = _indice_proceso(clave, datos)
+    resultados = []
+    for cliente_id, *encriptados in filas:
+        nombre, segundo, paterno, materno, nacimiento, *documentos = (_desencriptar(v) for v in encriptados)
+        nombre_completo = ' '.join(p for p in (nombre, segundo, paterno, materno) if p)
+        identificaciones = {i for i in (normalizar_identificacion(d) for d in documentos) if i}
+        for indice_entrada, puntaje, tipo_coincidencia, nombre_coincidente in indice.cotejar(
+            nombre_completo, sorted(identificaciones), _parsear_fecha(nacimiento), umbral, prefiltro
+        ):
+            entrada_id, tipo, _ = indice.entradas[indice_entrada]
+            resultados.append({
+                'cliente_id': cliente_id,
+                'entrada_id': entrada_id,
+                'tipo_lista': tipo,
+                'puntaje': puntaje,
+                'tipo_coincidencia': tipo_coincidencia,
+                'nombre_coincidente': nombre_coincidente[:500],
+            })
+    return resultados
+
+
+# ----------------------------------------------------------------------
+# Servicio
+# ----------------------------------------------------------------------
+
+class ListasControlService:
+    """Carga de listas de control, cotejo de la cartera y revisión de coincidencias"""
+
+    def __init__(
+        self,
+        db: Session,
+        chunk_size: Optional[int] = None,
+        publicador: Optional[RabbitMQService] = None
+    ):
+        self.db = db
+        self.chunk_size = chunk_size or settings.LISTAS_CONTROL_LOTE
+        self.publicador = publicador
+
+    # ------------------------------------------------------------------
+    # Carga de listas
+    # ------------------------------------------------------------------
+
+    def cargar_listas(self, directorio: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Sincroniza las entradas con los archivos del directorio de listas
+
+        Solo se escriben las entradas nuevas o con huella distinta; las que
+        ya no están en los archivos se desactivan. Si no hay archivos no se
+        desactiva nada (directorio mal configurado o no montado).
+        """
+        directorio = Path(directorio or settings.LISTAS_CONTROL_DIR)
+        archivos = sorted(directorio.glob('*.csv')) if directorio.is_dir() else []
+        if not archivos:
+            logger.warning(f"No hay archivos de listas de control en {directorio}")
+            return {'archivos': 0, 'entradas': 0, 'escritas': 0, 'desactivadas': 0}
+
+        existentes = {
+            (lista, referencia): (huella, activo)
+            for lista, referencia, huella, activo in self.db.query(
+                ListaControlEntrada.lista, ListaControlEntrada.referencia,
+                ListaControlEntrada.huella, ListaControlEntrada.activo
+            )
+        }
+        ahora = datetime.utcnow()
+        vistas = set()
+        cambios = []
+        for archivo in archivos:
+            for entrada in self._leer_archivo(archivo):
+                clave = (entrada['lista'], entrada['referencia'])
+                if clave in vistas:
+                    continue
+                vistas.add(clave)
+                if existentes.get(clave) != (entrada['huella'], True):
+                    cambios.append({**entrada, 'activo': True, 'actualizado_en': ahora})
+
+        for inicio in range(0, len(cambios), 1000):
+            stmt = insert(ListaControlEntrada).values(cambios[inicio:inicio + 1000])
+            self.db.execute(stmt.on_conflict_do_update(
+                index_elements=['lista', 'referencia'],
+                set_={c: stmt.excluded[c] for c in cambios[0] if c not in ('lista', 'referencia')}
+            ))
+
+        desactivar = [clave for clave, (_, activo) in existentes.items() if activo and clave not in vistas]
+        for inicio in range(0, len(desactivar), 1000):
+            parte = desactivar[inicio:inicio + 1000]
+            self.db.execute(SQL_DESACTIVAR_ENTRADAS, {
+                'ahora': ahora, 'listas': [c[0] for c in parte], 'referencias': [c[1] for c in parte]
+            })
+        self.db.commit()
+
+        resumen = {
+            'archivos': len(archivos),
+            'entradas': len(vistas),
+            'escritas': len(cambios),
+            'desactivadas': len(desactivar),
+        }
+        logger.info(f"Listas de control sincronizadas: {resumen}")
+        return resumen
+
+    @staticmethod
+    def _leer_archivo(archivo: Path) -> Iterator[Dict[str, Any]]:
+        lista = archivo.stem[:50]
+        tipo_archivo = PEP if lista.lower().startswith('pep') else SANCION
+        with open(archivo, encoding='utf-8-sig', newline='') as f:
+            muestra = f.read(8192)
+            f.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=',;|\t')
+            except csv.Error:
+                dialecto = csv.excel
+            lector = csv.DictReader(f, dialect=dialecto)
+            lector.fieldnames = [
+                unicodedata.normalize('NFKD', c or '').encode('ascii', 'ignore').decode().strip().lower()
+                for c in lector.fieldnames or []
+            ]
+            for fila in lector:
+                nombre = (fila.get('nombre') or '').strip()
+                if not nombre:
+                    continue
+                identificacion = normalizar_identificacion(fila.get('identificacion'))
+                tipo = (fila.get('tipo') or '').strip().upper() or tipo_archivo
+                valores = (
+                    tipo if tipo in (PEP, SANCION) else tipo_archivo,
+                    nombre[:500],
+                    (fila.get('alias') or '').strip() or None,
+                    identificacion[:100] if identificacion else None,
+                    _parsear_fecha((fila.get('fecha_nacimiento') or '').strip()),
+                    (fila.get('pais') or '').strip()[:100] or None,
+                )
+                huella = hashlib.sha256('|'.join(str(v or '') for v in valores).encode()).hexdigest()
+                referencia = (fila.get('referencia') or '').strip()[:100] or huella[:32]
+                yield {
+                    'lista': lista,
+                    'referencia': referencia,
+                    'tipo': valores[0],
+                    'nombre': valores[1],
+                    'alias': valores[2],
+                    'identificacion': valores[3],
+                    'fecha_nacimiento': valores[4],
+                    'pais': valores[5],
+                    'huella': huella,
+                }
+
+    # ------------------------------------------------------------------
+    # Cotejo
+    # ------------------------------------------------------------------
+
+    def cotejar(self, completo: bool = False, cargar: bool = True) -> Dict[str, Any]:
+        """
+        Coteja la cartera contra las listas y guarda las coincidencias
+
+        Sin corrida previa finalizada el cotejo es completo.
+        """
+        reloj = time.monotonic()
+        carga = self.cargar_listas() if cargar else None
+        marca = None if completo else self._marca_incremental()
+        ejecucion = ListaControlEjecucion(modo='INCREMENTAL' if marca else 'COMPLETA', iniciada_en=datetime.utcnow())
+        self.db.add(ejecucion)
+        self.db.commit()
+        inicio = ejecucion.iniciada_en
+
+        self.db.execute(SQL_DESCARTAR_ENTRADAS_INACTIVAS)
+        indice = self._indice()
+        totales: Counter = Counter()
+
+        if marca is None:
+            self._procesar(self._iterar_clientes(), indice, inicio, totales)
+        else:
+            # Clientes nuevos o modificados contra toda la lista
+            self._procesar(self._iterar_clientes(desde=marca), indice, inicio, totales)
+            # Toda la cartera solo contra las entradas nuevas o modificadas
+            modificadas = self._indice(desde=marca)
+            totales['entradas_modificadas'] = len(modificadas)
+            if len(modificadas):
+                entradas = [str(e[0]) for e in modificadas.entradas]
+                self._procesar(self._iterar_clientes(), modificadas, inicio, totales, entradas)
+
+        ejecucion.finalizada_en = datetime.utcnow()
+        ejecucion.entradas_activas = len(indice)
+        ejecucion.entradas_modificadas = totales['entradas_modificadas']
+        ejecucion.clientes_cotejados = totales['clientes']
+        ejecucion.coincidencias_nuevas = totales['nuevas']
+        self.db.commit()
+
+        resumen = {
+            'modo': ejecucion.modo,
+            'listas': carga,
+            'entradas_activas': len(indice),
+            'entradas_modificadas': totales['entradas_modificadas'],
+            'clientes_cotejados': totales['clientes'],
+            'coincidencias': totales['coincidencias'],
+            'coincidencias_nuevas': totales['nuevas'],
+            'duracion_segundos': round(time.monotonic() - reloj, 2),
+        }
+        logger.info(f"Cotejo de listas de control: {resumen}")
+        return resumen
+
+    def _marca_incremental(self) -> Optional[datetime]:
+        """Inicio de la última corrida finalizada, con solapamiento para transacciones tardías"""
+        ultima = self.db.query(ListaControlEjecucion.iniciada_en).filter(
+            ListaControlEjecucion.finalizada_en.isnot(None)
+        ).order_by(ListaControlEjecucion.iniciada_en.desc()).limit(1).scalar()
+        if ultima is None:
+            return None
+        return ultima - timedelta(seconds=settings.LISTAS_CONTROL_SOLAPAMIENTO_SEGUNDOS)
+
+    def _indice(self, desde: Optional[datetime] = None) -> IndiceListas:
+        query = self.db.query(
+            ListaControlEntrada.id, ListaControlEntrada.tipo, ListaControlEntrada.nombre,
+            ListaControlEntrada.alias, ListaControlEntrada.identificacion, ListaControlEntrada.fecha_nacimiento
+        ).filter(ListaControlEntrada.activo.is_(True))
+        if desde is not None:
+            query = query.filter(ListaControlEntrada.actualizado_en >= desde)
+        return IndiceListas(
+            (f.id, f.tipo, [f.nombre] + [a.strip() for a in (f.alias or '').split('|') if a.strip()],
+             f.identificacion, f.fecha_nacimiento)
+            for f in query
+        )
+
+    def _iterar_clientes(self, desde: Optional[datetime] = None) -> Iterator[List[tuple]]:
+        """Clientes activos por bloques, paginando por id (sin cursor abierto entre commits)"""
+        ultimo = None
+        while True:
+            query = self.db.query(
+                Cliente.id, Cliente._nombre, Cliente._segundo_nombre, Cliente._apellido_paterno,
+                Cliente._apellido_materno, Cliente._fecha_nacimiento, Cliente._cedula, Cliente._pasaporte,
+                Cliente._numero_identificacion
+            ).filter(Cliente.is_active.is_(True))
+            if desde is not None:
+                query = query.filter(Cliente.updated_at >= desde)
+            if ultimo is not None:
+                query = query.filter(Cliente.id > ultimo)
+            bloque = [tuple(f) for f in query.order_by(Cliente.id).limit(self.chunk_size)]
+            if not bloque:
+                return
+            yield bloque
+            ultimo = bloque[-1][0]
+
+    def _procesar(
+        self,
+        bloques: Iterator[List[tuple]],
+        indice: IndiceListas,
+        inicio: datetime,
+        totales: Counter,
+        entradas: Optional[List[str]] = None
+    ):
+        """
+        Coteja los bloques y guarda las coincidencias
+
+        `entradas` limita el descarte de pendientes obsoletas a las entradas
+        del índice parcial (el resto no se cotejó en esta pasada).
+        """
+        contexto = (
+            indice.clave, pickle.dumps(indice, protocol=pickle.HIGHEST_PROTOCOL),
+            settings.LISTAS_CONTROL_UMBRAL, settings.LISTAS_CONTROL_PREFILTRO
+        )
+        for clientes in bloques:
+            ids = [str(c[0]) for c in clientes]
+            resultados = repartir_en_pool(_cotejar_bloque, clientes, contexto) if len(indice) else []
+
+            previas = {
+                (str(cliente_id), str(entrada_id))
+                for cliente_id, entrada_id in self.db.execute(SQL_COINCIDENCIAS_PREVIAS, {'ids': ids})
+            }
+            nuevas = [r for r in resultados if (str(r['cliente_id']), str(r['entrada_id'])) not in previas]
+            if resultados:
+                self._guardar(resultados)
+            if entradas is None:
+                self.db.execute(SQL_DESCARTAR_OBSOLETAS, {'inicio': inicio, 'ids': ids})
+            else:
+                self.db.execute(SQL_DESCARTAR_OBSOLETAS_ENTRADAS, {'inicio': inicio, 'ids': ids, 'entradas': entradas})
+            self.db.commit()
+
+            totales['clientes'] += len(clientes)
+            totales['coincidencias'] += len(resultados)
+            if nuevas and self._notificar(nuevas):
+                totales['nuevas'] += len(nuevas)
+
+    def _guardar(self, resultados: List[Dict[str, Any]]):
+        """UPSERT de coincidencias: actualiza el puntaje sin tocar la revisión"""
+        ahora = datetime.utcnow()
+        stmt = insert(ClienteCoincidenciaLista).values([
+            {**r, 'estado': PENDIENTE, 'detectada_en': ahora, 'actualizada_en': ahora} for r in resultados
+        ])
+        self.db.execute(stmt.on_conflict_do_update(
+            index_elements=['cliente_id', 'entrada_id'],
+            set_={
+                columna: stmt.excluded[columna]
+                for columna in ('tipo_lista', 'puntaje', 'tipo_coincidencia', 'nombre_coincidente', 'actualizada_en')
+            }
+        ))
+
+    def _notificar(self, nuevas: List[Dict[str, Any]]) -> bool:
+        """Publica un solo evento con las coincidencias nuevas del bloque"""
+        if self.publicador is None:
+            self.publicador = RabbitMQService()
+        evento = {
+            'total': len(nuevas),
+            'por_tipo': dict(Counter(r['tipo_lista'] for r in nuevas)),
+            'coincidencias': [
+                {
+                    'cliente_id': str(r['cliente_id']),
+                    'entrada_id': str(r['entrada_id']),
+                    'tipo_lista': r['tipo_lista'],
+                    'puntaje': r['puntaje'],
+                    'tipo_coincidencia': r['tipo_coincidencia'],
+                }
+                for r in nuevas
+            ],
+        }
+        if not self.publicador.publish_notificacion_event('listas_control', evento):
+            logger.error(f"No se pudo publicar la notificación de listas de control ({len(nuevas)} coincidencias)")
+            return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Consulta y revisión
+    # ------------------------------------------------------------------
+
+    def listar(
+        self,
+        estados: Optional[List[str]] = None,
+        tipo_lista: Optional[str] = None,
+        puntaje_minimo: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[ClienteCoincidenciaLista], int]:
+        """Coincidencias por puntaje descendente (por defecto, las pendientes)"""
+        query = self.db.query(ClienteCoincidenciaLista).filter(
+            ClienteCoincidenciaLista.estado.in_(estados or [PENDIENTE])
+        )
+        if tipo_lista:
+            query = query.filter(ClienteCoincidenciaLista.tipo_lista == tipo_lista)
+        if puntaje_minimo is not None:
+            query = query.filter(ClienteCoincidenciaLista.puntaje >= puntaje_minimo)
+        total = query.count()
+        items = query.order_by(
+            ClienteCoincidenciaLista.puntaje.desc(),
+            ClienteCoincidenciaLista.detectada_en
+        ).offset(skip).limit(limit).all()
+        return items, total
+
+    def revisar(
+        self,
+        coincidencia_id,
+        estado: str,
+        usuario: str,
+        observaciones: Optional[str] = None
+    ) -> Optional[ClienteCoincidenciaLista]:
+        """Confirma o descarta una coincidencia"""
+        if estado not in ESTADOS_REVISION:
+            raise ValueError(f"Estado de revisión inválido: {estado}")
+        coincidencia = self.db.query(ClienteCoincidenciaLista).filter(
+            ClienteCoincidenciaLista.id == coincidencia_id
+        ).first()
+        if coincidencia is None:
+            return None
+        coincidencia.estado = estado
+        coincidencia.revisado_por = usuario
+        coincidencia.revisado_en = datetime.utcnow()
+        if observaciones:
+            coincidencia.observaciones = observaciones
+        self.db.commit()
+        return coincidencia
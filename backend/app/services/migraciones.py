@@ -0,0 +1,1073 @@
+"""
+Migraciones registradas para el ejecutor en línea (migration_runner)
+
+Única definición del esquema a partir de la versión 004: no hay scripts
+.sql equivalentes en migrations/ (los de 001-003 son anteriores al
+ejecutor). Se aplican con scripts/migrar.py o al arrancar la API.
+
+Todas las migraciones son idempotentes: en una base creada desde cero con
+create_all() los pasos detectan que el esquema ya existe y solo se registra
+la versión en schema_migrations.
+"""
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.services.migration_runner import Backfill, CrearIndice, Funcion, Migracion, SQL
+
+
+def _existe_tabla(tabla: str) -> str:
+    return f"SELECT to_regclass('public.{tabla}') IS NOT NULL"
+
+
+def _existe_columna(tabla: str, columna: str) -> str:
+    return (
+        "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+        f"WHERE table_name = '{tabla}' AND column_name = '{columna}')"
+    )
+
+
+def _crear_tipo(nombre: str, valores: str) -> str:
+    return f"""
+        DO $$ BEGIN
+            CREATE TYPE {nombre} AS ENUM ({valores});
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END $$
+    """
+
+
+# ----------------------------------------------------------------------
+# 003: Descuento directo en préstamos
+# ----------------------------------------------------------------------
+
+ESTADOS_PRESTAMO_SQL = (
+    "'SOLICITUD', 'EVALUACION', 'APROBADO', 'RECHAZADO', 'DESEMBOLSADO', "
+    "'VIGENTE', 'MORA', 'CANCELADO', 'REFINANCIADO', 'CASTIGADO'"
+)
+
+# Estados del esquema anterior (texto libre) al ENUM estado_prestamo
+MAPEO_ESTADO_LEGADO = f"""
+    CASE
+        WHEN upper(estado::text) IN ({ESTADOS_PRESTAMO_SQL}) THEN upper(estado::text)::estado_prestamo
+        WHEN lower(estado::text) IN ('pendiente', 'pending') THEN 'SOLICITUD'::estado_prestamo
+        WHEN lower(estado::text) IN ('aprobado', 'approved') THEN 'APROBADO'::estado_prestamo
+        WHEN lower(estado::text) IN ('rechazado', 'rejected') THEN 'RECHAZADO'::estado_prestamo
+        WHEN lower(estado::text) IN ('activo', 'active') THEN 'VIGENTE'::estado_prestamo
+        WHEN lower(estado::text) IN ('pagado', 'cancelled') THEN 'CANCELADO'::estado_prestamo
+        WHEN lower(estado::text) = 'mora' THEN 'MORA'::estado_prestamo
+        ELSE 'SOLICITUD'::estado_prestamo
+    END
+"""
+
+SI_ESTADO_ES_TEXTO = (
+    "SELECT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'prestamos' "
+    "AND column_name = 'estado' AND udt_name <> 'estado_prestamo')"
+)
+SI_ESTADO_NUEVO = _existe_columna('prestamos', 'estado_nuevo')
+SI_CHECK_ESTADO = "SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'prestamos_estado_not_null')"
+SI_ESTADO_ANTERIOR = _existe_columna('prestamos', 'estado_anterior')
+SI_PRESTAMOS = _existe_tabla('prestamos')
+
+MIGRACION_DESCUENTO_DIRECTO = Migracion(
+    version='003_add_descuento_directo_prestamos',
+    descripcion='Campos de descuento directo, ENUMs e índices de préstamos',
+    pasos=[
+        SQL(
+            'Tipos ENUM de préstamos',
+            _crear_tipo('tipo_prestamo', "'PERSONAL', 'VEHICULAR', 'HIPOTECARIO', 'COMERCIAL', 'CONSUMO', 'EDUCATIVO', 'EMERGENCIA'"),
+            _crear_tipo('tipo_descuento_directo', (
+                "'JUBILADOS', 'PAGOS_VOLUNTARIOS', 'CONTRALORIA', 'CSS', 'MEF', 'MEDUCA', 'MINSA', "
+                "'EMPRESA_PRIVADA', 'BANCO_NACIONAL', 'CAJA_AHORROS', 'OTROS_BANCOS', 'COOPERATIVAS', "
+                "'GARANTIA_HIPOTECARIA', 'GARANTIA_VEHICULAR', 'GARANTIA_FIDUCIARIA', 'GARANTIA_PRENDARIA', "
+                "'AVAL_SOLIDARIO', 'SIN_DESCUENTO'"
+            )),
+            _crear_tipo('modalidad_pago', "'DESCUENTO_DIRECTO', 'DEBITO_AUTOMATICO', 'VENTANILLA', 'TRANSFERENCIA', 'CHEQUE', 'EFECTIVO'"),
+            _crear_tipo('estado_prestamo', ESTADOS_PRESTAMO_SQL),
+        ),
+        # Columnas con DEFAULT constante: solo cambia el catálogo, sin reescribir la tabla.
+        # La unicidad de numero_prestamo se crea después con un índice concurrente.
+        SQL(
+            'Columnas de clasificación y descuento directo',
+            """
+            ALTER TABLE prestamos
+                ADD COLUMN IF NOT EXISTS tipo_prestamo tipo_prestamo NOT NULL DEFAULT 'PERSONAL',
+                ADD COLUMN IF NOT EXISTS tipo_descuento_directo tipo_descuento_directo,
+                ADD COLUMN IF NOT EXISTS modalidad_pago modalidad_pago NOT NULL DEFAULT 'VENTANILLA',
+                ADD COLUMN IF NOT EXISTS numero_prestamo VARCHAR(50),
+                ADD COLUMN IF NOT EXISTS entidad_empleadora VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS numero_empleado VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS cedula_empleado VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS cargo_empleado VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS salario_base VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS contacto_rrhh VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS telefono_rrhh VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS email_rrhh VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS observaciones TEXT,
+                ADD COLUMN IF NOT EXISTS descuento_autorizado BOOLEAN NOT NULL DEFAULT FALSE,
+                ADD COLUMN IF NOT EXISTS fecha_autorizacion_descuento TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS porcentaje_descuento_maximo NUMERIC(5, 2) NOT NULL DEFAULT 30.00
+            """,
+            si=SI_PRESTAMOS,
+        ),
+
+        # Conversión de estado (texto -> ENUM) sin ALTER COLUMN TYPE, que
+        # reescribiría la tabla con ACCESS EXCLUSIVE: columna nueva, backfill
+        # por lotes, índices concurrentes y un intercambio de nombres breve.
+        SQL(
+            'Columna estado_nuevo',
+            "ALTER TABLE prestamos ADD COLUMN IF NOT EXISTS estado_nuevo estado_prestamo",
+            si=SI_ESTADO_ES_TEXTO,
+        ),
+        Backfill(
+            'Backfill de estado_nuevo',
+            tabla='prestamos',
+            asignacion=f"estado_nuevo = {MAPEO_ESTADO_LEGADO}",
+            pendiente='estado_nuevo IS NULL',
+            si=SI_ESTADO_NUEVO,
+        ),
+        CrearIndice('idx_prestamo_estado_tmp', 'prestamos', 'estado_nuevo', si=SI_ESTADO_NUEVO),
+        CrearIndice('idx_prestamo_sucursal_estado_tmp', 'prestamos', 'sucursal_id, estado_nuevo', si=SI_ESTADO_NUEVO),
+        CrearIndice('idx_prestamo_tipo_estado_tmp', 'prestamos', 'tipo_prestamo, estado_nuevo', si=SI_ESTADO_NUEVO),
+        SQL(
+            'Intercambio de columnas de estado',
+            # Las filas escritas durante el backfill se completan bajo el lock
+            f"UPDATE prestamos SET estado_nuevo = {MAPEO_ESTADO_LEGADO} WHERE estado_nuevo IS NULL",
+            "ALTER TABLE prestamos RENAME COLUMN estado TO estado_anterior",
+            "ALTER TABLE prestamos RENAME COLUMN estado_nuevo TO estado",
+            "ALTER TABLE prestamos ALTER COLUMN estado SET DEFAULT 'SOLICITUD'",
+            "ALTER TABLE prestamos ALTER COLUMN estado_anterior DROP NOT NULL",
+            "ALTER TABLE prestamos ADD CONSTRAINT prestamos_estado_not_null CHECK (estado IS NOT NULL) NOT VALID",
+            si=SI_ESTADO_NUEVO,
+        ),
+        # VALIDATE solo toma SHARE UPDATE EXCLUSIVE; con el CHECK validado,
+        # SET NOT NULL no recorre la tabla
+        SQL(
+            'Validación de estado NOT NULL',
+            "ALTER TABLE prestamos VALIDATE CONSTRAINT prestamos_estado_not_null",
+            si=SI_CHECK_ESTADO,
+        ),
+        SQL(
+            'Estado NOT NULL',
+            "ALTER TABLE prestamos ALTER COLUMN estado SET NOT NULL",
+            "ALTER TABLE prestamos DROP CONSTRAINT prestamos_estado_not_null",
+            si=SI_CHECK_ESTADO,
+        ),
+        SQL(
+            'Eliminación de estado_anterior',
+            "ALTER TABLE prestamos DROP COLUMN estado_anterior",
+            "DROP INDEX IF EXISTS idx_prestamos_estado_nuevo",
+            "ALTER INDEX IF EXISTS idx_prestamo_estado_tmp RENAME TO idx_prestamo_estado",
+            "ALTER INDEX IF EXISTS idx_prestamo_sucursal_estado_tmp RENAME TO idx_prestamo_sucursal_estado",
+            "ALTER INDEX IF EXISTS idx_prestamo_tipo_estado_tmp RENAME TO idx_prestamo_tipo_estado",
+            si=SI_ESTADO_ANTERIOR,
+        ),
+
+        # Números de préstamo para registros existentes (secuencia: únicos por lote)
+        SQL('Secuencia de números de préstamo', "CREATE SEQUENCE IF NOT EXISTS prestamos_numero_migracion_seq", si=SI_PRESTAMOS),
+        Backfill(
+            'Backfill de numero_prestamo',
+            tabla='prestamos',
+            asignacion="""numero_prestamo = CONCAT(
+                SUBSTRING(t.tipo_prestamo::text, 1, 3), '-',
+                COALESCE((SELECT s.codigo FROM sucursales s WHERE s.id = t.sucursal_id), 'S00'), '-',
+                EXTRACT(YEAR FROM COALESCE(t.created_at, NOW()))::int, '-',
+                LPAD(nextval('prestamos_numero_migracion_seq')::text, 6, '0')
+            )""",
+            pendiente='numero_prestamo IS NULL',
+            si=SI_PRESTAMOS,
+        ),
+
+        CrearIndice('prestamos_numero_prestamo_key', 'prestamos', 'numero_prestamo', unico=True, si=SI_PRESTAMOS),
+        CrearIndice('idx_prestamo_numero', 'prestamos', 'numero_prestamo', si=SI_PRESTAMOS),
+        CrearIndice('idx_prestamo_estado', 'prestamos', 'estado', si=SI_PRESTAMOS),
+        CrearIndice('idx_prestamo_tipo', 'prestamos', 'tipo_prestamo', si=SI_PRESTAMOS),
+        CrearIndice('idx_prestamo_descuento_directo', 'prestamos', 'tipo_descuento_directo', si=SI_PRESTAMOS),
+        CrearIndice('idx_prestamo_modalidad_pago', 'prestamos', 'modalidad_pago', si=SI_PRESTAMOS),
+        CrearIndice('idx_prestamo_descuento_autorizado', 'prestamos', 'descuento_autorizado', si=SI_PRESTAMOS),
+        CrearIndice('idx_prestamo_sucursal_estado', 'prestamos', 'sucursal_id, estado', si=SI_PRESTAMOS),
+        CrearIndice('idx_prestamo_tipo_estado', 'prestamos', 'tipo_prestamo, estado', si=SI_PRESTAMOS),
+    ],
+)
+
+
+# ----------------------------------------------------------------------
+# 003: Campos PEP en cliente_trabajos
+# ----------------------------------------------------------------------
+
+SI_CLIENTE_TRABAJOS = _existe_tabla('cliente_trabajos')
+
+MIGRACION_PEP = Migracion(
+    version='003_add_pep_fields',
+    descripcion='Campos PEP (Persona Políticamente Expuesta) en cliente_trabajos',
+    # migrations/003_add_pep_fields.sql registraba la versión como '003'
+    alias=['003'],
+    pasos=[
+        SQL(
+            'Columnas PEP',
+            """
+            ALTER TABLE cliente_trabajos
+                ADD COLUMN IF NOT EXISTS es_gobierno BOOLEAN DEFAULT FALSE NOT NULL,
+                ADD COLUMN IF NOT EXISTS es_pep BOOLEAN DEFAULT FALSE NOT NULL,
+                ADD COLUMN IF NOT EXISTS tipo_entidad_publica VARCHAR(100),
+                ADD COLUMN IF NOT EXISTS nivel_cargo VARCHAR(50),
+                ADD COLUMN IF NOT EXISTS tiene_poder_decision BOOLEAN DEFAULT FALSE NOT NULL,
+                ADD COLUMN IF NOT EXISTS maneja_fondos_publicos BOOLEAN DEFAULT FALSE NOT NULL,
+                ADD COLUMN IF NOT EXISTS cargo_eleccion_popular BOOLEAN DEFAULT FALSE NOT NULL,
+                ADD COLUMN IF NOT EXISTS familiar_pep BOOLEAN DEFAULT FALSE NOT NULL,
+                ADD COLUMN IF NOT EXISTS asociado_pep BOOLEAN DEFAULT FALSE NOT NULL,
+                ADD COLUMN IF NOT EXISTS detalle_cargo_publico VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS institucion_publica VARCHAR(500),
+                ADD COLUMN IF NOT EXISTS observaciones_pep TEXT
+            """,
+            "COMMENT ON COLUMN cliente_trabajos.es_gobierno IS 'Trabaja en entidad gubernamental'",
+            "COMMENT ON COLUMN cliente_trabajos.es_pep IS 'Es Persona Políticamente Expuesta'",
+            "COMMENT ON COLUMN cliente_trabajos.tipo_entidad_publica IS 'Tipo de entidad: EJECUTIVO, LEGISLATIVO, JUDICIAL, MUNICIPAL, AUTONOMA, DESCENTRALIZADA'",
+            "COMMENT ON COLUMN cliente_trabajos.nivel_cargo IS 'Nivel del cargo: ALTO, MEDIO, OPERATIVO'",
+            "COMMENT ON COLUMN cliente_trabajos.tiene_poder_decision IS 'Tiene poder de decisión en políticas públicas'",
+            "COMMENT ON COLUMN cliente_trabajos.maneja_fondos_publicos IS 'Maneja o autoriza fondos públicos'",
+            "COMMENT ON COLUMN cliente_trabajos.cargo_eleccion_popular IS 'Cargo de elección popular'",
+            "COMMENT ON COLUMN cliente_trabajos.familiar_pep IS 'Familiar cercano de PEP'",
+            "COMMENT ON COLUMN cliente_trabajos.asociado_pep IS 'Asociado comercial de PEP'",
+            "COMMENT ON COLUMN cliente_trabajos.detalle_cargo_publico IS 'Detalle del cargo público'",
+            "COMMENT ON COLUMN cliente_trabajos.institucion_publica IS 'Nombre de la institución pública'",
+            "COMMENT ON COLUMN cliente_trabajos.observaciones_pep IS 'Observaciones sobre exposición política'",
+            si=SI_CLIENTE_TRABAJOS,
+        ),
+        CrearIndice('idx_cliente_trabajos_es_pep', 'cliente_trabajos', 'es_pep', where='es_pep = TRUE', si=SI_CLIENTE_TRABAJOS),
+        CrearIndice('idx_cliente_trabajos_es_gobierno', 'cliente_trabajos', 'es_gobierno', where='es_gobierno = TRUE', si=SI_CLIENTE_TRABAJOS),
+        CrearIndice('idx_cliente_trabajos_cargo_eleccion', 'cliente_trabajos', 'cargo_eleccion_popular', where='cargo_eleccion_popular = TRUE', si=SI_CLIENTE_TRABAJOS),
+        CrearIndice('idx_cliente_trabajos_familiar_pep', 'cliente_trabajos', 'familiar_pep', where='familiar_pep = TRUE', si=SI_CLIENTE_TRABAJOS),
+        CrearIndice('idx_cliente_trabajos_asociado_pep', 'cliente_trabajos', 'asociado_pep', where='asociado_pep = TRUE', si=SI_CLIENTE_TRABAJOS),
+        CrearIndice('idx_cliente_trabajos_tipo_entidad', 'cliente_trabajos', 'tipo_entidad_publica', where='tipo_entidad_publica IS NOT NULL', si=SI_CLIENTE_TRABAJOS),
+        CrearIndice('idx_cliente_trabajos_nivel_cargo', 'cliente_trabajos', 'nivel_cargo', where='nivel_cargo IS NOT NULL', si=SI_CLIENTE_TRABAJOS),
+        CrearIndice(
+            'idx_cliente_trabajos_riesgo_politico', 'cliente_trabajos',
+            'cliente_id, es_pep, es_gobierno, familiar_pep, asociado_pep, cargo_eleccion_popular',
+            si=SI_CLIENTE_TRABAJOS,
+        ),
+        SQL(
+            'Vista y funciones de exposición política',
+            """
+            CREATE OR REPLACE VIEW vista_clientes_pep AS
+            SELECT DISTINCT
+                c.id as cliente_id,
+                c.codigo_cliente,
+                c.nombre as nombre_cliente,
+                c.apellido_paterno,
+                c.apellido_materno,
+                ct.empresa,
+                ct.puesto,
+                ct.es_pep,
+                ct.es_gobierno,
+                ct.cargo_eleccion_popular,
+                ct.familiar_pep,
+                ct.asociado_pep,
+                ct.tipo_entidad_publica,
+                ct.nivel_cargo,
+                ct.tiene_poder_decision,
+                ct.maneja_fondos_publicos,
+                ct.institucion_publica,
+                ct.es_actual,
+                CASE
+                    WHEN ct.cargo_eleccion_popular OR (ct.es_pep AND ct.nivel_cargo = 'ALTO') THEN 'ALTO'
+                    WHEN ct.es_pep OR (ct.es_gobierno AND ct.tiene_poder_decision) THEN 'MEDIO'
+                    WHEN ct.es_gobierno OR ct.familiar_pep OR ct.asociado_pep THEN 'BAJO'
+                    ELSE 'NINGUNO'
+                END as nivel_exposicion_politica,
+                CASE
+                    WHEN ct.es_pep OR ct.cargo_eleccion_popular OR ct.maneja_fondos_publicos OR ct.tiene_poder_decision
+                    THEN TRUE
+                    ELSE FALSE
+                END as requiere_due_diligence_reforzada
+            FROM clientes c
+            INNER JOIN cliente_trabajos ct ON c.id = ct.cliente_id
+            WHERE ct.es_pep = TRUE
+               OR ct.es_gobierno = TRUE
+               OR ct.familiar_pep = TRUE
+               OR ct.asociado_pep = TRUE
+               OR ct.cargo_eleccion_popular = TRUE
+            """,
+            """
+            CREATE OR REPLACE FUNCTION obtener_nivel_exposicion_cliente(cliente_uuid UUID)
+            RETURNS TEXT AS $$
+            DECLARE
+                nivel_max TEXT := 'NINGUNO';
+            BEGIN
+                SELECT CASE
+                    WHEN bool_or(cargo_eleccion_popular) OR bool_or(es_pep AND nivel_cargo = 'ALTO') THEN 'ALTO'
+                    WHEN bool_or(es_pep) OR bool_or(es_gobierno AND tiene_poder_decision) THEN 'MEDIO'
+                    WHEN bool_or(es_gobierno) OR bool_or(familiar_pep) OR bool_or(asociado_pep) THEN 'BAJO'
+                    ELSE 'NINGUNO'
+                END INTO nivel_max
+                FROM cliente_trabajos
+                WHERE cliente_id = cliente_uuid;
+
+                RETURN COALESCE(nivel_max, 'NINGUNO');
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            """
+            CREATE OR REPLACE FUNCTION requiere_due_diligence_reforzada(cliente_uuid UUID)
+            RETURNS BOOLEAN AS $$
+            BEGIN
+                RETURN EXISTS(
+                    SELECT 1 FROM cliente_trabajos
+                    WHERE cliente_id = cliente_uuid
+                    AND (es_pep = TRUE OR cargo_eleccion_popular = TRUE OR maneja_fondos_publicos = TRUE OR tiene_poder_decision = TRUE)
+                );
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            si=SI_CLIENTE_TRABAJOS,
+        ),
+    ],
+)
+
+
+# ----------------------------------------------------------------------
+# 004 - 006
+# ----------------------------------------------------------------------
+
+MIGRACION_IDEMPOTENCIA = Migracion(
+    version='004_add_bulk_idempotency_keys',
+    descripcion='Claves de idempotencia para carga masiva de préstamos y pagos',
+    pasos=[
+        SQL(
+            'Columnas clave_idempotencia',
+            "ALTER TABLE prestamos ADD COLUMN IF NOT EXISTS clave_idempotencia VARCHAR(100)",
+            "ALTER TABLE pagos ADD COLUMN IF NOT EXISTS clave_idempotencia VARCHAR(100)",
+            "COMMENT ON COLUMN prestamos.clave_idempotencia IS 'Clave de idempotencia de carga masiva'",
+            "COMMENT ON COLUMN pagos.clave_idempotencia IS 'Clave de idempotencia de carga masiva'",
+            si=SI_PRESTAMOS,
+        ),
+        CrearIndice('prestamos_clave_idempotencia_key', 'prestamos', 'clave_idempotencia', unico=True, si=SI_PRESTAMOS),
+        CrearIndice('pagos_clave_idempotencia_key', 'pagos', 'clave_idempotencia', unico=True, si=_existe_tabla('pagos')),
+    ],
+)
+
+
+def _particionar_audit_logs(engine: Engine):
+    from app.services.audit_partition_service import AuditPartitionService
+
+    service = AuditPartitionService(engine)
+    service.migrar_tabla_heap()
+    service.asegurar_particiones()
+
+
+MIGRACION_PARTICIONES_AUDITORIA = Migracion(
+    version='005_partition_audit_logs',
+    descripcion='audit_logs particionada por mes',
+    # El intercambio de tablas toma ACCESS EXCLUSIVE sobre audit_logs
+    manual=True,
+    pasos=[
+        Funcion('Particionamiento de audit_logs', _particionar_audit_logs, si=_existe_tabla('audit_logs')),
+    ],
+)
+
+MIGRACION_HUELLAS_LEGADO = Migracion(
+    version='006_add_cliente_legado_huellas',
+    descripcion='Huellas de registros legados para sincronización delta',
+    pasos=[
+        SQL(
+            'Tabla cliente_legado_huellas',
+            """
+            CREATE TABLE IF NOT EXISTS cliente_legado_huellas (
+                codigo_legado VARCHAR(50) PRIMARY KEY,
+                cliente_id UUID NOT NULL REFERENCES clientes(id),
+                huella VARCHAR(64) NOT NULL,
+                eliminado_en TIMESTAMP NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_cliente_legado_huellas_cliente ON cliente_legado_huellas(cliente_id)",
+            si=_existe_tabla('clientes'),
+        ),
+    ],
+)
+
+
+
+# ----------------------------------------------------------------------
+# 007 - Cuotas
+# ----------------------------------------------------------------------
+
+def _generar_cuotas_existentes(engine: Engine):
+    from sqlalchemy.orm import Session
+    from app.services.cuota_service import CuotaService
+
+    with Session(bind=engine) as db:
+        CuotaService(db).generar_faltantes()
+
+
+MIGRACION_CUOTAS = Migracion(
+    version='007_add_cuotas',
+    descripcion='Tabla de cuotas por préstamo y mora desde la cuota impaga más antigua',
+    pasos=[
+        SQL(
+            'Tabla cuotas',
+            """
+            CREATE TABLE IF NOT EXISTS cuotas (
+                id UUID PRIMARY KEY,
+                prestamo_id UUID NOT NULL REFERENCES prestamos(id) ON DELETE CASCADE,
+                numero INTEGER NOT NULL,
+                fecha_vencimiento DATE NOT NULL,
+                monto_capital NUMERIC(12, 2) NOT NULL,
+                monto_interes NUMERIC(12, 2) NOT NULL,
+                monto_seguro NUMERIC(12, 2) NOT NULL DEFAULT 0,
+                monto_cargos NUMERIC(12, 2) NOT NULL DEFAULT 0,
+                monto_cuota NUMERIC(12, 2) NOT NULL,
+                saldo_capital NUMERIC(12, 2) NOT NULL,
+                monto_pagado NUMERIC(12, 2) NOT NULL DEFAULT 0,
+                estado VARCHAR(20) NOT NULL DEFAULT 'PENDIENTE',
+                fecha_pago TIMESTAMP NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                created_by UUID NULL REFERENCES usuarios(id),
+                updated_by UUID NULL REFERENCES usuarios(id)
+            )
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_cuota_prestamo_numero ON cuotas(prestamo_id, numero)",
+            "CREATE INDEX IF NOT EXISTS idx_cuota_estado_vencimiento ON cuotas(estado, fecha_vencimiento)",
+            """
+            CREATE INDEX IF NOT EXISTS idx_cuota_impaga_prestamo
+            ON cuotas(prestamo_id, fecha_vencimiento) WHERE estado <> 'PAGADA'
+            """,
+            si=SI_PRESTAMOS,
+        ),
+        SQL(
+            'Columna fecha_primera_cuota_impaga',
+            "ALTER TABLE prestamos ADD COLUMN IF NOT EXISTS fecha_primera_cuota_impaga DATE",
+            "COMMENT ON COLUMN prestamos.fecha_primera_cuota_impaga IS 'Vencimiento de la cuota impaga más antigua'",
+            si=SI_PRESTAMOS,
+        ),
+        CrearIndice(
+            'idx_prestamo_primera_cuota_impaga', 'prestamos', 'fecha_primera_cuota_impaga', si=SI_PRESTAMOS
+        ),
+        Funcion('Cuotas de préstamos existentes', _generar_cuotas_existentes, si=SI_PRESTAMOS),
+    ],
+)
+
+MIGRACION_TRANSICIONES_ESTADO = Migracion(
+    version='008_add_prestamo_transiciones',
+    descripcion='Resumen de transiciones nocturnas de estado e índice por estado y cuota impaga',
+    pasos=[
+        SQL(
+            'Tabla prestamo_transiciones_ejecuciones',
+            """
+            CREATE TABLE IF NOT EXISTS prestamo_transiciones_ejecuciones (
+                id BIGSERIAL PRIMARY KEY,
+                fecha_corte DATE NOT NULL,
+                iniciado_en TIMESTAMP NOT NULL,
+                finalizado_en TIMESTAMP NOT NULL,
+                duracion_segundos NUMERIC(10, 3) NOT NULL,
+                curados INTEGER NOT NULL DEFAULT 0,
+                a_mora INTEGER NOT NULL DEFAULT 0,
+                castigados INTEGER NOT NULL DEFAULT 0,
+                eventos_publicados BOOLEAN NOT NULL DEFAULT FALSE
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_transiciones_ejecuciones_fecha
+            ON prestamo_transiciones_ejecuciones(fecha_corte)
+            """,
+        ),
+        CrearIndice(
+            'idx_prestamo_estado_primera_impaga', 'prestamos', 'estado, fecha_primera_cuota_impaga',
+            si=SI_PRESTAMOS
+        ),
+        SQL(
+            'Índice idx_prestamo_primera_cuota_impaga reemplazado',
+            "DROP INDEX CONCURRENTLY IF EXISTS idx_prestamo_primera_cuota_impaga",
+            transaccional=False,
+        ),
+    ],
+)
+
+MIGRACION_CARTERA_SNAPSHOTS = Migracion(
+    version='009_add_cartera_snapshots',
+    descripcion='Fotografías diarias de antigüedad de cartera',
+    pasos=[
+        SQL(
+            'Tabla cartera_antiguedad_diaria',
+            """
+            CREATE TABLE IF NOT EXISTS cartera_antiguedad_diaria (
+                fecha_corte DATE NOT NULL,
+                sucursal_id UUID NOT NULL REFERENCES sucursales(id),
+                tipo_prestamo VARCHAR(30) NOT NULL,
+                tipo_descuento_directo VARCHAR(30) NOT NULL,
+                tramo VARCHAR(20) NOT NULL,
+                prestamos INTEGER NOT NULL,
+                monto NUMERIC(16, 2) NOT NULL,
+                saldo_pendiente NUMERIC(16, 2) NOT NULL,
+                saldo_vencido NUMERIC(16, 2) NOT NULL,
+                PRIMARY KEY (fecha_corte, sucursal_id, tipo_prestamo, tipo_descuento_directo, tramo)
+            )
+            """,
+        ),
+        SQL(
+            'Tabla cartera_mora_diaria',
+            """
+            CREATE TABLE IF NOT EXISTS cartera_mora_diaria (
+                fecha_corte DATE NOT NULL,
+                prestamo_id UUID NOT NULL,
+                numero_prestamo VARCHAR(50),
+                cliente_id UUID NOT NULL,
+                sucursal_id UUID NOT NULL,
+                tipo_prestamo VARCHAR(30) NOT NULL,
+                tipo_descuento_directo VARCHAR(30),
+                modalidad_pago VARCHAR(30) NOT NULL,
+                estado VARCHAR(20) NOT NULL,
+                monto NUMERIC(12, 2) NOT NULL,
+                saldo_pendiente NUMERIC(12, 2) NOT NULL,
+                saldo_vencido NUMERIC(12, 2) NOT NULL,
+                cuotas_vencidas INTEGER NOT NULL,
+                cuota_mensual NUMERIC(12, 2) NOT NULL,
+                fecha_vencimiento TIMESTAMP NOT NULL,
+                dias_mora INTEGER NOT NULL,
+                tramo VARCHAR(20) NOT NULL,
+                descuento_autorizado BOOLEAN NOT NULL,
+                prestamo_creado_en TIMESTAMP NOT NULL,
+                PRIMARY KEY (fecha_corte, prestamo_id)
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_cartera_mora_fecha_dias
+            ON cartera_mora_diaria(fecha_corte, dias_mora)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_cartera_mora_fecha_sucursal_dias
+            ON cartera_mora_diaria(fecha_corte, sucursal_id, dias_mora)
+            """,
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 010 - Aplicación de pagos
+# ----------------------------------------------------------------------
+
+SI_PAGOS = _existe_tabla('pagos')
+
+MIGRACION_APLICACION_PAGOS = Migracion(
+    version='010_add_pago_aplicacion',
+    descripcion='Aplicación de pagos a cuotas',
+    pasos=[
+        SQL(
+            'Columnas de imputación en pagos',
+            "ALTER TABLE pagos ADD COLUMN IF NOT EXISTS origen VARCHAR(30)",
+            "ALTER TABLE pagos ADD COLUMN IF NOT EXISTS monto_cargos NUMERIC(12, 2) NOT NULL DEFAULT 0",
+            "ALTER TABLE pagos ADD COLUMN IF NOT EXISTS monto_interes NUMERIC(12, 2) NOT NULL DEFAULT 0",
+            "ALTER TABLE pagos ADD COLUMN IF NOT EXISTS monto_capital NUMERIC(12, 2) NOT NULL DEFAULT 0",
+            "ALTER TABLE pagos ADD COLUMN IF NOT EXISTS monto_excedente NUMERIC(12, 2) NOT NULL DEFAULT 0",
+            "COMMENT ON COLUMN pagos.origen IS 'Origen del pago: CAJA, CONTRALORIA, CSS, MEF...'",
+            si=SI_PAGOS,
+        ),
+        SQL(
+            'Tabla pago_cuotas',
+            """
+            CREATE TABLE IF NOT EXISTS pago_cuotas (
+                pago_id UUID NOT NULL REFERENCES pagos(id) ON DELETE CASCADE,
+                cuota_id UUID NOT NULL REFERENCES cuotas(id) ON DELETE CASCADE,
+                monto_cargos NUMERIC(12, 2) NOT NULL,
+                monto_interes NUMERIC(12, 2) NOT NULL,
+                monto_capital NUMERIC(12, 2) NOT NULL,
+                PRIMARY KEY (pago_id, cuota_id)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_pago_cuota_cuota ON pago_cuotas(cuota_id)",
+            si=SI_PAGOS,
+        ),
+        CrearIndice(
+            'idx_pago_origen_referencia', 'pagos', 'origen, referencia',
+            unico=True, where='origen IS NOT NULL', si=SI_PAGOS
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 011 - Índice ciego de cédula del empleado
+# ----------------------------------------------------------------------
+
+def _indexar_cedulas_empleado(engine: Engine, todas: bool = False):
+    """
+    Calcula cedula_empleado_hash de los préstamos por lotes de id
+
+    Por defecto solo los préstamos sin índice; con todas=True se recalculan
+    todos (cambio de normalización del índice ciego).
+    """
+    from app.core.security import data_encryption
+
+    pendiente = "" if todas else "AND cedula_empleado_hash IS NULL"
+    seleccion = text(f"""
+        SELECT id, cedula_empleado FROM prestamos
+        WHERE id > CAST(:desde AS uuid) AND cedula_empleado IS NOT NULL {pendiente}
+        ORDER BY id
+        LIMIT :lote
+    """)
+    actualizacion = text("UPDATE prestamos SET cedula_empleado_hash = :hash WHERE id = :id")
+    desde = '00000000-0000-0000-0000-000000000000'
+    while True:
+        with engine.begin() as conn:
+            filas = conn.execute(seleccion, {'desde': desde, 'lote': settings.MIGRATION_BACKFILL_BATCH_SIZE}).all()
+            if not filas:
+                break
+            valores = []
+            for id_, cedula in filas:
+                try:
+                    valores.append({'id': id_, 'hash': data_encryption.blind_index(data_encryption.decrypt(cedula))})
+                except ValueError:
+                    continue  # Valor no desencriptable: se deja sin índice
+            if valores:
+                conn.execute(actualizacion, valores)
+        desde = str(filas[-1][0])
+        time.sleep(settings.MIGRATION_BACKFILL_PAUSE_SECONDS)
+
+
+MIGRACION_CEDULA_EMPLEADO_HASH = Migracion(
+    version='011_add_prestamo_cedula_hash',
+    descripcion='Índice ciego de la cédula del empleado en préstamos',
+    pasos=[
+        SQL(
+            'Columna cedula_empleado_hash',
+            "ALTER TABLE prestamos ADD COLUMN IF NOT EXISTS cedula_empleado_hash VARCHAR(64)",
+            "COMMENT ON COLUMN prestamos.cedula_empleado_hash IS 'Índice ciego de la cédula del empleado'",
+            si=SI_PRESTAMOS,
+        ),
+        CrearIndice('ix_prestamos_cedula_empleado_hash', 'prestamos', 'cedula_empleado_hash', si=SI_PRESTAMOS),
+        Funcion('Backfill de cedula_empleado_hash', _indexar_cedulas_empleado, si=SI_PRESTAMOS),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 012 - Numeradores de préstamos y solicitudes
+# ----------------------------------------------------------------------
+
+SI_SOLICITUDES = _existe_tabla('cliente_solicitudes')
+
+MIGRACION_NUMERADORES = Migracion(
+    version='012_add_numeradores',
+    descripcion='Numeradores de préstamos y solicitudes',
+    pasos=[
+        SQL(
+            'Tabla numeradores',
+            """
+            CREATE TABLE IF NOT EXISTS numeradores (
+                clave VARCHAR(50) PRIMARY KEY,
+                ultimo BIGINT NOT NULL DEFAULT 0
+            )
+            """,
+            "COMMENT ON COLUMN numeradores.clave IS 'Prefijo del número, p. ej. PER-001-2026'",
+            "COMMENT ON COLUMN numeradores.ultimo IS 'Último correlativo reservado'",
+        ),
+        # Los contadores continúan después del mayor correlativo ya emitido
+        SQL(
+            'Numeradores de préstamos existentes',
+            """
+            INSERT INTO numeradores (clave, ultimo)
+            SELECT substring(numero_prestamo FROM '^(.+)-[0-9]{6}$'),
+                   MAX(substring(numero_prestamo FROM '-([0-9]{6})$')::bigint)
+            FROM prestamos
+            WHERE numero_prestamo ~ '^.+-[0-9]{6}$'
+            GROUP BY 1
+            ON CONFLICT (clave) DO UPDATE SET ultimo = GREATEST(numeradores.ultimo, EXCLUDED.ultimo)
+            """,
+            si=SI_PRESTAMOS,
+        ),
+        SQL(
+            'Numeradores de solicitudes existentes',
+            """
+            INSERT INTO numeradores (clave, ultimo)
+            SELECT substring(numero_solicitud FROM '^(SOL-[0-9]{8})-'),
+                   MAX(substring(numero_solicitud FROM '^SOL-[0-9]{8}-([0-9]+)$')::bigint)
+            FROM cliente_solicitudes
+            WHERE numero_solicitud ~ '^SOL-[0-9]{8}-[0-9]+$'
+            GROUP BY 1
+            ON CONFLICT (clave) DO UPDATE SET ultimo = GREATEST(numeradores.ultimo, EXCLUDED.ultimo)
+            """,
+            si=SI_SOLICITUDES,
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 013 - Perfil financiero materializado de clientes
+# ----------------------------------------------------------------------
+
+SI_CLIENTES = _existe_tabla('clientes')
+
+MIGRACION_PERFIL_FINANCIERO = Migracion(
+    version='013_add_cliente_perfil_financiero',
+    descripcion='Perfil financiero materializado de clientes',
+    pasos=[
+        SQL(
+            'Tabla cliente_perfil_financiero',
+            """
+            CREATE TABLE IF NOT EXISTS cliente_perfil_financiero (
+                cliente_id UUID PRIMARY KEY REFERENCES clientes(id) ON DELETE CASCADE,
+                ingresos_totales NUMERIC(14, 2),
+                ingresos_alquiler NUMERIC(14, 2) NOT NULL DEFAULT 0,
+                gastos_fijos NUMERIC(14, 2) NOT NULL DEFAULT 0,
+                capacidad_pago NUMERIC(14, 2),
+                patrimonio_total NUMERIC(16, 2) NOT NULL DEFAULT 0,
+                valor_vehiculos NUMERIC(16, 2) NOT NULL DEFAULT 0,
+                valor_neto_propiedades NUMERIC(16, 2) NOT NULL DEFAULT 0,
+                saldo_promedio_cuentas NUMERIC(16, 2) NOT NULL DEFAULT 0,
+                total_obligaciones_vigentes NUMERIC(16, 2) NOT NULL DEFAULT 0,
+                cuotas_mensuales_obligaciones NUMERIC(14, 2) NOT NULL DEFAULT 0,
+                obligaciones_vigentes INTEGER NOT NULL DEFAULT 0,
+                pendiente BOOLEAN NOT NULL DEFAULT FALSE,
+                calculado_en TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            "COMMENT ON COLUMN cliente_perfil_financiero.ingresos_totales IS 'Ingresos mensuales (incluye alquileres)'",
+            "COMMENT ON COLUMN cliente_perfil_financiero.gastos_fijos IS 'Vivienda, obligaciones, vehículos e hipotecas'",
+            "COMMENT ON COLUMN cliente_perfil_financiero.capacidad_pago IS '30% de los ingresos disponibles'",
+            "COMMENT ON COLUMN cliente_perfil_financiero.pendiente IS 'Datos de origen modificados desde el último cálculo'",
+            """
+            CREATE INDEX IF NOT EXISTS idx_perfil_financiero_pendiente
+            ON cliente_perfil_financiero(cliente_id) WHERE pendiente
+            """,
+            si=SI_CLIENTES,
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 014 - Cumplimiento documental de clientes
+# ----------------------------------------------------------------------
+
+MIGRACION_CUMPLIMIENTO_DOCUMENTAL = Migracion(
+    version='014_add_cliente_cumplimiento_documental',
+    descripcion='Cumplimiento documental de clientes',
+    pasos=[
+        SQL(
+            'Tabla cliente_cumplimiento_documental',
+            """
+            CREATE TABLE IF NOT EXISTS cliente_cumplimiento_documental (
+                cliente_id UUID PRIMARY KEY REFERENCES clientes(id) ON DELETE CASCADE,
+                estado VARCHAR(20) NOT NULL,
+                fecha_vencimiento_cedula DATE,
+                dias_para_vencimiento_cedula INTEGER,
+                cedula_vigente BOOLEAN,
+                fecha_vencimiento_pasaporte DATE,
+                pasaporte_vigente BOOLEAN,
+                documentos_total INTEGER NOT NULL DEFAULT 0,
+                documentos_verificados INTEGER NOT NULL DEFAULT 0,
+                documentos_vencidos INTEGER NOT NULL DEFAULT 0,
+                documentos_por_vencer INTEGER NOT NULL DEFAULT 0,
+                porcentaje_completo INTEGER NOT NULL DEFAULT 0,
+                obligatorios_faltantes VARCHAR(500),
+                proximo_vencimiento DATE,
+                revisado_en TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            "COMMENT ON COLUMN cliente_cumplimiento_documental.estado IS 'AL_DIA, POR_VENCER, INCOMPLETO, VENCIDO'",
+            "COMMENT ON COLUMN cliente_cumplimiento_documental.fecha_vencimiento_cedula IS 'NULL si no está registrada o no se pudo interpretar'",
+            "COMMENT ON COLUMN cliente_cumplimiento_documental.documentos_total IS 'Versiones actuales'",
+            "COMMENT ON COLUMN cliente_cumplimiento_documental.obligatorios_faltantes IS 'Tipos de documento separados por coma'",
+            "COMMENT ON COLUMN cliente_cumplimiento_documental.proximo_vencimiento IS 'Vencimiento más cercano (cédula, pasaporte o documento)'",
+            """
+            CREATE INDEX IF NOT EXISTS idx_cumplimiento_estado_vencimiento
+            ON cliente_cumplimiento_documental(estado, proximo_vencimiento)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_cumplimiento_proximo_vencimiento
+            ON cliente_cumplimiento_documental(proximo_vencimiento) WHERE estado <> 'AL_DIA'
+            """,
+            si=SI_CLIENTES,
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 015 - Refresco incremental del índice espacial de direcciones
+# ----------------------------------------------------------------------
+
+SI_CLIENTE_DIRECCIONES = _existe_tabla('cliente_direcciones')
+
+MIGRACION_INDICE_ESPACIAL = Migracion(
+    version='015_add_direccion_updated_at_index',
+    descripcion='Índice de actualización de direcciones para el índice espacial',
+    pasos=[
+        CrearIndice('idx_direccion_actualizacion', 'cliente_direcciones', 'updated_at', si=SI_CLIENTE_DIRECCIONES),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 016 - Orden de ruta de visitas en la agenda de cobranza
+# ----------------------------------------------------------------------
+
+SI_AGENDA_COBRANZA = _existe_tabla('agenda_cobranza')
+
+MIGRACION_ORDEN_RUTA = Migracion(
+    version='016_add_agenda_orden_ruta',
+    descripcion='Orden de ruta de visitas domiciliarias en la agenda de cobranza',
+    pasos=[
+        SQL(
+            'Columna orden_ruta',
+            "ALTER TABLE agenda_cobranza ADD COLUMN IF NOT EXISTS orden_ruta INTEGER",
+            "COMMENT ON COLUMN agenda_cobranza.orden_ruta IS 'Posición en la ruta de visitas del día (NULL si no planificada)'",
+            si=SI_AGENDA_COBRANZA,
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 017 - Listas de control (PEP y sanciones)
+# ----------------------------------------------------------------------
+
+MIGRACION_LISTAS_CONTROL = Migracion(
+    version='017_add_listas_control',
+    descripcion='Listas de control PEP y sanciones, coincidencias de clientes y corridas del cotejo',
+    pasos=[
+        SQL(
+            'Tabla lista_control_entradas',
+            """
+            CREATE TABLE IF NOT EXISTS lista_control_entradas (
+                id UUID PRIMARY KEY,
+                lista VARCHAR(50) NOT NULL,
+                tipo VARCHAR(20) NOT NULL,
+                referencia VARCHAR(100) NOT NULL,
+                nombre VARCHAR(500) NOT NULL,
+                alias TEXT,
+                identificacion VARCHAR(100),
+                fecha_nacimiento DATE,
+                pais VARCHAR(100),
+                huella VARCHAR(64) NOT NULL,
+                activo BOOLEAN NOT NULL DEFAULT TRUE,
+                actualizado_en TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            "COMMENT ON COLUMN lista_control_entradas.lista IS 'Nombre del archivo de origen'",
+            "COMMENT ON COLUMN lista_control_entradas.tipo IS 'PEP o SANCION'",
+            "COMMENT ON COLUMN lista_control_entradas.huella IS 'SHA-256 del contenido de la fila'",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_lista_control_referencia ON lista_control_entradas(lista, referencia)",
+            "CREATE INDEX IF NOT EXISTS idx_lista_control_actualizacion ON lista_control_entradas(actualizado_en)",
+        ),
+        SQL(
+            'Tabla cliente_coincidencias_listas',
+            """
+            CREATE TABLE IF NOT EXISTS cliente_coincidencias_listas (
+                id UUID PRIMARY KEY,
+                cliente_id UUID NOT NULL REFERENCES clientes(id) ON DELETE CASCADE,
+                entrada_id UUID NOT NULL REFERENCES lista_control_entradas(id) ON DELETE CASCADE,
+                tipo_lista VARCHAR(20) NOT NULL,
+                puntaje INTEGER NOT NULL,
+                tipo_coincidencia VARCHAR(20) NOT NULL,
+                nombre_coincidente VARCHAR(500),
+                estado VARCHAR(20) NOT NULL DEFAULT 'PENDIENTE',
+                observaciones TEXT,
+                revisado_por VARCHAR(100),
+                revisado_en TIMESTAMP,
+                detectada_en TIMESTAMP NOT NULL DEFAULT NOW(),
+                actualizada_en TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            "COMMENT ON COLUMN cliente_coincidencias_listas.puntaje IS 'Similitud 0-100'",
+            "COMMENT ON COLUMN cliente_coincidencias_listas.tipo_coincidencia IS 'NOMBRE o IDENTIFICACION'",
+            "COMMENT ON COLUMN cliente_coincidencias_listas.estado IS 'PENDIENTE, CONFIRMADA o DESCARTADA'",
+            "COMMENT ON COLUMN cliente_coincidencias_listas.actualizada_en IS 'Último cotejo que la encontró'",
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_coincidencia_cliente_entrada
+            ON cliente_coincidencias_listas(cliente_id, entrada_id)
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_coincidencia_estado_puntaje ON cliente_coincidencias_listas(estado, puntaje)",
+            "CREATE INDEX IF NOT EXISTS idx_coincidencia_entrada ON cliente_coincidencias_listas(entrada_id)",
+            si=SI_CLIENTES,
+        ),
+        SQL(
+            'Tabla lista_control_ejecuciones',
+            """
+            CREATE TABLE IF NOT EXISTS lista_control_ejecuciones (
+                id UUID PRIMARY KEY,
+                modo VARCHAR(20) NOT NULL,
+                iniciada_en TIMESTAMP NOT NULL DEFAULT NOW(),
+                finalizada_en TIMESTAMP,
+                entradas_activas INTEGER NOT NULL DEFAULT 0,
+                entradas_modificadas INTEGER NOT NULL DEFAULT 0,
+                clientes_cotejados INTEGER NOT NULL DEFAULT 0,
+                coincidencias_nuevas INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_lista_ejecucion_finalizada ON lista_control_ejecuciones(finalizada_en)",
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 018 - Detección de clientes duplicados
+# ----------------------------------------------------------------------
+
+MIGRACION_DUPLICADOS_CLIENTES = Migracion(
+    version='018_add_duplicados_clientes',
+    descripcion='Claves de bloqueo, candidatos a fusión y corridas de la detección de clientes duplicados',
+    pasos=[
+        SQL(
+            'Tabla cliente_claves_duplicados',
+            """
+            CREATE TABLE IF NOT EXISTS cliente_claves_duplicados (
+                cliente_id UUID NOT NULL REFERENCES clientes(id) ON DELETE CASCADE,
+                clave VARCHAR(32) NOT NULL,
+                PRIMARY KEY (cliente_id, clave)
+            )
+            """,
+            "COMMENT ON COLUMN cliente_claves_duplicados.clave IS 'HMAC truncado de la clave de bloqueo'",
+            "CREATE INDEX IF NOT EXISTS idx_clave_duplicado_clave ON cliente_claves_duplicados(clave)",
+            si=SI_CLIENTES,
+        ),
+        SQL(
+            'Tabla cliente_duplicados_candidatos',
+            """
+            CREATE TABLE IF NOT EXISTS cliente_duplicados_candidatos (
+                id UUID PRIMARY KEY,
+                cliente_id UUID NOT NULL REFERENCES clientes(id) ON DELETE CASCADE,
+                duplicado_id UUID NOT NULL REFERENCES clientes(id) ON DELETE CASCADE,
+                puntaje INTEGER NOT NULL,
+                criterios VARCHAR(100),
+                estado VARCHAR(20) NOT NULL DEFAULT 'PENDIENTE',
+                observaciones TEXT,
+                revisado_por VARCHAR(100),
+                revisado_en TIMESTAMP,
+                detectado_en TIMESTAMP NOT NULL DEFAULT NOW(),
+                actualizado_en TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            "COMMENT ON COLUMN cliente_duplicados_candidatos.cliente_id IS 'Registro más antiguo (sugerido como el que se conserva)'",
+            "COMMENT ON COLUMN cliente_duplicados_candidatos.puntaje IS 'Similitud 0-100'",
+            """
+            COMMENT ON COLUMN cliente_duplicados_candidatos.criterios
+            IS 'Campos coincidentes: NOMBRE, IDENTIFICACION, FECHA_NACIMIENTO, TELEFONO'
+            """,
+            "COMMENT ON COLUMN cliente_duplicados_candidatos.estado IS 'PENDIENTE, CONFIRMADO o DESCARTADO'",
+            "COMMENT ON COLUMN cliente_duplicados_candidatos.actualizado_en IS 'Última detección que lo encontró'",
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_duplicado_par
+            ON cliente_duplicados_candidatos(cliente_id, duplicado_id)
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_duplicado_estado_puntaje ON cliente_duplicados_candidatos(estado, puntaje)",
+            "CREATE INDEX IF NOT EXISTS idx_duplicado_duplicado ON cliente_duplicados_candidatos(duplicado_id)",
+            si=SI_CLIENTES,
+        ),
+        SQL(
+            'Tabla cliente_duplicados_ejecuciones',
+            """
+            CREATE TABLE IF NOT EXISTS cliente_duplicados_ejecuciones (
+                id UUID PRIMARY KEY,
+                modo VARCHAR(20) NOT NULL,
+                iniciada_en TIMESTAMP NOT NULL DEFAULT NOW(),
+                finalizada_en TIMESTAMP,
+                clientes_procesados INTEGER NOT NULL DEFAULT 0,
+                bloques INTEGER NOT NULL DEFAULT 0,
+                bloques_omitidos INTEGER NOT NULL DEFAULT 0,
+                pares_comparados INTEGER NOT NULL DEFAULT 0,
+                candidatos_nuevos INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_duplicado_ejecucion_finalizada ON cliente_duplicados_ejecuciones(finalizada_en)",
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 019 - Scoring de riesgo por lotes
+# ----------------------------------------------------------------------
+
+MIGRACION_RIESGO_PUNTAJES = Migracion(
+    version='019_add_riesgo_puntajes',
+    descripcion='Puntaje de riesgo en clientes y préstamos e historial de calificaciones',
+    pasos=[
+        SQL(
+            'Columna clientes.puntaje_riesgo',
+            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS puntaje_riesgo INTEGER",
+            "COMMENT ON COLUMN clientes.puntaje_riesgo IS 'Probabilidad de incumplimiento estimada (0-100), mantenida por riesgo_service'",
+            si=SI_CLIENTES,
+        ),
+        SQL(
+            'Columna prestamos.puntaje_riesgo',
+            "ALTER TABLE prestamos ADD COLUMN IF NOT EXISTS puntaje_riesgo INTEGER",
+            "COMMENT ON COLUMN prestamos.puntaje_riesgo IS 'Probabilidad de incumplimiento estimada (0-100), mantenida por riesgo_service'",
+            si=SI_PRESTAMOS,
+        ),
+        SQL(
+            'Tabla riesgo_puntajes_historial',
+            """
+            CREATE TABLE IF NOT EXISTS riesgo_puntajes_historial (
+                id UUID PRIMARY KEY,
+                entidad VARCHAR(20) NOT NULL,
+                entidad_id UUID NOT NULL,
+                puntaje INTEGER NOT NULL,
+                nivel VARCHAR(20) NOT NULL,
+                puntaje_anterior INTEGER,
+                nivel_anterior VARCHAR(20),
+                factores VARCHAR(200),
+                version_modelo VARCHAR(50) NOT NULL,
+                calculado_en TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            "COMMENT ON COLUMN riesgo_puntajes_historial.entidad IS 'CLIENTE o PRESTAMO'",
+            "COMMENT ON COLUMN riesgo_puntajes_historial.factores IS 'Variables que más aportan al riesgo'",
+            """
+            CREATE INDEX IF NOT EXISTS idx_riesgo_historial_entidad
+            ON riesgo_puntajes_historial(entidad, entidad_id, calculado_en)
+            """,
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 020 - Transición DESEMBOLSADO -> VIGENTE
+# ----------------------------------------------------------------------
+
+MIGRACION_TRANSICION_DESEMBOLSADOS = Migracion(
+    version='020_add_transicion_desembolsados',
+    descripcion='Conteo de préstamos desembolsados que pasan a VIGENTE en cada ejecución',
+    pasos=[
+        SQL(
+            'Columna prestamo_transiciones_ejecuciones.activados',
+            "ALTER TABLE prestamo_transiciones_ejecuciones ADD COLUMN IF NOT EXISTS activados INTEGER NOT NULL DEFAULT 0",
+            "COMMENT ON COLUMN prestamo_transiciones_ejecuciones.activados IS 'DESEMBOLSADO -> VIGENTE'",
+        ),
+    ],
+)
+
+# ----------------------------------------------------------------------
+# 021 - Índice ciego de cédula con segmentos
+# ----------------------------------------------------------------------
+
+MIGRACION_CEDULA_HASH_SEGMENTOS = Migracion(
+    version='021_reindex_prestamo_cedula_hash',
+    descripcion='Recalcula el índice ciego de la cédula del empleado conservando los guiones entre segmentos',
+    pasos=[
+        Funcion(
+            'Recálculo de cedula_empleado_hash',
+            lambda engine: _indexar_cedulas_empleado(engine, todas=True),
+            si=_existe_columna('prestamos', 'cedula_empleado_hash'),
+        ),
+    ],
+)
+
+MIGRACIONES = [
+    MIGRACION_DESCUENTO_DIRECTO,
+    MIGRACION_PEP,
+    MIGRACION_IDEMPOTENCIA,
+    MIGRACION_PARTICIONES_AUDITORIA,
+    MIGRACION_HUELLAS_LEGADO,
+    MIGRACION_CUOTAS,
+    MIGRACION_TRANSICIONES_ESTADO,
+    MIGRACION_CARTERA_SNAPSHOTS,
+    MIGRACION_APLICACION_PAGOS,
+    MIGRACION_CEDULA_EMPLEADO_HASH,
+    MIGRACION_NUMERADORES,
+    MIGRACION_PERFIL_FINANCIERO,
+    MIGRACION_CUMPLIMIENTO_DOCUMENTAL,
+    MIGRACION_INDICE_ESPACIAL,
+    MIGRACION_ORDEN_RUTA,
+    MIGRACION_LISTAS_CONTROL,
+    MIGRACION_DUPLICADOS_CLIENTES,
+    MIGRACION_RIESGO_PUNTAJES,
+    MIGRACION_TRANSICION_DESEMBOLSADOS,
+    MIGRACION_CEDULA_HASH_SEGMENTOS,
+]
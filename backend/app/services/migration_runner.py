@@ -0,0 +1,459 @@
+"""
+Ejecutor de migraciones en línea (sin bloquear escrituras)
+
+Cada migración es una lista de pasos que se ejecutan en orden y se
+registran en schema_migration_pasos, de modo que una migración
+interrumpida continúa desde el último paso completado:
+- SQL: sentencia DDL/DML corta con lock_timeout y reintentos
+- CrearIndice: CREATE INDEX CONCURRENTLY (recrea índices inválidos)
+- Backfill: UPDATE por lotes con pausa entre lotes y progreso por filas
+- Funcion: lógica en Python que recibe el engine
+
+Las migraciones aplicadas se registran en schema_migrations. Solo un
+ejecutor puede correr a la vez (advisory lock de PostgreSQL).
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import time
+import zlib
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE lock_not_available (lock_timeout vencido)
+CODIGO_LOCK_NO_DISPONIBLE = '55P03'
+
+LLAVE_BLOQUEO = zlib.crc32(b'financepro.schema_migrations')
+
+ESTADO_PENDIENTE = 'PENDIENTE'
+ESTADO_EN_CURSO = 'EN_CURSO'
+ESTADO_COMPLETADO = 'COMPLETADO'
+ESTADO_FALLIDO = 'FALLIDO'
+
+TABLAS_CONTROL = [
+    """CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(100) PRIMARY KEY,
+        applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+    )""",
+    "ALTER TABLE schema_migrations ADD COLUMN IF NOT EXISTS descripcion TEXT",
+    "ALTER TABLE schema_migrations ADD COLUMN IF NOT EXISTS duracion_segundos NUMERIC(12, 2)",
+    """CREATE TABLE IF NOT EXISTS schema_migration_pasos (
+        version VARCHAR(100) NOT NULL,
+        paso INTEGER NOT NULL,
+        nombre VARCHAR(255) NOT NULL,
+        estado VARCHAR(20) NOT NULL,
+        filas_procesadas BIGINT NOT NULL DEFAULT 0,
+        filas_totales BIGINT,
+        intentos INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        iniciado_en TIMESTAMP,
+        actualizado_en TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (version, paso)
+    )""",
+    """CREATE OR REPLACE VIEW vista_progreso_migraciones AS
+    SELECT p.version, p.paso, p.nombre, p.estado, p.filas_procesadas, p.filas_totales,
+           CASE WHEN p.filas_totales > 0
+                THEN ROUND(100.0 * LEAST(p.filas_procesadas, p.filas_totales) / p.filas_totales, 1)
+           END AS porcentaje,
+           p.intentos, p.error, p.iniciado_en, p.actualizado_en,
+           m.applied_at IS NOT NULL AS migracion_aplicada
+    FROM schema_migration_pasos p
+    LEFT JOIN schema_migrations m ON m.version = p.version""",
+]
+
+
+class MigracionBloqueadaError(RuntimeError):
+    """Otro ejecutor de migraciones está en curso"""
+
+
+def _es_lock_timeout(error: Exception) -> bool:
+    return isinstance(error, DBAPIError) and getattr(error.orig, 'pgcode', None) == CODIGO_LOCK_NO_DISPONIBLE
+
+
+def _consulta_booleana(engine: Engine, sql: Optional[str]) -> bool:
+    if not sql:
+        return True
+    with engine.connect() as conn:
+        return bool(conn.execute(text(sql)).scalar())
+
+
+def ejecutar_con_reintentos(
+    engine: Engine,
+    sentencias: List[str],
+    transaccional: bool = True,
+    parametros: Optional[Dict[str, Any]] = None
+):
+    """
+    Ejecuta sentencias con lock_timeout; si el lock no se obtiene a tiempo
+    se reintenta con espera creciente en lugar de encolar escrituras detrás.
+    """
+    intentos = settings.MIGRATION_MAX_RETRIES
+    for intento in range(1, intentos + 1):
+        try:
+            if transaccional:
+                with engine.begin() as conn:
+                    conn.execute(text(f"SET LOCAL lock_timeout = '{settings.MIGRATION_LOCK_TIMEOUT_MS}ms'"))
+                    for sentencia in sentencias:
+                        conn.execute(text(sentencia), parametros or {})
+            else:
+                autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+                with autocommit.connect() as conn:
+                    conn.execute(text(f"SET lock_timeout = '{settings.MIGRATION_LOCK_TIMEOUT_MS}ms'"))
+                    for sentencia in sentencias:
+                        conn.execute(text(sentencia), parametros or {})
+            return
+        except DBAPIError as e:
+            if not _es_lock_timeout(e) or intento == intentos:
+                raise
+            espera = settings.MIGRATION_RETRY_BACKOFF_SECONDS * (2 ** (intento - 1))
+            logger.warning(f"lock_timeout en migración (intento {intento}/{intentos}), reintentando en {espera}s")
+            time.sleep(espera)
+
+
+# ----------------------------------------------------------------------
+# Pasos
+# ----------------------------------------------------------------------
+
+class Paso:
+    """Paso de una migración; `si` es una consulta que decide si aplica"""
+
+    def __init__(self, nombre: str, si: Optional[str] = None):
+        self.nombre = nombre
+        self.si = si
+
+    def aplica(self, engine: Engine) -> bool:
+        return _consulta_booleana(engine, self.si)
+
+    def ejecutar(self, engine: Engine, progreso: Callable[[int, Optional[int]], None]):
+        raise NotImplementedError
+
+
+class SQL(Paso):
+    """Sentencias cortas en una transacción (o en autocommit)"""
+
+    def __init__(self, nombre: str, *sentencias: str, transaccional: bool = True, si: Optional[str] = None):
+        super().__init__(nombre, si)
+        self.sentencias = list(sentencias)
+        self.transaccional = transaccional
+
+    def ejecutar(self, engine: Engine, progreso):
+        ejecutar_con_reintentos(engine, self.sentencias, self.transaccional)
+
+
+class CrearIndice(Paso):
+    """CREATE INDEX CONCURRENTLY; un índice inválido de un intento previo se elimina y recrea"""
+
+    def __init__(
+        self,
+        nombre_indice: str,
+        tabla: str,
+        columnas: str,
+        unico: bool = False,
+        where: Optional[str] = None,
+        si: Optional[str] = None,
+        metodo: Optional[str] = None
+    ):
+        super().__init__(f"Índice {nombre_indice}", si)
+        self.nombre_indice = nombre_indice
+        self.tabla = tabla
+        self.columnas = columnas
+        self.unico = unico
+        self.where = where
+        self.metodo = metodo
+
+    def _es_valido(self, engine: Engine) -> Optional[bool]:
+        """True/False según pg_index.indisvalid; None si el índice no existe"""
+        with engine.connect() as conn:
+            return conn.execute(text("""
+                SELECT i.indisvalid FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = :nombre AND c.relnamespace = 'public'::regnamespace
+            """), {'nombre': self.nombre_indice}).scalar()
+
+    def ejecutar(self, engine: Engine, progreso):
+        sentencia = (
+            f"CREATE {'UNIQUE ' if self.unico else ''}INDEX CONCURRENTLY IF NOT EXISTS "
+            f"{self.nombre_indice} ON {self.tabla} "
+            f"{f'USING {self.metodo} ' if self.metodo else ''}({self.columnas})"
+        )
+        if self.where:
+            sentencia += f" WHERE {self.where}"
+
+        # Un CREATE INDEX CONCURRENTLY interrumpido deja el índice inválido:
+        # cada intento lo elimina antes de volver a crearlo
+        intentos = settings.MIGRATION_MAX_RETRIES
+        for intento in range(1, intentos + 1):
+            valido = self._es_valido(engine)
+            if valido:
+                return
+            try:
+                if valido is False:
+                    logger.warning(f"Índice {self.nombre_indice} inválido de un intento anterior, recreando")
+                    ejecutar_con_reintentos(engine, [f"DROP INDEX CONCURRENTLY IF EXISTS {self.nombre_indice}"], transaccional=False)
+                autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+                with autocommit.connect() as conn:
+                    conn.execute(text(f"SET lock_timeout = '{settings.MIGRATION_LOCK_TIMEOUT_MS}ms'"))
+                    conn.execute(text(sentencia))
+                return
+            except DBAPIError as e:
+                if not _es_lock_timeout(e) or intento == intentos:
+                    raise
+                espera = settings.MIGRATION_RETRY_BACKOFF_SECONDS * (2 ** (intento - 1))
+                logger.warning(f"lock_timeout creando {self.nombre_indice} (intento {intento}/{intentos}), reintentando en {espera}s")
+                time.sleep(espera)
+
+
+class Backfill(Paso):
+    """
+    UPDATE por lotes sobre las filas que cumplen `pendiente`, recorriendo la
+    clave primaria (UUID) en orden para que cada lote sea una búsqueda por
+    índice. Cada lote es una transacción corta y entre lotes se pausa para
+    no saturar la base de datos. En `asignacion` la tabla se referencia como `t`.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        tabla: str,
+        asignacion: str,
+        pendiente: str,
+        clave: str = 'id',
+        tamano_lote: Optional[int] = None,
+        pausa_segundos: Optional[float] = None,
+        si: Optional[str] = None
+    ):
+        super().__init__(nombre, si)
+        self.tabla = tabla
+        self.asignacion = asignacion
+        self.pendiente = pendiente
+        self.clave = clave
+        self.tamano_lote = tamano_lote or settings.MIGRATION_BACKFILL_BATCH_SIZE
+        self.pausa_segundos = settings.MIGRATION_BACKFILL_PAUSE_SECONDS if pausa_segundos is None else pausa_segundos
+
+    def ejecutar(self, engine: Engine, progreso):
+        with engine.connect() as conn:
+            total = conn.execute(text(f"SELECT COUNT(*) FROM {self.tabla} WHERE {self.pendiente}")).scalar()
+        progreso(0, total)
+
+        sentencia = text(f"""
+            WITH lote AS (
+                SELECT {self.clave} FROM {self.tabla}
+                WHERE {self.clave} > CAST(:desde AS uuid) AND ({self.pendiente})
+                ORDER BY {self.clave}
+                LIMIT :lote
+            ), actualizadas AS (
+                UPDATE {self.tabla} t SET {self.asignacion}
+                FROM lote WHERE t.{self.clave} = lote.{self.clave}
+                RETURNING t.{self.clave}
+            )
+            SELECT COUNT(*), MAX({self.clave}::text) FROM actualizadas
+        """)
+        desde = '00000000-0000-0000-0000-000000000000'
+        procesadas = 0
+        intento = 0
+        while True:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(f"SET LOCAL lock_timeout = '{settings.MIGRATION_LOCK_TIMEOUT_MS}ms'"))
+                    filas, ultima = conn.execute(sentencia, {'desde': desde, 'lote': self.tamano_lote}).one()
+            except DBAPIError as e:
+                intento += 1
+                if not _es_lock_timeout(e) or intento >= settings.MIGRATION_MAX_RETRIES:
+                    raise
+                time.sleep(settings.MIGRATION_RETRY_BACKOFF_SECONDS * (2 ** (intento - 1)))
+                continue
+
+            intento = 0
+            if not filas:
+                break
+            desde = ultima
+            procesadas += filas
+            progreso(procesadas, total)
+            if self.pausa_segundos:
+                time.sleep(self.pausa_segundos)
+
+
+class Funcion(Paso):
+    """Paso en Python; la función recibe el engine y debe ser idempotente"""
+
+    def __init__(self, nombre: str, funcion: Callable[[Engine], Any], si: Optional[str] = None):
+        super().__init__(nombre, si)
+        self.funcion = funcion
+
+    def ejecutar(self, engine: Engine, progreso):
+        self.funcion(engine)
+
+
+class Migracion:
+    """
+    Migración versionada; `alias` son versiones históricas equivalentes
+
+    Una migración `manual` toma locks sobre tablas completas: no se aplica
+    al arrancar la API, solo con scripts/migrar.py.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        descripcion: str,
+        pasos: List[Paso],
+        alias: Optional[List[str]] = None,
+        manual: bool = False
+    ):
+        self.version = version
+        self.descripcion = descripcion
+        self.pasos = pasos
+        self.alias = alias or []
+        self.manual = manual
+
+
+# ----------------------------------------------------------------------
+# Ejecutor
+# ----------------------------------------------------------------------
+
+class MigrationRunner:
+    """Aplica migraciones pendientes registrando progreso por paso"""
+
+    def __init__(self, engine: Engine, migraciones: Optional[List[Migracion]] = None):
+        self.engine = engine
+        if migraciones is None:
+            from app.services.migraciones import MIGRACIONES
+            migraciones = MIGRACIONES
+        self.migraciones = migraciones
+
+    def asegurar_tablas_control(self):
+        """Crea (o completa) schema_migrations, schema_migration_pasos y la vista de progreso"""
+        ejecutar_con_reintentos(self.engine, TABLAS_CONTROL)
+
+    def versiones_aplicadas(self) -> Dict[str, datetime]:
+        with self.engine.connect() as conn:
+            return {v: f for v, f in conn.execute(text("SELECT version, applied_at FROM schema_migrations"))}
+
+    def pendientes(self) -> List[Migracion]:
+        aplicadas = self.versiones_aplicadas()
+        return [
+            m for m in self.migraciones
+            if m.version not in aplicadas and not any(a in aplicadas for a in m.alias)
+        ]
+
+    def estado(self) -> Dict[str, Any]:
+        """Migraciones aplicadas, pendientes y progreso por paso"""
+        self.asegurar_tablas_control()
+        aplicadas = self.versiones_aplicadas()
+        with self.engine.connect() as conn:
+            pasos = [dict(fila._mapping) for fila in conn.execute(text(
+                "SELECT * FROM vista_progreso_migraciones ORDER BY version, paso"
+            ))]
+        return {
+            'aplicadas': [
+                {'version': v, 'applied_at': f.isoformat() if f else None}
+                for v, f in sorted(aplicadas.items())
+            ],
+            'pendientes': [
+                {'version': m.version, 'descripcion': m.descripcion, 'pasos': len(m.pasos), 'manual': m.manual}
+                for m in self.pendientes()
+            ],
+            'progreso': pasos,
+        }
+
+    def aplicar(self, versiones: Optional[List[str]] = None, incluir_manuales: bool = True) -> List[str]:
+        """Aplica las migraciones pendientes (o solo las indicadas), en orden"""
+        self.asegurar_tablas_control()
+        aplicadas = []
+        # Conexión en autocommit: una transacción abierta retendría un snapshot
+        # y CREATE INDEX CONCURRENTLY esperaría indefinidamente por ella
+        autocommit = self.engine.execution_options(isolation_level="AUTOCOMMIT")
+        with autocommit.connect() as bloqueo:
+            if not bloqueo.execute(text("SELECT pg_try_advisory_lock(:llave)"), {'llave': LLAVE_BLOQUEO}).scalar():
+                raise MigracionBloqueadaError("Hay otra ejecución de migraciones en curso")
+            try:
+                for migracion in self.pendientes():
+                    if versiones and migracion.version not in versiones:
+                        continue
+                    if migracion.manual and not incluir_manuales:
+                        logger.warning(f"Migración {migracion.version} pendiente: aplicar con scripts/migrar.py")
+                        continue
+                    self._aplicar_migracion(migracion)
+                    aplicadas.append(migracion.version)
+            finally:
+                bloqueo.execute(text("SELECT pg_advisory_unlock(:llave)"), {'llave': LLAVE_BLOQUEO})
+        return aplicadas
+
+    def _aplicar_migracion(self, migracion: Migracion):
+        logger.info(f"Aplicando migración {migracion.version}: {migracion.descripcion}")
+        inicio = time.monotonic()
+        completados = self._pasos_completados(migracion.version)
+
+        for numero, paso in enumerate(migracion.pasos, start=1):
+            if numero in completados:
+                continue
+            if not paso.aplica(self.engine):
+                self._registrar_paso(migracion.version, numero, paso.nombre, ESTADO_COMPLETADO)
+                logger.info(f"  [{numero}/{len(migracion.pasos)}] {paso.nombre}: no aplica")
+                continue
+
+            self._registrar_paso(migracion.version, numero, paso.nombre, ESTADO_EN_CURSO, iniciar=True)
+            logger.info(f"  [{numero}/{len(migracion.pasos)}] {paso.nombre}")
+
+            def progreso(filas: int, total: Optional[int], _numero=numero, _nombre=paso.nombre):
+                self._registrar_paso(migracion.version, _numero, _nombre, ESTADO_EN_CURSO, filas, total)
+
+            try:
+                paso.ejecutar(self.engine, progreso)
+            except Exception as e:
+                self._registrar_paso(migracion.version, numero, paso.nombre, ESTADO_FALLIDO, error=str(e))
+                logger.error(f"Migración {migracion.version} falló en el paso {numero} ({paso.nombre}): {e}")
+                raise
+            self._registrar_paso(migracion.version, numero, paso.nombre, ESTADO_COMPLETADO)
+
+        duracion = round(time.monotonic() - inicio, 2)
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO schema_migrations (version, applied_at, descripcion, duracion_segundos)
+                VALUES (:version, NOW(), :descripcion, :duracion)
+                ON CONFLICT (version) DO NOTHING
+            """), {'version': migracion.version, 'descripcion': migracion.descripcion, 'duracion': duracion})
+        logger.info(f"✅ Migración {migracion.version} aplicada en {duracion}s")
+
+    def _pasos_completados(self, version: str) -> set:
+        with self.engine.connect() as conn:
+            return {fila[0] for fila in conn.execute(text(
+                "SELECT paso FROM schema_migration_pasos WHERE version = :version AND estado = :estado"
+            ), {'version': version, 'estado': ESTADO_COMPLETADO})}
+
+    def _registrar_paso(
+        self,
+        version: str,
+        paso: int,
+        nombre: str,
+        estado: str,
+        filas: Optional[int] = None,
+        total: Optional[int] = None,
+        error: Optional[str] = None,
+        iniciar: bool = False
+    ):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO schema_migration_pasos
+                    (version, paso, nombre, estado, filas_procesadas, filas_totales, intentos, error, iniciado_en, actualizado_en)
+                VALUES (:version, :paso, :nombre, :estado, COALESCE(:filas, 0), :total,
+                        CASE WHEN :iniciar THEN 1 ELSE 0 END, :error,
+                        CASE WHEN :iniciar THEN NOW() END, NOW())
+                ON CONFLICT (version, paso) DO UPDATE SET
+                    estado = EXCLUDED.estado,
+                    filas_procesadas = COALESCE(:filas, schema_migration_pasos.filas_procesadas),
+                    filas_totales = COALESCE(:total, schema_migration_pasos.filas_totales),
+                    intentos = schema_migration_pasos.intentos + CASE WHEN :iniciar THEN 1 ELSE 0 END,
+                    error = EXCLUDED.error,
+                    iniciado_en = COALESCE(EXCLUDED.iniciado_en, schema_migration_pasos.iniciado_en),
+                    actualizado_en = NOW()
+            """), {
+                'version': version, 'paso': paso, 'nombre': nombre, 'estado': estado,
+                'filas': filas, 'total': total, 'error': error, 'iniciar': iniciar
+            })
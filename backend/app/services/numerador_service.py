@@ -0,0 +1,104 @@
+"""
+Numeración correlativa de préstamos y solicitudes
+
+Cada prefijo (tipo-sucursal-año para préstamos, día para solicitudes) tiene
+un contador en la tabla numeradores. Cada proceso reserva bloques de
+NUMERADOR_TAMANO_BLOQUE números con un único UPSERT ... RETURNING en su
+propia transacción confirmada, y luego los entrega desde memoria: en el caso
+común asignar un número no consulta la base de datos.
+
+Los números son únicos entre procesos y reintentos; a cambio, los bloques
+no consumidos al reiniciar un proceso dejan huecos en la numeración (igual
+que una secuencia de Postgres).
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+import os
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Reserva atómica de un bloque: crea el contador si no existe
+SQL_RESERVAR_BLOQUE = text("""
+    INSERT INTO numeradores (clave, ultimo) VALUES (:clave, :cantidad)
+    ON CONFLICT (clave) DO UPDATE SET ultimo = numeradores.ultimo + EXCLUDED.ultimo
+    RETURNING ultimo
+""")
+
+
+class Numerador:
+    """Asignador de correlativos por prefijo con reserva de bloques por proceso"""
+
+    def __init__(self, engine: Engine = engine, tamano_bloque: Optional[int] = None):
+        self.engine = engine
+        self.tamano_bloque = tamano_bloque or settings.NUMERADOR_TAMANO_BLOQUE
+        # clave -> [siguiente, último reservado]
+        self._bloques: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def siguientes(self, clave: str, cantidad: int = 1) -> List[int]:
+        """Entrega `cantidad` correlativos de la clave, reservando bloques si hace falta"""
+        with self._lock:
+            # Un proceso hijo (fork de Celery/gunicorn) no debe reutilizar los bloques del padre
+            if os.getpid() != self._pid:
+                self._bloques.clear()
+                self._pid = os.getpid()
+
+            numeros: List[int] = []
+            bloque = self._bloques.get(clave)
+            while len(numeros) < cantidad:
+                if bloque is None or bloque[0] > bloque[1]:
+                    bloque = self._reservar(clave, max(self.tamano_bloque, cantidad - len(numeros)))
+                    self._bloques[clave] = bloque
+                tomar = min(cantidad - len(numeros), bloque[1] - bloque[0] + 1)
+                numeros.extend(range(bloque[0], bloque[0] + tomar))
+                bloque[0] += tomar
+            return numeros
+
+    def siguiente(self, clave: str) -> int:
+        return self.siguientes(clave, 1)[0]
+
+    def _reservar(self, clave: str, cantidad: int) -> List[int]:
+        """Reserva un bloque fuera de la transacción del llamador (no se revierte con ella)"""
+        with self.engine.begin() as conn:
+            ultimo = conn.execute(SQL_RESERVAR_BLOQUE, {'clave': clave, 'cantidad': cantidad}).scalar_one()
+        logger.debug(f"Bloque reservado para {clave}: {ultimo - cantidad + 1}-{ultimo}")
+        return [ultimo - cantidad + 1, ultimo]
+
+    def descartar(self):
+        """Olvida los bloques reservados en memoria"""
+        with self._lock:
+            self._bloques.clear()
+
+    # ------------------------------------------------------------------
+    # Formatos de número
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def prefijo_prestamo(tipo_prestamo: str, sucursal_codigo: Optional[str], anio: Optional[int] = None) -> str:
+        return f"{tipo_prestamo[:3].upper()}-{sucursal_codigo or '001'}-{anio or datetime.now().year}"
+
+    def numeros_prestamo(self, tipo_prestamo: str, sucursal_codigo: Optional[str], cantidad: int = 1) -> List[str]:
+        """Números de préstamo TIPO-SUCURSAL-AÑO-NNNNNN"""
+        prefijo = self.prefijo_prestamo(tipo_prestamo, sucursal_codigo)
+        return [f"{prefijo}-{n:06d}" for n in self.siguientes(prefijo, cantidad)]
+
+    def numero_prestamo(self, tipo_prestamo: str, sucursal_codigo: Optional[str]) -> str:
+        return self.numeros_prestamo(tipo_prestamo, sucursal_codigo)[0]
+
+    def numero_solicitud(self, fecha: Optional[datetime] = None) -> str:
+        """Número de solicitud SOL-AAAAMMDD-NNNN"""
+        prefijo = f"SOL-{(fecha or datetime.utcnow()):%Y%m%d}"
+        return f"{prefijo}-{self.siguiente(prefijo):04d}"
+
+
+# Instancia global del servicio
+numerador = Numerador()
@@ -0,0 +1,57 @@
+"""
+Servicio para gestión de pagos de préstamos
+"""
+from typing import List, Optional, Dict, Any
+import logging
+
+from sqlalchemy.orm import Session
+
+from app.services.aplicacion_pagos_service import AplicacionPagosService
+
+logger = logging.getLogger(__name__)
+
+# Origen con el que se registran los pagos de la carga masiva
+ORIGEN_CARGA_MASIVA = 'CARGA_MASIVA'
+
+# Campos de la carga masiva que pasan tal cual a la aplicación de pagos
+CAMPOS_APLICACION = ('prestamo_id', 'numero_prestamo', 'monto', 'fecha_pago', 'metodo_pago', 'notas')
+
+
+class PagoService:
+    """Servicio para gestión de pagos"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def crear_pagos_bulk(
+        self,
+        items: List[dict],
+        usuario_id: str,
+        sucursal_permitida: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Registrar pagos de forma masiva
+        
+        Los pagos se imputan a las cuotas con AplicacionPagosService, igual que
+        en /pagos/aplicar. La clave_idempotencia (o, si falta, la referencia)
+        identifica el pago dentro del origen CARGA_MASIVA: reintentar la carga
+        devuelve esas filas como DUPLICADO.
+        """
+        filas = [self._fila_aplicacion(item) for item in items]
+        return AplicacionPagosService(self.db).aplicar_pagos(filas, usuario_id, sucursal_permitida)
+    
+    @staticmethod
+    def _fila_aplicacion(item: dict) -> dict:
+        """Convierte una fila de la carga masiva al formato de aplicación de pagos"""
+        if not isinstance(item, dict):
+            return item  # validar_items la reporta como error
+        fila = {campo: item[campo] for campo in CAMPOS_APLICACION if campo in item}
+        fila['origen'] = ORIGEN_CARGA_MASIVA
+        clave, referencia = item.get('clave_idempotencia'), item.get('referencia')
+        if clave:
+            fila['referencia'] = clave
+            if referencia:
+                fila['notas'] = " ".join(p for p in (f"Referencia: {referencia}.", item.get('notas')) if p)
+        elif referencia:
+            fila['referencia'] = referencia
+        return fila
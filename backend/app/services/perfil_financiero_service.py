@@ -0,0 +1,185 @@
+"""
+Perfil financiero materializado de clientes
+
+Los totales de ingresos, gastos fijos, capacidad de pago, patrimonio y
+obligaciones recorren las obligaciones, vehículos, propiedades y cuentas del
+cliente y desencriptan cada valor. Este servicio los persiste en
+cliente_perfil_financiero para que la evaluación y el scoring los lean con
+una búsqueda por clave primaria.
+
+Invalidación por dependencias (suscripción en cache_comun):
+- al hacer flush: si cambian los campos financieros del cliente o cualquier fila
+  de sus tablas dependientes, el perfil se marca pendiente en la misma
+  transacción
+- al confirmar: se encola el recálculo de esos clientes en Celery
+- una tarea nocturna recalcula los perfiles pendientes o inexistentes (por
+  ejemplo, si el broker no estaba disponible al confirmar)
+
+Un perfil pendiente o inexistente se calcula en memoria al leerlo, de modo
+que la lectura nunca devuelve datos desactualizados ni escribe en la
+transacción de quien lee; lo persiste el recálculo encolado o el nocturno.
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import logging
+
+from sqlalchemy import or_, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.models.secure_models import (
+    Cliente, ClienteCuentaBancaria, ClienteObligacion, ClientePerfilFinanciero,
+    ClientePropiedad, ClienteVehiculo
+)
+from app.services.cache_comun import SuscripcionClientes, suscribir_cambios_clientes
+
+logger = logging.getLogger(__name__)
+
+# Columnas encriptadas del cliente que intervienen en el perfil
+CAMPOS_FINANCIEROS_CLIENTE = (
+    '_ingreso_mensual', '_comisiones', '_otros_ingresos',
+    '_valor_propiedad', '_alquiler_mensual', '_hipoteca_mensual',
+)
+
+# Tablas hijas cuyo cambio invalida el perfil del cliente
+MODELOS_DEPENDIENTES = (ClienteObligacion, ClienteVehiculo, ClientePropiedad, ClienteCuentaBancaria)
+
+SQL_MARCAR_PENDIENTES = text("""
+    UPDATE cliente_perfil_financiero SET pendiente = true
+    WHERE cliente_id = ANY(CAST(:ids AS uuid[])) AND NOT pendiente
+""")
+
+
+def _decimal(valor: Optional[float]) -> Optional[Decimal]:
+    return Decimal(f"{valor:.2f}") if valor is not None else None
+
+
+def calcular_perfil(cliente: Cliente) -> Dict[str, Any]:
+    """Calcula el perfil con las reglas del modelo (relaciones ya cargadas)"""
+    saldo_cuentas = 0.0
+    for cuenta in cliente.cuentas_activas:
+        if cuenta.saldo_promedio:
+            try:
+                saldo_cuentas += float(cuenta.saldo_promedio)
+            except (ValueError, TypeError):
+                pass
+
+    return {
+        'cliente_id': cliente.id,
+        'ingresos_totales': _decimal(cliente.ingresos_totales),
+        'ingresos_alquiler': _decimal(cliente.ingresos_alquiler_mensual),
+        'gastos_fijos': _decimal(cliente.gastos_fijos_mensuales),
+        'capacidad_pago': _decimal(cliente.calcular_capacidad_pago()),
+        'patrimonio_total': _decimal(cliente.patrimonio_total),
+        'valor_vehiculos': _decimal(cliente.valor_total_vehiculos),
+        'valor_neto_propiedades': _decimal(cliente.valor_neto_propiedades),
+        'saldo_promedio_cuentas': _decimal(saldo_cuentas),
+        'total_obligaciones_vigentes': _decimal(cliente.total_obligaciones_vigentes),
+        'cuotas_mensuales_obligaciones': _decimal(cliente.cuotas_mensuales_obligaciones),
+        'obligaciones_vigentes': sum(1 for o in cliente.obligaciones if o.estado == 'VIGENTE'),
+        'pendiente': False,
+        'calculado_en': datetime.utcnow(),
+    }
+
+
+class PerfilFinancieroService:
+    """Cálculo y lectura de perfiles financieros materializados"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def obtener(self, cliente_id) -> Optional[ClientePerfilFinanciero]:
+        """Perfil vigente de un cliente (lo calcula en memoria si está pendiente o no existe)"""
+        return self.obtener_varios([cliente_id]).get(str(cliente_id))
+
+    def obtener_varios(self, cliente_ids: Iterable) -> Dict[str, ClientePerfilFinanciero]:
+        """Perfiles vigentes de varios clientes con una consulta y, si hace falta, un cálculo sin escritura"""
+        ids = list(dict.fromkeys(str(c) for c in cliente_ids if c is not None))
+        if not ids:
+            return {}
+        perfiles = {
+            str(p.cliente_id): p
+            for p in self.db.query(ClientePerfilFinanciero).filter(ClientePerfilFinanciero.cliente_id.in_(ids))
+        }
+        desactualizados = [i for i in ids if i not in perfiles or perfiles[i].pendiente]
+        # Sin escribir: objetos transitorios, fuera de la sesión de quien lee
+        for lote in self._calcular(desactualizados):
+            perfiles.update({str(datos['cliente_id']): ClientePerfilFinanciero(**datos) for datos in lote})
+        return perfiles
+
+    def _calcular(self, ids: List[str]) -> Iterator[List[Dict[str, Any]]]:
+        """Calcula los perfiles de los clientes indicados, por lotes"""
+        tamano_lote = settings.PERFIL_FINANCIERO_LOTE
+        for inicio in range(0, len(ids), tamano_lote):
+            clientes = self.db.query(Cliente).options(
+                selectinload(Cliente.obligaciones),
+                selectinload(Cliente.vehiculos),
+                selectinload(Cliente.propiedades),
+                selectinload(Cliente.cuentas_bancarias),
+            ).filter(Cliente.id.in_(ids[inicio:inicio + tamano_lote])).all()
+            if clientes:
+                yield [calcular_perfil(c) for c in clientes]
+
+    def recalcular(self, cliente_ids: Iterable) -> int:
+        """Recalcula y guarda los perfiles de los clientes indicados, un commit por lote"""
+        ids = list(dict.fromkeys(str(c) for c in cliente_ids if c is not None))
+        total = 0
+        for lote in self._calcular(ids):
+            stmt = insert(ClientePerfilFinanciero).values(lote)
+            self.db.execute(stmt.on_conflict_do_update(
+                index_elements=['cliente_id'],
+                set_={
+                    columna.name: stmt.excluded[columna.name]
+                    for columna in ClientePerfilFinanciero.__table__.columns if columna.name != 'cliente_id'
+                }
+            ))
+            self.db.commit()
+            total += len(lote)
+        return total
+
+    def recalcular_pendientes(self) -> int:
+        """Recalcula los perfiles marcados como pendientes y los de clientes sin perfil"""
+        total = 0
+        while True:
+            ids = [
+                fila[0] for fila in self.db.query(Cliente.id).outerjoin(
+                    ClientePerfilFinanciero, ClientePerfilFinanciero.cliente_id == Cliente.id
+                ).filter(
+                    or_(ClientePerfilFinanciero.cliente_id.is_(None), ClientePerfilFinanciero.pendiente.is_(True))
+                ).limit(settings.PERFIL_FINANCIERO_LOTE)
+            ]
+            if not ids:
+                break
+            total += self.recalcular(ids)
+            logger.info(f"Perfiles financieros recalculados: {total}")
+        return total
+
+
+# ----------------------------------------------------------------------
+# Invalidación por dependencias
+# ----------------------------------------------------------------------
+
+def _marcar_pendientes(session: Session, ids):
+    """Marca pendientes, en la misma transacción, los perfiles de los clientes modificados"""
+    session.connection().execute(SQL_MARCAR_PENDIENTES, {'ids': sorted(ids)})
+
+
+def _encolar_recalculo(ids):
+    """Encola el recálculo de los perfiles invalidados en la transacción confirmada"""
+    try:
+        from app.tasks.clientes_tasks import recalcular_perfiles_financieros
+        recalcular_perfiles_financieros.delay(sorted(ids))
+    except Exception as e:
+        # Quedan marcados como pendientes: se calculan al leerlos y se guardan en la tarea nocturna
+        logger.warning(f"No se pudo encolar el recálculo de {len(ids)} perfiles financieros: {str(e)}")
+
+
+suscribir_cambios_clientes(SuscripcionClientes(
+    'perfiles financieros',
+    al_confirmar=_encolar_recalculo,
+    campos=CAMPOS_FINANCIEROS_CLIENTE,
+    modelos_hijos=MODELOS_DEPENDIENTES,
+    al_flush=_marcar_pendientes,
+))
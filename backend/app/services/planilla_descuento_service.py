@@ -0,0 +1,276 @@
+"""
+Generación de planillas de descuento directo por entidad
+
+Cada período se envía a cada entidad (Contraloría, CSS, MEF, bancos,
+cooperativas, ...) un archivo con los descuentos de sus empleados:
+número de empleado, cédula, número de préstamo y monto del período.
+
+- Solo préstamos con descuento autorizado y cuotas por cobrar en el período
+- Lectura con cursor del lado del servidor (yield_per), una conexión por entidad
+- Desencriptación por bloques en el pool de procesos de exportación
+- Entidades generadas en paralelo, cada una con su diseño (ancho fijo o CSV)
+- Totales de control: registro final en ancho fijo y archivo .ctl por planilla
+"""
+from calendar import monthrange
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import csv
+import hashlib
+import json
+import logging
+import os
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.secure_models import Cuota, Prestamo
+from app.services.export_service import desencriptar_bloque
+
+logger = logging.getLogger(__name__)
+
+FORMATO_ANCHO_FIJO = 'ancho_fijo'
+FORMATO_CSV = 'csv'
+
+# Estados de préstamo que se descuentan por planilla
+ESTADOS_PLANILLA = ('DESEMBOLSADO', 'VIGENTE', 'MORA')
+
+# Diseño de archivo por entidad. Ancho fijo: (campo, ancho); los montos van
+# en centavos rellenos con ceros. CSV: separador y campos con encabezado.
+DISENOS_PLANILLA: Dict[str, Dict[str, Any]] = {
+    'JUBILADOS': {
+        'formato': FORMATO_ANCHO_FIJO,
+        'campos': (('cedula', 15), ('numero_prestamo', 20), ('monto', 12)),
+    },
+    'CONTRALORIA': {
+        'formato': FORMATO_ANCHO_FIJO,
+        'campos': (('numero_empleado', 10), ('cedula', 15), ('numero_prestamo', 20), ('monto', 12)),
+    },
+    'CSS': {
+        'formato': FORMATO_ANCHO_FIJO,
+        'campos': (('numero_empleado', 12), ('cedula', 15), ('numero_prestamo', 20), ('monto', 12)),
+    },
+    'MEF': {
+        'formato': FORMATO_ANCHO_FIJO,
+        'campos': (('numero_empleado', 10), ('cedula', 15), ('numero_prestamo', 20), ('monto', 12)),
+    },
+    'MEDUCA': {
+        'formato': FORMATO_ANCHO_FIJO,
+        'campos': (('numero_empleado', 10), ('cedula', 15), ('numero_prestamo', 20), ('monto', 12)),
+    },
+    'MINSA': {
+        'formato': FORMATO_ANCHO_FIJO,
+        'campos': (('numero_empleado', 10), ('cedula', 15), ('numero_prestamo', 20), ('monto', 12)),
+    },
+    'EMPRESA_PRIVADA': {
+        'formato': FORMATO_CSV,
+        'separador': ',',
+        'campos': ('entidad_empleadora', 'numero_empleado', 'cedula', 'numero_prestamo', 'monto'),
+    },
+    'BANCO_NACIONAL': {
+        'formato': FORMATO_CSV,
+        'separador': ',',
+        'campos': ('numero_empleado', 'cedula', 'numero_prestamo', 'monto'),
+    },
+    'CAJA_AHORROS': {
+        'formato': FORMATO_CSV,
+        'separador': ',',
+        'campos': ('numero_empleado', 'cedula', 'numero_prestamo', 'monto'),
+    },
+    'OTROS_BANCOS': {
+        'formato': FORMATO_CSV,
+        'separador': ',',
+        'campos': ('entidad_empleadora', 'numero_empleado', 'cedula', 'numero_prestamo', 'monto'),
+    },
+    'COOPERATIVAS': {
+        'formato': FORMATO_CSV,
+        'separador': ';',
+        'campos': ('entidad_empleadora', 'numero_empleado', 'cedula', 'numero_prestamo', 'monto'),
+    },
+}
+
+# Columnas leídas: (campo, columna, encriptada)
+COLUMNAS_PLANILLA = (
+    ('numero_prestamo', Prestamo.numero_prestamo, False),
+    ('entidad_empleadora', Prestamo._entidad_empleadora, True),
+    ('numero_empleado', Prestamo._numero_empleado, True),
+    ('cedula', Prestamo._cedula_empleado, True),
+)
+
+
+def periodo_planilla(fecha: Optional[date] = None) -> Tuple[date, date]:
+    """Período de planilla que contiene la fecha (quincena o mes según la configuración)"""
+    fecha = fecha or date.today()
+    ultimo_dia = monthrange(fecha.year, fecha.month)[1]
+    if settings.AMORTIZACION_FRECUENCIA_DESCUENTO_DIRECTO == 'QUINCENAL':
+        if fecha.day <= 15:
+            return fecha.replace(day=1), fecha.replace(day=15)
+        return fecha.replace(day=16), fecha.replace(day=ultimo_dia)
+    return fecha.replace(day=1), fecha.replace(day=ultimo_dia)
+
+
+def _ajustar(valor: Any, ancho: int) -> str:
+    return str(valor or '').upper()[:ancho].ljust(ancho)
+
+
+def _centavos(monto: Decimal, ancho: int) -> str:
+    return str(int(monto * 100)).zfill(ancho)
+
+
+class PlanillaDescuentoService:
+    """Generación de planillas de descuento directo en paralelo por entidad"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, chunk_size: Optional[int] = None):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+
+    def generar(
+        self,
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None,
+        entidades: Optional[List[str]] = None,
+        directorio: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Genera las planillas del período para las entidades indicadas (todas
+        por defecto) y retorna los totales de control de cada una
+        """
+        if not desde or not hasta:
+            desde, hasta = periodo_planilla(desde or hasta)
+        entidades = entidades or list(DISENOS_PLANILLA)
+        desconocidas = [e for e in entidades if e not in DISENOS_PLANILLA]
+        if desconocidas:
+            raise ValueError(f"Entidades sin diseño de planilla: {', '.join(desconocidas)}")
+
+        directorio = os.path.join(
+            directorio or settings.PLANILLA_DESCUENTO_DIR, f"{desde:%Y%m%d}_{hasta:%Y%m%d}"
+        )
+        os.makedirs(directorio, exist_ok=True)
+
+        inicio = datetime.utcnow()
+        with ThreadPoolExecutor(max_workers=settings.PLANILLA_DESCUENTO_WORKERS) as executor:
+            controles = list(executor.map(
+                lambda entidad: self.generar_entidad(entidad, desde, hasta, directorio), entidades
+            ))
+        duracion = (datetime.utcnow() - inicio).total_seconds()
+
+        resumen = {
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'directorio': directorio,
+            'registros': sum(c['registros'] for c in controles),
+            'monto_total': str(sum((Decimal(c['monto_total']) for c in controles), Decimal('0'))),
+            'duracion_segundos': round(duracion, 2),
+            'planillas': controles,
+        }
+        logger.info(
+            f"Planillas de descuento {desde} a {hasta}: {len(controles)} entidades, "
+            f"{resumen['registros']} registros en {duracion:.1f}s"
+        )
+        return resumen
+
+    def generar_entidad(self, entidad: str, desde: date, hasta: date, directorio: str) -> Dict[str, Any]:
+        """Escribe la planilla de una entidad con su propia conexión y su archivo de control"""
+        diseno = DISENOS_PLANILLA[entidad]
+        extension = 'txt' if diseno['formato'] == FORMATO_ANCHO_FIJO else 'csv'
+        ruta = os.path.join(directorio, f"{entidad}_{desde:%Y%m%d}_{hasta:%Y%m%d}.{extension}")
+
+        db = self.session_factory()
+        try:
+            bloques = self._iterar_bloques(db, entidad, desde, hasta)
+            if diseno['formato'] == FORMATO_ANCHO_FIJO:
+                registros, monto_total = self._escribir_ancho_fijo(ruta, entidad, diseno, bloques, desde, hasta)
+            else:
+                registros, monto_total = self._escribir_csv(ruta, diseno, bloques)
+        finally:
+            db.close()
+
+        control = {
+            'entidad': entidad,
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'archivo': ruta,
+            'formato': diseno['formato'],
+            'registros': registros,
+            'monto_total': str(monto_total),
+            'sha256': self._sha256(ruta),
+        }
+        with open(f"{ruta}.ctl", 'w', encoding='utf-8') as f:
+            json.dump(control, f, ensure_ascii=False, indent=2)
+        return control
+
+    def _iterar_bloques(self, db: Session, entidad: str, desde: date, hasta: date):
+        """Itera los préstamos de la entidad con su monto del período, ya desencriptados"""
+        monto = func.sum(Cuota.monto_cuota - Cuota.monto_pagado)
+        query = db.query(
+            *[c[1] for c in COLUMNAS_PLANILLA], monto.label('monto')
+        ).join(
+            Cuota, Cuota.prestamo_id == Prestamo.id
+        ).filter(
+            Prestamo.tipo_descuento_directo == entidad,
+            Prestamo.descuento_autorizado.is_(True),
+            Prestamo.estado.in_(ESTADOS_PLANILLA),
+            Cuota.estado != 'PAGADA',
+            Cuota.fecha_vencimiento.between(desde, hasta)
+        ).group_by(
+            Prestamo.id, *[c[1] for c in COLUMNAS_PLANILLA]
+        ).having(monto > 0).order_by(Prestamo.numero_prestamo).yield_per(self.chunk_size)
+
+        indices_encriptados = tuple(i for i, c in enumerate(COLUMNAS_PLANILLA) if c[2])
+        campos = [c[0] for c in COLUMNAS_PLANILLA] + ['monto']
+        bloque: List[tuple] = []
+        for fila in query:
+            bloque.append(tuple(fila))
+            if len(bloque) >= self.chunk_size:
+                yield [dict(zip(campos, f)) for f in desencriptar_bloque(bloque, indices_encriptados)]
+                bloque = []
+        if bloque:
+            yield [dict(zip(campos, f)) for f in desencriptar_bloque(bloque, indices_encriptados)]
+
+    @staticmethod
+    def _escribir_ancho_fijo(ruta, entidad, diseno, bloques, desde, hasta) -> Tuple[int, Decimal]:
+        """Encabezado (H), detalle (D) y registro de control (T) con cantidad y monto"""
+        registros = 0
+        monto_total = Decimal('0')
+        ancho_monto = dict(diseno['campos'])['monto']
+        with open(ruta, 'w', encoding='latin1', errors='replace', newline='\r\n') as f:
+            f.write(f"H{_ajustar(entidad, 20)}{desde:%Y%m%d}{hasta:%Y%m%d}\n")
+            for bloque in bloques:
+                lineas = []
+                for fila in bloque:
+                    lineas.append('D' + ''.join(
+                        _centavos(fila['monto'], ancho) if campo == 'monto' else _ajustar(fila[campo], ancho)
+                        for campo, ancho in diseno['campos']
+                    ) + '\n')
+                    monto_total += fila['monto']
+                f.writelines(lineas)
+                registros += len(bloque)
+            f.write(f"T{str(registros).zfill(10)}{_centavos(monto_total, ancho_monto + 3)}\n")
+        return registros, monto_total
+
+    @staticmethod
+    def _escribir_csv(ruta, diseno, bloques) -> Tuple[int, Decimal]:
+        registros = 0
+        monto_total = Decimal('0')
+        with open(ruta, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, delimiter=diseno['separador'])
+            writer.writerow(diseno['campos'])
+            for bloque in bloques:
+                writer.writerows(
+                    [f"{fila['monto']:.2f}" if campo == 'monto' else fila[campo] for campo in diseno['campos']]
+                    for fila in bloque
+                )
+                monto_total += sum((fila['monto'] for fila in bloque), Decimal('0'))
+                registros += len(bloque)
+        return registros, monto_total
+
+    @staticmethod
+    def _sha256(ruta: str) -> str:
+        digest = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(bloque)
+        return digest.hexdigest()
@@ -12,16 +12,40 @@ from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 import logging
+import uuid
 
-from backend.app.models.secure_models import Prestamo, Cliente, Sucursal, Usuario
-from backend.app.schemas.prestamo_schemas import (
+import numpy as np
+
+from app.core.config import settings
+from app.core.security import data_encryption
+from app.models.secure_models import Prestamo, Cliente, Sucursal, Usuario
+from app.schemas.prestamo_schemas import (
     PrestamoCreate, PrestamoUpdate, PrestamoFiltros,
     AutorizarDescuentoRequest, EstadisticasDescuentoDirecto,
-    ValidacionDescuentoResponse, TipoDescuentoDirecto, EstadoPrestamo
+    ValidacionDescuentoResponse, TipoDescuentoDirecto, EstadoPrestamo,
+    ValidacionDescuentoBatchItem, ValidacionDescuentoBatchItemResponse,
+    PrestamoBulkItem, CronogramaResponse
+)
+from app.services.amortizacion import generar_cronogramas, fecha_ultimo_vencimiento
+from app.services.cache_comun import CacheLRU
+from app.services.cuota_service import CuotaService, parametros_amortizacion
+from app.services.numerador_service import numerador
+from app.services.carga_masiva import (
+    validar_items, resolver_idempotencia, insertar_en_lotes, resultado_error, resumir
 )
 
 logger = logging.getLogger(__name__)
 
+# Caché de estadísticas de descuento directo por sucursal ('*' = todo el sistema)
+_estadisticas_cache = CacheLRU(settings.PRESTAMO_STATS_CACHE_MAX_ENTRADAS, settings.PRESTAMO_STATS_CACHE_TTL_SECONDS)
+
+# Estados cuyos préstamos consumen capacidad de descuento del empleado
+ESTADOS_CON_DESCUENTO = ('APROBADO', 'DESEMBOLSADO', 'VIGENTE', 'MORA')
+
+# Límite legal de descuento sobre el salario (Panamá)
+LIMITE_LEGAL_DESCUENTO = Prestamo.LIMITE_LEGAL_DESCUENTO
+
+
 
 class PrestamoService:
     """Servicio para gestión integral de préstamos"""
@@ -46,11 +70,16 @@ class PrestamoService:
             if not sucursal:
                 raise ValueError(f"Sucursal {prestamo_data.sucursal_id} no encontrada")
             
-            # Calcular fecha de vencimiento
-            fecha_vencimiento = prestamo_data.fecha_inicio + timedelta(days=prestamo_data.plazo * 30)
-            
-            # Calcular monto total (simplificado - aquí se podría usar una fórmula más compleja)
-            monto_total = prestamo_data.monto * (1 + (prestamo_data.tasa_interes / 100) * (prestamo_data.plazo / 12))
+            # Calcular cronograma: monto total, cuota y fecha de la última cuota
+            monto_total, cuota_mensual, fecha_vencimiento = self._condiciones_cronograma(
+                prestamo_data.monto, prestamo_data.tasa_interes, prestamo_data.plazo,
+                prestamo_data.modalidad_pago.value, prestamo_data.fecha_inicio
+            )
+            if abs(cuota_mensual - prestamo_data.cuota_mensual) > Decimal('0.01'):
+                logger.warning(
+                    f"Cuota mensual informada ({prestamo_data.cuota_mensual}) difiere de la calculada "
+                    f"({cuota_mensual}); se usa la calculada"
+                )
             
             # Crear el préstamo
             prestamo = Prestamo(
@@ -66,7 +95,7 @@ class PrestamoService:
                 fecha_inicio=prestamo_data.fecha_inicio,
                 fecha_vencimiento=fecha_vencimiento,
                 monto_total=monto_total,
-                cuota_mensual=prestamo_data.cuota_mensual,
+                cuota_mensual=cuota_mensual,
                 garantia=prestamo_data.garantia,
                 proposito=prestamo_data.proposito,
                 observaciones=prestamo_data.observaciones,
@@ -80,6 +109,7 @@ class PrestamoService:
                 prestamo.entidad_empleadora = info.entidad_empleadora
                 prestamo.numero_empleado = info.numero_empleado
                 prestamo.cedula_empleado = info.cedula_empleado
+                prestamo.cedula_empleado_hash = data_encryption.blind_index(info.cedula_empleado)
                 prestamo.cargo_empleado = info.cargo_empleado
                 prestamo.salario_base = str(info.salario_base) if info.salario_base else None
                 prestamo.contacto_rrhh = info.contacto_rrhh
@@ -87,9 +117,14 @@ class PrestamoService:
                 prestamo.email_rrhh = info.email_rrhh
             
             # Generar número de préstamo
-            prestamo.generar_numero_prestamo()
+            prestamo.generar_numero_prestamo(sucursal.codigo)
             
             self.db.add(prestamo)
+            self.db.flush()
+            
+            # Persistir el cronograma de cuotas en la misma transacción
+            CuotaService(self.db).generar_para_prestamo(prestamo)
+            
             self.db.commit()
             self.db.refresh(prestamo)
             
@@ -101,6 +136,176 @@ class PrestamoService:
             logger.error(f"Error creando préstamo: {str(e)}")
             raise
     
+    @staticmethod
+    def _condiciones_cronograma(monto, tasa_interes, plazo, modalidad_pago: str, fecha_inicio) -> Tuple[Decimal, Decimal, date]:
+        """Monto total, cuota mensual y fecha de la última cuota según el motor de amortización"""
+        cronograma = generar_cronogramas(monto, tasa_interes, plazo, **parametros_amortizacion(modalidad_pago))
+        totales = cronograma.totales()
+        if isinstance(fecha_inicio, datetime):
+            fecha_inicio = fecha_inicio.date()
+        return (
+            Decimal(f"{totales['total_pagado'][0]:.2f}"),
+            Decimal(f"{totales['cuota_mensual'][0]:.2f}"),
+            fecha_ultimo_vencimiento(fecha_inicio, int(cronograma.periodos[0]), int(cronograma.periodos_por_anio[0]))
+        )
+    
+    def crear_prestamos_bulk(
+        self,
+        items: List[dict],
+        usuario_id: str,
+        sucursal_permitida: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Crear préstamos de forma masiva con errores por fila e idempotencia"""
+        if len(items) > settings.BULK_MAX_ITEMS:
+            raise ValueError(f"Máximo {settings.BULK_MAX_ITEMS} registros por solicitud")
+        
+        validos, resultados = validar_items(items, PrestamoBulkItem)
+        validos = resolver_idempotencia(self.db, Prestamo, validos, resultados)
+        
+        # Validación por conjuntos: una consulta para clientes y otra para sucursales
+        cliente_ids = {item.cliente_id for _, item in validos}
+        sucursal_ids = {item.sucursal_id for _, item in validos}
+        clientes_existentes = {
+            str(c[0]) for c in self.db.query(Cliente.id).filter(Cliente.id.in_(cliente_ids))
+        } if cliente_ids else set()
+        sucursales = {
+            str(s.id): s.codigo
+            for s in self.db.query(Sucursal.id, Sucursal.codigo).filter(Sucursal.id.in_(sucursal_ids))
+        } if sucursal_ids else {}
+        
+        filas = []
+        for indice, item in validos:
+            errores = []
+            if item.cliente_id not in clientes_existentes:
+                errores.append(f"Cliente {item.cliente_id} no encontrado")
+            if item.sucursal_id not in sucursales:
+                errores.append(f"Sucursal {item.sucursal_id} no encontrada")
+            elif sucursal_permitida and item.sucursal_id != sucursal_permitida:
+                errores.append("No tiene acceso a la sucursal indicada")
+            if errores:
+                resultados[indice] = resultado_error(indice, errores, item.clave_idempotencia)
+                continue
+            
+            filas.append((indice, self._mapeo_prestamo_bulk(item, None, usuario_id)))
+        
+        self._asignar_numeros_bulk(filas, sucursales)
+        self._aplicar_amortizacion_bulk(filas)
+        # Las cuotas se generan en la misma transacción de cada lote
+        insertar_en_lotes(
+            self.db, Prestamo, filas, resultados, settings.BULK_BATCH_SIZE,
+            al_insertar=CuotaService(self.db).generar_cuotas
+        )
+        
+        resumen = resumir(len(items), resultados)
+        logger.info(
+            f"Carga masiva de préstamos: {resumen['creados']} creados, "
+            f"{resumen['duplicados']} duplicados, {resumen['errores']} con error"
+        )
+        return resumen
+    
+    def _mapeo_prestamo_bulk(self, item: PrestamoBulkItem, numero: Optional[str], usuario_id: str) -> Dict[str, Any]:
+        """Construye el mapeo de columnas para inserción masiva"""
+        fecha_inicio = datetime.combine(item.fecha_inicio, datetime.min.time())
+        mapeo = {
+            'id': uuid.uuid4(),
+            'numero_prestamo': numero,
+            'cliente_id': item.cliente_id,
+            'sucursal_id': item.sucursal_id,
+            'usuario_id': usuario_id,
+            'tipo_prestamo': item.tipo_prestamo.value,
+            'tipo_descuento_directo': item.tipo_descuento_directo.value if item.tipo_descuento_directo else None,
+            'modalidad_pago': item.modalidad_pago.value,
+            'monto': item.monto,
+            'plazo': item.plazo,
+            'tasa_interes': item.tasa_interes,
+            'fecha_inicio': fecha_inicio,
+            'estado': item.estado.value,
+            'monto_pagado': item.monto_pagado,
+            'cuota_mensual': item.cuota_mensual,
+            'garantia': item.garantia,
+            'proposito': item.proposito,
+            'observaciones': item.observaciones,
+            'porcentaje_descuento_maximo': item.porcentaje_descuento_maximo,
+            'clave_idempotencia': item.clave_idempotencia,
+            'created_by': usuario_id,
+        }
+        
+        # Campos de descuento directo (encriptados)
+        info = item.descuento_directo_info
+        campos_encriptados = {
+            '_entidad_empleadora': info.entidad_empleadora if info else None,
+            '_numero_empleado': info.numero_empleado if info else None,
+            '_cedula_empleado': info.cedula_empleado if info else None,
+            '_cargo_empleado': info.cargo_empleado if info else None,
+            '_salario_base': str(info.salario_base) if info and info.salario_base else None,
+            '_contacto_rrhh': info.contacto_rrhh if info else None,
+            '_telefono_rrhh': info.telefono_rrhh if info else None,
+            '_email_rrhh': info.email_rrhh if info else None,
+        }
+        for campo, valor in campos_encriptados.items():
+            mapeo[campo] = data_encryption.encrypt(valor) if valor else None
+        mapeo['cedula_empleado_hash'] = data_encryption.blind_index(info.cedula_empleado) if info else None
+        
+        return mapeo
+    
+    def _aplicar_amortizacion_bulk(self, filas):
+        """
+        Calcula monto total y vencimiento de toda la carga en una sola llamada
+        al motor de amortización. La cuota informada se conserva porque las
+        cargas masivas migran contratos ya pactados.
+        """
+        if not filas:
+            return
+        mapeos = [m for _, m in filas]
+        cronogramas = generar_cronogramas(
+            [m['monto'] for m in mapeos],
+            [m['tasa_interes'] for m in mapeos],
+            [m['plazo'] for m in mapeos],
+            **parametros_amortizacion([m['modalidad_pago'] for m in mapeos])
+        )
+        totales = cronogramas.totales()
+        for i, mapeo in enumerate(mapeos):
+            mapeo['monto_total'] = Decimal(f"{totales['total_pagado'][i]:.2f}")
+            mapeo['fecha_vencimiento'] = datetime.combine(
+                fecha_ultimo_vencimiento(
+                    mapeo['fecha_inicio'].date(), int(cronogramas.periodos[i]), int(cronogramas.periodos_por_anio[i])
+                ),
+                datetime.min.time()
+            )
+    
+    def obtener_cronograma(self, prestamo: Prestamo) -> CronogramaResponse:
+        """Tabla de amortización, totales y tasa efectiva anual de un préstamo"""
+        cronograma = generar_cronogramas(
+            prestamo.monto, prestamo.tasa_interes, prestamo.plazo,
+            **parametros_amortizacion(prestamo.modalidad_pago)
+        )
+        totales = cronograma.totales()
+        fecha_inicio = prestamo.fecha_inicio.date() if isinstance(prestamo.fecha_inicio, datetime) else prestamo.fecha_inicio
+        return CronogramaResponse(
+            prestamo_id=str(prestamo.id),
+            metodo=settings.AMORTIZACION_METODO,
+            periodos_por_anio=int(cronograma.periodos_por_anio[0]),
+            cuota_mensual=Decimal(f"{totales['cuota_mensual'][0]:.2f}"),
+            total_capital=Decimal(f"{totales['total_capital'][0]:.2f}"),
+            total_interes=Decimal(f"{totales['total_interes'][0]:.2f}"),
+            total_seguro=Decimal(f"{totales['total_seguro'][0]:.2f}"),
+            total_cargos=Decimal(f"{totales['total_cargos'][0]:.2f}"),
+            total_pagado=Decimal(f"{totales['total_pagado'][0]:.2f}"),
+            comision_apertura=Decimal(f"{totales['comision'][0]:.2f}"),
+            tasa_efectiva_anual=float(cronograma.tasa_efectiva_anual()[0]),
+            cuotas=cronograma.cronograma(0, fecha_inicio)
+        )
+    
+    def _asignar_numeros_bulk(self, filas, sucursales: Dict[str, str]):
+        """Asigna números correlativos a la carga, una reserva por tipo y sucursal"""
+        grupos: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for _, mapeo in filas:
+            grupos.setdefault((mapeo['tipo_prestamo'], sucursales[str(mapeo['sucursal_id'])]), []).append(mapeo)
+        for (tipo_prestamo, sucursal_codigo), mapeos in grupos.items():
+            numeros = numerador.numeros_prestamo(tipo_prestamo, sucursal_codigo, len(mapeos))
+            for mapeo, numero in zip(mapeos, numeros):
+                mapeo['numero_prestamo'] = numero
+    
     def obtener_prestamo(self, prestamo_id: str) -> Optional[Prestamo]:
         """Obtener un préstamo por ID"""
         return self.db.query(Prestamo).filter(Prestamo.id == prestamo_id).first()
@@ -183,17 +388,35 @@ class PrestamoService:
             if not prestamo:
                 return None
             
+            condiciones_previas = (prestamo.tasa_interes, prestamo.modalidad_pago)
+            
             # Actualizar campos básicos
             for field, value in prestamo_data.dict(exclude_unset=True).items():
                 if field != 'descuento_directo_info' and hasattr(prestamo, field):
                     setattr(prestamo, field, value)
             
+            # Cambios de tasa o modalidad alteran el cronograma de cuotas y sus totales
+            if (prestamo.tasa_interes, prestamo.modalidad_pago) != condiciones_previas:
+                monto_total, cuota_mensual, fecha_vencimiento = self._condiciones_cronograma(
+                    prestamo.monto, prestamo.tasa_interes, prestamo.plazo,
+                    prestamo.modalidad_pago, prestamo.fecha_inicio
+                )
+                prestamo.monto_total = monto_total
+                prestamo.cuota_mensual = cuota_mensual
+                prestamo.fecha_vencimiento = datetime.combine(fecha_vencimiento, datetime.min.time())
+                self.db.flush()
+                if not CuotaService(self.db).regenerar_para_prestamo(prestamo):
+                    raise ValueError(
+                        "No se pueden cambiar tasa o modalidad de un préstamo con pagos imputados a sus cuotas"
+                    )
+            
             # Actualizar información de descuento directo
             if prestamo_data.descuento_directo_info:
                 info = prestamo_data.descuento_directo_info
                 prestamo.entidad_empleadora = info.entidad_empleadora
                 prestamo.numero_empleado = info.numero_empleado
                 prestamo.cedula_empleado = info.cedula_empleado
+                prestamo.cedula_empleado_hash = data_encryption.blind_index(info.cedula_empleado)
                 prestamo.cargo_empleado = info.cargo_empleado
                 prestamo.salario_base = str(info.salario_base) if info.salario_base else None
                 prestamo.contacto_rrhh = info.contacto_rrhh
@@ -316,53 +539,191 @@ class PrestamoService:
             margen_disponible=margen_disponible
         )
     
+    def validar_descuento_directo_batch(
+        self,
+        items: List[ValidacionDescuentoBatchItem],
+        sucursal_id: Optional[str] = None
+    ) -> List[ValidacionDescuentoBatchItemResponse]:
+        """
+        Validar capacidad de descuento para muchos pares (préstamo o cédula, salario)
+
+        Carga todos los préstamos con una consulta (por id o por el índice
+        ciego de la cédula) y calcula porcentajes y márgenes vectorizados.
+        Por cédula se suman las cuotas de todos los préstamos activos del
+        empleado. Los resultados se devuelven en el orden de la solicitud.
+        """
+        if len(items) > settings.VALIDACION_DESCUENTO_MAX_ITEMS:
+            raise ValueError(f"Máximo {settings.VALIDACION_DESCUENTO_MAX_ITEMS} registros por solicitud")
+
+        # IDs en forma canónica: el cliente puede enviar mayúsculas o llaves
+        canonicos: List[Optional[str]] = []
+        for item in items:
+            try:
+                canonicos.append(str(uuid.UUID(item.prestamo_id)) if item.prestamo_id else None)
+            except ValueError:
+                canonicos.append(None)
+        ids = {uuid.UUID(c) for c in canonicos if c}
+        hashes = [data_encryption.blind_index(item.cedula) if not item.prestamo_id else None for item in items]
+
+        filas = self.db.query(
+            Prestamo.id, Prestamo.cedula_empleado_hash, Prestamo.sucursal_id, Prestamo.estado,
+            Prestamo.cuota_mensual, Prestamo.porcentaje_descuento_maximo
+        ).filter(
+            or_(
+                Prestamo.id.in_(ids),
+                and_(
+                    Prestamo.cedula_empleado_hash.in_({h for h in hashes if h}),
+                    Prestamo.estado.in_(ESTADOS_CON_DESCUENTO)
+                )
+            )
+        ).all() if ids or any(hashes) else []
+
+        por_id = {str(f.id): f for f in filas}
+        por_cedula: Dict[str, List] = {}
+        for fila in filas:
+            if fila.cedula_empleado_hash and fila.estado in ESTADOS_CON_DESCUENTO:
+                por_cedula.setdefault(fila.cedula_empleado_hash, []).append(fila)
+
+        # Cuota total, máximo permitido y préstamos considerados por fila
+        n = len(items)
+        cuota = np.zeros(n)
+        maximo = np.full(n, LIMITE_LEGAL_DESCUENTO)
+        considerados = np.zeros(n, dtype=int)
+        errores: Dict[int, str] = {}
+        for i, (item, hash_cedula) in enumerate(zip(items, hashes)):
+            if item.prestamo_id and not canonicos[i]:
+                errores[i] = "prestamo_id no es un UUID válido"
+                continue
+            if item.prestamo_id:
+                prestamo = por_id.get(canonicos[i])
+                seleccion = [prestamo] if prestamo else []
+            else:
+                seleccion = por_cedula.get(hash_cedula, [])
+            if sucursal_id:
+                fuera = [p for p in seleccion if str(p.sucursal_id) != sucursal_id]
+                seleccion = [p for p in seleccion if str(p.sucursal_id) == sucursal_id]
+                if item.prestamo_id and fuera:
+                    errores[i] = "No tiene acceso a este préstamo"
+                    continue
+            if not seleccion:
+                errores[i] = "Préstamo no encontrado" if item.prestamo_id else "Sin préstamos activos para la cédula"
+                continue
+            cuota[i] = sum(float(p.cuota_mensual) for p in seleccion)
+            maximo[i] = min(float(p.porcentaje_descuento_maximo) for p in seleccion)
+            considerados[i] = len(seleccion)
+
+        salario = np.array([float(item.salario_bruto) for item in items])
+        salario_valido = salario > 0
+        porcentaje = np.divide(cuota * 100, salario, out=np.zeros(n), where=salario_valido)
+        margen = salario * (LIMITE_LEGAL_DESCUENTO / 100) - cuota
+        excede_maximo = porcentaje > maximo
+        excede_legal = porcentaje > LIMITE_LEGAL_DESCUENTO
+        es_valido = salario_valido & ~excede_maximo & ~excede_legal
+
+        resultados = []
+        for i, item in enumerate(items):
+            if i in errores:
+                es_valido_i, mensaje = False, errores[i]
+            elif not salario_valido[i]:
+                es_valido_i, mensaje = False, "Salario bruto inválido"
+            elif excede_maximo[i]:
+                es_valido_i = False
+                mensaje = f"El descuento ({porcentaje[i]:.2f}%) excede el máximo permitido ({maximo[i]:.2f}%)"
+            elif excede_legal[i]:
+                es_valido_i = False
+                mensaje = f"El descuento ({porcentaje[i]:.2f}%) excede el límite legal del 30%"
+            else:
+                es_valido_i, mensaje = bool(es_valido[i]), f"Descuento válido: {porcentaje[i]:.2f}% del salario"
+
+            resultados.append(ValidacionDescuentoBatchItemResponse(
+                indice=i,
+                prestamo_id=item.prestamo_id,
+                cedula=item.cedula,
+                prestamos_considerados=int(considerados[i]),
+                es_valido=es_valido_i,
+                mensaje=mensaje,
+                porcentaje_descuento=round(float(porcentaje[i]), 4),
+                salario_bruto=item.salario_bruto,
+                cuota_mensual=Decimal(f"{cuota[i]:.2f}"),
+                margen_disponible=Decimal(f"{margen[i]:.2f}") if i not in errores else Decimal('0')
+            ))
+        return resultados
+    
     def obtener_estadisticas_descuento_directo(
         self, 
         sucursal_id: Optional[str] = None
     ) -> EstadisticasDescuentoDirecto:
-        """Obtener estadísticas de descuento directo"""
-        query = self.db.query(Prestamo)
+        """
+        Obtener estadísticas de descuento directo
+
+        Se calculan con una sola consulta agrupada (memoria constante sin
+        importar el número de préstamos) y se mantienen en caché por sucursal
+        durante PRESTAMO_STATS_CACHE_TTL_SECONDS.
+        """
+        clave = str(sucursal_id) if sucursal_id else '*'
+        estadisticas = _estadisticas_cache.obtener(clave)
+        if estadisticas is None:
+            estadisticas = self._calcular_estadisticas_descuento_directo(sucursal_id)
+            _estadisticas_cache.guardar(clave, estadisticas)
+        return estadisticas
+    
+    def _calcular_estadisticas_descuento_directo(
+        self, 
+        sucursal_id: Optional[str] = None
+    ) -> EstadisticasDescuentoDirecto:
+        """Agrega por estado, modalidad y tipo de descuento en la base de datos"""
+        es_descuento = Prestamo.modalidad_pago == 'DESCUENTO_DIRECTO'
+        tipo = Prestamo.tipo_descuento_directo
+        
+        query = self.db.query(
+            Prestamo.estado,
+            Prestamo.modalidad_pago,
+            tipo,
+            func.count().label('total'),
+            func.count().filter(es_descuento).label('con_descuento'),
+            func.sum(Prestamo.monto).filter(es_descuento).label('monto_descuento'),
+            func.sum(Prestamo.cuota_mensual).filter(es_descuento).label('cuota_descuento'),
+            func.count().filter(tipo.in_(Prestamo.TIPOS_EMPLEADO_PUBLICO)).label('empleados_publicos'),
+            func.count().filter(tipo.in_(Prestamo.TIPOS_EMPLEADO_BANCARIO)).label('empleados_bancarios'),
+            func.count().filter(tipo.in_(Prestamo.TIPOS_CON_GARANTIA)).label('con_garantia'),
+            func.count().filter(Prestamo.descuento_autorizado.is_(True)).label('autorizados'),
+            func.count().filter(
+                and_(es_descuento, Prestamo.descuento_autorizado.is_(False))
+            ).label('pendientes_autorizacion'),
+        )
         
         if sucursal_id:
             query = query.filter(Prestamo.sucursal_id == sucursal_id)
         
-        prestamos = query.all()
-        
-        total_prestamos = len(prestamos)
-        con_descuento_directo = len([p for p in prestamos if p.requiere_descuento_directo])
+        # Como máximo estados × modalidades × tipos filas, independiente del volumen
+        grupos = query.group_by(Prestamo.estado, Prestamo.modalidad_pago, tipo).all()
         
-        # Estadísticas por tipo de descuento
+        totales = dict.fromkeys((
+            'total', 'con_descuento', 'empleados_publicos', 'empleados_bancarios',
+            'con_garantia', 'autorizados', 'pendientes_autorizacion'
+        ), 0)
+        monto_total_descuento = Decimal('0')
+        suma_cuotas = Decimal('0')
         por_tipo_descuento = {}
-        for prestamo in prestamos:
-            if prestamo.tipo_descuento_directo:
-                tipo = prestamo.tipo_descuento_directo
-                por_tipo_descuento[tipo] = por_tipo_descuento.get(tipo, 0) + 1
-        
-        # Estadísticas por modalidad de pago
         por_modalidad_pago = {}
-        for prestamo in prestamos:
-            modalidad = prestamo.modalidad_pago
-            por_modalidad_pago[modalidad] = por_modalidad_pago.get(modalidad, 0) + 1
-        
-        # Estadísticas por estado
         por_estado = {}
-        for prestamo in prestamos:
-            estado = prestamo.estado
-            por_estado[estado] = por_estado.get(estado, 0) + 1
-        
-        # Montos
-        prestamos_descuento = [p for p in prestamos if p.requiere_descuento_directo]
-        monto_total_descuento = sum(p.monto for p in prestamos_descuento)
-        promedio_cuota = sum(p.cuota_mensual for p in prestamos_descuento) / len(prestamos_descuento) if prestamos_descuento else Decimal('0')
         
-        # Clasificaciones
-        empleados_publicos = len([p for p in prestamos if p.es_empleado_publico])
-        empleados_bancarios = len([p for p in prestamos if p.es_empleado_bancario])
-        con_garantia = len([p for p in prestamos if p.tiene_garantia])
+        for grupo in grupos:
+            for campo in totales:
+                totales[campo] += getattr(grupo, campo)
+            monto_total_descuento += grupo.monto_descuento or Decimal('0')
+            suma_cuotas += grupo.cuota_descuento or Decimal('0')
+            
+            if grupo.tipo_descuento_directo:
+                por_tipo_descuento[grupo.tipo_descuento_directo] = (
+                    por_tipo_descuento.get(grupo.tipo_descuento_directo, 0) + grupo.total
+                )
+            por_modalidad_pago[grupo.modalidad_pago] = por_modalidad_pago.get(grupo.modalidad_pago, 0) + grupo.total
+            por_estado[grupo.estado] = por_estado.get(grupo.estado, 0) + grupo.total
         
-        # Autorizaciones
-        autorizados = len([p for p in prestamos if p.descuento_autorizado])
-        pendientes_autorizacion = len([p for p in prestamos if p.requiere_descuento_directo and not p.descuento_autorizado])
+        total_prestamos = totales['total']
+        con_descuento_directo = totales['con_descuento']
+        promedio_cuota = suma_cuotas / con_descuento_directo if con_descuento_directo else Decimal('0')
         
         return EstadisticasDescuentoDirecto(
             total_prestamos=total_prestamos,
@@ -373,11 +734,11 @@ class PrestamoService:
             por_estado=por_estado,
             monto_total_descuento_directo=monto_total_descuento,
             promedio_cuota_descuento_directo=promedio_cuota,
-            empleados_publicos=empleados_publicos,
-            empleados_bancarios=empleados_bancarios,
-            con_garantia=con_garantia,
-            autorizados=autorizados,
-            pendientes_autorizacion=pendientes_autorizacion
+            empleados_publicos=totales['empleados_publicos'],
+            empleados_bancarios=totales['empleados_bancarios'],
+            con_garantia=totales['con_garantia'],
+            autorizados=totales['autorizados'],
+            pendientes_autorizacion=totales['pendientes_autorizacion']
         )
     
     def obtener_prestamos_por_vencer(
@@ -405,16 +766,19 @@ class PrestamoService:
         dias_minimos: int = 1,
         sucursal_id: Optional[str] = None
     ) -> List[Prestamo]:
-        """Obtener préstamos en mora"""
-        query = self.db.query(Prestamo).filter(Prestamo.estado == EstadoPrestamo.MORA)
+        """
+        Obtener préstamos en mora
+
+        Los días de mora se cuentan desde la cuota impaga más antigua, por lo
+        que el filtro y el orden se resuelven con idx_prestamo_estado_primera_impaga.
+        """
+        fecha_limite = date.today() - timedelta(days=dias_minimos)
+        query = self.db.query(Prestamo).filter(
+            Prestamo.estado == EstadoPrestamo.MORA,
+            Prestamo.fecha_primera_cuota_impaga <= fecha_limite
+        )
         
         if sucursal_id:
             query = query.filter(Prestamo.sucursal_id == sucursal_id)
         
-        prestamos = query.all()
-        
-        # Filtrar por días de mora si se especifica
-        if dias_minimos > 1:
-            prestamos = [p for p in prestamos if p.dias_mora >= dias_minimos]
-        
-        return sorted(prestamos, key=lambda x: x.dias_mora, reverse=True)
+        return query.order_by(Prestamo.fecha_primera_cuota_impaga).all()
@@ -47,6 +47,11 @@ class RabbitMQService:
                 'name': 'notificaciones.events',
                 'type': 'topic',
                 'durable': True
+            },
+            'prestamos': {
+                'name': 'prestamos.events',
+                'type': 'topic',
+                'durable': True
             }
         }
     
@@ -241,6 +246,23 @@ class RabbitMQService:
         routing_key = f"notificacion.{event_type}"
         return self.publish_event('notificaciones', routing_key, notificacion_data, priority)
     
+    def publish_prestamo_event(
+        self,
+        event_type: str,
+        prestamo_data: Dict[str, Any],
+        priority: int = 3
+    ) -> bool:
+        """
+        Publica eventos relacionados con préstamos
+        
+        Tipos de eventos:
+        - prestamo.estado.mora
+        - prestamo.estado.curado
+        - prestamo.estado.castigado
+        """
+        routing_key = f"prestamo.{event_type}"
+        return self.publish_event('prestamos', routing_key, prestamo_data, priority)
+    
     def _generate_event_id(self) -> str:
         """
         Genera un ID único para el evento
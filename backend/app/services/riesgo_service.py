@@ -0,0 +1,464 @@
+"""
+Scoring de riesgo por lotes de clientes y préstamos
+
+Cliente.risk_level y Prestamo.risk_assessment se recalculan en una sola
+pasada sobre toda la cartera:
+
+- Una consulta por entidad arma los datos crudos (mora y cuotas vencidas,
+  historial de pagos tardíos, cuotas frente a ingresos y capacidad de pago
+  del perfil financiero materializado, obligaciones, exposición PEP y
+  listas de control confirmadas, resultados de cobranza) y se lee por
+  bloques con cursor del lado del servidor
+- NumPy deriva la matriz de variables y aplica un modelo logístico
+  (scorecard con peso y tope por variable) a todas las filas a la vez; la
+  probabilidad se expresa como puntaje 0-100 y los cortes dan el nivel
+  low / medium / high
+- Solo se escriben las filas cuyo puntaje o nivel cambió (UPDATE por
+  bloques con unnest, sin tocar updated_at) y se registra historial cuando
+  cambia el nivel o el puntaje varía al menos RIESGO_CAMBIO_HISTORIAL
+
+El modelo base se puede reemplazar por un JSON calibrado externamente
+(RIESGO_MODELO_ARCHIVO) con intercepto, variables {peso, tope} y cortes.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import time
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.secure_models import RiesgoPuntajeHistorial
+
+logger = logging.getLogger(__name__)
+
+NIVELES = ('low', 'medium', 'high')
+ENTIDAD_CLIENTE = 'CLIENTE'
+ENTIDAD_PRESTAMO = 'PRESTAMO'
+
+# Préstamos calificados: en trámite y activos
+ESTADOS_CALIFICADOS = ('SOLICITUD', 'EVALUACION', 'APROBADO', 'DESEMBOLSADO', 'VIGENTE', 'MORA')
+
+# Columnas crudas que devuelven las consultas (después de id, nivel y puntaje actuales)
+COLUMNAS_CRUDAS = (
+    'dias_mora', 'cuotas_vencidas', 'saldo_vencido', 'saldo', 'cuotas_exigibles', 'cuotas_tardias',
+    'cuotas_prestamos', 'ingresos', 'capacidad_pago', 'cuotas_obligaciones', 'obligaciones_vigentes',
+    'exposicion_pep', 'lista_sanciones', 'gestiones_fallidas', 'gestiones_exitosas',
+    'promesas_incumplidas', 'descuento_directo',
+)
+_CRUDA = {nombre: i for i, nombre in enumerate(COLUMNAS_CRUDAS)}
+
+# Variables del modelo, en el orden de las columnas de la matriz
+VARIABLES = (
+    'dias_mora', 'cuotas_vencidas', 'proporcion_saldo_vencido', 'proporcion_pagos_tardios',
+    'carga_deuda', 'uso_capacidad', 'obligaciones_vigentes', 'sin_ingresos', 'exposicion_pep',
+    'lista_sanciones', 'gestiones_fallidas', 'promesas_incumplidas', 'gestiones_exitosas',
+    'descuento_directo',
+)
+
+# Scorecard base: sin atrasos ni alertas la probabilidad es ~10% (low); un
+# mes de mora o una promesa incumplida llevan a medium y la mora avanzada o
+# una sanción confirmada a high
+MODELO_BASE = {
+    'version': 'base-2026.10',
+    'intercepto': -2.2,
+    'variables': {
+        'dias_mora': {'peso': 0.035, 'tope': 120},
+        'cuotas_vencidas': {'peso': 0.25, 'tope': 6},
+        'proporcion_saldo_vencido': {'peso': 1.5, 'tope': 1},
+        'proporcion_pagos_tardios': {'peso': 1.8, 'tope': 1},
+        'carga_deuda': {'peso': 1.2, 'tope': 1.5},
+        'uso_capacidad': {'peso': 0.8, 'tope': 2},
+        'obligaciones_vigentes': {'peso': 0.08, 'tope': 10},
+        'sin_ingresos': {'peso': 0.7, 'tope': 1},
+        'exposicion_pep': {'peso': 0.6, 'tope': 1},
+        'lista_sanciones': {'peso': 4.0, 'tope': 1},
+        'gestiones_fallidas': {'peso': 0.2, 'tope': 10},
+        'promesas_incumplidas': {'peso': 0.45, 'tope': 5},
+        'gestiones_exitosas': {'peso': -0.15, 'tope': 5},
+        'descuento_directo': {'peso': -0.6, 'tope': 1},
+    },
+    'cortes': [0.15, 0.45],
+}
+
+RESULTADOS_FALLIDOS = ('SIN_EXITO', 'CLIENTE_INUBICABLE', 'CLIENTE_RENUENTE', 'REQUIERE_ESCALAMIENTO')
+RESULTADOS_EXITOSOS = ('EXITOSA', 'ACUERDO_ALCANZADO')
+
+
+def _lista_sql(valores: Tuple[str, ...]) -> str:
+    return ', '.join(f"'{v}'" for v in valores)
+
+
+SQL_EXISTE_AGENDA = text("SELECT to_regclass('agenda_cobranza') IS NOT NULL AND to_regclass('alertas_cobranza') IS NOT NULL")
+
+# Resultados de cobranza por cliente en la ventana (promesas vencidas sin pago según la alerta generada)
+SQL_CTE_GESTIONES = f"""
+    gestiones AS (
+        SELECT cliente_id,
+               COUNT(*) FILTER (WHERE resultado::text IN ({_lista_sql(RESULTADOS_FALLIDOS)})) AS fallidas,
+               COUNT(*) FILTER (WHERE resultado::text IN ({_lista_sql(RESULTADOS_EXITOSOS)})) AS exitosas
+        FROM agenda_cobranza
+        WHERE fecha_programada >= CAST(:desde_gestiones AS date) AND resultado IS NOT NULL
+        GROUP BY cliente_id
+    ),
+    promesas AS (
+        SELECT a.cliente_id, COUNT(DISTINCT a.id) AS incumplidas
+        FROM alertas_cobranza al
+        JOIN agenda_cobranza a ON a.id = al.actividad_id
+        WHERE al.tipo_alerta = 'PROMESA_PAGO_VENCIDA' AND al.created_at >= CAST(:desde_gestiones AS date)
+        GROUP BY a.cliente_id
+    ),
+"""
+SQL_CTE_SIN_GESTIONES = """
+    gestiones AS (SELECT NULL::uuid AS cliente_id, 0 AS fallidas, 0 AS exitosas WHERE FALSE),
+    promesas AS (SELECT NULL::uuid AS cliente_id, 0 AS incumplidas WHERE FALSE),
+"""
+
+# Datos por préstamo y por cliente comunes a ambas entidades
+SQL_CTE_BASE = f"""
+    vencidas AS (
+        SELECT prestamo_id, COUNT(*) AS cuotas_vencidas, SUM(monto_cuota - monto_pagado) AS saldo_vencido
+        FROM cuotas
+        WHERE estado <> 'PAGADA' AND fecha_vencimiento < CAST(:hoy AS date)
+        GROUP BY prestamo_id
+    ),
+    pagos AS (
+        SELECT prestamo_id, COUNT(*) AS exigibles,
+               COUNT(*) FILTER (WHERE fecha_pago IS NULL OR fecha_pago::date > fecha_vencimiento) AS tardias
+        FROM cuotas
+        WHERE fecha_vencimiento >= CAST(:desde_pagos AS date) AND fecha_vencimiento < CAST(:hoy AS date)
+        GROUP BY prestamo_id
+    ),
+    prestamos_base AS (
+        SELECT p.id, p.cliente_id, p.estado::text IN ('VIGENTE', 'MORA') AS activo,
+               GREATEST(COALESCE(CAST(:hoy AS date) - p.fecha_primera_cuota_impaga, 0), 0) AS dias_mora,
+               COALESCE(v.cuotas_vencidas, 0) AS cuotas_vencidas,
+               COALESCE(v.saldo_vencido, 0) AS saldo_vencido,
+               p.monto_total - p.monto_pagado AS saldo,
+               COALESCE(g.exigibles, 0) AS exigibles,
+               COALESCE(g.tardias, 0) AS tardias,
+               p.cuota_mensual,
+               p.modalidad_pago::text = 'DESCUENTO_DIRECTO' AS descuento_directo
+        FROM prestamos p
+        LEFT JOIN vencidas v ON v.prestamo_id = p.id
+        LEFT JOIN pagos g ON g.prestamo_id = p.id
+        WHERE p.estado::text IN ({_lista_sql(ESTADOS_CALIFICADOS)})
+    ),
+    prestamos_cliente AS (
+        SELECT cliente_id,
+               MAX(dias_mora) FILTER (WHERE activo) AS dias_mora,
+               SUM(cuotas_vencidas) FILTER (WHERE activo) AS cuotas_vencidas,
+               SUM(saldo_vencido) FILTER (WHERE activo) AS saldo_vencido,
+               SUM(saldo) FILTER (WHERE activo) AS saldo,
+               SUM(cuota_mensual) FILTER (WHERE activo) AS cuotas_prestamos,
+               BOOL_OR(descuento_directo) FILTER (WHERE activo) AS descuento_directo
+        FROM prestamos_base
+        GROUP BY cliente_id
+    ),
+    pagos_cliente AS (
+        SELECT p.cliente_id, SUM(g.exigibles) AS exigibles, SUM(g.tardias) AS tardias
+        FROM pagos g
+        JOIN prestamos p ON p.id = g.prestamo_id
+        GROUP BY p.cliente_id
+    ),
+    exposicion AS (
+        SELECT cliente_id, BOOL_OR(pep) AS pep, BOOL_OR(sancion) AS sancion
+        FROM (
+            SELECT cliente_id, es_pep OR familiar_pep OR asociado_pep OR cargo_eleccion_popular AS pep, FALSE AS sancion
+            FROM cliente_trabajos
+            UNION ALL
+            SELECT cliente_id, tipo_lista = 'PEP', tipo_lista = 'SANCION'
+            FROM cliente_coincidencias_listas
+            WHERE estado = 'CONFIRMADA'
+        ) e
+        GROUP BY cliente_id
+    )
+"""
+
+# Columnas del cliente comunes a ambas consultas (alias: f, e, g, pr)
+SQL_COLUMNAS_CLIENTE = """
+    f.ingresos_totales, f.capacidad_pago,
+    COALESCE(f.cuotas_mensuales_obligaciones, 0), COALESCE(f.obligaciones_vigentes, 0),
+    COALESCE(e.pep, FALSE), COALESCE(e.sancion, FALSE),
+    COALESCE(g.fallidas, 0), COALESCE(g.exitosas, 0), COALESCE(pr.incumplidas, 0)
+"""
+SQL_JOINS_CLIENTE = """
+    LEFT JOIN prestamos_cliente pc ON pc.cliente_id = c.id
+    LEFT JOIN cliente_perfil_financiero f ON f.cliente_id = c.id
+    LEFT JOIN exposicion e ON e.cliente_id = c.id
+    LEFT JOIN gestiones g ON g.cliente_id = c.id
+    LEFT JOIN promesas pr ON pr.cliente_id = c.id
+"""
+
+SQL_CLIENTES = """
+    WITH {gestiones}""" + SQL_CTE_BASE + f"""
+    SELECT c.id, c.risk_level, c.puntaje_riesgo,
+           COALESCE(pc.dias_mora, 0), COALESCE(pc.cuotas_vencidas, 0), COALESCE(pc.saldo_vencido, 0),
+           COALESCE(pc.saldo, 0), COALESCE(hc.exigibles, 0), COALESCE(hc.tardias, 0),
+           COALESCE(pc.cuotas_prestamos, 0),
+           {SQL_COLUMNAS_CLIENTE},
+           COALESCE(pc.descuento_directo, FALSE)
+    FROM clientes c
+    LEFT JOIN pagos_cliente hc ON hc.cliente_id = c.id
+    {SQL_JOINS_CLIENTE}
+    WHERE c.is_active
+"""
+
+SQL_PRESTAMOS = """
+    WITH {gestiones}""" + SQL_CTE_BASE + f"""
+    SELECT p.id, p.risk_assessment, p.puntaje_riesgo,
+           b.dias_mora, b.cuotas_vencidas, b.saldo_vencido, b.saldo, b.exigibles, b.tardias,
+           COALESCE(pc.cuotas_prestamos, 0) + CASE WHEN b.activo THEN 0 ELSE b.cuota_mensual END,
+           {SQL_COLUMNAS_CLIENTE},
+           b.descuento_directo
+    FROM prestamos_base b
+    JOIN prestamos p ON p.id = b.id
+    JOIN clientes c ON c.id = b.cliente_id
+    {SQL_JOINS_CLIENTE}
+"""
+
+# Actualización masiva sin pasar por el ORM (no modifica updated_at ni
+# dispara las invalidaciones de perfil, listas de control o duplicados)
+SQL_ACTUALIZAR = {
+    ENTIDAD_CLIENTE: text("""
+        UPDATE clientes AS c SET risk_level = v.nivel, puntaje_riesgo = v.puntaje
+        FROM unnest(CAST(:ids AS uuid[]), CAST(:niveles AS varchar[]), CAST(:puntajes AS integer[]))
+            AS v(id, nivel, puntaje)
+        WHERE c.id = v.id
+    """),
+    ENTIDAD_PRESTAMO: text("""
+        UPDATE prestamos AS p SET risk_assessment = v.nivel, puntaje_riesgo = v.puntaje
+        FROM unnest(CAST(:ids AS uuid[]), CAST(:niveles AS varchar[]), CAST(:puntajes AS integer[]))
+            AS v(id, nivel, puntaje)
+        WHERE p.id = v.id
+    """),
+}
+
+
+# ----------------------------------------------------------------------
+# Variables y modelo
+# ----------------------------------------------------------------------
+
+def construir_variables(crudos: np.ndarray) -> np.ndarray:
+    """
+    Matriz de variables (filas x VARIABLES) a partir de las columnas crudas
+
+    Los valores nulos cuentan como cero, salvo ingresos y capacidad de pago:
+    sin ingresos (o sin perfil) las cuotas se consideran impagables.
+    """
+    columna = {nombre: np.nan_to_num(crudos[:, i]) for nombre, i in _CRUDA.items()}
+    ingresos = crudos[:, _CRUDA['ingresos']]
+    capacidad = crudos[:, _CRUDA['capacidad_pago']]
+    con_ingresos = ingresos > 0  # NaN compara como False
+    cuotas_prestamos = columna['cuotas_prestamos']
+    cuotas_totales = cuotas_prestamos + columna['cuotas_obligaciones']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        proporcion_saldo_vencido = np.where(columna['saldo'] > 0, columna['saldo_vencido'] / columna['saldo'], 0.0)
+        proporcion_pagos_tardios = np.where(
+            columna['cuotas_exigibles'] > 0, columna['cuotas_tardias'] / columna['cuotas_exigibles'], 0.0
+        )
+        carga_deuda = np.where(
+            con_ingresos, cuotas_totales / ingresos, np.where(cuotas_totales > 0, np.inf, 0.0)
+        )
+        uso_capacidad = np.where(
+            capacidad > 0, cuotas_prestamos / capacidad, np.where(cuotas_prestamos > 0, np.inf, 0.0)
+        )
+
+    derivadas = {
+        'proporcion_saldo_vencido': proporcion_saldo_vencido,
+        'proporcion_pagos_tardios': proporcion_pagos_tardios,
+        'carga_deuda': carga_deuda,
+        'uso_capacidad': uso_capacidad,
+        'sin_ingresos': (~con_ingresos).astype(np.float64),
+    }
+    return np.column_stack([derivadas[v] if v in derivadas else columna[v] for v in VARIABLES])
+
+
+@dataclass
+class ModeloRiesgo:
+    """Modelo logístico con tope por variable: p = 1 / (1 + e^-(b0 + w·min(x, tope)))"""
+    version: str
+    intercepto: float
+    pesos: np.ndarray
+    topes: np.ndarray
+    cortes: np.ndarray
+
+    @classmethod
+    def desde_dict(cls, definicion: Dict[str, Any]) -> 'ModeloRiesgo':
+        variables = definicion.get('variables', {})
+        desconocidas = set(variables) - set(VARIABLES)
+        if desconocidas:
+            raise ValueError(f"Variables de riesgo desconocidas: {', '.join(sorted(desconocidas))}")
+        cortes = np.asarray(definicion.get('cortes', MODELO_BASE['cortes']), dtype=np.float64)
+        if cortes.shape != (len(NIVELES) - 1,) or not np.all(np.diff(cortes) > 0):
+            raise ValueError(f"Se esperan {len(NIVELES) - 1} cortes de probabilidad crecientes")
+        return cls(
+            version=str(definicion.get('version', 'personalizado')),
+            intercepto=float(definicion.get('intercepto', 0.0)),
+            pesos=np.array([float(variables.get(v, {}).get('peso', 0.0)) for v in VARIABLES]),
+            topes=np.array([float(variables.get(v, {}).get('tope', np.inf)) for v in VARIABLES]),
+            cortes=cortes,
+        )
+
+    @classmethod
+    def cargar(cls, archivo: Optional[str] = None) -> 'ModeloRiesgo':
+        """Modelo del archivo configurado o el modelo base"""
+        archivo = archivo if archivo is not None else settings.RIESGO_MODELO_ARCHIVO
+        if not archivo:
+            return cls.desde_dict(MODELO_BASE)
+        with open(archivo, encoding='utf-8') as f:
+            return cls.desde_dict(json.load(f))
+
+    def contribuciones(self, variables: np.ndarray) -> np.ndarray:
+        return np.minimum(variables, self.topes) * self.pesos
+
+    def probabilidad(self, variables: np.ndarray) -> np.ndarray:
+        z = self.intercepto + np.minimum(variables, self.topes) @ self.pesos
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def niveles(self, probabilidad: np.ndarray) -> np.ndarray:
+        """Índice en NIVELES de cada probabilidad"""
+        return np.searchsorted(self.cortes, probabilidad, side='right')
+
+    def factores(self, variables: np.ndarray, cantidad: int = 3) -> List[str]:
+        """Variables que más suben el riesgo de cada fila (para el historial)"""
+        aportes = self.contribuciones(variables)
+        orden = np.argsort(-aportes, axis=1)[:, :cantidad]
+        return [
+            ','.join(VARIABLES[j] for j in fila if aportes[i, j] > 0) or None
+            for i, fila in enumerate(orden)
+        ]
+
+
+# ----------------------------------------------------------------------
+# Servicio
+# ----------------------------------------------------------------------
+
+class RiesgoService:
+    """Calificación de riesgo de la cartera completa"""
+
+    def __init__(self, db: Session, modelo: Optional[ModeloRiesgo] = None, chunk_size: Optional[int] = None):
+        self.db = db
+        self.modelo = modelo or ModeloRiesgo.cargar()
+        self.chunk_size = chunk_size or settings.RIESGO_LOTE
+
+    def calificar(self, fecha_corte: Optional[date] = None) -> Dict[str, Any]:
+        """Califica clientes activos y préstamos en trámite o activos"""
+        hoy = fecha_corte or date.today()
+        parametros = {
+            'hoy': hoy,
+            'desde_pagos': hoy - timedelta(days=30 * settings.RIESGO_MESES_PAGOS),
+            'desde_gestiones': hoy - timedelta(days=settings.RIESGO_DIAS_GESTIONES),
+        }
+        gestiones = SQL_CTE_GESTIONES if self.db.execute(SQL_EXISTE_AGENDA).scalar() else SQL_CTE_SIN_GESTIONES
+
+        resumen = {'version_modelo': self.modelo.version, 'fecha_corte': hoy.isoformat()}
+        for entidad, consulta in ((ENTIDAD_CLIENTE, SQL_CLIENTES), (ENTIDAD_PRESTAMO, SQL_PRESTAMOS)):
+            resumen[entidad.lower()] = self._calificar_entidad(
+                entidad, text(consulta.format(gestiones=gestiones)), parametros
+            )
+        logger.info(f"Calificación de riesgo: {resumen}")
+        return resumen
+
+    def _leer(self, consulta, parametros: Dict[str, Any]) -> Tuple[List[Any], np.ndarray, np.ndarray, np.ndarray]:
+        """(ids, nivel actual, puntaje actual, columnas crudas) leyendo por bloques"""
+        ids: List[Any] = []
+        niveles: List[Optional[str]] = []
+        puntajes: List[Optional[int]] = []
+        bloques = []
+        resultado = self.db.execute(consulta, parametros, execution_options={'yield_per': self.chunk_size})
+        for filas in resultado.partitions():
+            for fila in filas:
+                ids.append(fila[0])
+                niveles.append(fila[1])
+                puntajes.append(fila[2])
+            # None -> NaN; Decimal y bool -> float
+            bloques.append(np.array([fila[3:] for fila in filas], dtype=np.float64))
+        crudos = np.vstack(bloques) if bloques else np.empty((0, len(COLUMNAS_CRUDAS)))
+        return ids, np.array(niveles, dtype=object), np.array(puntajes, dtype=np.float64), crudos
+
+    def _calificar_entidad(self, entidad: str, consulta, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        reloj = time.monotonic()
+        ids, nivel_actual, puntaje_actual, crudos = self._leer(consulta, parametros)
+        lectura = time.monotonic() - reloj
+
+        variables = construir_variables(crudos)
+        probabilidad = self.modelo.probabilidad(variables)
+        puntajes = np.rint(probabilidad * 100).astype(np.int64)
+        niveles = np.array(NIVELES, dtype=object)[self.modelo.niveles(probabilidad)]
+
+        sin_calificar = np.isnan(puntaje_actual)
+        cambio_nivel = niveles != nivel_actual
+        actualizar = np.flatnonzero(sin_calificar | cambio_nivel | (puntajes != puntaje_actual))
+        historial = np.flatnonzero(
+            sin_calificar | cambio_nivel
+            | (np.abs(puntajes - np.nan_to_num(puntaje_actual)) >= settings.RIESGO_CAMBIO_HISTORIAL)
+        )
+        self._guardar(entidad, ids, niveles, puntajes, actualizar)
+        self._registrar_historial(entidad, ids, niveles, puntajes, nivel_actual, puntaje_actual, variables, historial)
+
+        return {
+            'calificados': len(ids),
+            'actualizados': len(actualizar),
+            'historial': len(historial),
+            'cambios_nivel': int(np.count_nonzero(cambio_nivel & ~sin_calificar)),
+            'distribucion': {n: int(np.count_nonzero(niveles == n)) for n in NIVELES},
+            'lectura_segundos': round(lectura, 2),
+            'duracion_segundos': round(time.monotonic() - reloj, 2),
+        }
+
+    def _guardar(self, entidad: str, ids: List[Any], niveles: np.ndarray, puntajes: np.ndarray, filas: np.ndarray):
+        """UPDATE masivo por bloques de las filas que cambiaron"""
+        for inicio in range(0, len(filas), self.chunk_size):
+            parte = filas[inicio:inicio + self.chunk_size]
+            self.db.execute(SQL_ACTUALIZAR[entidad], {
+                'ids': [str(ids[i]) for i in parte],
+                'niveles': niveles[parte].tolist(),
+                'puntajes': puntajes[parte].tolist(),
+            })
+            self.db.commit()
+
+    def _registrar_historial(
+        self,
+        entidad: str,
+        ids: List[Any],
+        niveles: np.ndarray,
+        puntajes: np.ndarray,
+        nivel_actual: np.ndarray,
+        puntaje_actual: np.ndarray,
+        variables: np.ndarray,
+        filas: np.ndarray
+    ):
+        ahora = datetime.utcnow()
+        for inicio in range(0, len(filas), self.chunk_size):
+            parte = filas[inicio:inicio + self.chunk_size]
+            factores = self.modelo.factores(variables[parte])
+            self.db.execute(insert(RiesgoPuntajeHistorial), [
+                {
+                    'entidad': entidad,
+                    'entidad_id': ids[i],
+                    'puntaje': int(puntajes[i]),
+                    'nivel': niveles[i],
+                    'puntaje_anterior': None if np.isnan(puntaje_actual[i]) else int(puntaje_actual[i]),
+                    'nivel_anterior': nivel_actual[i],
+                    'factores': factor,
+                    'version_modelo': self.modelo.version,
+                    'calculado_en': ahora,
+                }
+                for i, factor in zip(parte, factores)
+            ])
+            self.db.commit()
+
+    @staticmethod
+    def historial(db: Session, entidad: str, entidad_id, limit: int = 50) -> List[RiesgoPuntajeHistorial]:
+        """Cambios de puntaje de un cliente o préstamo, del más reciente al más antiguo (no carga el modelo)"""
+        return db.query(RiesgoPuntajeHistorial).filter(
+            RiesgoPuntajeHistorial.entidad == entidad,
+            RiesgoPuntajeHistorial.entidad_id == entidad_id
+        ).order_by(RiesgoPuntajeHistorial.calculado_en.desc()).limit(limit).all()
@@ -0,0 +1,385 @@
+"""
+Planificación de rutas de visitas domiciliarias de cobranza
+
+Ordena las visitas (VISITA_DOMICILIO) de cada gestor para una fecha partiendo
+de su sucursal:
+
+- Coordenadas de la dirección del cliente (ClienteDireccion: principal,
+  residencial y más reciente, en ese orden) y de la sucursal de la actividad
+  o, en su defecto, la del gestor
+- Matriz de distancias vectorizada (haversine por un factor de desvío vial)
+- Vecino más cercano respetando las citas con hora_inicio: se visitan en
+  orden cronológico y solo se intercalan visitas libres que permiten llegar
+  a tiempo a la siguiente cita
+- Mejora 2-opt: los deltas de todos los pares de aristas se calculan de una
+  vez con NumPy; se aplica el mejor movimiento que no invierta dos citas ni
+  aumente el retraso total, hasta no encontrar mejora
+
+El orden resultante se guarda en AgendaCobranza.orden_ruta; las visitas sin
+coordenadas quedan al final por hora de inicio.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.agenda_models import AgendaCobranza, EstadoActividad, TipoActividad
+from app.models.secure_models import ClienteDireccion, Sucursal, Usuario
+from app.services.indice_espacial import matriz_distancias
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_PLANIFICABLES = (EstadoActividad.PROGRAMADA, EstadoActividad.REPROGRAMADA)
+
+# Tolerancia para considerar que un movimiento 2-opt mejora la ruta
+EPSILON_KM = 1e-9
+
+
+def _minutos(hora: time) -> float:
+    return hora.hour * 60 + hora.minute + hora.second / 60
+
+
+def _hora(minutos: float) -> time:
+    minutos = int(round(min(max(minutos, 0), 24 * 60 - 1)))
+    return time(minutos // 60, minutos % 60)
+
+
+# ----------------------------------------------------------------------
+# Algoritmo (sin base de datos)
+# ----------------------------------------------------------------------
+
+def simular_ruta(
+    ruta: np.ndarray,
+    tiempos: np.ndarray,
+    ventanas: np.ndarray,
+    servicio: np.ndarray,
+    salida: float,
+) -> Tuple[np.ndarray, float]:
+    """
+    Recorre la ruta y devuelve (llegada por posición en minutos, retraso total)
+
+    Si se llega antes de la hora de una cita se espera; el retraso es la
+    suma de los minutos de llegada posteriores a cada hora_inicio.
+    """
+    llegadas = np.empty(len(ruta))
+    llegadas[0] = t = salida
+    retraso = 0.0
+    for posicion in range(1, len(ruta)):
+        t += tiempos[ruta[posicion - 1], ruta[posicion]]
+        llegadas[posicion] = t
+        ventana = ventanas[ruta[posicion]]
+        if not np.isnan(ventana):
+            if t < ventana:
+                t = ventana
+            else:
+                retraso += t - ventana
+        t += servicio[ruta[posicion]]
+    return llegadas, retraso
+
+
+def _vecino_mas_cercano(
+    distancias: np.ndarray,
+    tiempos: np.ndarray,
+    ventanas: np.ndarray,
+    servicio: np.ndarray,
+    salida: float,
+) -> np.ndarray:
+    """Ruta inicial: nodo 0 = sucursal, 1..n = visitas, n + 1 = cierre"""
+    n = len(distancias) - 2
+    visitas = np.arange(1, n + 1)
+    con_cita = ~np.isnan(ventanas[visitas])
+    citas = list(visitas[con_cita][np.argsort(ventanas[visitas][con_cita], kind='stable')])
+    libres = visitas[~con_cita]
+
+    ruta = [0]
+    actual, t = 0, salida
+    while citas or libres.size:
+        candidatos = libres
+        if citas and candidatos.size:
+            # Solo visitas libres que aún permiten llegar a tiempo a la siguiente cita
+            fin = t + tiempos[actual, candidatos] + servicio[candidatos]
+            candidatos = candidatos[fin + tiempos[candidatos, citas[0]] <= ventanas[citas[0]]]
+        if candidatos.size:
+            siguiente = int(candidatos[np.argmin(distancias[actual, candidatos])])
+            libres = libres[libres != siguiente]
+        else:
+            siguiente = int(citas.pop(0))
+        t += tiempos[actual, siguiente]
+        if not np.isnan(ventanas[siguiente]):
+            t = max(t, ventanas[siguiente])
+        t += servicio[siguiente]
+        ruta.append(siguiente)
+        actual = siguiente
+    ruta.append(n + 1)
+    return np.array(ruta, dtype=np.intp)
+
+
+def _dos_opt(
+    ruta: np.ndarray,
+    distancias: np.ndarray,
+    tiempos: np.ndarray,
+    ventanas: np.ndarray,
+    servicio: np.ndarray,
+    salida: float,
+    max_iteraciones: int,
+) -> np.ndarray:
+    """
+    Mejora 2-opt: invertir ruta[i+1..j] sustituye las aristas (i, i+1) y
+    (j, j+1) por (i, j) y (i+1, j+1). Nunca invierte un tramo con dos o más
+    citas (cambiaría su orden cronológico) y, si hay citas, descarta los
+    movimientos que aumentan el retraso total.
+    """
+    largo = len(ruta)
+    if largo < 5:
+        return ruta
+    hay_citas = bool(np.any(~np.isnan(ventanas)))
+    retraso_actual = simular_ruta(ruta, tiempos, ventanas, servicio, salida)[1] if hay_citas else 0.0
+    i_idx, j_idx = np.triu_indices(largo - 1, k=2)
+
+    for _ in range(max_iteraciones):
+        origen, destino = ruta[:-1], ruta[1:]
+        arista = distancias[origen, destino]
+        delta = (
+            distancias[origen[i_idx], origen[j_idx]] + distancias[destino[i_idx], destino[j_idx]]
+            - arista[i_idx] - arista[j_idx]
+        )
+        if hay_citas:
+            acumulado = np.concatenate(([0], np.cumsum(~np.isnan(ventanas[ruta]))))
+            delta[acumulado[j_idx + 1] - acumulado[i_idx + 1] > 1] = np.inf
+
+        mejoras = np.flatnonzero(delta < -EPSILON_KM)
+        if not mejoras.size:
+            break
+        aplicado = False
+        for k in mejoras[np.argsort(delta[mejoras], kind='stable')]:
+            i, j = i_idx[k], j_idx[k]
+            candidata = np.concatenate((ruta[:i + 1], ruta[j:i:-1], ruta[j + 1:]))
+            if hay_citas:
+                retraso = simular_ruta(candidata, tiempos, ventanas, servicio, salida)[1]
+                if retraso > retraso_actual + EPSILON_KM:
+                    continue
+                retraso_actual = retraso
+            ruta = candidata
+            aplicado = True
+            break
+        if not aplicado:
+            break
+    return ruta
+
+
+def planificar_ruta(
+    origen: Optional[Tuple[float, float]],
+    paradas: Sequence[Tuple[float, float]],
+    horas_inicio: Sequence[Optional[time]],
+    duraciones: Sequence[Optional[int]],
+    salida: time,
+    regresar: bool = True,
+) -> Dict[str, Any]:
+    """
+    Orden casi óptimo de las paradas (latitud, longitud) desde el origen
+
+    Sin origen la ruta empieza en la primera parada elegida. Devuelve los
+    índices de las paradas en orden de visita, la llegada estimada y el
+    retraso de cada una (minutos), y las distancias en km.
+    """
+    n = len(paradas)
+    if n == 0:
+        return {'orden': [], 'llegadas': [], 'retrasos': [], 'tramos_km': [], 'distancia_km': 0.0, 'retraso_minutos': 0.0}
+
+    factor = settings.RUTAS_FACTOR_DESVIO
+    puntos = np.asarray(paradas, dtype=float)
+    distancias = np.zeros((n + 2, n + 2))
+    distancias[1:n + 1, 1:n + 1] = matriz_distancias(puntos) * factor
+    if origen is not None:
+        desde_origen = matriz_distancias(np.asarray(origen, dtype=float), puntos)[0] * factor
+        distancias[0, 1:n + 1] = distancias[1:n + 1, 0] = desde_origen
+        if regresar:
+            distancias[1:n + 1, n + 1] = desde_origen
+    tiempos = distancias / settings.RUTAS_VELOCIDAD_KMH * 60
+
+    ventanas = np.full(n + 2, np.nan)
+    servicio = np.zeros(n + 2)
+    for posicion, (hora, duracion) in enumerate(zip(horas_inicio, duraciones), start=1):
+        if hora is not None:
+            ventanas[posicion] = _minutos(hora)
+        servicio[posicion] = duracion or settings.RUTAS_DURACION_VISITA_MINUTOS
+    minutos_salida = _minutos(salida)
+
+    ruta = _vecino_mas_cercano(distancias, tiempos, ventanas, servicio, minutos_salida)
+    ruta = _dos_opt(
+        ruta, distancias, tiempos, ventanas, servicio, minutos_salida, settings.RUTAS_2OPT_MAX_ITERACIONES
+    )
+    llegadas, retraso = simular_ruta(ruta, tiempos, ventanas, servicio, minutos_salida)
+
+    tramos = distancias[ruta[:-1], ruta[1:]]
+    retrasos = np.where(np.isnan(ventanas[ruta]), 0.0, np.maximum(llegadas - np.nan_to_num(ventanas[ruta]), 0.0))
+    return {
+        'orden': [int(nodo) - 1 for nodo in ruta[1:-1]],
+        'llegadas': llegadas[1:-1].tolist(),
+        'retrasos': retrasos[1:-1].tolist(),
+        'tramos_km': tramos[:-1].tolist(),
+        'distancia_km': float(tramos.sum()),
+        'retraso_minutos': float(retraso),
+    }
+
+
+# ----------------------------------------------------------------------
+# Servicio
+# ----------------------------------------------------------------------
+
+class RutaCobranzaService:
+    """Planifica y guarda las rutas diarias de visitas domiciliarias"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def planificar(
+        self,
+        fecha: date,
+        usuario_id: Optional[str] = None,
+        sucursal_id: Optional[str] = None,
+        guardar: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Planifica las rutas de la fecha, una por gestor
+
+        Con guardar=True escribe orden_ruta en las actividades (sin confirmar
+        la transacción; lo hace el llamador).
+        """
+        query = self.db.query(
+            AgendaCobranza.id, AgendaCobranza.cliente_id, AgendaCobranza.usuario_asignado_id,
+            AgendaCobranza.sucursal_id, AgendaCobranza.hora_inicio, AgendaCobranza.duracion_estimada_minutos
+        ).filter(
+            AgendaCobranza.fecha_programada == fecha,
+            AgendaCobranza.tipo_actividad == TipoActividad.VISITA_DOMICILIO,
+            AgendaCobranza.estado.in_(ESTADOS_PLANIFICABLES)
+        )
+        if usuario_id:
+            query = query.filter(AgendaCobranza.usuario_asignado_id == usuario_id)
+        if sucursal_id:
+            query = query.filter(AgendaCobranza.sucursal_id == sucursal_id)
+        actividades = query.all()
+        if not actividades:
+            return []
+
+        por_gestor: Dict[Any, List[Any]] = defaultdict(list)
+        for actividad in actividades:
+            por_gestor[actividad.usuario_asignado_id].append(actividad)
+
+        coordenadas = self._coordenadas_clientes({a.cliente_id for a in actividades})
+        sucursal_gestor = dict(
+            self.db.query(Usuario.id, Usuario.sucursal_id).filter(Usuario.id.in_(list(por_gestor)))
+        )
+        origenes = self._coordenadas_sucursales(
+            {a.sucursal_id for a in actividades if a.sucursal_id} | {s for s in sucursal_gestor.values() if s}
+        )
+        salida = time.fromisoformat(settings.RUTAS_HORA_SALIDA)
+
+        rutas, asignaciones = [], []
+        for gestor_id, visitas in por_gestor.items():
+            # Sucursal de partida: la más frecuente entre las visitas o la del gestor
+            sucursales = [v.sucursal_id for v in visitas if v.sucursal_id in origenes]
+            partida = max(set(sucursales), key=sucursales.count) if sucursales else sucursal_gestor.get(gestor_id)
+            ruta = self._planificar_gestor(fecha, gestor_id, partida, origenes.get(partida), visitas, coordenadas, salida)
+            rutas.append(ruta)
+            asignaciones.extend(
+                {'id': parada['actividad_id'], 'orden_ruta': parada['orden']}
+                for parada in ruta['paradas'] + ruta['sin_ubicacion']
+            )
+
+        if guardar:
+            self.db.execute(update(AgendaCobranza), asignaciones)
+            logger.info(f"Rutas de cobranza planificadas para {fecha}: {len(rutas)} gestores, {len(asignaciones)} visitas")
+        return rutas
+
+    def _planificar_gestor(
+        self,
+        fecha: date,
+        gestor_id,
+        sucursal_id,
+        origen: Optional[Tuple[float, float]],
+        visitas: List[Any],
+        coordenadas: Dict[Any, Tuple[float, float]],
+        salida: time,
+    ) -> Dict[str, Any]:
+        ubicadas = [v for v in visitas if v.cliente_id in coordenadas]
+        sin_ubicacion = sorted(
+            (v for v in visitas if v.cliente_id not in coordenadas),
+            key=lambda v: (v.hora_inicio is None, v.hora_inicio or time.min)
+        )
+
+        plan = planificar_ruta(
+            origen,
+            [coordenadas[v.cliente_id] for v in ubicadas],
+            [v.hora_inicio for v in ubicadas],
+            [v.duracion_estimada_minutos for v in ubicadas],
+            salida,
+            settings.RUTAS_REGRESO_SUCURSAL,
+        )
+
+        paradas = []
+        for orden, (indice, llegada, retraso, tramo) in enumerate(
+            zip(plan['orden'], plan['llegadas'], plan['retrasos'], plan['tramos_km']), start=1
+        ):
+            visita = ubicadas[indice]
+            latitud, longitud = coordenadas[visita.cliente_id]
+            paradas.append({
+                'actividad_id': visita.id,
+                'cliente_id': visita.cliente_id,
+                'orden': orden,
+                'latitud': latitud,
+                'longitud': longitud,
+                'hora_inicio': visita.hora_inicio,
+                'llegada_estimada': _hora(llegada),
+                'retraso_minutos': int(round(retraso)),
+                'distancia_tramo_km': round(tramo, 3),
+            })
+
+        return {
+            'usuario_id': gestor_id,
+            'sucursal_id': sucursal_id,
+            'fecha': fecha,
+            'hora_salida': salida,
+            'distancia_total_km': round(plan['distancia_km'], 3),
+            'retraso_total_minutos': int(round(plan['retraso_minutos'])),
+            'paradas': paradas,
+            'sin_ubicacion': [
+                {'actividad_id': v.id, 'cliente_id': v.cliente_id, 'orden': orden, 'hora_inicio': v.hora_inicio}
+                for orden, v in enumerate(sin_ubicacion, start=len(paradas) + 1)
+            ],
+        }
+
+    def _coordenadas_clientes(self, cliente_ids) -> Dict[Any, Tuple[float, float]]:
+        """Dirección de visita por cliente: principal, residencial y más reciente"""
+        if not cliente_ids:
+            return {}
+        filas = self.db.query(
+            ClienteDireccion.cliente_id, ClienteDireccion.latitud, ClienteDireccion.longitud,
+            ClienteDireccion.es_principal, ClienteDireccion.tipo, ClienteDireccion.updated_at
+        ).filter(
+            ClienteDireccion.cliente_id.in_(list(cliente_ids)),
+            ClienteDireccion.latitud.isnot(None),
+            ClienteDireccion.longitud.isnot(None)
+        ).all()
+
+        mejores: Dict[Any, Tuple[Tuple, Tuple[float, float]]] = {}
+        for fila in filas:
+            clave = (bool(fila.es_principal), fila.tipo == 'RESIDENCIAL', fila.updated_at or datetime.min)
+            if fila.cliente_id not in mejores or clave > mejores[fila.cliente_id][0]:
+                mejores[fila.cliente_id] = (clave, (float(fila.latitud), float(fila.longitud)))
+        return {cliente_id: punto for cliente_id, (_, punto) in mejores.items()}
+
+    def _coordenadas_sucursales(self, sucursal_ids) -> Dict[Any, Tuple[float, float]]:
+        if not sucursal_ids:
+            return {}
+        filas = self.db.query(Sucursal.id, Sucursal.latitud, Sucursal.longitud).filter(
+            Sucursal.id.in_(list(sucursal_ids)),
+            Sucursal.latitud.isnot(None),
+            Sucursal.longitud.isnot(None)
+        )
+        return {f.id: (float(f.latitud), float(f.longitud)) for f in filas}
@@ -0,0 +1,179 @@
+"""
+Simulación (cotización) de préstamos
+
+Los oficiales cotizan muchas variantes por cliente y el frontend consulta en
+cada cambio del formulario. Cada escenario (monto, tasa, modalidad, plazo y
+parámetros de amortización vigentes) se memoriza en un LRU con vigencia por
+proceso; los plazos que falten se calculan juntos en una sola llamada al
+motor de amortización vectorizado.
+
+La fecha de inicio y el salario no forman parte de la clave: las fechas de
+vencimiento y la validación del 30% se calculan sobre el resultado memorizado.
+"""
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.secure_models import Prestamo
+from app.schemas.prestamo_schemas import (
+    CuotaCronograma, SimulacionEscenario, SimulacionRequest, SimulacionResponse
+)
+from app.services.amortizacion import fechas_vencimiento, generar_cronogramas
+from app.services.cache_comun import CacheLRU
+from app.services.cuota_service import parametros_amortizacion
+
+logger = logging.getLogger(__name__)
+
+CENTAVO = Decimal('0.01')
+
+# Columnas de la tabla memorizada por escenario
+COLUMNAS_TABLA = ('capital', 'interes', 'seguro', 'cargos', 'pago', 'saldo')
+
+
+# Escenarios memorizados por proceso
+simulacion_cache = CacheLRU(settings.SIMULACION_CACHE_MAX_ENTRADAS, settings.SIMULACION_CACHE_TTL_SECONDS)
+
+
+class SimulacionService:
+    """Cotización de préstamos con escenarios memorizados"""
+
+    def __init__(self, cache: CacheLRU = simulacion_cache):
+        self.cache = cache
+
+    def simular(self, solicitud: SimulacionRequest) -> SimulacionResponse:
+        """Calcula la cotización del plazo principal y de los plazos adicionales"""
+        plazos = sorted({solicitud.plazo, *(solicitud.plazos or [])})
+        if len(plazos) > settings.SIMULACION_MAX_ESCENARIOS:
+            raise ValueError(f"Máximo {settings.SIMULACION_MAX_ESCENARIOS} plazos por simulación")
+
+        monto = solicitud.monto.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+        tasa = solicitud.tasa_interes.quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
+        modalidad = solicitud.modalidad_pago.value
+        parametros = parametros_amortizacion(modalidad)
+        por_anio = int(parametros['periodos_por_anio'][0])
+        base = (
+            str(monto), str(tasa), por_anio, parametros['metodo'], parametros['comision_apertura'],
+            parametros['tasa_seguro_anual'], parametros['cargo_periodico']
+        )
+
+        escenarios: Dict[int, Dict[str, Any]] = {}
+        en_cache = set()
+        for plazo in plazos:
+            escenario = self.cache.obtener(base + (plazo,))
+            if escenario is not None:
+                escenarios[plazo] = escenario
+                en_cache.add(plazo)
+
+        faltantes = [p for p in plazos if p not in escenarios]
+        if faltantes:
+            for plazo, escenario in zip(faltantes, self._calcular(monto, tasa, modalidad, faltantes)):
+                self.cache.guardar(base + (plazo,), escenario)
+                escenarios[plazo] = escenario
+
+        limite = min(Prestamo.LIMITE_LEGAL_DESCUENTO, float(solicitud.porcentaje_descuento_maximo))
+        validacion = self._validar_salario(
+            np.array([escenarios[p]['cuota_mensual'] for p in plazos]), solicitud.salario_bruto, limite
+        )
+
+        cuotas = []
+        if solicitud.incluir_cronograma:
+            cuotas = self._cuotas(escenarios[solicitud.plazo], solicitud.fecha_inicio or date.today(), por_anio)
+
+        return SimulacionResponse(
+            monto=monto,
+            tasa_interes=tasa,
+            modalidad_pago=modalidad,
+            tipo_descuento_directo=solicitud.tipo_descuento_directo.value if solicitud.tipo_descuento_directo else None,
+            metodo=parametros['metodo'],
+            periodos_por_anio=por_anio,
+            salario_bruto=solicitud.salario_bruto,
+            limite_descuento=limite,
+            escenarios=[
+                self._escenario(plazo, escenarios[plazo], plazo in en_cache, *(v[i] for v in validacion))
+                for i, plazo in enumerate(plazos)
+            ],
+            cuotas=cuotas
+        )
+
+    @staticmethod
+    def _calcular(monto: Decimal, tasa: Decimal, modalidad: str, plazos: List[int]) -> List[Dict[str, Any]]:
+        """Calcula todos los plazos indicados con una sola llamada al motor"""
+        k = len(plazos)
+        cronogramas = generar_cronogramas(
+            [float(monto)] * k, float(tasa), plazos, **parametros_amortizacion([modalidad] * k)
+        )
+        totales = cronogramas.totales()
+        tasa_efectiva = cronogramas.tasa_efectiva_anual()
+        costo_total = (
+            totales['total_interes'] + totales['total_seguro'] + totales['total_cargos'] + totales['comision']
+        )
+
+        resultado = []
+        for i in range(k):
+            n = int(cronogramas.periodos[i])
+            tabla = np.column_stack([getattr(cronogramas, c)[i, :n] for c in COLUMNAS_TABLA])
+            tabla.setflags(write=False)  # Compartida entre solicitudes desde la caché
+            escenario = {nombre: float(valores[i]) for nombre, valores in totales.items()}
+            escenario.update({
+                'periodos': n,
+                'costo_total': float(costo_total[i]),
+                'tasa_efectiva_anual': float(tasa_efectiva[i]),
+                'tabla': tabla,
+            })
+            resultado.append(escenario)
+        return resultado
+
+    @staticmethod
+    def _validar_salario(
+        cuota_mensual: np.ndarray, salario_bruto: Optional[Decimal], limite: float
+    ) -> Tuple[List, List, List]:
+        """Porcentaje del salario, cumplimiento y margen de cada escenario"""
+        n = cuota_mensual.size
+        if not salario_bruto:
+            return [None] * n, [None] * n, [None] * n
+        salario = float(salario_bruto)
+        porcentaje = np.round(cuota_mensual * 100 / salario, 4)
+        cumple = porcentaje <= limite
+        margen = np.round(salario * limite / 100 - cuota_mensual, 2)
+        return porcentaje.tolist(), cumple.tolist(), margen.tolist()
+
+    @staticmethod
+    def _escenario(plazo, escenario, desde_cache, porcentaje, cumple, margen) -> SimulacionEscenario:
+        def _d(valor: float) -> Decimal:
+            return Decimal(f"{valor:.2f}")
+
+        return SimulacionEscenario(
+            plazo=plazo,
+            periodos=escenario['periodos'],
+            cuota=_d(escenario['cuota']),
+            cuota_mensual=_d(escenario['cuota_mensual']),
+            total_interes=_d(escenario['total_interes']),
+            total_seguro=_d(escenario['total_seguro']),
+            total_cargos=_d(escenario['total_cargos']),
+            total_pagado=_d(escenario['total_pagado']),
+            comision_apertura=_d(escenario['comision']),
+            costo_total=_d(escenario['costo_total']),
+            tasa_efectiva_anual=escenario['tasa_efectiva_anual'],
+            porcentaje_salario=porcentaje,
+            cumple_limite_descuento=cumple,
+            margen_disponible=_d(margen) if margen is not None else None,
+            desde_cache=desde_cache
+        )
+
+    @staticmethod
+    def _cuotas(escenario: Dict[str, Any], fecha_inicio: date, por_anio: int) -> List[CuotaCronograma]:
+        """Tabla de amortización memorizada con las fechas de la fecha de inicio indicada"""
+        tabla = escenario['tabla']
+        fechas = fechas_vencimiento(fecha_inicio, escenario['periodos'], por_anio)
+        return [
+            CuotaCronograma(
+                numero=p + 1,
+                fecha_vencimiento=fechas[p],
+                **{c: Decimal(f"{tabla[p, j]:.2f}") for j, c in enumerate(COLUMNAS_TABLA)}
+            )
+            for p in range(escenario['periodos'])
+        ]
@@ -15,6 +15,8 @@ from app.models.secure_models import (
 )
 from app.services.notification_service import NotificationService
 from app.services.rabbitmq_service import RabbitMQService
+from app.services.cliente_nombre_cache import cliente_nombre_cache
+from app.services.numerador_service import numerador
 
 logger = logging.getLogger(__name__)
 
@@ -200,7 +202,7 @@ class SolicitudesService:
                 nivel_urgencia='MEDIA',
                 titulo=f'Solicitud Asignada - {solicitud.numero_solicitud}',
                 mensaje=f'Se le ha asignado la solicitud {solicitud.numero_solicitud} '
-                       f'del cliente {solicitud.cliente.nombres}.'
+                       f'del cliente {cliente_nombre_cache.obtener(self.db, solicitud.cliente_id)}.'
             )
             
             self.db.add(alerta)
@@ -287,7 +289,8 @@ class SolicitudesService:
             proximas_vencer = [
                 s for s in solicitudes 
                 if not s.esta_completada and s.horas_restantes_sla <= 24
-            ]
+            ][:10]  # Top 10
+            nombres = cliente_nombre_cache.obtener_varios(self.db, [s.cliente_id for s in proximas_vencer])
             
             return {
                 'resumen': {
@@ -304,12 +307,12 @@ class SolicitudesService:
                     {
                         'id': str(s.id),
                         'numero_solicitud': s.numero_solicitud,
-                        'cliente': s.cliente.nombres,
+                        'cliente': nombres.get(str(s.cliente_id), "N/A"),
                         'tipo': s.nombre_tipo_legible,
                         'horas_restantes': s.horas_restantes_sla,
                         'porcentaje_sla': s.porcentaje_sla_consumido
                     }
-                    for s in proximas_vencer[:10]  # Top 10
+                    for s in proximas_vencer
                 ]
             }
             
@@ -412,27 +415,8 @@ class SolicitudesService:
         """
         Genera un número único de solicitud
         """
-        # Formato: SOL-YYYYMMDD-NNNN
-        fecha = datetime.utcnow().strftime("%Y%m%d")
-        
-        # Contar solicitudes del día
-        inicio_dia = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        fin_dia = datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=999999)
-        
-        count = self.db.query(ClienteSolicitud).filter(
-            ClienteSolicitud.fecha_solicitud.between(inicio_dia, fin_dia)
-        ).count()
-        
-        numero = f"SOL-{fecha}-{count + 1:04d}"
-        
-        # Verificar que no exista
-        while self.db.query(ClienteSolicitud).filter(
-            ClienteSolicitud.numero_solicitud == numero
-        ).first():
-            count += 1
-            numero = f"SOL-{fecha}-{count:04d}"
-        
-        return numero
+        # Formato: SOL-YYYYMMDD-NNNN (correlativo diario reservado por bloques)
+        return numerador.numero_solicitud()
     
     def _crear_evento_historial(
         self,
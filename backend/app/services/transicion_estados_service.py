@@ -0,0 +1,174 @@
+"""
+Transiciones nocturnas de estado de préstamos (DESEMBOLSADO / VIGENTE / MORA / CASTIGADO)
+
+Cada transición es un único UPDATE por conjuntos con RETURNING, evaluado en
+SQL a partir de la cuota impaga más antigua (fecha_primera_cuota_impaga,
+índice idx_prestamo_estado_primera_impaga). Las transiciones y el
+resumen de la ejecución se confirman en una sola transacción; los eventos se
+publican en RabbitMQ después del commit, uno por tipo de transición.
+
+Es seguro re-ejecutar: los predicados solo seleccionan préstamos cuyo estado
+no corresponde aún a su mora, por lo que una segunda corrida no cambia nada.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+import time
+import zlib
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.services.rabbitmq_service import RabbitMQService
+
+logger = logging.getLogger(__name__)
+
+LLAVE_BLOQUEO = zlib.crc32(b"financepro:transiciones_prestamos")
+
+# (nombre, estado origen, estado destino, condición sobre la cuota impaga más antigua)
+# El orden importa: primero se curan los préstamos al día, luego pasan a
+# VIGENTE los desembolsados cuya primera cuota ya venció, se marcan las moras
+# nuevas (incluidos esos desembolsados con atraso) y por último se castigan
+# las moras que superan el umbral.
+TRANSICIONES = (
+    (
+        'curado', 'MORA', 'VIGENTE',
+        "(p.fecha_primera_cuota_impaga IS NULL OR p.fecha_primera_cuota_impaga >= :limite_mora)"
+    ),
+    (
+        'activado', 'DESEMBOLSADO', 'VIGENTE',
+        """EXISTS (
+            SELECT 1 FROM cuotas q
+            WHERE q.prestamo_id = p.id AND q.numero = 1 AND q.fecha_vencimiento <= :fecha_corte
+        )"""
+    ),
+    (
+        'mora', 'VIGENTE', 'MORA',
+        "p.fecha_primera_cuota_impaga < :limite_mora"
+    ),
+    (
+        'castigado', 'MORA', 'CASTIGADO',
+        "p.fecha_primera_cuota_impaga <= :limite_castigo"
+    ),
+)
+
+SQL_TRANSICION = """
+    UPDATE prestamos p
+    SET estado = '{destino}', updated_at = NOW()
+    WHERE p.estado = '{origen}' AND {condicion}
+    RETURNING p.id, p.numero_prestamo, p.sucursal_id, p.cliente_id,
+              (:fecha_corte - p.fecha_primera_cuota_impaga) AS dias_mora
+"""
+
+
+class TransicionEstadosService:
+    """Transiciones de estado de préstamos por conjuntos"""
+
+    def __init__(self, engine: Engine, publicador: Optional[RabbitMQService] = None):
+        self.engine = engine
+        self.publicador = publicador
+
+    def ejecutar(self, fecha_corte: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Aplica las transiciones para la fecha de corte y registra el resumen
+
+        Retorna el resumen de la ejecución con la cantidad de préstamos por
+        transición. Si otra ejecución está en curso, no hace nada.
+        """
+        fecha_corte = fecha_corte or date.today()
+        parametros = {
+            'fecha_corte': fecha_corte,
+            'limite_mora': fecha_corte - timedelta(days=settings.PRESTAMO_DIAS_GRACIA_MORA),
+            'limite_castigo': fecha_corte - timedelta(days=settings.PRESTAMO_DIAS_CASTIGO),
+        }
+        iniciado = datetime.utcnow()
+        inicio = time.monotonic()
+        cambios: Dict[str, List[Dict[str, Any]]] = {}
+
+        with self.engine.begin() as conn:
+            if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:llave)"), {'llave': LLAVE_BLOQUEO}).scalar():
+                logger.warning("Transición de estados omitida: hay otra ejecución en curso")
+                return {'omitida': True, 'fecha_corte': fecha_corte.isoformat()}
+
+            for nombre, origen, destino, condicion in TRANSICIONES:
+                sentencia = text(SQL_TRANSICION.format(origen=origen, destino=destino, condicion=condicion))
+                cambios[nombre] = [dict(fila._mapping) for fila in conn.execute(sentencia, parametros)]
+
+            duracion = round(time.monotonic() - inicio, 3)
+            ejecucion_id = conn.execute(text("""
+                INSERT INTO prestamo_transiciones_ejecuciones
+                    (fecha_corte, iniciado_en, finalizado_en, duracion_segundos,
+                     curados, activados, a_mora, castigados, eventos_publicados)
+                VALUES (:fecha_corte, :iniciado, NOW(), :duracion, :curados, :activados, :a_mora, :castigados, FALSE)
+                RETURNING id
+            """), {
+                'fecha_corte': fecha_corte,
+                'iniciado': iniciado,
+                'duracion': duracion,
+                'curados': len(cambios['curado']),
+                'activados': len(cambios['activado']),
+                'a_mora': len(cambios['mora']),
+                'castigados': len(cambios['castigado']),
+            }).scalar()
+
+        eventos_publicados = self._publicar_eventos(fecha_corte, ejecucion_id, cambios)
+        if eventos_publicados:
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    "UPDATE prestamo_transiciones_ejecuciones SET eventos_publicados = TRUE WHERE id = :id"
+                ), {'id': ejecucion_id})
+
+        resumen = {
+            'ejecucion_id': ejecucion_id,
+            'fecha_corte': fecha_corte.isoformat(),
+            'curados': len(cambios['curado']),
+            'activados': len(cambios['activado']),
+            'a_mora': len(cambios['mora']),
+            'castigados': len(cambios['castigado']),
+            'duracion_segundos': duracion,
+            'eventos_publicados': eventos_publicados,
+        }
+        logger.info(f"Transición de estados de préstamos: {resumen}")
+        return resumen
+
+    def _publicar_eventos(self, fecha_corte: date, ejecucion_id: int, cambios: Dict[str, List[Dict]]) -> bool:
+        """Publica un evento por tipo de transición con todos los préstamos afectados"""
+        publicador = self.publicador or RabbitMQService()
+        exito = True
+        for nombre, origen, destino, _ in TRANSICIONES:
+            filas = cambios[nombre]
+            if not filas:
+                continue
+            evento = {
+                'ejecucion_id': ejecucion_id,
+                'fecha_corte': fecha_corte.isoformat(),
+                'estado_anterior': origen,
+                'estado_nuevo': destino,
+                'total': len(filas),
+                'por_sucursal': dict(Counter(str(f['sucursal_id']) for f in filas)),
+                'prestamos': [
+                    {
+                        'id': str(f['id']),
+                        'numero_prestamo': f['numero_prestamo'],
+                        'sucursal_id': str(f['sucursal_id']),
+                        'cliente_id': str(f['cliente_id']),
+                        'dias_mora': f['dias_mora'] or 0,
+                    }
+                    for f in filas
+                ],
+            }
+            if not publicador.publish_prestamo_event(f"estado.{nombre}", evento):
+                logger.error(f"No se pudo publicar el evento de transición '{nombre}' ({len(filas)} préstamos)")
+                exito = False
+        return exito
+
+    def ultimas_ejecuciones(self, limite: int = 30) -> List[Dict[str, Any]]:
+        """Resumen de las ejecuciones más recientes"""
+        with self.engine.connect() as conn:
+            return [dict(fila._mapping) for fila in conn.execute(text("""
+                SELECT * FROM prestamo_transiciones_ejecuciones
+                ORDER BY iniciado_en DESC
+                LIMIT :limite
+            """), {'limite': limite})]
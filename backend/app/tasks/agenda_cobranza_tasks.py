@@ -10,11 +10,16 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
 
 from app.core.database import SessionLocal
-from app.models.agenda_models import AgendaCobranza, AlertaCobranza, EstadoActividad, ResultadoActividad
+from app.models.agenda_models import (
+    AgendaCobranza, AlertaCobranza, EstadoActividad, ResultadoActividad,
+    TipoActividad, PrioridadActividad
+)
 from app.models.secure_models import Cliente, Usuario, Prestamo
 from app.services.agenda_cobranza_service import AgendaCobranzaService
+from app.services.ruta_cobranza_service import RutaCobranzaService
 from app.services.notification_service import NotificationService
 from app.services.rabbitmq_service import RabbitMQService
+from app.services.cliente_nombre_cache import cliente_nombre_cache
 
 logger = logging.getLogger(__name__)
 
@@ -156,13 +161,14 @@ def verificar_promesas_pago_vencidas(self):
                 actividad.fecha_proximo_seguimiento = hoy
                 
                 # Crear alerta de promesa vencida
+                nombre_cliente = cliente_nombre_cache.obtener(db, actividad.cliente_id)
                 alerta = AlertaCobranza(
                     actividad_id=actividad.id,
                     usuario_destinatario_id=actividad.usuario_asignado_id,
                     tipo_alerta='PROMESA_PAGO_VENCIDA',
                     nivel_urgencia='CRITICA',
-                    titulo=f'Promesa de Pago Vencida - {actividad.cliente.nombres}',
-                    mensaje=f'El cliente {actividad.cliente.nombres} {actividad.cliente.apellidos} '
+                    titulo=f'Promesa de Pago Vencida - {nombre_cliente}',
+                    mensaje=f'El cliente {nombre_cliente} '
                            f'no cumplió con la promesa de pago de ${actividad.monto_prometido} '
                            f'programada para {actividad.fecha_promesa_pago}.',
                     fecha_programada=datetime.utcnow()
@@ -470,44 +476,45 @@ def crear_actividades_cobranza_automaticas(self):
     try:
         db: Session = SessionLocal()
         hoy = date.today()
-        
-        # Buscar préstamos en mora sin actividades de cobranza recientes
-        prestamos_mora = db.query(Prestamo).filter(
+        fecha_limite = hoy - timedelta(days=7)
+        
+        # Préstamos en mora (calculada en SQL desde la cuota impaga más antigua)
+        # sin actividades de cobranza en los últimos 7 días, en una sola consulta
+        actividad_reciente = db.query(AgendaCobranza.id).filter(
+            AgendaCobranza.prestamo_id == Prestamo.id,
+            AgendaCobranza.fecha_programada >= fecha_limite
+        ).exists()
+        prestamos_mora = db.query(Prestamo, Prestamo.dias_mora.label('dias_mora')).filter(
             Prestamo.estado == 'MORA',
-            Prestamo.dias_mora > 0
+            Prestamo.fecha_primera_cuota_impaga < hoy,
+            ~actividad_reciente
         ).all()
         
         actividades_creadas = 0
+        oficiales_por_sucursal = {}
         
-        for prestamo in prestamos_mora:
+        for prestamo, dias_mora in prestamos_mora:
             try:
-                # Verificar si ya tiene actividades de cobranza recientes (últimos 7 días)
-                fecha_limite = hoy - timedelta(days=7)
-                
-                actividad_reciente = db.query(AgendaCobranza).filter(
-                    AgendaCobranza.prestamo_id == prestamo.id,
-                    AgendaCobranza.fecha_programada >= fecha_limite
-                ).first()
-                
-                if actividad_reciente:
-                    continue  # Ya tiene actividad reciente
-                
                 # Determinar tipo de actividad según días de mora
-                if prestamo.dias_mora <= 15:
+                if dias_mora <= 15:
                     tipo_actividad = 'LLAMADA_TELEFONICA'
                     prioridad = 'NORMAL'
-                elif prestamo.dias_mora <= 30:
+                elif dias_mora <= 30:
                     tipo_actividad = 'VISITA_DOMICILIO'
                     prioridad = 'ALTA'
                 else:
                     tipo_actividad = 'ESCALAMIENTO_LEGAL'
                     prioridad = 'CRITICA'
                 
-                # Buscar oficial de crédito asignado o supervisor
-                usuario_asignado = prestamo.usuario or db.query(Usuario).filter(
-                    Usuario.rol == 'OFICIAL_CREDITO',
-                    Usuario.sucursal_id == prestamo.sucursal_id
-                ).first()
+                # Buscar oficial de crédito asignado o supervisor (una consulta por sucursal)
+                usuario_asignado = prestamo.usuario
+                if not usuario_asignado:
+                    if prestamo.sucursal_id not in oficiales_por_sucursal:
+                        oficiales_por_sucursal[prestamo.sucursal_id] = db.query(Usuario).filter(
+                            Usuario.rol == 'OFICIAL_CREDITO',
+                            Usuario.sucursal_id == prestamo.sucursal_id
+                        ).first()
+                    usuario_asignado = oficiales_por_sucursal[prestamo.sucursal_id]
                 
                 if not usuario_asignado:
                     continue  # No hay usuario para asignar
@@ -518,9 +525,9 @@ def crear_actividades_cobranza_automaticas(self):
                 actividad = service.crear_actividad_cobranza(
                     cliente_id=str(prestamo.cliente_id),
                     tipo_actividad=getattr(TipoActividad, tipo_actividad),
-                    titulo=f'Cobranza Automática - Mora {prestamo.dias_mora} días',
+                    titulo=f'Cobranza Automática - Mora {dias_mora} días',
                     descripcion=f'Actividad automática de cobranza para préstamo en mora. '
-                               f'Días de mora: {prestamo.dias_mora}. '
+                               f'Días de mora: {dias_mora}. '
                                f'Saldo pendiente: ${prestamo.saldo_pendiente}.',
                     fecha_programada=hoy + timedelta(days=1),  # Programar para mañana
                     usuario_asignado_id=str(usuario_asignado.id),
@@ -553,3 +560,36 @@ def crear_actividades_cobranza_automaticas(self):
             raise self.retry(countdown=3600, exc=e)
         
         raise
+
+
+@celery_app.task(bind=True, max_retries=3)
+def planificar_rutas_cobranza(self, fecha: str = None):
+    """
+    Planifica las rutas de visitas domiciliarias del día y guarda el orden
+    de visita en cada actividad. Ejecuta diariamente a las 6:30 AM, después
+    de crear las actividades automáticas.
+    """
+    db: Session = SessionLocal()
+    try:
+        dia = date.fromisoformat(fecha) if fecha else date.today()
+        rutas = RutaCobranzaService(db).planificar(dia)
+        db.commit()
+
+        return {
+            'fecha': dia.isoformat(),
+            'gestores': len(rutas),
+            'visitas': sum(len(r['paradas']) + len(r['sin_ubicacion']) for r in rutas),
+            'distancia_total_km': round(sum(r['distancia_total_km'] for r in rutas), 3)
+        }
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error planificando rutas de cobranza: {str(e)}")
+
+        if self.request.retries < self.max_retries:
+            logger.info(f"Reintentando tarea en 10 minutos (intento {self.request.retries + 1})")
+            raise self.retry(countdown=600, exc=e)
+
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,59 @@
+"""
+Tareas Celery para la gestión de cartera de préstamos
+"""
+from datetime import date
+from typing import Optional
+import logging
+
+from app.core.database import SessionLocal, engine
+from app.services.cartera_snapshot_service import CarteraSnapshotService
+from app.services.transicion_estados_service import TransicionEstadosService
+
+logger = logging.getLogger(__name__)
+
+# Importar la instancia de Celery
+from app.core.celery_app import celery_app
+
+
+@celery_app.task(bind=True, max_retries=3)
+def transicionar_estados_prestamos(self, fecha_corte: Optional[str] = None):
+    """
+    Transiciones nocturnas VIGENTE -> MORA -> CASTIGADO (y curas MORA -> VIGENTE)
+    Ejecuta diariamente a las 0:30 AM
+    """
+    try:
+        service = TransicionEstadosService(engine)
+        return service.ejecutar(date.fromisoformat(fecha_corte) if fecha_corte else None)
+
+    except Exception as e:
+        logger.error(f"Error en transición de estados de préstamos: {str(e)}")
+
+        # Reintentar la tarea (las transiciones son idempotentes)
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=600, exc=e)
+
+        raise
+
+
+@celery_app.task(bind=True, max_retries=3)
+def generar_fotografia_cartera(self, fecha_corte: Optional[str] = None):
+    """
+    Fotografía diaria de antigüedad de cartera (acumulado y detalle de mora)
+    Ejecuta diariamente a las 0:45 AM, después de las transiciones de estado
+    """
+    db = SessionLocal()
+    try:
+        service = CarteraSnapshotService(db)
+        return service.generar(date.fromisoformat(fecha_corte) if fecha_corte else None)
+
+    except Exception as e:
+        logger.error(f"Error generando fotografía de cartera: {str(e)}")
+
+        # Reintentar la tarea (regenerar una fecha reemplaza sus filas)
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=600, exc=e)
+
+        raise
+
+    finally:
+        db.close()
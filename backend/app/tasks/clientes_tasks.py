@@ -0,0 +1,166 @@
+"""
+Tareas Celery para el mantenimiento de datos derivados de clientes
+"""
+from datetime import date
+from typing import List, Optional
+import logging
+
+from app.core.database import SessionLocal
+from app.services.cumplimiento_documental_service import CumplimientoDocumentalService
+from app.services.duplicados_clientes_service import DuplicadosClientesService
+from app.services.listas_control_service import ListasControlService
+from app.services.perfil_financiero_service import PerfilFinancieroService
+from app.services.riesgo_service import RiesgoService
+from app.services import cliente_360_service  # noqa: F401  Suscribe la invalidación de vistas 360 en los workers
+
+logger = logging.getLogger(__name__)
+
+# Importar la instancia de Celery
+from app.core.celery_app import celery_app
+
+
+@celery_app.task(bind=True, max_retries=3)
+def recalcular_perfiles_financieros(self, cliente_ids: List[str]):
+    """
+    Recalcula los perfiles financieros invalidados al confirmar cambios
+    Encolada por perfil_financiero_service tras cada commit
+    """
+    db = SessionLocal()
+    try:
+        return {'recalculados': PerfilFinancieroService(db).recalcular(cliente_ids)}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error recalculando perfiles financieros: {str(e)}")
+
+        # Reintentar la tarea (el recálculo es idempotente)
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=60, exc=e)
+
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def recalcular_perfiles_pendientes(self):
+    """
+    Recalcula los perfiles pendientes o inexistentes
+    Ejecuta diariamente a las 1:30 AM
+    """
+    db = SessionLocal()
+    try:
+        total = PerfilFinancieroService(db).recalcular_pendientes()
+        logger.info(f"Perfiles financieros pendientes recalculados: {total}")
+        return {'recalculados': total}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error recalculando perfiles financieros pendientes: {str(e)}")
+
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=600, exc=e)
+
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def escanear_cumplimiento_documental(self, fecha_corte: Optional[str] = None):
+    """
+    Cumplimiento documental de toda la cartera activa y notificación de cambios
+    Ejecuta diariamente a las 5:00 AM
+    """
+    db = SessionLocal()
+    try:
+        service = CumplimientoDocumentalService(db)
+        return service.escanear(date.fromisoformat(fecha_corte) if fecha_corte else None)
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error en escaneo de cumplimiento documental: {str(e)}")
+
+        # Reintentar la tarea (cada bloque se reescribe completo)
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=600, exc=e)
+
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def cotejar_listas_control(self, completo: bool = False):
+    """
+    Carga las listas PEP y de sanciones y coteja la cartera contra ellas
+    Incremental cada hora; completo los domingos a las 4:00 AM
+    """
+    db = SessionLocal()
+    try:
+        return ListasControlService(db).cotejar(completo=completo)
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error cotejando listas de control: {str(e)}")
+
+        # Reintentar la tarea (la ejecución fallida no avanza la marca incremental)
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=600, exc=e)
+
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def detectar_clientes_duplicados(self, completo: bool = False):
+    """
+    Detecta clientes duplicados y registra los candidatos a fusión
+    Incremental diario a las 2:30 AM; completo los sábados a las 3:00 AM
+    """
+    db = SessionLocal()
+    try:
+        return DuplicadosClientesService(db).detectar(completo=completo)
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error detectando clientes duplicados: {str(e)}")
+
+        # Reintentar la tarea (la ejecución fallida no avanza la marca incremental)
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=600, exc=e)
+
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def calificar_riesgo_cartera(self, fecha_corte: Optional[str] = None):
+    """
+    Recalcula risk_level de clientes y risk_assessment de préstamos
+    Ejecuta diariamente a las 3:30 AM
+    """
+    db = SessionLocal()
+    try:
+        service = RiesgoService(db)
+        return service.calificar(date.fromisoformat(fecha_corte) if fecha_corte else None)
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error en calificación de riesgo: {str(e)}")
+
+        # Reintentar la tarea (solo reescribe las filas que cambian)
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=600, exc=e)
+
+        raise
+
+    finally:
+        db.close()
@@ -0,0 +1,94 @@
+"""
+Tareas Celery para exportaciones masivas de cartera
+"""
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional
+import logging
+import os
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.export_service import ExportService
+from app.services.planilla_descuento_service import PlanillaDescuentoService
+
+logger = logging.getLogger(__name__)
+
+# Importar la instancia de Celery
+from app.core.celery_app import celery_app
+
+
+@celery_app.task(bind=True, max_retries=3)
+def exportar_entidad(
+    self,
+    entidad: str,
+    formato: str,
+    filtros: Optional[Dict[str, Any]] = None,
+    usuario_id: Optional[str] = None
+):
+    """
+    Genera un archivo de exportación en EXPORT_DIR y retorna su ubicación
+    """
+    db: Session = SessionLocal()
+    try:
+        os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+        marca = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        ruta = os.path.join(settings.EXPORT_DIR, f"{entidad}_{marca}_{self.request.id}.{formato}")
+
+        service = ExportService(db)
+        resultado = service.exportar_a_archivo(entidad, formato, ruta, filtros)
+        resultado['usuario_id'] = usuario_id
+
+        logger.info(f"Exportación generada: {resultado}")
+        return resultado
+
+    except ValueError:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error exportando {entidad}: {str(e)}")
+
+        # Reintentar la tarea
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=60, exc=e)
+
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def generar_planillas_descuento(
+    self,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    entidades: Optional[List[str]] = None,
+    usuario_id: Optional[str] = None
+):
+    """
+    Genera las planillas de descuento directo del período en PLANILLA_DESCUENTO_DIR
+    Ejecuta el 1 y el 16 de cada mes a las 2:00 AM (período en curso)
+    """
+    try:
+        service = PlanillaDescuentoService()
+        resultado = service.generar(
+            date.fromisoformat(desde) if desde else None,
+            date.fromisoformat(hasta) if hasta else None,
+            entidades
+        )
+        resultado['usuario_id'] = usuario_id
+        return resultado
+
+    except ValueError:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error generando planillas de descuento: {str(e)}")
+
+        # Reintentar la tarea (los archivos del período se sobrescriben)
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=300, exc=e)
+
+        raise
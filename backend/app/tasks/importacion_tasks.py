@@ -0,0 +1,47 @@
+"""
+Tareas Celery para la importación desde el sistema legado (DBF)
+"""
+from typing import Optional
+import logging
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services.dbf_import_service import DBFImportService, cargar_mapeo
+
+logger = logging.getLogger(__name__)
+
+# Importar la instancia de Celery
+from app.core.celery_app import celery_app
+
+
+@celery_app.task(bind=True, max_retries=3)
+def sincronizar_clientes_legado(
+    self,
+    ruta: Optional[str] = None,
+    forzar_eliminaciones: bool = False
+):
+    """
+    Sincronización delta nocturna de clientes desde el DBF legado
+    """
+    ruta = ruta or settings.DBF_SYNC_FILE
+    if not ruta:
+        logger.info("Sincronización de clientes legados omitida: DBF_SYNC_FILE no configurado")
+        return {'success': False, 'motivo': 'DBF_SYNC_FILE no configurado'}
+
+    try:
+        service = DBFImportService(engine, mapeo=cargar_mapeo(settings.DBF_IMPORT_MAPPING_FILE))
+        resultado = service.sincronizar(ruta, forzar_eliminaciones=forzar_eliminaciones)
+        resultado['success'] = True
+        return resultado
+
+    except ValueError:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error en sincronización de clientes legados: {str(e)}")
+
+        # Reintentar la tarea
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=300, exc=e)
+
+        raise
@@ -13,6 +13,7 @@ from app.models.secure_models import ClienteSolicitud, SolicitudAlerta, Cliente
 from app.services.notification_service import NotificationService
 from app.services.rabbitmq_service import RabbitMQService
 from app.services.solicitudes_service import SolicitudesService
+from app.services.cliente_nombre_cache import cliente_nombre_cache
 
 logger = logging.getLogger(__name__)
 
@@ -67,7 +68,7 @@ def monitorear_sla_solicitudes():
                     tipo_alerta=tipo_alerta,
                     nivel_urgencia=nivel_urgencia,
                     titulo=f'SLA {int(porcentaje_sla)}% - Solicitud {solicitud.numero_solicitud}',
-                    mensaje=f'La solicitud {solicitud.numero_solicitud} del cliente {solicitud.cliente.nombres} '
+                    mensaje=f'La solicitud {solicitud.numero_solicitud} del cliente {cliente_nombre_cache.obtener(db, solicitud.cliente_id)} '
                            f'ha consumido el {int(porcentaje_sla)}% del SLA. '
                            f'Quedan {solicitud.horas_restantes_sla} horas para responder.',
                     fecha_vencimiento=datetime.utcnow() + timedelta(hours=24)
@@ -345,7 +346,7 @@ def notificar_seguimientos_programados():
                 nivel_urgencia='MEDIA',
                 titulo=f'Seguimiento Programado - {solicitud.numero_solicitud}',
                 mensaje=f'Seguimiento programado para la solicitud {solicitud.numero_solicitud} '
-                       f'del cliente {solicitud.cliente.nombres}.'
+                       f'del cliente {cliente_nombre_cache.obtener(db, solicitud.cliente_id)}.'
             )
             
             db.add(alerta)
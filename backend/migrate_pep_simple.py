@@ -10,55 +10,27 @@ from pathlib import Path
 # Agregar el directorio del proyecto al path
 sys.path.append(str(Path(__file__).parent))
 
-from sqlalchemy import create_engine, text
-from app.core.config import settings
+from sqlalchemy import text
+from app.core.database import engine
+from app.services.migration_runner import MigrationRunner
 
 def run_migration():
-    """Ejecuta la migración PEP"""
-    
-    # Crear engine de SQLAlchemy
-    engine = create_engine(settings.DATABASE_URL)
-    
-    # Leer el archivo de migración
-    migration_file = Path(__file__).parent / "migrations" / "003_add_pep_fields.sql"
-    
-    if not migration_file.exists():
-        print(f"❌ Error: No se encontró el archivo de migración: {migration_file}")
-        return False
+    """Ejecuta la migración PEP con el ejecutor en línea (índices concurrentes)"""
     
     try:
-        print("📖 Leyendo archivo de migración...")
-        with open(migration_file, 'r', encoding='utf-8') as f:
-            migration_sql = f.read()
+        runner = MigrationRunner(engine)
+        runner.asegurar_tablas_control()
+        
+        if not any(m.version == '003_add_pep_fields' for m in runner.pendientes()):
+            print("✅ La migración 003 ya fue aplicada anteriormente.")
+            return True
         
-        # Ejecutar la migración
         print("🚀 Ejecutando migración PEP...")
+        runner.aplicar(['003_add_pep_fields'])
+        print("✅ Migración PEP ejecutada exitosamente!")
+        
+        # Verificar campos agregados
         with engine.connect() as conn:
-            # Verificar si ya fue aplicada
-            result = conn.execute(text("SELECT version FROM schema_migrations WHERE version = '003'"))
-            if result.fetchone():
-                print("✅ La migración 003 ya fue aplicada anteriormente.")
-                return True
-            
-            # Ejecutar cada statement por separado para evitar problemas
-            statements = migration_sql.split(';')
-            for i, statement in enumerate(statements):
-                statement = statement.strip()
-                if statement and not statement.startswith('--'):
-                    try:
-                        conn.execute(text(statement))
-                        conn.commit()
-                    except Exception as e:
-                        if "already exists" in str(e).lower():
-                            print(f"⚠️  Statement {i+1} ya existe, continuando...")
-                        else:
-                            print(f"❌ Error en statement {i+1}: {e}")
-                            print(f"Statement: {statement[:100]}...")
-                            # Continuar con los demás statements
-            
-            print("✅ Migración PEP ejecutada exitosamente!")
-            
-            # Verificar campos agregados
             result = conn.execute(text("""
                 SELECT column_name 
                 FROM information_schema.columns 
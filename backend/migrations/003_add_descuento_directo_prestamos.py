@@ -28,149 +28,19 @@ def get_database_url():
     )
 
 def upgrade():
-    """Aplicar migración: agregar campos de descuento directo a préstamos"""
+    """
+    Aplicar migración: agregar campos de descuento directo a préstamos.
+
+    Se delega en el ejecutor en línea (app.services.migraciones) para no
+    bloquear escrituras sobre prestamos: índices concurrentes, backfill por
+    lotes y lock_timeout con reintentos.
+    """
+    from app.services.migration_runner import MigrationRunner
     
-    # Crear conexión a la base de datos
     engine = create_engine(get_database_url())
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
-    with SessionLocal() as db:
-        try:
-            logger.info("Iniciando migración 003: Agregar campos de descuento directo a préstamos")
-            
-            # 1. Crear tipos ENUM para préstamos
-            logger.info("Creando tipos ENUM...")
-            
-            # Tipo de préstamo
-            db.execute(text("""
-                CREATE TYPE tipo_prestamo AS ENUM (
-                    'PERSONAL', 'VEHICULAR', 'HIPOTECARIO', 'COMERCIAL',
-                    'CONSUMO', 'EDUCATIVO', 'EMERGENCIA'
-                );
-            """))
-            
-            # Tipo de descuento directo
-            db.execute(text("""
-                CREATE TYPE tipo_descuento_directo AS ENUM (
-                    'JUBILADOS', 'PAGOS_VOLUNTARIOS', 'CONTRALORIA', 'CSS',
-                    'MEF', 'MEDUCA', 'MINSA', 'EMPRESA_PRIVADA',
-                    'BANCO_NACIONAL', 'CAJA_AHORROS', 'OTROS_BANCOS', 'COOPERATIVAS',
-                    'GARANTIA_HIPOTECARIA', 'GARANTIA_VEHICULAR', 'GARANTIA_FIDUCIARIA',
-                    'GARANTIA_PRENDARIA', 'AVAL_SOLIDARIO', 'SIN_DESCUENTO'
-                );
-            """))
-            
-            # Modalidad de pago
-            db.execute(text("""
-                CREATE TYPE modalidad_pago AS ENUM (
-                    'DESCUENTO_DIRECTO', 'DEBITO_AUTOMATICO', 'VENTANILLA',
-                    'TRANSFERENCIA', 'CHEQUE', 'EFECTIVO'
-                );
-            """))
-            
-            # Estado de préstamo
-            db.execute(text("""
-                CREATE TYPE estado_prestamo AS ENUM (
-                    'SOLICITUD', 'EVALUACION', 'APROBADO', 'RECHAZADO',
-                    'DESEMBOLSADO', 'VIGENTE', 'MORA', 'CANCELADO',
-                    'REFINANCIADO', 'CASTIGADO'
-                );
-            """))
-            
-            # 2. Agregar nuevas columnas a la tabla prestamos
-            logger.info("Agregando nuevas columnas a prestamos...")
-            
-            # Clasificación del préstamo
-            db.execute(text("""
-                ALTER TABLE prestamos 
-                ADD COLUMN tipo_prestamo tipo_prestamo NOT NULL DEFAULT 'PERSONAL',
-                ADD COLUMN tipo_descuento_directo tipo_descuento_directo,
-                ADD COLUMN modalidad_pago modalidad_pago NOT NULL DEFAULT 'VENTANILLA';
-            """))
-            
-            # Número único de préstamo
-            db.execute(text("""
-                ALTER TABLE prestamos 
-                ADD COLUMN numero_prestamo VARCHAR(50) UNIQUE;
-            """))
-            
-            # Información de descuento directo (encriptada)
-            db.execute(text("""
-                ALTER TABLE prestamos 
-                ADD COLUMN entidad_empleadora VARCHAR(500),
-                ADD COLUMN numero_empleado VARCHAR(500),
-                ADD COLUMN cedula_empleado VARCHAR(500),
-                ADD COLUMN cargo_empleado VARCHAR(500),
-                ADD COLUMN salario_base VARCHAR(500),
-                ADD COLUMN contacto_rrhh VARCHAR(500),
-                ADD COLUMN telefono_rrhh VARCHAR(500),
-                ADD COLUMN email_rrhh VARCHAR(500);
-            """))
-            
-            # Campos adicionales
-            db.execute(text("""
-                ALTER TABLE prestamos 
-                ADD COLUMN observaciones TEXT,
-                ADD COLUMN descuento_autorizado BOOLEAN NOT NULL DEFAULT FALSE,
-                ADD COLUMN fecha_autorizacion_descuento TIMESTAMP,
-                ADD COLUMN porcentaje_descuento_maximo NUMERIC(5,2) NOT NULL DEFAULT 30.00;
-            """))
-            
-            # 3. Actualizar el campo estado para usar el nuevo ENUM
-            logger.info("Actualizando campo estado...")
-            
-            # Primero, mapear estados existentes
-            db.execute(text("""
-                UPDATE prestamos 
-                SET estado = CASE 
-                    WHEN estado = 'pendiente' THEN 'SOLICITUD'
-                    WHEN estado = 'aprobado' THEN 'APROBADO'
-                    WHEN estado = 'activo' THEN 'VIGENTE'
-                    WHEN estado = 'pagado' THEN 'CANCELADO'
-                    WHEN estado = 'mora' THEN 'MORA'
-                    ELSE 'SOLICITUD'
-                END;
-            """))
-            
-            # Cambiar tipo de columna
-            db.execute(text("""
-                ALTER TABLE prestamos 
-                ALTER COLUMN estado TYPE estado_prestamo 
-                USING estado::estado_prestamo;
-            """))
-            
-            # 4. Crear índices para optimizar consultas
-            logger.info("Creando índices...")
-            
-            db.execute(text("CREATE INDEX idx_prestamo_numero ON prestamos (numero_prestamo);"))
-            db.execute(text("CREATE INDEX idx_prestamo_tipo ON prestamos (tipo_prestamo);"))
-            db.execute(text("CREATE INDEX idx_prestamo_descuento_directo ON prestamos (tipo_descuento_directo);"))
-            db.execute(text("CREATE INDEX idx_prestamo_modalidad_pago ON prestamos (modalidad_pago);"))
-            db.execute(text("CREATE INDEX idx_prestamo_descuento_autorizado ON prestamos (descuento_autorizado);"))
-            db.execute(text("CREATE INDEX idx_prestamo_sucursal_estado ON prestamos (sucursal_id, estado);"))
-            db.execute(text("CREATE INDEX idx_prestamo_tipo_estado ON prestamos (tipo_prestamo, estado);"))
-            
-            # 5. Generar números de préstamo para registros existentes
-            logger.info("Generando números de préstamo para registros existentes...")
-            
-            db.execute(text("""
-                UPDATE prestamos 
-                SET numero_prestamo = CONCAT(
-                    SUBSTRING(tipo_prestamo::text, 1, 3), '-',
-                    COALESCE((SELECT codigo FROM sucursales WHERE id = prestamos.sucursal_id), '001'), '-',
-                    EXTRACT(YEAR FROM created_at), '-',
-                    LPAD((ROW_NUMBER() OVER (ORDER BY created_at))::text, 4, '0')
-                )
-                WHERE numero_prestamo IS NULL;
-            """))
-            
-            db.commit()
-            logger.info("Migración 003 completada exitosamente")
-            
-        except Exception as e:
-            logger.error(f"Error en migración 003: {str(e)}")
-            db.rollback()
-            raise
+    logger.info("Iniciando migración 003: Agregar campos de descuento directo a préstamos")
+    MigrationRunner(engine).aplicar(['003_add_descuento_directo_prestamos'])
+    logger.info("Migración 003 completada exitosamente")
 
 def downgrade():
     """Revertir migración: eliminar campos de descuento directo"""
@@ -233,6 +103,9 @@ def downgrade():
             db.execute(text("DROP TYPE IF EXISTS modalidad_pago;"))
             db.execute(text("DROP TYPE IF EXISTS estado_prestamo;"))
             
+            db.execute(text("DELETE FROM schema_migration_pasos WHERE version = '003_add_descuento_directo_prestamos';"))
+            db.execute(text("DELETE FROM schema_migrations WHERE version = '003_add_descuento_directo_prestamos';"))
+            
             db.commit()
             logger.info("Migración 003 revertida exitosamente")
             
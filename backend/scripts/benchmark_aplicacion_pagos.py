@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de aplicación de pagos contra un Postgres local
+
+Toma préstamos activos con cuotas pendientes de la base configurada
+(DATABASE_URL), genera pagos sintéticos de entre media y tres cuotas y los
+aplica con AplicacionPagosService. Todo corre dentro de una transacción
+externa que se revierte al final (los commits del servicio solo liberan
+savepoints), salvo que se indique --confirmar.
+
+Uso:
+    python scripts/benchmark_aplicacion_pagos.py
+    python scripts/benchmark_aplicacion_pagos.py --pagos 50000 --prestamos 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+# Agregar el directorio raíz del proyecto al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.models.secure_models import Cuota, Prestamo, Usuario
+from app.services.aplicacion_pagos_service import AplicacionPagosService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de aplicación de pagos")
+    parser.add_argument("--pagos", type=int, default=20_000)
+    parser.add_argument("--prestamos", type=int, default=2_000, help="Préstamos distintos a los que se aplican pagos")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--confirmar", action="store_true", help="Confirmar los pagos en lugar de revertirlos")
+    args = parser.parse_args()
+
+    random.seed(args.semilla)
+
+    with engine.connect() as conn:
+        transaccion = conn.begin()
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            usuario_id = db.execute(select(Usuario.id).limit(1)).scalar()
+            prestamos = db.execute(
+                select(Prestamo.numero_prestamo, Prestamo.cuota_mensual).where(
+                    Prestamo.estado.in_(('VIGENTE', 'MORA')),
+                    Prestamo.numero_prestamo.isnot(None),
+                    select(Cuota.id).where(Cuota.prestamo_id == Prestamo.id, Cuota.estado != 'PAGADA').exists()
+                ).limit(args.prestamos)
+            ).all()
+            if not usuario_id or not prestamos:
+                print("❌ Se necesitan al menos un usuario y préstamos VIGENTE/MORA con cuotas pendientes")
+                return 1
+
+            lote = uuid.uuid4().hex[:8]
+            ahora = datetime.utcnow().isoformat()
+            items = []
+            for i in range(args.pagos):
+                numero, cuota = random.choice(prestamos)
+                monto = Decimal(str(cuota)) * Decimal(str(random.uniform(0.5, 3.0)))
+                items.append({
+                    'origen': 'BENCHMARK',
+                    'referencia': f"{lote}-{i}",
+                    'numero_prestamo': numero,
+                    'monto': str(monto.quantize(Decimal('0.01'))),
+                    'fecha_pago': ahora,
+                })
+
+            print(f"⏱️  Aplicando {len(items):,} pagos sobre {len(prestamos):,} préstamos...")
+            inicio = time.perf_counter()
+            resumen = AplicacionPagosService(db).aplicar_pagos(items, str(usuario_id))
+            duracion = time.perf_counter() - inicio
+
+            print("⏱️  Reaplicando los mismos pagos (idempotencia)...")
+            inicio_reintento = time.perf_counter()
+            reintento = AplicacionPagosService(db).aplicar_pagos(items, str(usuario_id))
+            duracion_reintento = time.perf_counter() - inicio_reintento
+        finally:
+            db.close()
+            if args.confirmar:
+                transaccion.commit()
+            else:
+                transaccion.rollback()
+
+    print("✅ Benchmark finalizado")
+    print(f"   Aplicados:      {resumen['aplicados']:,}")
+    print(f"   Errores:        {resumen['errores']:,}")
+    print(f"   Monto aplicado: {resumen['monto_aplicado']:,.2f}")
+    print(f"   Duración:       {duracion:.2f} s")
+    print(f"   Velocidad:      {len(items) / duracion:,.0f} pagos/s")
+    print(f"   Reintento:      {reintento['duplicados']:,} duplicados en {duracion_reintento:.2f} s")
+    print(f"   Cambios:        {'confirmados' if args.confirmar else 'revertidos'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
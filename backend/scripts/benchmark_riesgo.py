@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la calificación de riesgo vectorizada
+
+Genera una matriz sintética de variables crudas (por defecto 1.000.000 de
+filas, con clientes sin ingresos declarados) y mide la construcción de
+variables, el cálculo de probabilidad, niveles, puntajes y la detección de
+cambios contra una calificación anterior, sin tocar la base de datos.
+
+Uso:
+    python scripts/benchmark_riesgo.py
+    python scripts/benchmark_riesgo.py --filas 5000000 --modelo /etc/financepro/riesgo.json
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Agregar el directorio raíz del proyecto al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.riesgo_service import COLUMNAS_CRUDAS, NIVELES, ModeloRiesgo, construir_variables
+
+
+def generar_crudos(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Matriz (n, columnas crudas) con distribuciones parecidas a la cartera"""
+    columnas = {
+        'dias_mora': np.where(rng.random(n) < 0.8, 0, rng.integers(1, 180, n)),
+        'cuotas_vencidas': rng.poisson(0.4, n),
+        'saldo_vencido': rng.exponential(150, n),
+        'saldo': rng.uniform(500, 30_000, n),
+        'cuotas_exigibles': rng.integers(0, 13, n),
+        'cuotas_tardias': rng.integers(0, 4, n),
+        'cuotas_prestamos': rng.uniform(50, 900, n),
+        'ingresos': np.where(rng.random(n) < 0.05, np.nan, rng.uniform(400, 6_000, n)),
+        'capacidad_pago': rng.uniform(0, 2_000, n),
+        'cuotas_obligaciones': rng.uniform(0, 800, n),
+        'obligaciones_vigentes': rng.poisson(1.5, n),
+        'exposicion_pep': rng.random(n) < 0.01,
+        'lista_sanciones': rng.random(n) < 0.001,
+        'gestiones_fallidas': rng.poisson(0.8, n),
+        'gestiones_exitosas': rng.poisson(1.2, n),
+        'promesas_incumplidas': rng.poisson(0.2, n),
+        'descuento_directo': rng.random(n) < 0.3,
+    }
+    return np.column_stack([np.asarray(columnas[c], dtype=np.float64) for c in COLUMNAS_CRUDAS])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la calificación de riesgo")
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--modelo", default="", help="Archivo JSON del modelo (por defecto el scorecard base)")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.semilla)
+    n = args.filas
+    crudos = generar_crudos(rng, n)
+    modelo = ModeloRiesgo.cargar(args.modelo)
+    puntaje_anterior = np.where(rng.random(n) < 0.1, np.nan, rng.integers(0, 101, n).astype(np.float64))
+    nivel_anterior = np.array(NIVELES, dtype=object)[rng.integers(0, len(NIVELES), n)]
+
+    print(f"⏱️  Calificando {n:,} filas con el modelo {modelo.version}...")
+    inicio = time.perf_counter()
+    variables = construir_variables(crudos)
+    t_variables = time.perf_counter()
+    probabilidad = modelo.probabilidad(variables)
+    puntajes = np.rint(probabilidad * 100).astype(np.int64)
+    niveles = np.array(NIVELES, dtype=object)[modelo.niveles(probabilidad)]
+    t_modelo = time.perf_counter()
+    cambios = np.flatnonzero(
+        np.isnan(puntaje_anterior) | (niveles != nivel_anterior) | (puntajes != puntaje_anterior)
+    )
+    fin = time.perf_counter()
+
+    print("✅ Benchmark finalizado")
+    print(f"   Filas:         {n:,}")
+    for nivel in NIVELES:
+        print(f"   {nivel + ':':<14} {np.count_nonzero(niveles == nivel):,}")
+    print(f"   Cambios:       {len(cambios):,}")
+    print(f"   Variables:     {t_variables - inicio:.3f} s")
+    print(f"   Modelo:        {t_modelo - t_variables:.3f} s")
+    print(f"   Detección:     {fin - t_modelo:.3f} s")
+    print(f"   Velocidad:     {n / (fin - inicio):,.0f} filas/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Importa clientes desde un archivo DBF del sistema legado (ej. prsctes.dbf)
+
+Uso:
+    python scripts/importar_dbf.py /ruta/prsctes.dbf
+    python scripts/importar_dbf.py /ruta/prsctes.dbf --mapeo mapeo.json --lote 5000
+    python scripts/importar_dbf.py /ruta/prsctes.dbf --reiniciar
+    python scripts/importar_dbf.py /ruta/prsctes.dbf --delta
+
+La carga completa se reanuda automáticamente desde el último checkpoint.
+El modo --delta aplica solo registros nuevos, modificados o eliminados.
+"""
+import argparse
+import logging
+import os
+import sys
+
+# Agregar el directorio raíz del proyecto al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services.dbf_import_service import DBFImportService, cargar_mapeo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importación de clientes desde DBF legado")
+    parser.add_argument("archivo", help="Ruta local del archivo DBF")
+    parser.add_argument("--mapeo", help="JSON con el mapeo campo destino -> campo DBF")
+    parser.add_argument("--lote", type=int, help="Registros por lote de COPY")
+    parser.add_argument("--checkpoint", help="Ruta del archivo de checkpoint")
+    parser.add_argument("--rechazados", help="Ruta del archivo dead-letter (JSONL)")
+    parser.add_argument("--limite", type=int, help="Máximo de registros a procesar en esta ejecución")
+    parser.add_argument("--reiniciar", action="store_true", help="Ignorar el checkpoint existente")
+    parser.add_argument("--delta", action="store_true", help="Sincronización delta por huellas")
+    parser.add_argument("--forzar-eliminaciones", action="store_true",
+                        help="Aplicar eliminaciones aunque superen DBF_SYNC_MAX_DELETE_RATIO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        service = DBFImportService(
+            engine,
+            mapeo=cargar_mapeo(args.mapeo or settings.DBF_IMPORT_MAPPING_FILE),
+            tamano_lote=args.lote
+        )
+        if args.delta:
+            print(f"🔄 Sincronizando cambios desde {args.archivo}...")
+            reporte = service.sincronizar(
+                args.archivo,
+                ruta_dead_letter=args.rechazados,
+                forzar_eliminaciones=args.forzar_eliminaciones
+            )
+            print("✅ Sincronización finalizada")
+            print(f"   Procesados:   {reporte['procesados']}")
+            print(f"   Nuevos:       {reporte['nuevos']}")
+            print(f"   Modificados:  {reporte['modificados']}")
+            print(f"   Sin cambios:  {reporte['sin_cambios']}")
+            print(f"   Eliminados:   {reporte['eliminados']}")
+            if reporte['eliminaciones_pendientes']:
+                print(f"⚠️  Eliminaciones no aplicadas: {reporte['eliminaciones_pendientes']} (use --forzar-eliminaciones)")
+            print(f"   Rechazados:   {reporte['rechazados']} ({reporte['dead_letter']})")
+            print(f"   Duración:     {reporte['duracion_segundos']} s")
+            return 0
+
+        print(f"📥 Importando clientes desde {args.archivo}...")
+        reporte = service.importar(
+            args.archivo,
+            ruta_checkpoint=args.checkpoint,
+            ruta_dead_letter=args.rechazados,
+            reiniciar=args.reiniciar,
+            limite=args.limite
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print("✅ Importación finalizada")
+    print(f"   Procesados:  {reporte['procesados']}")
+    print(f"   Importados:  {reporte['importados']}")
+    print(f"   Omitidos:    {reporte['omitidos']}")
+    print(f"   Rechazados:  {reporte['rechazados']} ({reporte['dead_letter']})")
+    print(f"   Duración:    {reporte['duracion_segundos']} s")
+    print(f"   Velocidad:   {reporte['registros_por_segundo']} registros/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
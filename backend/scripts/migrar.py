@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Ejecutor de migraciones en línea
+
+Uso:
+    python scripts/migrar.py estado
+    python scripts/migrar.py aplicar
+    python scripts/migrar.py aplicar --version 003_add_descuento_directo_prestamos
+"""
+import argparse
+import logging
+import os
+import sys
+
+# Agregar el directorio raíz del proyecto al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine
+from app.services.migration_runner import MigrationRunner, MigracionBloqueadaError
+
+
+def mostrar_estado(runner: MigrationRunner):
+    estado = runner.estado()
+    print("📋 Migraciones aplicadas:")
+    for m in estado['aplicadas']:
+        print(f"   ✅ {m['version']} ({m['applied_at']})")
+    print("⏳ Migraciones pendientes:")
+    for m in estado['pendientes']:
+        manual = ", manual" if m['manual'] else ""
+        print(f"   • {m['version']}: {m['descripcion']} ({m['pasos']} pasos{manual})")
+    en_curso = [p for p in estado['progreso'] if p['estado'] != 'COMPLETADO']
+    if en_curso:
+        print("🔄 Pasos en curso o fallidos:")
+        for p in en_curso:
+            avance = f" {p['porcentaje']}%" if p['porcentaje'] is not None else ""
+            print(f"   [{p['estado']}] {p['version']} #{p['paso']} {p['nombre']}{avance}")
+            if p['error']:
+                print(f"      ❌ {p['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones en línea de FinancePro")
+    parser.add_argument("accion", choices=["estado", "aplicar"])
+    parser.add_argument("--version", action="append", help="Versión a aplicar (repetible)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    runner = MigrationRunner(engine)
+
+    if args.accion == "estado":
+        mostrar_estado(runner)
+        return 0
+
+    try:
+        aplicadas = runner.aplicar(args.version)
+    except MigracionBloqueadaError as e:
+        print(f"⚠️  {e}")
+        return 1
+    except Exception as e:
+        print(f"❌ Error aplicando migraciones: {e}")
+        return 1
+
+    print(f"✅ Migraciones aplicadas: {', '.join(aplicadas) if aplicadas else 'ninguna pendiente'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())